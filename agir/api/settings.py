@@ -108,6 +108,15 @@ SCANNER_API = os.environ.get("SCANNER_API", "http://agir.local:8000")
 SCANNER_API_KEY = os.environ.get("SCANNER_API_KEY", "prout")
 SCANNER_API_SECRET = os.environ.get("SCANNER_API_SECRET", "prout")
 
+# fenêtre de temps des événements inclus dans les flux ICS des agendas
+EVENT_ICS_FEED_PAST_DAYS = int(os.environ.get("EVENT_ICS_FEED_PAST_DAYS", 90))
+EVENT_ICS_FEED_FUTURE_DAYS = int(os.environ.get("EVENT_ICS_FEED_FUTURE_DAYS", 365))
+# génération en tâche de fond des images de partage des événements et des groupes, à chaque
+# enregistrement (désactivée pendant les tests)
+OG_IMAGE_BACKGROUND_GENERATION = (
+    os.environ.get("OG_IMAGE_BACKGROUND_GENERATION", "y").lower() in YES_VALUES
+)
+
 # these domain names are used when absolute URLs should be generated (e.g. to include in emails)
 MAIN_DOMAIN = os.environ.get("MAIN_DOMAIN", "https://lafranceinsoumise.fr")
 API_DOMAIN = os.environ.get(
@@ -228,6 +237,7 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "agir.lib.middleware.PermissionContextMiddleware",
     *(["django_otp.middleware.OTPMiddleware"] if ENABLE_ADMIN else []),
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
@@ -934,8 +944,13 @@ PAYMENT_MODES = [
 ]
 
 # SMS settings
-SMS_PROVIDER = os.environ.get("SMS_PROVIDER", "SFR")  # OVH or SFR
+SMS_PROVIDER = os.environ.get("SMS_PROVIDER", "SFR")  # OVH, SFR or FAKE
 SMS_DISABLED = os.environ.get("SMS_DISABLED", "true").lower() == "true"
+# envois groupés : nombre de lots envoyés en parallèle, et nombre maximal de lots par seconde
+SMS_BULK_CONCURRENCY = int(os.environ.get("SMS_BULK_CONCURRENCY", 4))
+SMS_BULK_BATCHES_PER_SECOND = float(os.environ.get("SMS_BULK_BATCHES_PER_SECOND", 5))
+# latence simulée (en secondes) par lot pour le fournisseur FAKE, utile pour les tests de charge
+SMS_FAKE_LATENCY = float(os.environ.get("SMS_FAKE_LATENCY", 0))
 
 # OVH Settings
 OVH_SMS_SERVICE = os.environ.get("OVH_SMS_SERVICE")
@@ -957,6 +972,9 @@ SFR_DEFAULT_SENDER = "LFI"
 # Short login codes settings
 SHORT_CODE_VALIDITY = 90
 MAX_CONCURRENT_SHORT_CODES = 3
+# nombre de vérifications de code ratées autorisées, et durée en minutes au bout de laquelle elles sont oubliées
+SHORT_CODE_MAX_ATTEMPTS = 5
+SHORT_CODE_ATTEMPTS_WINDOW = 15
 
 CALENDAR_MAXIMAL_DEPTH = 3
 
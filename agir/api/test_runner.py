@@ -18,6 +18,7 @@ class TestRunner(DiscoverRunner):
 
         Réalise les actions suivantes :
         - Crée un dossier temporaire pour les fichiers média et modifie le paramètre MEDIA_ROOT
+        - Désactive la génération en tâche de fond des images de partage
         - Met en place un serveur Redis standalone pour les tests
         - Met Celery en mode "eager", c'est-à-dire que les tâches sont exécutées immédiatement
           plutôt que d'être schedulées
@@ -33,6 +34,7 @@ class TestRunner(DiscoverRunner):
             STATICFILES_STORAGE=(
                 "django.contrib.staticfiles.storage.StaticFilesStorage"
             ),
+            OG_IMAGE_BACKGROUND_GENERATION=False,
         )
         self.settings_overrider.enable()
 
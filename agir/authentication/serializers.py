@@ -6,6 +6,11 @@ from django.urls import reverse
 from django_countries.serializer_fields import CountryField
 from rest_framework import serializers
 
+from agir.authentication.session_context import (
+    get_cached_person_context,
+    get_session_context_version,
+    get_static_routes,
+)
 from agir.authentication.utils import (
     is_hard_logged,
     is_soft_logged,
@@ -18,7 +23,6 @@ from agir.donations.actions import (
 )
 from agir.donations.views.donations_views import DONATION_SESSION_NAMESPACE
 from agir.groups.models import SupportGroup, Membership
-from agir.lib.utils import front_url
 from agir.people.serializers import PersonNewsletterListField
 from agir.voting_proxies.models import VotingProxyRequest
 
@@ -135,30 +139,8 @@ class SessionSerializer(serializers.Serializer):
         return 0
 
     def get_user_routes(self, request):
-        routes = {
-            "search": reverse("dashboard_search"),
-            "signup": reverse("signup"),
-            "login": reverse("short_code_login"),
-            "help": "https://infos.actionpopulaire.fr",
-            "resources": "https://infos.actionpopulaire.fr",
-            "logout": reverse("disconnect"),
-            "personalInformation": reverse("personal_information"),
-            "nspReferral": front_url("nsp_referral"),
-            "materiel": "https://materiel.actionpopulaire.fr/",
-            "news": "https://lafranceinsoumise.fr/actualites/",
-            "thematicTeams": front_url("thematic_groups"),
-        }
-
         if request.user.is_authenticated and request.user.person is not None:
-            routes.update(
-                {
-                    "notificationSettings": reverse(
-                        "list_activities.notification_settings"
-                    )
-                }
-            )
-
-            return routes
+            return get_static_routes()
 
     def get_toasts(self, request):
         return [
@@ -172,12 +154,34 @@ class SessionSerializer(serializers.Serializer):
             for m in messages.get_messages(request)
         ]
 
+    def get_person_context(self, request):
+        if not hasattr(self, "_person_context"):
+            person = request.user.person
+            version = self.context.get(
+                "session_context_version"
+            ) or get_session_context_version(person.pk)
+
+            self._person_context = get_cached_person_context(
+                person.pk,
+                version,
+                lambda: {
+                    "user": UserContextSerializer(instance=person).data,
+                    "facebookLogin": request.user.social_auth.filter(
+                        provider="facebook"
+                    ).exists(),
+                },
+            )
+
+        return self._person_context
+
     def get_user(self, request):
         if request.user.is_authenticated and request.user.person is not None:
-            return UserContextSerializer(instance=request.user.person).data
+            return self.get_person_context(request)["user"]
         return False
 
     def get_facebook_login(self, request):
+        if request.user.is_authenticated and request.user.person is not None:
+            return self.get_person_context(request)["facebookLogin"]
         return (
             request.user.is_authenticated
             and request.user.social_auth.filter(provider="facebook").exists()
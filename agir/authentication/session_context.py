@@ -0,0 +1,111 @@
+"""Mise en cache du contexte de session renvoyé par `/api/session/`
+
+Les données propres à une personne (informations personnelles, groupes, contribution active,
+procurations, connexion Facebook) sont construites une seule fois puis conservées en cache sous
+une clé dépendant d'un numéro de version propre à la personne. Ce numéro de version est changé
+par des signaux à chaque modification des objets concernés (voir `agir.authentication.signals`),
+et sert aussi à calculer l'ETag de la réponse.
+
+Certaines données dépendent de la date (contribution active, procurations à venir) : le numéro de
+version expire au bout de `SESSION_CONTEXT_CACHE_TIMEOUT`, et la date du jour entre dans la clé du
+cache comme dans l'ETag, pour que ces données ne soient jamais servies au-delà de leur validité.
+"""
+
+import hashlib
+import uuid
+from functools import lru_cache
+
+from django.core.cache import cache
+from django.urls import reverse
+from django.utils import timezone
+
+from agir.lib.utils import front_url
+
+SESSION_CONTEXT_CACHE_TIMEOUT = 3600
+
+
+def _version_key(person_id):
+    return f"SessionContext:{person_id}:version"
+
+
+def _context_key(person_id, version):
+    return f"SessionContext:{person_id}:{version}:{timezone.localdate().isoformat()}"
+
+
+def get_session_context_version(person_id):
+    """Renvoie le numéro de version actuel du contexte de session de la personne"""
+    version = cache.get(_version_key(person_id))
+
+    if version is None:
+        version = uuid.uuid4().hex
+        # si une autre requête a initialisé la version entre temps, c'est la sienne qu'on garde
+        if not cache.add(
+            _version_key(person_id), version, SESSION_CONTEXT_CACHE_TIMEOUT
+        ):
+            version = cache.get(_version_key(person_id), version)
+
+    return version
+
+
+def invalidate_session_context(*person_ids):
+    """Invalide le contexte de session mis en cache pour les personnes indiquées"""
+    if person_ids:
+        cache.set_many(
+            {
+                _version_key(person_id): uuid.uuid4().hex
+                for person_id in person_ids
+                if person_id is not None
+            },
+            SESSION_CONTEXT_CACHE_TIMEOUT,
+        )
+
+
+def get_cached_person_context(person_id, version, build):
+    """Renvoie le contexte de la personne depuis le cache, en le construisant si besoin
+
+    :param person_id: l'identifiant de la personne
+    :param version: le numéro de version obtenu par `get_session_context_version`
+    :param build: fonction sans argument construisant le contexte
+    """
+    key = _context_key(person_id, version)
+    context = cache.get(key)
+
+    if context is None:
+        context = build()
+        cache.set(key, context, SESSION_CONTEXT_CACHE_TIMEOUT)
+
+    return context
+
+
+def get_session_context_etag(request, version, authentication):
+    """Calcule l'ETag de la réponse de `/api/session/`
+
+    L'ETag ne dépend que du numéro de version du contexte de la personne, de la date du jour, du
+    niveau d'authentification et des adresses enregistrées dans les cookies, ce qui permet de
+    répondre `304 Not Modified` sans construire le contexte.
+    """
+    known_emails = request.COOKIES.get("knownEmails", "")
+    today = timezone.localdate().isoformat()
+    digest = hashlib.sha1(
+        f"{version}:{today}:{authentication}:{known_emails}".encode()
+    ).hexdigest()
+    return f'"{digest}"'
+
+
+@lru_cache(maxsize=None)
+def get_static_routes():
+    """Routes communes à toutes les sessions, calculées une seule fois par processus"""
+    return {
+        "search": reverse("dashboard_search"),
+        "signup": reverse("signup"),
+        "login": reverse("short_code_login"),
+        "help": "https://infos.actionpopulaire.fr",
+        "resources": "https://infos.actionpopulaire.fr",
+        "logout": reverse("disconnect"),
+        "personalInformation": reverse("personal_information"),
+        "nspReferral": front_url("nsp_referral"),
+        "materiel": "https://materiel.actionpopulaire.fr/",
+        "news": "https://lafranceinsoumise.fr/actualites/",
+        "thematicTeams": front_url("thematic_groups"),
+        "notificationSettings": reverse("list_activities.notification_settings"),
+    }
@@ -4,10 +4,19 @@ from django.contrib.auth import (
     user_logged_out,
     user_login_failed,
 )
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
+from social_django.models import UserSocialAuth
 
 import agir.authentication
 from agir.authentication import metrics
+from agir.authentication.session_context import invalidate_session_context
+from agir.authentication.social.storage import AgirSocialUser
+from agir.groups.models import Membership, SupportGroup
+from agir.payments.models import Payment, Subscription
+from agir.people.models import Person, PersonEmail
+from agir.voting_proxies.models import VotingProxy, VotingProxyRequest
 
 
 @receiver(user_logged_in, dispatch_uid="user_logged_in_count")
@@ -30,3 +39,66 @@ def user_login_failed_count(credentials, **kwargs):
 
     if backend is not None:
         agir.authentication.metrics.login_failed.labels(backend).inc()
+
+
+def invalidate_person_session_context(*person_ids):
+    # l'invalidation doit avoir lieu après la validation de la transaction, pour qu'une requête
+    # concurrente ne remette pas en cache les anciennes données sous la nouvelle version
+    transaction.on_commit(lambda: invalidate_session_context(*person_ids))
+
+
+@receiver(post_save, sender=Person, dispatch_uid="session_context_person")
+@receiver(post_delete, sender=Person, dispatch_uid="session_context_person_delete")
+def invalidate_session_context_for_person(sender, instance, **kwargs):
+    invalidate_person_session_context(instance.pk)
+
+
+@receiver(post_save, sender=PersonEmail, dispatch_uid="session_context_email")
+@receiver(post_delete, sender=PersonEmail, dispatch_uid="session_context_email_delete")
+@receiver(post_save, sender=Membership, dispatch_uid="session_context_membership")
+@receiver(
+    post_delete, sender=Membership, dispatch_uid="session_context_membership_delete"
+)
+@receiver(post_save, sender=Subscription, dispatch_uid="session_context_subscription")
+@receiver(post_save, sender=Payment, dispatch_uid="session_context_payment")
+@receiver(post_save, sender=VotingProxy, dispatch_uid="session_context_voting_proxy")
+@receiver(
+    post_delete, sender=VotingProxy, dispatch_uid="session_context_voting_proxy_delete"
+)
+def invalidate_session_context_for_related(sender, instance, **kwargs):
+    if instance.person_id is not None:
+        invalidate_person_session_context(instance.person_id)
+
+
+@receiver(
+    post_save, sender=VotingProxyRequest, dispatch_uid="session_context_proxy_request"
+)
+def invalidate_session_context_for_voting_proxy_request(sender, instance, **kwargs):
+    if instance.proxy_id is not None:
+        invalidate_person_session_context(
+            *VotingProxy.objects.filter(pk=instance.proxy_id).values_list(
+                "person_id", flat=True
+            )
+        )
+
+
+@receiver(post_save, sender=SupportGroup, dispatch_uid="session_context_group")
+def invalidate_session_context_for_group_members(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_person_session_context(
+            *instance.memberships.values_list("person_id", flat=True)
+        )
+
+
+@receiver(post_save, sender=UserSocialAuth, dispatch_uid="session_context_social")
+@receiver(post_save, sender=AgirSocialUser, dispatch_uid="session_context_social_p")
+@receiver(
+    post_delete, sender=UserSocialAuth, dispatch_uid="session_context_social_delete"
+)
+@receiver(
+    post_delete, sender=AgirSocialUser, dispatch_uid="session_context_social_p_delete"
+)
+def invalidate_session_context_for_social_auth(sender, instance, **kwargs):
+    invalidate_person_session_context(
+        *Person.objects.filter(role_id=instance.user_id).values_list("pk", flat=True)
+    )
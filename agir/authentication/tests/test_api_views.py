@@ -1,13 +1,23 @@
+import datetime
 from unittest.mock import patch
 
+from django.core.cache import cache
+from django.test import override_settings
 from rest_framework.test import APITestCase
 
+from agir.api.redis import using_separate_redis_server
 from agir.authentication.tokens import short_code_generator
+from agir.authentication.views.api_views import (
+    send_mail_email_bucket,
+    send_mail_ip_bucket,
+)
+from agir.lib import token_bucket
 from agir.people.models import Person
 
 
 class LoginAPITestCase(APITestCase):
     def setUp(self):
+        self.addCleanup(token_bucket._exhausted_until.clear)
         self.valid_email = "valid@email.com"
         self.person = Person.objects.create_person(
             email=self.valid_email, create_role=True, is_political_support=True
@@ -27,44 +37,39 @@ class LoginAPITestCase(APITestCase):
         self.assertEqual(res.status_code, 422)
         self.assertIn("email", res.data)
 
-    @patch(
-        "agir.authentication.views.api_views.send_mail_email_bucket.has_tokens",
-        return_value=False,
-    )
-    def test_person_cannot_login_if_email_is_throttled(self, email_bucket):
+    @using_separate_redis_server
+    def test_person_cannot_login_if_email_is_throttled(self):
         self.client.logout()
         email = self.valid_email
+        for _ in range(send_mail_email_bucket.max):
+            send_mail_email_bucket.has_tokens(email)
+
         res = self.client.post(f"/api/connexion/", data={"email": email})
         self.assertEqual(res.status_code, 429)
         self.assertIn("detail", res.data)
 
-    @patch(
-        "agir.authentication.views.api_views.send_mail_email_bucket.has_tokens",
-        return_value=True,
-    )
-    @patch(
-        "agir.authentication.views.api_views.send_mail_ip_bucket.has_tokens",
-        return_value=False,
-    )
-    def test_person_cannot_login_if_ip_address_is_throttled(
-        self, email_bucket, ip_bucket
-    ):
+    @using_separate_redis_server
+    def test_person_cannot_login_if_ip_address_is_throttled(self):
         self.client.logout()
         email = self.valid_email
+        for _ in range(send_mail_ip_bucket.max):
+            send_mail_ip_bucket.has_tokens("127.0.0.1")
+
         res = self.client.post(f"/api/connexion/", data={"email": email})
         self.assertEqual(res.status_code, 429)
         self.assertIn("detail", res.data)
 
+        # l'adresse email n'a pas consommé de jeton, la requête ayant été refusée
+        send_mail_ip_bucket.reset("127.0.0.1")
+        for _ in range(send_mail_email_bucket.max):
+            self.assertTrue(send_mail_email_bucket.has_tokens(email))
+
     @patch(
-        "agir.authentication.views.api_views.send_mail_email_bucket.has_tokens",
-        return_value=True,
-    )
-    @patch(
-        "agir.authentication.views.api_views.send_mail_ip_bucket.has_tokens",
+        "agir.authentication.views.api_views.has_tokens",
         return_value=True,
     )
     def test_person_can_login_if_email_is_valid_and_email_and_ip_address_are_not_throttled(
-        self, email_bucket, ip_bucket
+        self, has_tokens
     ):
         self.client.logout()
         email = self.valid_email
@@ -131,30 +136,40 @@ class CheckCodeTestCase(APITestCase):
         self.assertEqual(res.status_code, 422)
         self.assertIn("code", res.data)
 
-    @patch(
-        "agir.authentication.views.api_views.check_short_code_bucket.has_tokens",
-        return_value=False,
-    )
-    def test_person_cannot_login_if_short_code_is_throttled(self, short_code_bucket):
+    @using_separate_redis_server
+    def test_person_cannot_login_if_short_code_is_throttled(self):
         session = self.client.session
         session["login_email"] = self.person.email
         session.save()
         code, expiry = short_code_generator.generate_short_code(self.person.email)
+        for _ in range(short_code_generator.max_attempts):
+            short_code_generator.check_short_code(self.person.email, "AAAAA")
         res = self.client.post(f"/api/connexion/code/", data={"code": code})
         self.assertEqual(res.status_code, 429)
         self.assertIn("detail", res.data)
 
-    @patch(
-        "agir.authentication.views.api_views.check_short_code_bucket.has_tokens",
-        return_value=True,
-    )
+    @using_separate_redis_server
+    def test_password_attempts_are_throttled(self):
+        self.person.role.set_password("mot de passe")
+        self.person.role.save()
+        session = self.client.session
+        session["login_email"] = self.person.email
+        session.save()
+
+        for _ in range(short_code_generator.max_attempts):
+            res = self.client.post(
+                "/api/connexion/code/", data={"code": "mauvais mot de passe"}
+            )
+            self.assertEqual(res.status_code, 422)
+
+        res = self.client.post("/api/connexion/code/", data={"code": "mot de passe"})
+        self.assertEqual(res.status_code, 429)
+
     @patch(
         "agir.authentication.views.api_views.authenticate",
         return_value=False,
     )
-    def test_person_cannot_login_if_short_code_is_not_valid(
-        self, short_code_bucket, authenticate
-    ):
+    def test_person_cannot_login_if_short_code_is_not_valid(self, authenticate):
         session = self.client.session
         session["login_email"] = self.person.email
         session.save()
@@ -181,6 +196,32 @@ class CheckCodeTestCase(APITestCase):
         self.assertIn("email", session_res.data["user"])
         self.assertEqual(session_res.data["user"]["email"], self.person.email)
 
+    @using_separate_redis_server
+    def test_short_code_can_only_be_used_once(self):
+        code, expiry = short_code_generator.generate_short_code(
+            self.person.email, {"source": "test"}
+        )
+        self.assertEqual(
+            short_code_generator.check_short_code(self.person.email, code),
+            {"source": "test", "_valid": True},
+        )
+        self.assertIsNone(
+            short_code_generator.check_short_code(self.person.email, code)
+        )
+
+    @using_separate_redis_server
+    def test_only_last_short_codes_are_valid(self):
+        codes = [
+            short_code_generator.generate_short_code(self.person.email)[0]
+            for _ in range(short_code_generator.max_concurrent_codes + 1)
+        ]
+        self.assertIsNone(
+            short_code_generator.check_short_code(self.person.email, codes[0])
+        )
+        self.assertTrue(
+            short_code_generator.check_short_code(self.person.email, codes[-1])
+        )
+
     def test_email_is_debounced_if_login_succeeds(self):
         email = self.person.emails.get_by_natural_key(self.person.email)
         email.bounced = True
@@ -215,3 +256,53 @@ class LogoutTestCase(APITestCase):
         session_res = self.client.get("/api/session/")
         self.assertIn("user", session_res.data)
         self.assertEqual(session_res.data["user"], False)
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class SessionContextAPITestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.person = Person.objects.create_person(
+            email="person@email.com",
+            first_name="Alice",
+            create_role=True,
+            is_political_support=True,
+        )
+        self.client.force_login(self.person.role)
+
+    def test_not_modified_if_etag_matches(self):
+        res = self.client.get("/api/session/")
+        self.assertEqual(res.status_code, 200)
+        self.assertIn("ETag", res)
+
+        res = self.client.get("/api/session/", HTTP_IF_NONE_MATCH=res["ETag"])
+        self.assertEqual(res.status_code, 304)
+
+    def test_context_is_invalidated_when_person_changes(self):
+        res = self.client.get("/api/session/")
+        self.assertEqual(res.data["user"]["firstName"], "Alice")
+        etag = res["ETag"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.person.first_name = "Berthe"
+            self.person.save()
+
+        res = self.client.get("/api/session/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data["user"]["firstName"], "Berthe")
+        self.assertNotEqual(res["ETag"], etag)
+
+    def test_context_is_invalidated_when_day_changes(self):
+        res = self.client.get("/api/session/")
+        etag = res["ETag"]
+
+        with patch(
+            "agir.authentication.session_context.timezone.localdate",
+            return_value=datetime.date.today() + datetime.timedelta(days=1),
+        ):
+            res = self.client.get("/api/session/", HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertNotEqual(res["ETag"], etag)
@@ -5,7 +5,6 @@ import re
 
 from django.conf import settings
 from django.utils import timezone
-from django.utils.crypto import constant_time_compare
 
 from agir.api.redis import get_auth_redis_client
 from agir.authentication.crypto import ConnectionSignatureGenerator
@@ -58,86 +57,213 @@ connection_token_generator = ConnectionSignatureGenerator(
 )
 
 
+# KEYS: codes_key
+# ARGV: code, expiration (ms), meta, now (ms), max_concurrent_codes, validity (s)
+_GENERATE_SHORT_CODE_SCRIPT = """
+local now = tonumber(ARGV[4])
+local max_codes = tonumber(ARGV[5])
+
+-- codes are stored as `expiration:sequence:meta`, the sequence giving the order of generation
+local sequence = redis.call('HINCRBY', KEYS[1], '#', 1)
+redis.call('HSET', KEYS[1], ARGV[1], ARGV[2] .. ':' .. sequence .. ':' .. ARGV[3])
+
+-- expired codes are removed, then the oldest ones if there are too many of them
+local entries = redis.call('HGETALL', KEYS[1])
+local codes = {}
+for i = 1, #entries, 2 do
+    if entries[i] ~= '#' then
+        local first = string.find(entries[i + 1], ':', 1, true)
+        local second = string.find(entries[i + 1], ':', first + 1, true)
+        local expiration = tonumber(string.sub(entries[i + 1], 1, first - 1))
+        if expiration <= now then
+            redis.call('HDEL', KEYS[1], entries[i])
+        else
+            table.insert(codes, {entries[i], tonumber(string.sub(entries[i + 1], first + 1, second - 1))})
+        end
+    end
+end
+
+if #codes > max_codes then
+    table.sort(codes, function(a, b) return a[2] < b[2] end)
+    for i = 1, #codes - max_codes do
+        redis.call('HDEL', KEYS[1], codes[i][1])
+    end
+end
+
+redis.call('EXPIRE', KEYS[1], ARGV[6])
+"""
+
+# KEYS: codes_key, attempts_key
+# ARGV: code, now (ms), max_attempts, attempts_window (s)
+# returns {-1} if there were too many attempts, {0} if the code is invalid, and {1, meta} otherwise
+_CHECK_SHORT_CODE_SCRIPT = """
+local attempts = redis.call('INCR', KEYS[2])
+if attempts == 1 then
+    redis.call('EXPIRE', KEYS[2], ARGV[4])
+end
+if attempts > tonumber(ARGV[3]) then
+    return {-1}
+end
+
+local value = redis.call('HGET', KEYS[1], ARGV[1])
+if (not value) or ARGV[1] == '#' then
+    return {0}
+end
+
+-- a code can only be used once
+redis.call('HDEL', KEYS[1], ARGV[1])
+
+local first = string.find(value, ':', 1, true)
+local second = string.find(value, ':', first + 1, true)
+if tonumber(string.sub(value, 1, first - 1)) <= tonumber(ARGV[2]) then
+    return {0}
+end
+
+redis.call('DEL', KEYS[2])
+return {1, string.sub(value, second + 1)}
+"""
+
+# KEYS: attempts_key
+# ARGV: attempts_window (s)
+# returns the number of attempts during the current window, including this one
+_COUNT_ATTEMPT_SCRIPT = """
+local attempts = redis.call('INCR', KEYS[1])
+if attempts == 1 then
+    redis.call('EXPIRE', KEYS[1], ARGV[1])
+end
+return attempts
+"""
+
+_scripts = {}
+
+
+def _run_script(source, keys, args):
+    client = get_auth_redis_client()
+    if source not in _scripts:
+        _scripts[source] = client.register_script(source)
+    return _scripts[source](keys=keys, args=args, client=client)
+
+
+class TooManyShortCodeAttempts(Exception):
+    pass
+
+
 class ShortCodeGenerator:
     alphabet = "ABCDEFGHJKLMNPQRSTUVWXYZ123456789"
     allowed_patterns = [r"^[A-Z1-9]{5}$"]
     length = 5
 
-    def __init__(self, key_prefix, validity, max_concurrent_codes):
+    def __init__(
+        self,
+        key_prefix,
+        validity,
+        max_concurrent_codes,
+        max_attempts=5,
+        attempts_window=15,
+    ):
         """
 
         :param key_prefix: redis prefix used to name the keys holding the tokens
         :param validity: duration of validity of generated tokens, in minutes
         :param max_concurrent_codes: maximum number of concurrent codes
+        :param max_attempts: maximum number of failed checks for a user during `attempts_window`
+        :param attempts_window: duration after which the failed checks are forgotten, in minutes
         """
         self.key_prefix = key_prefix
         self.validity = validity
         self.max_concurrent_codes = max_concurrent_codes
+        self.max_attempts = max_attempts
+        self.attempts_window = attempts_window
         self._allowed_patterns = [re.compile(p) for p in self.allowed_patterns]
 
     def _make_code(self):
         return "".join(choice(self.alphabet) for i in range(self.length))
 
-    def generate_short_code(self, user_pk, meta: dict = None):
-        if meta is None:
-            meta = {}
+    def _codes_key(self, user_pk):
+        return f"{self.key_prefix}{user_pk}"
 
+    def _attempts_key(self, user_pk):
+        return f"{self.key_prefix}{user_pk}:attempts"
+
+    def generate_short_code(self, user_pk, meta: dict = None):
         short_code = self._make_code()
-        expiration = timezone.now() + timezone.timedelta(minutes=self.validity)
-        payload = json.dumps(
-            {
-                "code": short_code,
-                "expiration": int(
+        now = timezone.now()
+        expiration = now + timezone.timedelta(minutes=self.validity)
+
+        _run_script(
+            _GENERATE_SHORT_CODE_SCRIPT,
+            keys=[self._codes_key(user_pk)],
+            args=[
+                short_code,
+                int(
                     expiration.timestamp() * 1000
-                ),  # timestamp from epoch in microseconds
-                "meta": meta,
-            }
+                ),  # timestamp from epoch in milliseconds
+                json.dumps(meta) if meta else "",
+                int(now.timestamp() * 1000),
+                self.max_concurrent_codes,
+                60 * self.validity,
+            ],
         )
-        key = f"{self.key_prefix}{user_pk}"
-
-        p = get_auth_redis_client().pipeline(transaction=False)
-        p.lpush(key, payload)
-        p.ltrim(key, 0, self.max_concurrent_codes - 1)
-        p.expire(key, 60 * self.validity)
-        p.execute()
 
         return short_code, expiration
 
     def is_allowed_pattern(self, code):
         return any(p.match(code) for p in self._allowed_patterns)
 
+    def count_failed_attempt(self, user_pk):
+        """Count a failed login attempt that did not go through `check_short_code`
+
+        The attempts are counted with the same counter as the short code checks, so that other
+        authentication methods (such as passwords) are throttled the same way.
+
+        :raises TooManyShortCodeAttempts: if there were too many failed attempts for this user
+        """
+        attempts = _run_script(
+            _COUNT_ATTEMPT_SCRIPT,
+            keys=[self._attempts_key(user_pk)],
+            args=[60 * self.attempts_window],
+        )
+
+        if attempts > self.max_attempts:
+            raise TooManyShortCodeAttempts()
+
     def check_short_code(self, user_pk, short_code):
-        key = f"{self.key_prefix}{user_pk}"
-        now = timezone.now()
+        """Check the short code and consume it if it is valid
+
+        The check, the consumption of the code and the counting of attempts are done atomically
+        in a single call to redis.
 
-        # get the raw payloads for all codes
-        raw_payloads = get_auth_redis_client().lrange(
-            key, 0, self.max_concurrent_codes - 1
+        :raises TooManyShortCodeAttempts: if there were too many failed attempts for this user
+        :return: the meta dict of the code if it is valid, `None` otherwise
+        """
+        result = _run_script(
+            _CHECK_SHORT_CODE_SCRIPT,
+            keys=[self._codes_key(user_pk), self._attempts_key(user_pk)],
+            args=[
+                short_code,
+                int(timezone.now().timestamp() * 1000),
+                self.max_attempts,
+                60 * self.attempts_window,
+            ],
         )
-        # parse the JSON payloads (but keep original payload to allow removing it from redis list)
-        payloads = [json.loads(p) for p in raw_payloads]
-        valid_short_codes = [
-            p
-            for p in payloads
-            if timezone.datetime.fromtimestamp(p["expiration"] / 1000, timezone.utc)
-            > now
-        ]
-
-        # to avoid timing attacks, always compare with every codes, and use constant time comparisons
-        correct_short_code_payloads = [
-            p for p in valid_short_codes if constant_time_compare(p["code"], short_code)
-        ]
-
-        if correct_short_code_payloads:
-            meta = correct_short_code_payloads[0].get("meta", {})
-            meta.setdefault(
-                "_valid", True
-            )  # comme ça la valeur booléenne du dict est vraie pour pouvoir faire `if gen.check_short_code(pk, tok):`
-            return meta
-
-        return None
+
+        if result[0] == -1:
+            raise TooManyShortCodeAttempts()
+
+        if result[0] != 1:
+            return None
+
+        meta = json.loads(result[1]) if result[1] else {}
+        meta.setdefault(
+            "_valid", True
+        )  # comme ça la valeur booléenne du dict est vraie pour pouvoir faire `if gen.check_short_code(pk, tok):`
+        return meta
 
 
 short_code_generator = ShortCodeGenerator(
-    "LoginCode:", settings.SHORT_CODE_VALIDITY, settings.MAX_CONCURRENT_SHORT_CODES
+    "LoginCodes:",
+    settings.SHORT_CODE_VALIDITY,
+    settings.MAX_CONCURRENT_SHORT_CODES,
+    settings.SHORT_CODE_MAX_ATTEMPTS,
+    settings.SHORT_CODE_ATTEMPTS_WINDOW,
 )
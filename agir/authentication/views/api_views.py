@@ -1,10 +1,12 @@
 import logging
 
 from django.conf import settings
+from django.contrib import messages
 from django.contrib.auth import authenticate, login, logout
 from django.core.exceptions import ValidationError
 from django.core.validators import validate_email
 from django.middleware.csrf import get_token
+from django.utils.cache import get_conditional_response
 from django.views.decorators.cache import never_cache
 from rest_framework import exceptions, permissions, status
 from rest_framework.decorators import api_view, permission_classes
@@ -13,10 +15,17 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from agir.authentication.serializers import SessionSerializer, SessionDonationSerializer
+from agir.authentication.session_context import (
+    get_session_context_etag,
+    get_session_context_version,
+)
 from agir.authentication.tasks import send_login_email, send_no_account_email
-from agir.authentication.tokens import short_code_generator
+from agir.authentication.tokens import (
+    short_code_generator,
+    TooManyShortCodeAttempts,
+)
 from agir.lib.rest_framework_permissions import IsActionPopulaireClientPermission
-from agir.lib.token_bucket import TokenBucket
+from agir.lib.token_bucket import TokenBucket, has_tokens
 from agir.lib.utils import get_client_ip
 from agir.people.models import Person, PersonEmail
 
@@ -30,9 +39,8 @@ __all__ = [
     "ping",
 ]
 
-send_mail_email_bucket = TokenBucket("SendMail", 5, 600)
-send_mail_ip_bucket = TokenBucket("SendMailIP", 5, 120)
-check_short_code_bucket = TokenBucket("CheckShortCode", 5, 180)
+send_mail_email_bucket = TokenBucket("SendMail", 5, 600, local_precheck=True)
+send_mail_ip_bucket = TokenBucket("SendMailIP", 5, 120, local_precheck=True)
 
 logger = logging.getLogger(__name__)
 
@@ -57,6 +65,46 @@ class SessionContextAPIView(RetrieveAPIView):
     def get_object(self):
         return self.request
 
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["session_context_version"] = getattr(
+            self, "session_context_version", None
+        )
+        return context
+
+    def get_etag(self, request):
+        # les messages ne doivent être consommés qu'une fois : pas d'ETag s'il y en a en attente
+        if len(messages.get_messages(request)) > 0:
+            return None
+
+        if request.user.is_authenticated and request.user.person is not None:
+            self.session_context_version = get_session_context_version(
+                request.user.person.pk
+            )
+        else:
+            self.session_context_version = None
+
+        return get_session_context_etag(
+            request,
+            self.session_context_version,
+            self.get_serializer().get_authentication(request),
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        etag = self.get_etag(request)
+
+        if etag is not None:
+            not_modified = get_conditional_response(request, etag=etag)
+            if not_modified is not None:
+                return not_modified
+
+        response = super().retrieve(request, *args, **kwargs)
+
+        if etag is not None:
+            response["ETag"] = etag
+
+        return response
+
 
 # Retrieve specific session filled with Donation informations
 class SessionDonationAPIView(RetrieveAPIView):
@@ -97,9 +145,9 @@ class LoginAPIView(APIView):
 
         client_ip = get_client_ip(self.request)
 
-        if not send_mail_email_bucket.has_tokens(
-            email
-        ) or not send_mail_ip_bucket.has_tokens(client_ip):
+        if not has_tokens(
+            (send_mail_email_bucket, email), (send_mail_ip_bucket, client_ip)
+        ):
             raise exceptions.Throttled(
                 detail=self.messages["throttled"], code="throttled"
             )
@@ -166,6 +214,9 @@ class CheckCodeAPIView(APIView):
         short_code = code.replace(" ", "").upper()
 
         if not short_code_generator.is_allowed_pattern(short_code):
+            # le code n'est pas vérifié par `check_short_code` : la tentative doit être comptée
+            # ici, pour que le repli sur le mot de passe soit limité de la même façon
+            short_code_generator.count_failed_attempt(email)
             raise exceptions.ValidationError(
                 detail={"code": self.messages["invalid_format"]}, code="invalid_format"
             )
@@ -180,14 +231,13 @@ class CheckCodeAPIView(APIView):
         return role
 
     def validate(self, email, code):
-        if not settings.DEBUG and not check_short_code_bucket.has_tokens(email):
-            raise exceptions.Throttled(
-                detail=self.messages["throttled"], code="throttled"
-            )
-
         try:
             # The authenticate function should be called with a short_code most of the time.
             return self.validate_short_code(email, code)
+        except TooManyShortCodeAttempts:
+            raise exceptions.Throttled(
+                detail=self.messages["throttled"], code="throttled"
+            )
         except exceptions.ValidationError as short_code_error:
             # The fallback of checking if the received code is the user password is only meant for granting access to
             # the the app to specific users (e.g. for Google or Apple app validation)
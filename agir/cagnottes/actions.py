@@ -1,32 +1,23 @@
 from django.core.exceptions import ValidationError
-from django.db.models import Sum
 
-from agir.api.redis import get_auth_redis_client
 from agir.cagnottes.apps import CagnottesConfig
 from agir.cagnottes.models import Cagnotte
+from agir.payments.counters import Counter
 from agir.payments.models import Payment
 
 
-def redis_key(cagnotte: Cagnotte):
-    return f"Cagnotte:{cagnotte.slug}:montant"
+def compteur_cagnotte(cagnotte_id):
+    return Counter(f"cagnotte:{cagnotte_id}")
 
 
-def recalculer_montant_cagnotte(cagnotte):
-    return (
-        Payment.objects.completed()
-        .filter(type=CagnottesConfig.PAYMENT_TYPE, meta__cagnotte=cagnotte.id)
-        .aggregate(total=Sum("price"))["total"]
-        or 0
+def paiements_cagnotte(cagnotte):
+    return Payment.objects.completed().filter(
+        type=CagnottesConfig.PAYMENT_TYPE, meta__cagnotte=cagnotte.id
     )
 
 
 def montant_cagnotte(cagnotte):
-    raw_value = get_auth_redis_client().get(redis_key(cagnotte))
-
-    try:
-        return int(raw_value)
-    except (ValueError, TypeError):
-        return 0
+    return compteur_cagnotte(cagnotte.id).get_value()
 
 
 def mettre_a_jour_compteur(payment: Payment, negative=False):
@@ -37,12 +28,12 @@ def mettre_a_jour_compteur(payment: Payment, negative=False):
     except (Cagnotte.DoesNotExist, ValidationError, ValueError, TypeError):
         return
 
-    client = get_auth_redis_client()
+    compteur = compteur_cagnotte(cagnotte.id)
 
     if negative:
-        client.decr(redis_key(cagnotte), payment.price)
+        compteur.remove_payment(payment)
     else:
-        client.incr(redis_key(cagnotte), payment.price)
+        compteur.add_payment(payment)
 
 
 def incrementer_compteur(payment: Payment):
@@ -54,5 +45,4 @@ def decrementer_compteur(payment: Payment):
 
 
 def rafraichir_compteur(cagnotte):
-    montant = recalculer_montant_cagnotte(cagnotte)
-    get_auth_redis_client().set(redis_key(cagnotte), montant)
+    return compteur_cagnotte(cagnotte.id).rebuild(paiements_cagnotte(cagnotte))
@@ -0,0 +1,25 @@
+from django.db import migrations
+
+REMPLIR_JOURNAL = """
+INSERT INTO payments_paymentcounterentry (counter, payment_id, amount, created)
+SELECT 'cagnotte:' || (p.meta->>'cagnotte'), p.id, p.price, NOW()
+FROM payments_payment p
+JOIN cagnottes_cagnotte c ON c.id::text = p.meta->>'cagnotte'
+WHERE p.type = 'don_cagnotte' AND p.status = 1
+ON CONFLICT DO NOTHING;
+"""
+
+VIDER_JOURNAL = """
+DELETE FROM payments_paymentcounterentry WHERE counter LIKE 'cagnotte:%';
+"""
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("cagnottes", "0006_alter_cagnotte_slug"),
+        ("payments", "0007_paymentcounterentry"),
+    ]
+
+    operations = [
+        migrations.RunSQL(sql=REMPLIR_JOURNAL, reverse_sql=VIDER_JOURNAL),
+    ]
@@ -1,9 +1,11 @@
 import json
 
 from django.db import transaction
-from django.db.models import Sum
+from django.db.models import Sum, Subquery, OuterRef, Value, CharField
+from django.db.models.functions import Coalesce, Concat, Cast
 
 from agir.donations.models import (
+    AccountBalance,
     MonthlyAllocation,
     AllocationModelMixin,
     AccountOperation,
@@ -27,7 +29,11 @@ def get_account_name_for_group(group):
     return f"actif:groupe:{group_id}"
 
 
-def get_account_balance(account: str):
+MATERIALIZED_ACCOUNTS_PREFIX = "actif:"
+
+
+def compute_account_balance(account: str):
+    """Calcule le solde d'un compte à partir de l'ensemble des opérations"""
     incomes = (
         AccountOperation.objects.filter(destination=account).aggregate(
             sum=Sum("amount")
@@ -43,6 +49,69 @@ def get_account_balance(account: str):
     return incomes - outcomes
 
 
+def get_account_balance(account: str):
+    if not account.startswith(MATERIALIZED_ACCOUNTS_PREFIX):
+        return compute_account_balance(account)
+
+    return (
+        AccountBalance.objects.filter(account=account)
+        .values_list("balance", flat=True)
+        .first()
+        or 0
+    )
+
+
+def get_account_balances(accounts):
+    """Renvoie les soldes de plusieurs comptes d'actif en une seule requête
+
+    :param accounts: les noms des comptes
+    :return: un dictionnaire associant à chaque nom de compte son solde
+    """
+    accounts = list(accounts)
+    balances = dict(
+        AccountBalance.objects.filter(account__in=accounts).values_list(
+            "account", "balance"
+        )
+    )
+    return {account: balances.get(account, 0) for account in accounts}
+
+
+def get_supportgroup_balances(groups):
+    """Renvoie les soldes de plusieurs groupes en une seule requête
+
+    :param groups: des groupes ou des identifiants de groupes
+    :return: un dictionnaire associant à chaque identifiant de groupe son solde
+    """
+    accounts = {
+        get_account_name_for_group(group): (
+            group.id if isinstance(group, SupportGroup) else group
+        )
+        for group in groups
+    }
+    return {
+        accounts[account]: balance
+        for account, balance in get_account_balances(accounts).items()
+    }
+
+
+def supportgroup_balance_subquery(group_ref="id"):
+    """Expression donnant le solde d'un groupe, pour annoter un queryset
+
+    :param group_ref: le chemin vers l'identifiant du groupe dans le queryset annoté
+    """
+    return Coalesce(
+        Subquery(
+            AccountBalance.objects.filter(
+                account=Concat(
+                    Value("actif:groupe:"),
+                    Cast(OuterRef(group_ref), output_field=CharField()),
+                )
+            ).values("balance")[:1]
+        ),
+        0,
+    )
+
+
 def get_balance(qs):
     return qs.aggregate(sum=Sum("amount"))["sum"] or 0
 
@@ -5,7 +5,7 @@ from django.db import transaction
 
 from agir.donations.allocations import (
     get_account_name_for_departement,
-    get_departement_balance,
+    get_account_balances,
     get_account_name_for_group,
 )
 from agir.donations.models import AccountOperation
@@ -26,18 +26,25 @@ class Command(BaseCommand):
         )
 
         with transaction.atomic():
+            comptes = {}
             for b in boucles:
                 if b.location_departement_id:
                     code = b.location_departement_id
                 else:
                     num = re.search("\d+", b.name).group(0).zfill(2)
                     code = f"99-{num}"
+                comptes[b] = get_account_name_for_departement(code)
 
-                balance = get_departement_balance(code)
+            # tous les soldes sont récupérés en une seule requête
+            balances = get_account_balances(set(comptes.values()))
+
+            for b, compte in comptes.items():
+                # un même compte départemental ne doit être transféré qu'une fois
+                balance = balances.pop(compte, 0)
 
                 if balance > 0:
                     AccountOperation.objects.create(
-                        source=get_account_name_for_departement(code),
+                        source=compte,
                         destination=get_account_name_for_group(b),
                         amount=balance,
                         comment=comment,
@@ -0,0 +1,89 @@
+from django.core.management import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Sum
+
+from agir.donations.allocations import MATERIALIZED_ACCOUNTS_PREFIX
+from agir.donations.models import AccountOperation, AccountBalance
+from agir.lib.display import display_price
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcule le solde des comptes d'actif à partir des opérations financières, et signale "
+        "les écarts avec les soldes enregistrés."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--corriger",
+            action="store_true",
+            default=False,
+            help="Remplace les soldes erronés par les soldes recalculés.",
+        )
+
+    def compute_balances(self):
+        balances = {}
+
+        incomes = (
+            AccountOperation.objects.filter(
+                destination__startswith=MATERIALIZED_ACCOUNTS_PREFIX
+            )
+            .values_list("destination")
+            .annotate(total=Sum("amount"))
+            .order_by()
+        )
+        outcomes = (
+            AccountOperation.objects.filter(
+                source__startswith=MATERIALIZED_ACCOUNTS_PREFIX
+            )
+            .values_list("source")
+            .annotate(total=Sum("amount"))
+            .order_by()
+        )
+
+        for account, total in incomes:
+            balances[account] = balances.get(account, 0) + total
+        for account, total in outcomes:
+            balances[account] = balances.get(account, 0) - total
+
+        return balances
+
+    def handle(self, *args, corriger, **options):
+        with transaction.atomic():
+            # le mode SHARE attend la fin des transactions qui écrivent des opérations (et mettent à
+            # jour les soldes correspondants), puis bloque toute nouvelle écriture jusqu'à la fin de
+            # la vérification : opérations et soldes enregistrés sont ainsi lus dans un état cohérent
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"LOCK TABLE {connection.ops.quote_name(AccountOperation._meta.db_table)} "
+                    "IN SHARE MODE"
+                )
+            computed = self.compute_balances()
+            recorded = dict(AccountBalance.objects.values_list("account", "balance"))
+
+            drifts = {
+                account: (recorded.get(account, 0), computed.get(account, 0))
+                for account in computed.keys() | recorded.keys()
+                if recorded.get(account, 0) != computed.get(account, 0)
+            }
+
+            for account, (recorded_balance, computed_balance) in sorted(drifts.items()):
+                self.stdout.write(
+                    f"{account} : solde enregistré {display_price(recorded_balance)}, "
+                    f"solde recalculé {display_price(computed_balance)}"
+                )
+
+            if not drifts:
+                self.stdout.write(
+                    self.style.SUCCESS(f"Aucun écart sur {len(computed)} compte(s).")
+                )
+                return
+
+            self.stdout.write(self.style.WARNING(f"{len(drifts)} compte(s) en écart."))
+
+            if corriger:
+                for account, (_, computed_balance) in drifts.items():
+                    AccountBalance.objects.update_or_create(
+                        account=account, defaults={"balance": computed_balance}
+                    )
+                self.stdout.write(self.style.SUCCESS("Soldes corrigés."))
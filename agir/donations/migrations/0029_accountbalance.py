@@ -0,0 +1,98 @@
+import agir.donations.model_fields
+from django.db import migrations, models
+
+# Les soldes ne sont projetés que pour les comptes d'actif (voir AccountBalance)
+update_balances_function = """
+CREATE OR REPLACE FUNCTION update_account_balances() RETURNS TRIGGER AS
+$update_balances$
+    BEGIN
+        IF TG_OP = 'UPDATE' OR TG_OP = 'DELETE' THEN
+            IF OLD.destination LIKE 'actif:%' THEN
+                INSERT INTO donations_accountbalance (account, balance)
+                VALUES (OLD.destination, -OLD.amount)
+                ON CONFLICT (account) DO UPDATE SET balance = donations_accountbalance.balance + EXCLUDED.balance;
+            END IF;
+
+            IF OLD.source LIKE 'actif:%' THEN
+                INSERT INTO donations_accountbalance (account, balance)
+                VALUES (OLD.source, OLD.amount)
+                ON CONFLICT (account) DO UPDATE SET balance = donations_accountbalance.balance + EXCLUDED.balance;
+            END IF;
+        END IF;
+
+        IF TG_OP = 'INSERT' OR TG_OP = 'UPDATE' THEN
+            IF NEW.destination LIKE 'actif:%' THEN
+                INSERT INTO donations_accountbalance (account, balance)
+                VALUES (NEW.destination, NEW.amount)
+                ON CONFLICT (account) DO UPDATE SET balance = donations_accountbalance.balance + EXCLUDED.balance;
+            END IF;
+
+            IF NEW.source LIKE 'actif:%' THEN
+                INSERT INTO donations_accountbalance (account, balance)
+                VALUES (NEW.source, -NEW.amount)
+                ON CONFLICT (account) DO UPDATE SET balance = donations_accountbalance.balance + EXCLUDED.balance;
+            END IF;
+        END IF;
+
+        RETURN NULL;
+    END
+$update_balances$ LANGUAGE plpgsql;
+
+CREATE TRIGGER update_account_balances
+AFTER INSERT OR UPDATE OR DELETE ON donations_accountoperation
+FOR EACH ROW EXECUTE PROCEDURE update_account_balances();
+"""
+
+drop_update_balances_function = """
+DROP TRIGGER IF EXISTS update_account_balances ON donations_accountoperation;
+DROP FUNCTION IF EXISTS update_account_balances();
+"""
+
+initial_balances = """
+INSERT INTO donations_accountbalance (account, balance)
+SELECT account, SUM(amount)
+FROM (
+    SELECT destination AS account, amount FROM donations_accountoperation
+    UNION ALL
+    SELECT source AS account, -amount FROM donations_accountoperation
+) AS movements
+WHERE account LIKE 'actif:%'
+GROUP BY account;
+"""
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("donations", "0028_auto_20240111_1723"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AccountBalance",
+            fields=[
+                (
+                    "account",
+                    models.CharField(
+                        max_length=200,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="Compte",
+                    ),
+                ),
+                (
+                    "balance",
+                    agir.donations.model_fields.BalanceField(
+                        default=0, verbose_name="Solde"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "solde de compte",
+                "verbose_name_plural": "soldes des comptes",
+            },
+        ),
+        migrations.RunSQL(
+            sql=update_balances_function, reverse_sql=drop_update_balances_function
+        ),
+        migrations.RunSQL(sql=initial_balances, reverse_sql=migrations.RunSQL.noop),
+    ]
@@ -170,6 +170,29 @@ class AccountOperation(TimeStampedModel):
         ]
 
 
+class AccountBalance(models.Model):
+    """Solde d'un compte d'actif (groupe, département, caisse nationale de solidarité)
+
+    Cette table est une projection des opérations financières : elle est tenue à jour par un
+    trigger PostgreSQL à chaque création, modification ou suppression d'une `AccountOperation`,
+    dans la même transaction. Seuls les comptes d'actif (`actif:...`) y figurent : les comptes de
+    revenus et de dépenses, modifiés par presque toutes les opérations, ne sont pas projetés pour
+    éviter la contention sur leurs lignes.
+
+    La commande `verifier_soldes` permet de recalculer ces soldes à partir des opérations.
+    """
+
+    account = models.CharField(_("Compte"), max_length=200, primary_key=True)
+    balance = BalanceField(_("Solde"), null=False, default=0)
+
+    def __repr__(self):
+        return f"AccountBalance(account={self.account!r}, balance={self.balance!r})"
+
+    class Meta:
+        verbose_name = _("solde de compte")
+        verbose_name_plural = _("soldes des comptes")
+
+
 class OperationModelMixin(TimeStampedModel):
     amount = BalanceField(
         _("montant net"),
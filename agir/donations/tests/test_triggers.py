@@ -1,7 +1,14 @@
 from django.db import IntegrityError, transaction
 from django.test import TestCase
 
-from agir.donations.models import MonthlyAllocation
+from agir.donations.allocations import (
+    compute_account_balance,
+    get_account_balance,
+    get_account_balances,
+    get_account_name_for_group,
+    get_supportgroup_balances,
+)
+from agir.donations.models import MonthlyAllocation, AccountOperation, AccountBalance
 from agir.groups.models import SupportGroup
 from agir.payments.models import Subscription
 from agir.people.models import Person
@@ -66,3 +73,37 @@ class MonthlyAllocationTestCase(TestCase):
             MonthlyAllocation.objects.create(
                 subscription=s, amount=300, group=self.group1
             )
+
+
+class AccountBalanceTestCase(TestCase):
+    def setUp(self) -> None:
+        self.group = SupportGroup.objects.create(
+            name="Groupe", type=SupportGroup.TYPE_LOCAL_GROUP
+        )
+        self.account = get_account_name_for_group(self.group)
+
+    def test_balance_follows_operations(self):
+        operation = AccountOperation.objects.create(
+            source="revenu:dons", destination=self.account, amount=1000
+        )
+        AccountOperation.objects.create(
+            source=self.account, destination="depenses:groupes", amount=300
+        )
+        self.assertEqual(get_account_balance(self.account), 700)
+        self.assertEqual(
+            get_account_balance(self.account), compute_account_balance(self.account)
+        )
+
+        operation.amount = 2000
+        operation.save()
+        self.assertEqual(get_supportgroup_balances([self.group]), {self.group.id: 1700})
+
+        operation.delete()
+        self.assertEqual(get_account_balances([self.account]), {self.account: -300})
+
+    def test_other_accounts_are_not_materialized(self):
+        AccountOperation.objects.create(
+            source="revenu:dons", destination=self.account, amount=1000
+        )
+        self.assertFalse(AccountBalance.objects.filter(account="revenu:dons").exists())
+        self.assertEqual(get_account_balance("revenu:dons"), -1000)
@@ -1,17 +1,13 @@
-from agir.api.redis import get_auth_redis_client
+from agir.payments.counters import Counter
 
 
-def incrementer_compteur(compteur, montant):
-    client = get_auth_redis_client()
+def compteur(nom):
+    return Counter(f"europeennes2024:{nom}")
 
-    cle = f"Europeennes2024:{compteur}:montant"
-    client.incr(cle, montant)
 
+def incrementer_compteur(nom, payment):
+    compteur(nom).add_payment(payment)
 
-def montant_compteur(compteur):
-    raw_value = get_auth_redis_client().get(f"Europeennes2024:{compteur}:montant")
 
-    try:
-        return int(raw_value)
-    except (ValueError, TypeError):
-        return 0
+def montant_compteur(nom):
+    return compteur(nom).get_value()
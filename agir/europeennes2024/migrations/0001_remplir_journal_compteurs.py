@@ -0,0 +1,33 @@
+from django.db import migrations
+
+# les paiements par chèque sont comptabilisés dès l'enregistrement de la promesse
+REMPLIR_JOURNAL = """
+INSERT INTO payments_paymentcounterentry (counter, payment_id, amount, created)
+SELECT
+  CASE p.type
+    WHEN 'pret_europeennes2024' THEN 'europeennes2024:prets'
+    ELSE 'europeennes2024:dons'
+  END,
+  p.id, p.price, NOW()
+FROM payments_payment p
+WHERE p.type IN ('pret_europeennes2024', 'don_europeennes2024')
+AND (
+  p.status = 1
+  OR (p.mode = 'check_europeennes2024' AND p.status = 0)
+)
+ON CONFLICT DO NOTHING;
+"""
+
+VIDER_JOURNAL = """
+DELETE FROM payments_paymentcounterentry WHERE counter LIKE 'europeennes2024:%';
+"""
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("payments", "0007_paymentcounterentry"),
+    ]
+
+    operations = [
+        migrations.RunSQL(sql=REMPLIR_JOURNAL, reverse_sql=VIDER_JOURNAL),
+    ]
@@ -57,7 +57,7 @@ class PretsReviewContractView(
         res = super().form_valid(form)
 
         if self.payment.mode == Europeennes2024CheckPaymentMode.id:
-            incrementer_compteur("prets", self.payment.price)
+            incrementer_compteur("prets", self.payment)
 
         return res
 
@@ -71,7 +71,7 @@ class DonsPersonalInformationView(
         res = super().form_valid(form)
 
         if self.payment.mode == Europeennes2024CheckPaymentMode.id:
-            incrementer_compteur("dons", self.payment.price)
+            incrementer_compteur("dons", self.payment)
 
         return res
 
@@ -80,7 +80,7 @@ def pret_status_listener(payment):
     if payment.status == Payment.STATUS_COMPLETED:
         find_or_create_person_from_payment(payment)
         if payment.mode != Europeennes2024CheckPaymentMode.id:
-            incrementer_compteur("prets", payment.price)
+            incrementer_compteur("prets", payment)
 
         return (
             generate_contract.si(payment.id) | envoyer_email_pret.si(payment.id)
@@ -91,7 +91,7 @@ def don_status_listener(payment):
     if payment.status == Payment.STATUS_COMPLETED:
         find_or_create_person_from_payment(payment)
         if payment.mode != Europeennes2024CheckPaymentMode.id:
-            incrementer_compteur("dons", payment.price)
+            incrementer_compteur("dons", payment)
 
         return envoyer_email_don.delay(payment.id)
 
@@ -50,6 +50,11 @@ def _ensure_can_rsvp(event, number=0):
     - que l'événement n'est pas terminé
     - que nous la limite éventuelle du nombre de participants n'est pas atteinte.
 
+    Lorsque le nombre de participants est limité, la ligne de l'événement est verrouillée jusqu'à
+    la fin de la transaction : les inscriptions concurrentes sont ainsi vérifiées l'une après
+    l'autre, sur le compteur mis à jour par la précédente. Elle doit donc être appelée dans une
+    transaction.
+
     :param event: L'événement concerné
     :param number: Le numéro de l'inscription à tester
     :return: None
@@ -59,10 +64,9 @@ def _ensure_can_rsvp(event, number=0):
     if event.is_past():
         raise RSVPException(MESSAGES["finished"])
 
-    # does not try to prevent race conditions
     if event.max_participants is not None and number:
-        current_participants = event.participants
-        if current_participants + number > event.max_participants:
+        event.refresh_participant_counts(lock=True)
+        if event.participants + number > event.max_participants:
             raise RSVPException(MESSAGES["full"])
 
 
@@ -97,10 +101,6 @@ def _get_rsvp_for_event(event, person, form_submission, paying):
     :raises: :class:`RSVPException`
     """
 
-    # TODO: add race conditions handling with explicit locking for maximum participants
-    # see https://www.caktusgroup.com/blog/2009/05/26/explicit-table-locking-with-postgresql-and-django/
-    # for potential solution
-
     if (event.subscription_form is None) != (form_submission is None):
         raise RSVPException(MESSAGES["submission_issue"])
 
@@ -24,7 +24,7 @@ from agir.lib.admin.filters import (
     CirconscriptionLegislativeFilter,
     ParticipantFilter,
 )
-from agir.lib.admin.panels import CenterOnFranceMixin
+from agir.lib.admin.panels import CenterOnFranceMixin, LargeChangeListMixin
 from agir.lib.utils import front_url, replace_datetime_timezone
 from agir.people.admin.views import FormSubmissionViewsMixin
 from agir.people.models import PersonFormSubmission
@@ -241,10 +241,11 @@ class AutoCompleteEventView(AutocompleteJsonView):
 
 
 @admin.register(models.Event)
-class EventAdmin(FormSubmissionViewsMixin, CenterOnFranceMixin, OSMGeoAdmin):
+class EventAdmin(
+    LargeChangeListMixin, FormSubmissionViewsMixin, CenterOnFranceMixin, OSMGeoAdmin
+):
     form = EventAdminForm
     person_form_display = EventRsvpPersonFormDisplay()
-    show_full_result_count = False
 
     fieldsets = (
         (
@@ -469,14 +470,14 @@ class EventAdmin(FormSubmissionViewsMixin, CenterOnFranceMixin, OSMGeoAdmin):
 
     def attendee_count(self, object):
         if object.is_free:
-            return str(object.all_attendee_count)
+            return str(object.participant_count)
 
         return _(
-            f"{object.all_attendee_count} (dont {object.confirmed_attendee_count} confirmés)"
+            f"{object.participant_count} (dont {object.confirmed_count} confirmés)"
         )
 
     attendee_count.short_description = _("Nombre de personnes inscrites")
-    attendee_count.admin_order_field = "all_attendee_count"
+    attendee_count.admin_order_field = "participant_count"
 
     def link(self, object):
         if object.pk:
@@ -0,0 +1,161 @@
+"""Arborescence des agendas et flux ICS
+
+Les clients de calendrier interrogent les flux ICS toutes les quelques minutes. Pour ne pas
+reconstruire chaque événement à chaque requête, le bloc VEVENT de chaque événement est conservé en
+cache sous une clé qui dépend de sa date de dernière modification, ce qui l'invalide à chaque
+enregistrement de l'événement. Les flux sont ensuite assemblés par simple concaténation de ces blocs.
+
+Les flux sont limités aux événements d'une fenêtre de temps configurable (`EVENT_ICS_FEED_PAST_DAYS`
+et `EVENT_ICS_FEED_FUTURE_DAYS`), et les réponses portent un ETag qui permet de répondre
+`304 Not Modified` sans assembler le flux. Cet ETag dépend de la liste des événements du flux, et
+pas seulement de leurs dates de modification : aucun en-tête `Last-Modified` n'est envoyé, car il ne
+changerait pas lorsqu'un événement est supprimé ou sort de la fenêtre de temps.
+"""
+
+import hashlib
+import uuid
+from datetime import timedelta
+from functools import lru_cache
+
+import ics
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+
+from agir.events.models import Calendar, Event
+
+EVENT_ICS_CACHE_TIMEOUT = 7 * 24 * 3600
+CALENDAR_TREE_CACHE_TIMEOUT = 24 * 3600
+
+CALENDAR_TREE_VERSION_KEY = "CalendarTree:version"
+
+CALENDAR_DESCENDANTS_QUERY = """
+WITH RECURSIVE children AS (
+    SELECT id
+    FROM events_calendar
+    WHERE id = %s
+  UNION ALL
+    SELECT c.id
+    FROM events_calendar AS c
+    JOIN children
+    ON c.parent_id = children.id
+)
+SELECT id FROM children;
+"""
+
+
+def get_calendar_ids(parent_id):
+    """Renvoie les identifiants de l'agenda et de tous ses descendants
+
+    Le résultat est conservé en cache jusqu'à la prochaine modification d'un agenda.
+    """
+    version = cache.get_or_set(CALENDAR_TREE_VERSION_KEY, uuid.uuid4().hex, None)
+    key = f"CalendarTree:{version}:{parent_id}"
+    ids = cache.get(key)
+
+    if ids is None:
+        ids = [
+            calendar.id
+            for calendar in Calendar.objects.raw(
+                CALENDAR_DESCENDANTS_QUERY, [parent_id]
+            )
+        ]
+        cache.set(key, ids, CALENDAR_TREE_CACHE_TIMEOUT)
+
+    return ids
+
+
+def invalidate_calendar_tree():
+    cache.set(CALENDAR_TREE_VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def _event_key(event_id, modified):
+    return f"EventIcs:{event_id}:{modified.timestamp()}"
+
+
+@lru_cache(maxsize=None)
+def get_calendar_envelope():
+    """Renvoie le début et la fin d'un fichier ICS, entre lesquels sont placés les événements"""
+    empty = ics.Calendar().serialize()
+    end = empty.rindex("END:VCALENDAR")
+    return empty[:end], empty[end:]
+
+
+def serialize_event(event):
+    """Renvoie le bloc VEVENT de l'événement, tel qu'il apparaît dans un fichier ICS"""
+    header, footer = get_calendar_envelope()
+    serialized = ics.Calendar(events=[event.to_ics()]).serialize()
+    return serialized[len(header) : len(serialized) - len(footer)]
+
+
+def get_feed_window(now=None):
+    if now is None:
+        now = timezone.now()
+
+    return (
+        now - timedelta(days=settings.EVENT_ICS_FEED_PAST_DAYS),
+        now + timedelta(days=settings.EVENT_ICS_FEED_FUTURE_DAYS),
+    )
+
+
+def get_feed_events(events):
+    """Restreint les événements d'un flux aux événements publics de la fenêtre de temps"""
+    start, end = get_feed_window()
+    return events.filter(
+        visibility=Event.VISIBILITY_PUBLIC, end_time__gte=start, start_time__lte=end
+    )
+
+
+def get_feed_versions(events):
+    """Renvoie la liste des couples (identifiant, date de modification) des événements du flux"""
+    return list(events.order_by("start_time", "id").values_list("id", "modified"))
+
+
+def get_feed_etag(versions):
+    digest = hashlib.sha1(
+        "\n".join(f"{id}:{modified.timestamp()}" for id, modified in versions).encode()
+    ).hexdigest()
+    return f'"{digest}"'
+
+
+def render_feed(versions):
+    """Assemble le flux à partir des blocs VEVENT en cache, en calculant ceux qui manquent"""
+    keys = {id: _event_key(id, modified) for id, modified in versions}
+    blocks = cache.get_many(keys.values())
+
+    missing = [id for id, key in keys.items() if key not in blocks]
+    if missing:
+        computed = {
+            keys[event.id]: serialize_event(event)
+            for event in Event.objects.filter(id__in=missing).select_related("subtype")
+        }
+        cache.set_many(computed, EVENT_ICS_CACHE_TIMEOUT)
+        blocks.update(computed)
+
+    header, footer = get_calendar_envelope()
+    return "".join(
+        [
+            header,
+            *(blocks[keys[id]] for id, _ in versions if keys[id] in blocks),
+            footer,
+        ]
+    )
+
+
+def feed_response(request, events):
+    """Renvoie la réponse HTTP du flux ICS des événements indiqués
+
+    Répond `304 Not Modified` si le client dispose déjà de la version actuelle du flux.
+    """
+    versions = get_feed_versions(get_feed_events(events))
+    etag = get_feed_etag(versions)
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(render_feed(versions), content_type="text/calendar")
+
+    response["ETag"] = etag
+
+    return response
@@ -1,9 +1,12 @@
+import locale
 from operator import itemgetter
 
+from django.utils import timezone
 from django.utils.formats import localize
 from django.utils.timezone import get_current_timezone
 from glom import T, glom
 
+from agir.lib.og_images import OGImage
 from agir.payments.models import Payment
 from agir.people.person_forms.display import PersonFormDisplay
 from agir.people.person_forms.models import PersonFormSubmission
@@ -126,3 +129,28 @@ def display_identified_guest(ig):
         values.update(res[0])
 
     return values
+
+
+class EventOGImage(OGImage):
+    kind = "events"
+
+    def get_date_string(self):
+        # set locale for displaying day name in french
+        locale.setlocale(locale.LC_ALL, "fr_FR.utf8")
+        format = "%A %d %B À %-H:%M"
+        if self.object.timezone != timezone.get_default_timezone_name():
+            format += "%Z"
+        return self.object.local_start_time.strftime(format).capitalize()
+
+    def get_location_string(self):
+        if self.object.location_city and self.object.location_zip:
+            return f"{self.object.location_city} ({self.object.location_zip})"
+        if self.object.location_city:
+            return self.object.location_city
+        if self.object.location_zip:
+            return self.object.location_zip
+
+        return ""
+
+    def get_subtitle(self):
+        return f"{self.get_location_string()} – {self.get_date_string()}"
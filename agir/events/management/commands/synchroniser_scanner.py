@@ -0,0 +1,40 @@
+from django.core.management import BaseCommand, CommandError
+
+from agir.events.scanner import sync_registrations, SCANNER_CONCURRENCY
+from agir.lib.management_utils import event_argument
+
+
+class Command(BaseCommand):
+    help = (
+        "Envoie les inscriptions d'un événement à l'application de scan des billets. Seules "
+        "les inscriptions modifiées depuis la dernière synchronisation sont envoyées."
+    )
+    requires_migrations_checks = True
+
+    def add_arguments(self, parser):
+        parser.add_argument("event", type=event_argument)
+        parser.add_argument(
+            "-f",
+            "--force",
+            action="store_true",
+            default=False,
+            help="Renvoie toutes les inscriptions, même celles qui n'ont pas changé.",
+        )
+        parser.add_argument(
+            "-c",
+            "--concurrency",
+            type=int,
+            default=SCANNER_CONCURRENCY,
+            help="Le nombre maximal de requêtes simultanées.",
+        )
+
+    def handle(self, event, force, concurrency, **kwargs):
+        if event.scanner_event is None:
+            raise CommandError(
+                "Cet événement n'est pas associé à un événement scanner."
+            )
+
+        sent = sync_registrations(
+            event.rsvps.all(), force=force, concurrency=concurrency
+        )
+        self.stdout.write(f"{sent} inscription(s) envoyée(s).")
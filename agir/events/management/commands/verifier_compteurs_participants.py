@@ -0,0 +1,70 @@
+from django.core.management import BaseCommand
+from django.db import connection, transaction
+
+from agir.events.models import Event
+
+# les compteurs sont recalculés avec la même fonction que celle utilisée par les triggers
+DRIFTS_QUERY = """
+SELECT e.id, e.name, e.participant_count, e.confirmed_count, c.total, c.confirmed
+FROM events_event e
+CROSS JOIN LATERAL compute_event_participant_counts(e.id, e.subscription_form_id IS NOT NULL) c
+WHERE (e.participant_count, e.confirmed_count) IS DISTINCT FROM (c.total, c.confirmed)
+ORDER BY e.start_time
+"""
+
+FIX_QUERY = """
+UPDATE events_event e
+SET (participant_count, confirmed_count) = (
+    SELECT total, confirmed
+    FROM compute_event_participant_counts(e.id, e.subscription_form_id IS NOT NULL)
+)
+WHERE e.id = ANY(%s)
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcule le nombre de participant⋅e⋅s de chaque événement à partir des inscriptions, "
+        "et signale les écarts avec les compteurs enregistrés."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--corriger",
+            action="store_true",
+            default=False,
+            help="Remplace les compteurs erronés par les valeurs recalculées.",
+        )
+
+    def handle(self, *args, corriger, **options):
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(DRIFTS_QUERY)
+                drifts = cursor.fetchall()
+
+            for id, name, participants, confirmed, total, total_confirmed in drifts:
+                self.stdout.write(
+                    f"{name} ({id}) : {participants} participant⋅e⋅s dont {confirmed} "
+                    f"confirmé⋅e⋅s enregistré⋅e⋅s, {total} dont {total_confirmed} recalculé⋅e⋅s"
+                )
+
+            if not drifts:
+                self.stdout.write(self.style.SUCCESS("Aucun écart."))
+                return
+
+            self.stdout.write(
+                self.style.WARNING(f"{len(drifts)} événement(s) en écart.")
+            )
+
+            if corriger:
+                ids = [drift[0] for drift in drifts]
+                # les événements sont verrouillés avant le recalcul, pour que celui-ci tienne
+                # compte des inscriptions enregistrées entre temps
+                list(
+                    Event.objects.select_for_update()
+                    .filter(pk__in=ids)
+                    .values_list("pk", flat=True)
+                )
+                with connection.cursor() as cursor:
+                    cursor.execute(FIX_QUERY, [ids])
+                self.stdout.write(self.style.SUCCESS("Compteurs corrigés."))
@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("events", "0036_alter_event_online_url"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="rsvp",
+            name="scanner_sync_hash",
+            field=models.CharField(
+                blank=True,
+                default="",
+                editable=False,
+                max_length=40,
+                verbose_name="empreinte de la dernière synchronisation avec le scanner",
+            ),
+        ),
+    ]
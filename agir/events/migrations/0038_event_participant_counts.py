@@ -0,0 +1,205 @@
+from django.db import migrations, models
+
+# Les invité⋅e⋅s sont comptés à partir du champ `guests` des RSVP pour les événements sans
+# formulaire d'inscription, et à partir des invité⋅e⋅s identifié⋅e⋅s pour les autres.
+compute_counts_function = """
+CREATE OR REPLACE FUNCTION compute_event_participant_counts(
+    p_event_id uuid, p_identified_guests boolean, OUT total integer, OUT confirmed integer
+) AS
+$compute_counts$
+    SELECT
+        (
+            COALESCE(SUM(1 + CASE WHEN p_identified_guests THEN 0 ELSE r.guests END), 0)
+            + CASE WHEN p_identified_guests THEN (
+                SELECT COUNT(*)
+                FROM events_identifiedguest g
+                INNER JOIN events_rsvp gr ON gr.id = g.rsvp_id
+                WHERE gr.event_id = p_event_id AND g.status IN ('AP', 'CO')
+            ) ELSE 0 END
+        )::integer,
+        (
+            COALESCE(SUM(1 + CASE WHEN p_identified_guests THEN 0 ELSE r.guests END) FILTER (WHERE r.status = 'CO'), 0)
+            + CASE WHEN p_identified_guests THEN (
+                SELECT COUNT(*)
+                FROM events_identifiedguest g
+                INNER JOIN events_rsvp gr ON gr.id = g.rsvp_id
+                WHERE gr.event_id = p_event_id AND g.status = 'CO'
+            ) ELSE 0 END
+        )::integer
+    FROM events_rsvp r
+    WHERE r.event_id = p_event_id AND r.status IN ('AP', 'CO');
+$compute_counts$ LANGUAGE sql STABLE;
+"""
+
+drop_compute_counts_function = """
+DROP FUNCTION IF EXISTS compute_event_participant_counts(uuid, boolean);
+"""
+
+rsvp_counts_trigger = """
+CREATE OR REPLACE FUNCTION update_event_participant_counts_from_rsvp() RETURNS TRIGGER AS
+$rsvp_counts$
+    BEGIN
+        IF (TG_OP = 'UPDATE' OR TG_OP = 'DELETE') AND OLD.status IN ('AP', 'CO') THEN
+            UPDATE events_event
+            SET
+                participant_count = participant_count
+                    - (1 + CASE WHEN subscription_form_id IS NULL THEN OLD.guests ELSE 0 END),
+                confirmed_count = confirmed_count
+                    - CASE WHEN OLD.status = 'CO'
+                        THEN 1 + CASE WHEN subscription_form_id IS NULL THEN OLD.guests ELSE 0 END
+                        ELSE 0 END
+            WHERE id = OLD.event_id;
+        END IF;
+
+        IF (TG_OP = 'INSERT' OR TG_OP = 'UPDATE') AND NEW.status IN ('AP', 'CO') THEN
+            UPDATE events_event
+            SET
+                participant_count = participant_count
+                    + (1 + CASE WHEN subscription_form_id IS NULL THEN NEW.guests ELSE 0 END),
+                confirmed_count = confirmed_count
+                    + CASE WHEN NEW.status = 'CO'
+                        THEN 1 + CASE WHEN subscription_form_id IS NULL THEN NEW.guests ELSE 0 END
+                        ELSE 0 END
+            WHERE id = NEW.event_id;
+        END IF;
+
+        RETURN NULL;
+    END
+$rsvp_counts$ LANGUAGE plpgsql;
+
+CREATE TRIGGER update_event_participant_counts
+AFTER INSERT OR DELETE ON events_rsvp
+FOR EACH ROW EXECUTE PROCEDURE update_event_participant_counts_from_rsvp();
+
+CREATE TRIGGER update_event_participant_counts_on_change
+AFTER UPDATE ON events_rsvp
+FOR EACH ROW
+WHEN (
+    OLD.status IS DISTINCT FROM NEW.status
+    OR OLD.guests IS DISTINCT FROM NEW.guests
+    OR OLD.event_id IS DISTINCT FROM NEW.event_id
+)
+EXECUTE PROCEDURE update_event_participant_counts_from_rsvp();
+"""
+
+drop_rsvp_counts_trigger = """
+DROP TRIGGER IF EXISTS update_event_participant_counts ON events_rsvp;
+DROP TRIGGER IF EXISTS update_event_participant_counts_on_change ON events_rsvp;
+DROP FUNCTION IF EXISTS update_event_participant_counts_from_rsvp();
+"""
+
+guest_counts_trigger = """
+CREATE OR REPLACE FUNCTION update_event_participant_counts_from_guest() RETURNS TRIGGER AS
+$guest_counts$
+    BEGIN
+        IF (TG_OP = 'UPDATE' OR TG_OP = 'DELETE') AND OLD.status IN ('AP', 'CO') THEN
+            UPDATE events_event e
+            SET
+                participant_count = e.participant_count - 1,
+                confirmed_count = e.confirmed_count - CASE WHEN OLD.status = 'CO' THEN 1 ELSE 0 END
+            FROM events_rsvp r
+            WHERE r.id = OLD.rsvp_id AND e.id = r.event_id AND e.subscription_form_id IS NOT NULL;
+        END IF;
+
+        IF (TG_OP = 'INSERT' OR TG_OP = 'UPDATE') AND NEW.status IN ('AP', 'CO') THEN
+            UPDATE events_event e
+            SET
+                participant_count = e.participant_count + 1,
+                confirmed_count = e.confirmed_count + CASE WHEN NEW.status = 'CO' THEN 1 ELSE 0 END
+            FROM events_rsvp r
+            WHERE r.id = NEW.rsvp_id AND e.id = r.event_id AND e.subscription_form_id IS NOT NULL;
+        END IF;
+
+        RETURN NULL;
+    END
+$guest_counts$ LANGUAGE plpgsql;
+
+CREATE TRIGGER update_event_participant_counts
+AFTER INSERT OR DELETE ON events_identifiedguest
+FOR EACH ROW EXECUTE PROCEDURE update_event_participant_counts_from_guest();
+
+CREATE TRIGGER update_event_participant_counts_on_change
+AFTER UPDATE ON events_identifiedguest
+FOR EACH ROW
+WHEN (
+    OLD.status IS DISTINCT FROM NEW.status
+    OR OLD.rsvp_id IS DISTINCT FROM NEW.rsvp_id
+)
+EXECUTE PROCEDURE update_event_participant_counts_from_guest();
+"""
+
+drop_guest_counts_trigger = """
+DROP TRIGGER IF EXISTS update_event_participant_counts ON events_identifiedguest;
+DROP TRIGGER IF EXISTS update_event_participant_counts_on_change ON events_identifiedguest;
+DROP FUNCTION IF EXISTS update_event_participant_counts_from_guest();
+"""
+
+# le mode de comptage des invité⋅e⋅s dépend de la présence d'un formulaire d'inscription
+subscription_form_trigger = """
+CREATE OR REPLACE FUNCTION reset_event_participant_counts() RETURNS TRIGGER AS
+$reset_counts$
+    BEGIN
+        SELECT total, confirmed INTO NEW.participant_count, NEW.confirmed_count
+        FROM compute_event_participant_counts(NEW.id, NEW.subscription_form_id IS NOT NULL);
+        RETURN NEW;
+    END
+$reset_counts$ LANGUAGE plpgsql;
+
+CREATE TRIGGER reset_event_participant_counts
+BEFORE UPDATE ON events_event
+FOR EACH ROW
+WHEN (OLD.subscription_form_id IS DISTINCT FROM NEW.subscription_form_id)
+EXECUTE PROCEDURE reset_event_participant_counts();
+"""
+
+drop_subscription_form_trigger = """
+DROP TRIGGER IF EXISTS reset_event_participant_counts ON events_event;
+DROP FUNCTION IF EXISTS reset_event_participant_counts();
+"""
+
+initial_counts = """
+UPDATE events_event e
+SET (participant_count, confirmed_count) = (
+    SELECT total, confirmed
+    FROM compute_event_participant_counts(e.id, e.subscription_form_id IS NOT NULL)
+)
+WHERE e.id IN (SELECT DISTINCT event_id FROM events_rsvp);
+"""
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("events", "0037_rsvp_scanner_sync_hash"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="event",
+            name="participant_count",
+            field=models.IntegerField(
+                default=0, editable=False, verbose_name="Nombre de participant⋅e⋅s"
+            ),
+        ),
+        migrations.AddField(
+            model_name="event",
+            name="confirmed_count",
+            field=models.IntegerField(
+                default=0,
+                editable=False,
+                verbose_name="Nombre de participant⋅e⋅s confirmé⋅e⋅s",
+            ),
+        ),
+        migrations.RunSQL(
+            sql=compute_counts_function, reverse_sql=drop_compute_counts_function
+        ),
+        migrations.RunSQL(
+            sql=rsvp_counts_trigger, reverse_sql=drop_rsvp_counts_trigger
+        ),
+        migrations.RunSQL(
+            sql=guest_counts_trigger, reverse_sql=drop_guest_counts_trigger
+        ),
+        migrations.RunSQL(
+            sql=subscription_form_trigger, reverse_sql=drop_subscription_form_trigger
+        ),
+        migrations.RunSQL(sql=initial_counts, reverse_sql=migrations.RunSQL.noop),
+    ]
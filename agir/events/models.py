@@ -25,8 +25,7 @@ from django.db.models import (
     When,
     Value,
 )
-from django.db.models import Sum, Count, Q, OuterRef, Subquery
-from django.db.models.functions import Coalesce
+from django.db.models import Q, OuterRef, Subquery
 from django.template.defaultfilters import floatformat
 from django.utils import formats, timezone
 from django.utils.html import format_html
@@ -448,6 +447,9 @@ lui-même.</li>
 )
 
 
+PARTICIPANT_COUNT_FIELDS = ("participant_count", "confirmed_count")
+
+
 class Event(
     ExportModelOperationsMixin("event"),
     BaseAPIResource,
@@ -509,6 +511,13 @@ class Event(
     allow_guests = models.BooleanField(
         "Autoriser les participant⋅e⋅s à inscrire des invité⋅e⋅s", default=False
     )
+    # tenus à jour par des triggers sur les RSVP et les invité⋅e⋅s (voir la migration 0038)
+    participant_count = models.IntegerField(
+        "Nombre de participant⋅e⋅s", default=0, editable=False
+    )
+    confirmed_count = models.IntegerField(
+        "Nombre de participant⋅e⋅s confirmé⋅e⋅s", default=0, editable=False
+    )
     facebook = FacebookEventField("Événement correspondant sur Facebook", blank=True)
 
     attendees = models.ManyToManyField(
@@ -725,38 +734,37 @@ class Event(
 
         return ics_event
 
-    def _get_participants_counts(self):
-        nb_rsvps = (
-            RSVP.objects.participating()
-            .filter(event_id=self.id)
-            .aggregate(
-                total=Count("id"),
-                confirmed=Count("id", filter=Q(status=RSVP.Status.CONFIRMED)),
-            )
-        )
+    def save(self, *args, update_fields=None, **kwargs):
+        # les compteurs de participant⋅e⋅s sont maintenus par la base de données : ils ne sont
+        # jamais réécrits depuis une instance, dont les valeurs peuvent être périmées
+        if update_fields is not None:
+            update_fields = [
+                f for f in update_fields if f not in PARTICIPANT_COUNT_FIELDS
+            ]
+        elif not self._state.adding and not kwargs.get("force_insert"):
+            deferred_fields = self.get_deferred_fields()
+            update_fields = [
+                f.attname
+                for f in self._meta.concrete_fields
+                if not f.primary_key
+                and f.attname not in deferred_fields
+                and f.attname not in PARTICIPANT_COUNT_FIELDS
+            ]
 
-        if self.subscription_form is not None:
-            nb_guests = (
-                IdentifiedGuest.objects.participating()
-                .filter(rsvp__event_id=self.id)
-                .aggregate(
-                    total=Count("id"),
-                    confirmed=Count("id", filter=Q(status=RSVP.Status.CONFIRMED)),
-                )
-            )
-        else:
-            nb_guests = (
-                RSVP.objects.participating()
-                .filter(event_id=self.id)
-                .aggregate(
-                    total=Coalesce(Sum("guests"), 0),
-                    confirmed=Coalesce(
-                        Sum("guests", filter=Q(status=RSVP.Status.CONFIRMED)), 0
-                    ),
-                )
-            )
-        self.all_attendee_count = nb_rsvps["total"] + nb_guests["total"]
-        self.confirmed_attendee_count = nb_rsvps["confirmed"] + nb_guests["confirmed"]
+        super().save(*args, update_fields=update_fields, **kwargs)
+
+    def refresh_participant_counts(self, lock=False):
+        """Relit les compteurs de participant⋅e⋅s depuis la base de données
+
+        :param lock: verrouille la ligne de l'événement jusqu'à la fin de la transaction, ce qui
+            sérialise les inscriptions concurrentes
+        """
+        qs = Event.objects.filter(pk=self.pk)
+        if lock:
+            qs = qs.select_for_update()
+        self.participant_count, self.confirmed_count = qs.values_list(
+            *PARTICIPANT_COUNT_FIELDS
+        ).get()
 
     @property
     def event_speaker(self):
@@ -765,17 +773,11 @@ class Event(
 
     @property
     def participants(self):
-        if not hasattr(self, "all_attendee_count"):
-            self._get_participants_counts()
-
-        return self.all_attendee_count
+        return self.participant_count
 
     @property
     def participants_confirmes(self):
-        if not hasattr(self, "confirmed_attendee_count"):
-            self._get_participants_counts()
-
-        return self.confirmed_attendee_count
+        return self.confirmed_count
 
     @property
     def confirmed_attendees(self):
@@ -1006,11 +1008,8 @@ class Event(
             .exists()
         )
 
-    def get_meta_image(self):
-        if hasattr(self, "image") and self.image:
-            return urljoin(settings.FRONT_DOMAIN, self.image.url)
-
-        # Use content hash as cache key for the auto-generated meta image
+    def get_og_image_cache_key(self):
+        """Renvoie la clé de l'image Open Graph générée, qui dépend de toutes les informations affichées"""
         content = ":".join(
             (
                 self.name,
@@ -1018,13 +1017,18 @@ class Event(
                 self.location_city,
                 str(self.coordinates),
                 str(self.start_time),
+                self.timezone,
             )
         )
-        content_hash = hashlib.sha1(content.encode("utf-8")).hexdigest()[:8]
+        return hashlib.sha1(content.encode("utf-8")).hexdigest()[:8]
+
+    def get_meta_image(self):
+        if hasattr(self, "image") and self.image:
+            return urljoin(settings.FRONT_DOMAIN, self.image.url)
 
         return front_url(
             "view_og_image_event",
-            kwargs={"pk": self.pk, "cache_key": content_hash},
+            kwargs={"pk": self.pk, "cache_key": self.get_og_image_cache_key()},
             absolute=True,
         )
 
@@ -1526,6 +1530,14 @@ class RSVP(ExportModelOperationsMixin("rsvp"), TimeStampedModel):
         on_delete=models.SET_NULL,
     )
 
+    scanner_sync_hash = models.CharField(
+        "empreinte de la dernière synchronisation avec le scanner",
+        max_length=40,
+        blank=True,
+        default="",
+        editable=False,
+    )
+
     class Meta:
         verbose_name = "RSVP"
         verbose_name_plural = "RSVP"
@@ -1,10 +1,80 @@
 import rules
+from django.db.models.signals import post_save, post_delete
 
-from agir.events.models import Event
+from agir.events.models import Event, OrganizerConfig, RSVP
 from .actions.required_documents import get_is_blocking_project
 from ..gestion.models import Projet
 from ..groups.models import Membership
-from ..lib.rules import is_authenticated_person
+from ..groups.rules import get_membership_type
+from ..lib.rules import (
+    is_authenticated_person,
+    cached_for_permissions,
+    clear_permission_context,
+)
+
+
+def get_person_organized_event_ids(person_id):
+    """Renvoie les identifiants des événements organisés par la personne elle-même"""
+    return cached_for_permissions(
+        ("organized_events", person_id),
+        lambda: set(
+            OrganizerConfig.objects.filter(person_id=person_id).values_list(
+                "event_id", flat=True
+            )
+        ),
+    )
+
+
+def get_event_organizer_group_ids(event_id):
+    """Renvoie les identifiants des groupes organisateurs de l'événement"""
+    return cached_for_permissions(
+        ("organizer_groups", event_id),
+        lambda: set(
+            OrganizerConfig.objects.filter(
+                event_id=event_id, as_group_id__isnull=False
+            ).values_list("as_group_id", flat=True)
+        ),
+    )
+
+
+def get_person_rsvp_event_ids(person_id):
+    """Renvoie les identifiants des événements auxquels la personne a répondu"""
+    return cached_for_permissions(
+        ("rsvps", person_id),
+        lambda: set(
+            RSVP.objects.filter(person_id=person_id).values_list("event_id", flat=True)
+        ),
+    )
+
+
+def has_group_organizer_rights(person, event, membership_type):
+    """Indique si la personne a au moins le rôle indiqué dans l'un des groupes organisateurs"""
+    return any(
+        get_membership_type(person, group_id) >= membership_type
+        for group_id in get_event_organizer_group_ids(event.pk)
+    )
+
+
+def _has_organizer_rights(role, event, membership_type):
+    # The person who created the event:
+    if event.pk in get_person_organized_event_ids(role.person.pk):
+        return True
+
+    # All the managers of the groups organizing the event:
+    return has_group_organizer_rights(role.person, event, membership_type)
+
+
+for model in (OrganizerConfig, RSVP):
+    post_save.connect(
+        clear_permission_context,
+        sender=model,
+        dispatch_uid=f"permissions_{model._meta.model_name}",
+    )
+    post_delete.connect(
+        clear_permission_context,
+        sender=model,
+        dispatch_uid=f"permissions_{model._meta.model_name}_delete",
+    )
 
 
 @rules.predicate
@@ -22,18 +92,7 @@ def is_organizer_of_event(role, event=None):
     if event is None:
         return False
 
-    # The person who created the event:
-    if role.person.organized_events.filter(pk=event.pk).exists():
-        return True
-
-    # All the managers of the groups organizing the event:
-    if event.organizers_groups.filter(
-        memberships__person=role.person,
-        memberships__membership_type__gte=Membership.MEMBERSHIP_TYPE_REFERENT,
-    ).exists():
-        return True
-
-    return False
+    return _has_organizer_rights(role, event, Membership.MEMBERSHIP_TYPE_REFERENT)
 
 
 @rules.predicate
@@ -42,18 +101,7 @@ def is_at_least_manager_of_event(role, event=None):
     if event is None:
         return False
 
-    # The person who created the event:
-    if role.person.organized_events.filter(pk=event.pk).exists():
-        return True
-
-    # All the managers of the groups organizing the event:
-    if event.organizers_groups.filter(
-        memberships__person=role.person,
-        memberships__membership_type__gte=Membership.MEMBERSHIP_TYPE_MANAGER,
-    ).exists():
-        return True
-
-    return False
+    return _has_organizer_rights(role, event, Membership.MEMBERSHIP_TYPE_MANAGER)
 
 
 @rules.predicate
@@ -63,7 +111,7 @@ def is_own_rsvp(role, rsvp=None):
 
 @rules.predicate
 def has_rsvp_for_event(role, event=None):
-    return event is not None and role.person.rsvps.filter(event=event).exists()
+    return event is not None and event.pk in get_person_rsvp_event_ids(role.person.pk)
 
 
 @rules.predicate
@@ -0,0 +1,239 @@
+"""Synchronisation des inscriptions aux événements avec l'application de scan des billets
+
+Les inscriptions sont traitées par lots : pour chaque événement, la liste des billets existants est
+récupérée une seule fois, puis les créations et mises à jour sont envoyées en parallèle, avec un
+nombre limité de requêtes simultanées, sur une session HTTP partagée par le processus.
+
+Une empreinte des données envoyées est conservée sur chaque RSVP (`scanner_sync_hash`), ce qui
+permet de ne pas renvoyer les inscriptions qui n'ont pas changé depuis la dernière synchronisation.
+Les métadonnées des billets n'entrent pas dans cette empreinte : elles ne sont envoyées que
+lorsqu'elles sont explicitement indiquées, pour ne pas effacer celles déjà enregistrées.
+"""
+
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from itertools import groupby
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+from agir.people.models import PersonEmail
+
+SCANNER_BATCH_SIZE = 500
+SCANNER_CONCURRENCY = 8
+# en dessous de ce nombre d'envois, les billets existants sont recherchés un par un plutôt qu'en
+# récupérant tous les billets de l'événement
+SCANNER_LOOKUP_THRESHOLD = 10
+
+_scanner_session = None
+
+# utilisé pour remplacer l'API du scanner dans les tests
+_test_scanner_session = None
+
+
+def get_scanner_session():
+    """Renvoie la session HTTP utilisée pour l'API du scanner, partagée au sein du processus"""
+    global _scanner_session
+
+    if _test_scanner_session is not None:
+        return _test_scanner_session
+
+    if _scanner_session is None:
+        session = requests.Session()
+        session.auth = (settings.SCANNER_API_KEY, settings.SCANNER_API_SECRET)
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=SCANNER_CONCURRENCY, max_retries=2
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        _scanner_session = session
+
+    return _scanner_session
+
+
+@contextmanager
+def using_fake_scanner(scanner=None):
+    """Remplace l'API du scanner par une implémentation locale le temps du bloc
+
+    :param scanner: l'implémentation à utiliser, par défaut une nouvelle instance de `FakeScanner`
+    """
+    from agir.events.tests.fake_scanner import FakeScanner
+
+    global _test_scanner_session
+    previous_session = _test_scanner_session
+    _test_scanner_session = scanner if scanner is not None else FakeScanner()
+
+    try:
+        yield _test_scanner_session
+    finally:
+        _test_scanner_session = previous_session
+
+
+def registrations_url(registration_id=None):
+    if registration_id is None:
+        return f"{settings.SCANNER_API}api/registrations/"
+    return f"{settings.SCANNER_API}api/registrations/{registration_id}/"
+
+
+def get_existing_registrations(session, scanner_event, uuid=None):
+    """Renvoie les billets existants d'un événement, indexés par l'identifiant de la personne
+
+    :param uuid: si indiqué, seul le billet de cette personne est recherché
+    """
+    registrations = {}
+    url = registrations_url()
+    params = {"event": scanner_event}
+    if uuid is not None:
+        params["uuid"] = uuid
+
+    while url:
+        res = session.get(url, params=params)
+        res.raise_for_status()
+        content = res.json()
+
+        # l'API peut renvoyer une liste simple ou une liste paginée
+        if isinstance(content, dict):
+            results, url, params = content["results"], content.get("next"), None
+        else:
+            results, url = content, None
+
+        for registration in results:
+            registrations.setdefault(registration["uuid"], registration["id"])
+
+    return registrations
+
+
+def get_emails(rsvps):
+    """Renvoie l'adresse à afficher de chacune des personnes, en une seule requête
+
+    Reprend la logique de `Person.display_email` : l'adresse publique si elle existe, sinon la
+    première adresse qui n'est pas en erreur, sinon la première adresse.
+    """
+    emails = dict(
+        PersonEmail.objects.filter(person_id__in=[r.person_id for r in rsvps])
+        .order_by("person_id", "_bounced", "_order")
+        .distinct("person_id")
+        .values_list("person_id", "address")
+    )
+
+    return {
+        r.person_id: (
+            r.person.public_email.address
+            if r.person.public_email
+            else emails.get(r.person_id, "")
+        )
+        for r in rsvps
+    }
+
+
+def registration_data(rsvp, email):
+    return {
+        "event": rsvp.event.scanner_event,
+        "category": rsvp.event.scanner_category,
+        "uuid": str(rsvp.person_id),
+        "numero": str(rsvp.id),
+        "full_name": rsvp.person.get_full_name(),
+        "contact_email": email,
+        "gender": rsvp.person.gender,
+    }
+
+
+def registration_hash(data):
+    return hashlib.sha1(
+        json.dumps(data, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+
+def _send_registration(session, data, registration_id):
+    if registration_id is None:
+        res = session.post(registrations_url(), json={"metas": {}, **data})
+    else:
+        res = session.patch(registrations_url(registration_id), json=data)
+    res.raise_for_status()
+
+
+def sync_registrations(
+    rsvps, metas=None, force=False, concurrency=SCANNER_CONCURRENCY, batch_size=None
+):
+    """Envoie les inscriptions au scanner, en ignorant celles qui n'ont pas changé
+
+    :param rsvps: un queryset des RSVP à synchroniser
+    :param metas: les métadonnées à associer aux billets ; si elles sont indiquées, toutes les
+        inscriptions sont envoyées, sinon les métadonnées déjà enregistrées sont conservées
+    :param force: renvoie toutes les inscriptions, même celles qui n'ont pas changé
+    :param concurrency: le nombre maximal de requêtes simultanées
+    :param batch_size: le nombre de RSVP traités à la fois
+    :return: le nombre d'inscriptions envoyées
+    """
+    from agir.events.models import RSVP
+
+    batch_size = batch_size or SCANNER_BATCH_SIZE
+    session = get_scanner_session()
+    rsvps = (
+        rsvps.filter(event__scanner_event__isnull=False)
+        .select_related("event", "person__public_email")
+        .order_by("event_id", "id")
+    )
+    sent = 0
+
+    with ThreadPoolExecutor(max_workers=max(concurrency, 1)) as executor:
+        for _, event_rsvps in groupby(rsvps.iterator(), key=lambda r: r.event_id):
+            event_rsvps = list(event_rsvps)
+            existing = None
+
+            for i in range(0, len(event_rsvps), batch_size):
+                batch = event_rsvps[i : i + batch_size]
+                emails = get_emails(batch)
+
+                to_send = []
+                for rsvp in batch:
+                    data = registration_data(rsvp, emails[rsvp.person_id])
+                    data_hash = registration_hash(data)
+                    if (
+                        force
+                        or metas is not None
+                        or data_hash != rsvp.scanner_sync_hash
+                    ):
+                        rsvp.scanner_sync_hash = data_hash
+                        if metas is not None:
+                            data["metas"] = metas
+                        to_send.append((rsvp, data))
+
+                if not to_send:
+                    continue
+
+                scanner_event = batch[0].event.scanner_event
+                if existing is None and len(to_send) <= SCANNER_LOOKUP_THRESHOLD:
+                    # pour quelques envois, inutile de parcourir tous les billets de l'événement
+                    registration_ids = {}
+                    for _, data in to_send:
+                        registration_ids.update(
+                            get_existing_registrations(
+                                session, scanner_event, uuid=data["uuid"]
+                            )
+                        )
+                else:
+                    # la liste des billets existants n'est récupérée qu'une fois par événement
+                    if existing is None:
+                        existing = get_existing_registrations(session, scanner_event)
+                    registration_ids = existing
+
+                # `list` pour attendre la fin des envois et propager les éventuelles erreurs
+                list(
+                    executor.map(
+                        lambda item: _send_registration(
+                            session, item[1], registration_ids.get(item[1]["uuid"])
+                        ),
+                        to_send,
+                    )
+                )
+
+                RSVP.objects.bulk_update(
+                    [rsvp for rsvp, _ in to_send], fields=["scanner_sync_hash"]
+                )
+                sent += len(to_send)
+
+    return sent
@@ -50,6 +50,7 @@ from .models import (
     jitsi_default_domain,
     jitsi_default_room_name,
 )
+from .rules import has_group_organizer_rights
 from .tasks import (
     send_event_creation_notification,
     send_secretariat_notification,
@@ -307,13 +308,9 @@ class EventSerializer(FlexibleFieldsMixin, serializers.Serializer):
         if bool(self.organizer_config):
             return True
 
-        if obj.organizers_groups.filter(
-            memberships__person=self.person,
-            memberships__membership_type__gte=Membership.MEMBERSHIP_TYPE_REFERENT,
-        ).exists():
-            return True
-
-        return False
+        return has_group_organizer_rights(
+            self.person, obj, Membership.MEMBERSHIP_TYPE_REFERENT
+        )
 
     def get_isManager(self, obj):
         if not self.person:
@@ -322,13 +319,9 @@ class EventSerializer(FlexibleFieldsMixin, serializers.Serializer):
         if bool(self.organizer_config):
             return True
 
-        if obj.organizers_groups.filter(
-            memberships__person=self.person,
-            memberships__membership_type__gte=Membership.MEMBERSHIP_TYPE_MANAGER,
-        ).exists():
-            return True
-
-        return False
+        return has_group_organizer_rights(
+            self.person, obj, Membership.MEMBERSHIP_TYPE_MANAGER
+        )
 
     def get_rsvp(self, _obj):
         return self.rsvp and self.rsvp.status
@@ -1,11 +1,14 @@
 from django.db.models import Exists, OuterRef
-from django.db.models.signals import post_save, pre_delete
+from django.db.models.signals import post_save, pre_delete, post_delete
 from django.dispatch import receiver
 
-from .models import RSVP, IdentifiedGuest, OrganizerConfig
+from agir.lib.og_images import schedule_og_image_generation
+from .calendars import invalidate_calendar_tree
+from .display import EventOGImage
+from .models import RSVP, IdentifiedGuest, OrganizerConfig, Calendar, Event
 from .tasks import (
-    copier_rsvp_vers_feuille_externe,
-    copier_identified_guest_vers_feuille_externe,
+    planifier_copie_participant_vers_feuille_externe,
+    generate_event_og_image,
 )
 from ..people.models import Person
 
@@ -14,18 +17,15 @@ def copier_participant_feuille_externe(instance, sheet):
     if not sheet:
         return
 
-    task = None
-
     if isinstance(instance, RSVP):
-        task = copier_rsvp_vers_feuille_externe
+        planifier_copie_participant_vers_feuille_externe(
+            instance.event_id, rsvp_id=instance.pk
+        )
 
     if isinstance(instance, IdentifiedGuest):
-        task = copier_identified_guest_vers_feuille_externe
-
-    if not task:
-        return
-
-    task.delay(instance.pk)
+        planifier_copie_participant_vers_feuille_externe(
+            instance.rsvp.event_id, guest_id=instance.pk
+        )
 
 
 @receiver(post_save, sender=RSVP, dispatch_uid="copier_rsvp_feuille_externe")
@@ -80,3 +80,15 @@ def signal_transfer_group_organizer_config_to_group_referents(
         organizer_config.event.add_organizer_group(
             organizer_config.as_group, exclude_organizer=instance
         )
+
+
+@receiver(post_save, sender=Calendar, dispatch_uid="invalider_arborescence_agendas")
+@receiver(post_delete, sender=Calendar, dispatch_uid="invalider_arborescence_agendas")
+def signal_invalider_arborescence_agendas(sender, instance, **kwargs):
+    invalidate_calendar_tree()
+
+
+@receiver(post_save, sender=Event, dispatch_uid="generer_image_og_evenement")
+def signal_generer_image_og_evenement(sender, instance, **kwargs):
+    if not instance.image:
+        schedule_og_image_generation(EventOGImage(instance), generate_event_og_image)
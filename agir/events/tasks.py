@@ -3,7 +3,6 @@ from collections import OrderedDict
 from datetime import timedelta
 
 import ics
-import requests
 from django.conf import settings
 from django.template.defaultfilters import date as _date
 from django.template.loader import render_to_string
@@ -11,6 +10,7 @@ from django.utils.http import urlencode
 from django.utils.translation import gettext_lazy as _
 
 from agir.activity.models import Activity
+from agir.api.redis import get_auth_redis_client
 from agir.authentication.tokens import subscription_confirmation_token_generator
 from agir.groups.models import Membership
 from agir.lib.celery import (
@@ -24,15 +24,23 @@ from agir.lib.geo import geocode_element
 from agir.lib.google_sheet import (
     parse_sheet_link,
     copy_array_to_sheet,
-    add_row_to_sheet,
+    add_rows_to_sheet,
     gspread_task,
+    schedule_sheet_sync,
+    release_sheet_sync,
 )
 from agir.lib.html import sanitize_html
 from agir.lib.mailing import send_mosaico_email, send_template_email
+from agir.lib.og_images import generate_og_image
 from agir.lib.utils import front_url
 from agir.notifications.models import Subscription
 from agir.people.models import Person
-from .display import display_participants, display_rsvp, display_identified_guest
+from .display import (
+    display_participants,
+    display_rsvp,
+    display_identified_guest,
+    EventOGImage,
+)
 from .models import (
     Event,
     RSVP,
@@ -41,6 +49,7 @@ from .models import (
     OrganizerConfig,
     IdentifiedGuest,
 )
+from .scanner import sync_registrations
 
 logger = logging.getLogger(__name__)
 
@@ -407,35 +416,12 @@ def send_event_report(event_pk):
 @http_task(post_save=True)
 def update_ticket(rsvp_pk, metas=None):
     rsvp = RSVP.objects.get(pk=rsvp_pk)
-    data = {
-        "event": rsvp.event.scanner_event,
-        "category": rsvp.event.scanner_category,
-        "uuid": str(rsvp.person.id),
-        "numero": str(rsvp.id),
-        "full_name": rsvp.person.get_full_name(),
-        "contact_email": rsvp.person.display_email,
-        "gender": rsvp.person.gender,
-        "metas": metas or {},
-    }
+    sync_registrations(RSVP.objects.filter(pk=rsvp.pk), metas=metas, force=True)
 
-    r = requests.get(
-        f"{settings.SCANNER_API}api/registrations/",
-        auth=(settings.SCANNER_API_KEY, settings.SCANNER_API_SECRET),
-        params={"event": rsvp.event.scanner_event, "uuid": str(rsvp.person.id)},
-    )
 
-    if len(r.json()) == 0:
-        requests.post(
-            f"{settings.SCANNER_API}api/registrations/",
-            auth=(settings.SCANNER_API_KEY, settings.SCANNER_API_SECRET),
-            json=data,
-        ).raise_for_status()
-    else:
-        requests.patch(
-            f"{settings.SCANNER_API}api/registrations/{r.json()[0]['id']}/",
-            auth=(settings.SCANNER_API_KEY, settings.SCANNER_API_SECRET),
-            json=data,
-        ).raise_for_status()
+@http_task()
+def sync_event_tickets(event_pk, force=False):
+    sync_registrations(RSVP.objects.filter(event_id=event_pk), force=force)
 
 
 @emailing_task(post_save=True)
@@ -504,6 +490,13 @@ def notify_on_event_report(event_pk):
     )
 
 
+@post_save_task()
+def generate_event_og_image(event_pk, cache_key):
+    event = Event.objects.get(pk=event_pk)
+    if not event.image:
+        generate_og_image(EventOGImage(event), cache_key)
+
+
 @http_task(post_save=True)
 def geocode_event(event_pk):
     event = Event.objects.get(pk=event_pk)
@@ -841,45 +834,68 @@ def copier_participants_vers_feuille_externe(event_id):
     copy_array_to_sheet(sheet_id, values)
 
 
-@gspread_task
-def copier_rsvp_vers_feuille_externe(rsvp_id):
-    try:
-        rsvp = RSVP.objects.select_related(
-            "form_submission", "person", "payment", "event"
-        ).get(id=rsvp_id)
-    except RSVP.DoesNotExist:
-        return
+def _cle_participants_en_attente(event_id):
+    return f"GoogleSheetSync:Event:{event_id}:pending"
 
-    sheet_id = parse_sheet_link(rsvp.event.lien_feuille_externe)
 
-    if not sheet_id:
-        logger.warning(
-            f"URL de la Google sheet incorrecte pour l'événement d'id {rsvp.event.id}"
-        )
-        return
+def planifier_copie_participant_vers_feuille_externe(
+    event_id, rsvp_id=None, guest_id=None
+):
+    """Marque un participant comme à copier vers la feuille externe de l'événement
 
-    values = display_rsvp(rsvp)
+    Les participants inscrits en rafale sont copiés ensemble lors d'une seule synchronisation.
+    """
+    member = f"rsvp:{rsvp_id}" if rsvp_id is not None else f"guest:{guest_id}"
+    get_auth_redis_client().sadd(_cle_participants_en_attente(event_id), member)
 
-    add_row_to_sheet(sheet_id, values, "id")
+    schedule_sheet_sync(
+        copier_participants_en_attente_vers_feuille_externe,
+        str(event_id),
+        key=f"Event:{event_id}",
+    )
 
 
 @gspread_task
-def copier_identified_guest_vers_feuille_externe(guest_id):
+def copier_participants_en_attente_vers_feuille_externe(event_id):
+    release_sheet_sync(f"Event:{event_id}")
+
+    client = get_auth_redis_client()
+    pending_key = _cle_participants_en_attente(event_id)
+    pending = [m.decode() for m in client.smembers(pending_key)]
+
+    if not pending:
+        return
+
     try:
-        ig = IdentifiedGuest.objects.select_related(
-            "submission", "rsvp__event", "rsvp__person", "payment"
-        ).get(id=guest_id)
-    except IdentifiedGuest.DoesNotExist:
+        event = Event.objects.get(id=event_id)
+    except Event.DoesNotExist:
+        client.delete(pending_key)
         return
 
-    sheet_id = parse_sheet_link(ig.rsvp.event.lien_feuille_externe)
+    sheet_id = parse_sheet_link(event.lien_feuille_externe)
 
     if not sheet_id:
         logger.warning(
-            f"URL de la Google sheet incorrecte pour l'événement d'id {ig.rsvp.event.id}"
+            f"URL de la Google sheet incorrecte pour l'événement d'id {event.id}"
         )
+        client.delete(pending_key)
         return
 
-    values = display_identified_guest(ig)
+    rsvp_ids = [int(m[5:]) for m in pending if m.startswith("rsvp:")]
+    guest_ids = [int(m[6:]) for m in pending if m.startswith("guest:")]
+
+    rsvps = RSVP.objects.select_related(
+        "form_submission", "person", "payment", "event"
+    ).filter(id__in=rsvp_ids, event=event)
+    guests = IdentifiedGuest.objects.select_related(
+        "submission", "rsvp__event", "rsvp__person", "payment"
+    ).filter(id__in=guest_ids, rsvp__event=event)
+
+    values = [display_rsvp(rsvp) for rsvp in rsvps.order_by("id")] + [
+        display_identified_guest(ig) for ig in guests.order_by("id")
+    ]
+
+    add_rows_to_sheet(sheet_id, values, "id")
 
-    add_row_to_sheet(sheet_id, values, "id")
+    # les participants ajoutés entre-temps restent en attente pour la prochaine synchronisation
+    client.srem(pending_key, *pending)
@@ -0,0 +1,64 @@
+import threading
+from urllib.parse import urlparse
+
+import requests
+
+
+class FakeResponse:
+    def __init__(self, status_code, content=None):
+        self.status_code = status_code
+        self._content = content
+
+    def json(self):
+        return self._content
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code}", response=self)
+
+
+class FakeScanner:
+    """API du scanner en mémoire, implémentant le sous-ensemble utilisé par `agir.events.scanner`
+
+    Elle s'utilise à la place de la session HTTP partagée, et enregistre les appels reçus.
+    """
+
+    def __init__(self):
+        self.registrations = {}
+        self.calls = []
+        self.get_params = []
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def _registration_id(self, url):
+        parts = [p for p in urlparse(url).path.split("/") if p]
+        return int(parts[-1]) if parts[-1].isdigit() else None
+
+    def get(self, url, params=None, **kwargs):
+        with self._lock:
+            self.calls.append("get")
+            params = params or {}
+            self.get_params.append(params)
+            results = [
+                r
+                for r in self.registrations.values()
+                if all(str(r.get(k)) == str(v) for k, v in params.items())
+            ]
+            return FakeResponse(200, results)
+
+    def post(self, url, json=None, **kwargs):
+        with self._lock:
+            self.calls.append("post")
+            registration = {**json, "id": self._next_id}
+            self.registrations[self._next_id] = registration
+            self._next_id += 1
+            return FakeResponse(201, registration)
+
+    def patch(self, url, json=None, **kwargs):
+        with self._lock:
+            self.calls.append("patch")
+            registration_id = self._registration_id(url)
+            if registration_id not in self.registrations:
+                return FakeResponse(404)
+            self.registrations[registration_id].update(json)
+            return FakeResponse(200, self.registrations[registration_id])
@@ -0,0 +1,108 @@
+import ics
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from agir.events.calendars import get_calendar_ids, serialize_event
+from agir.events.models import Calendar, CalendarItem, Event
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    EVENT_ICS_FEED_PAST_DAYS=30,
+    EVENT_ICS_FEED_FUTURE_DAYS=60,
+)
+class CalendarIcsFeedTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.calendar = Calendar.objects.create(name="Agenda", slug="agenda")
+        now = timezone.now()
+        hour = timezone.timedelta(hours=1)
+        day = timezone.timedelta(days=1)
+
+        self.event = Event.objects.create(
+            name="Dans la fenêtre", start_time=now + day, end_time=now + day + hour
+        )
+        self.old_event = Event.objects.create(
+            name="Trop ancien",
+            start_time=now - 40 * day,
+            end_time=now - 40 * day + hour,
+        )
+        self.private_event = Event.objects.create(
+            name="Privé",
+            start_time=now + day,
+            end_time=now + day + hour,
+            visibility=Event.VISIBILITY_ORGANIZER,
+        )
+        for event in (self.event, self.old_event, self.private_event):
+            CalendarItem.objects.create(event=event, calendar=self.calendar)
+
+        self.url = "/agenda/agenda/icalendar.ics"
+
+    def test_feed_contains_public_events_of_the_window(self):
+        res = self.client.get(self.url)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res["Content-Type"], "text/calendar")
+        calendar = ics.Calendar(res.content.decode())
+        self.assertEqual([e.name for e in calendar.events], [self.event.name])
+
+    def test_serialized_event_matches_ics_serialization(self):
+        self.assertIn(
+            serialize_event(self.event),
+            ics.Calendar(events=[self.event.to_ics()]).serialize(),
+        )
+
+    def test_not_modified_until_an_event_is_saved(self):
+        res = self.client.get(self.url)
+        etag = res["ETag"]
+
+        res = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 304)
+
+        self.event.name = "Nouveau nom"
+        self.event.save()
+
+        res = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 200)
+        self.assertNotEqual(res["ETag"], etag)
+        self.assertIn(b"Nouveau nom", res.content)
+
+    def test_modified_when_an_event_leaves_the_feed(self):
+        other_event = Event.objects.create(
+            name="Autre événement",
+            start_time=self.event.start_time,
+            end_time=self.event.end_time,
+        )
+        CalendarItem.objects.create(event=other_event, calendar=self.calendar)
+
+        res = self.client.get(self.url)
+        self.assertNotIn("Last-Modified", res)
+        etag = res["ETag"]
+
+        other_event.delete()
+
+        res = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 200)
+        self.assertNotIn("Autre événement", res.content.decode())
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class CalendarTreeTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_calendar_ids_are_updated_when_a_calendar_changes(self):
+        parent = Calendar.objects.create(name="Parent", slug="parent")
+        child = Calendar.objects.create(name="Enfant", slug="enfant", parent=parent)
+        self.assertCountEqual(get_calendar_ids(parent.id), [parent.id, child.id])
+
+        with self.assertNumQueries(0):
+            get_calendar_ids(parent.id)
+
+        other = Calendar.objects.create(name="Autre", slug="autre", parent=child)
+        self.assertCountEqual(
+            get_calendar_ids(parent.id), [parent.id, child.id, other.id]
+        )
@@ -65,6 +65,7 @@ class RSVPTestCase(TestCase):
     def test_participants_count(self):
         RSVP.objects.create(person=self.person, event=self.event, guests=10)
 
+        self.event.refresh_participant_counts()
         self.assertEqual(self.event.participants, 11)
 
         RSVP.objects.create(
@@ -72,7 +73,44 @@ class RSVPTestCase(TestCase):
             event=self.event,
         )
 
-        # on supprime la valeur en cache
-        del self.event.all_attendee_count
+        # les compteurs sont maintenus par la base de données
+        self.event.refresh_participant_counts()
 
         self.assertEqual(self.event.participants, 12)
+
+    def test_participants_count_follows_status_changes(self):
+        rsvp = RSVP.objects.create(
+            person=self.person,
+            event=self.event,
+            guests=2,
+            status=RSVP.Status.AWAITING_PAYMENT,
+        )
+        self.event.refresh_participant_counts()
+        self.assertEqual(
+            (self.event.participants, self.event.participants_confirmes), (3, 0)
+        )
+
+        rsvp.status = RSVP.Status.CONFIRMED
+        rsvp.save()
+        self.event.refresh_participant_counts()
+        self.assertEqual(
+            (self.event.participants, self.event.participants_confirmes), (3, 3)
+        )
+
+        rsvp.status = RSVP.Status.CANCELLED
+        rsvp.save()
+        self.event.refresh_participant_counts()
+        self.assertEqual(
+            (self.event.participants, self.event.participants_confirmes), (0, 0)
+        )
+
+    def test_saving_stale_event_keeps_participants_count(self):
+        stale_event = Event.objects.get(pk=self.event.pk)
+        RSVP.objects.create(person=self.person, event=self.event)
+
+        stale_event.name = "Nouveau nom"
+        stale_event.save()
+
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.name, "Nouveau nom")
+        self.assertEqual(self.event.participants, 1)
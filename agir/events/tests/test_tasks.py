@@ -11,6 +11,7 @@ from agir.people.models import Person
 from agir.notifications.models import Subscription
 
 from .. import tasks
+from ..scanner import using_fake_scanner, sync_registrations
 from ..models import Event, Calendar, RSVP, OrganizerConfig
 from ...activity.models import Activity
 from ...groups.models import SupportGroup, Membership
@@ -279,3 +280,76 @@ class EventTasksTestCase(TestCase):
         ).count()
 
         self.assertEqual(new_activity_count, old_activity_count)
+
+
+class ScannerSyncTestCase(TestCase):
+    def setUp(self):
+        now = timezone.now()
+        self.event = Event.objects.create(
+            name="Grand meeting",
+            start_time=now + timezone.timedelta(days=10),
+            end_time=now + timezone.timedelta(days=10, hours=4),
+            scanner_event=1,
+            scanner_category=2,
+        )
+        self.people = [
+            Person.objects.create_insoumise(f"personne{i}@example.com")
+            for i in range(3)
+        ]
+        for person in self.people:
+            RSVP.objects.create(event=self.event, person=person)
+
+    def test_sync_only_sends_changed_registrations(self):
+        with using_fake_scanner() as scanner:
+            self.assertEqual(
+                sync_registrations(self.event.rsvps.all(), batch_size=2), 3
+            )
+            self.assertEqual(scanner.calls.count("post"), 3)
+            self.assertEqual(
+                sorted(r["contact_email"] for r in scanner.registrations.values()),
+                [p.email for p in self.people],
+            )
+
+            self.assertEqual(sync_registrations(self.event.rsvps.all()), 0)
+
+            self.people[0].first_name = "Camille"
+            self.people[0].save()
+            scanner.calls.clear()
+
+            self.assertEqual(sync_registrations(self.event.rsvps.all()), 1)
+            self.assertEqual(scanner.calls, ["get", "patch"])
+            self.assertEqual(len(scanner.registrations), 3)
+
+    def test_update_ticket_always_sends_registration(self):
+        rsvp = self.event.rsvps.first()
+        with using_fake_scanner() as scanner:
+            tasks.update_ticket(rsvp.pk, metas={"place": "A12"})
+            tasks.update_ticket(rsvp.pk, metas={"place": "A12"})
+
+            self.assertEqual(scanner.calls.count("post"), 1)
+            self.assertEqual(scanner.calls.count("patch"), 1)
+            self.assertEqual(
+                list(scanner.registrations.values())[0]["metas"], {"place": "A12"}
+            )
+
+    def test_sync_keeps_metas_sent_by_update_ticket(self):
+        rsvp = self.event.rsvps.first()
+        with using_fake_scanner() as scanner:
+            tasks.update_ticket(rsvp.pk, metas={"place": "A12"})
+            self.assertEqual(
+                scanner.get_params,
+                [{"event": 1, "uuid": str(rsvp.person_id)}],
+            )
+
+            sync_registrations(self.event.rsvps.all())
+            self.assertEqual(scanner.calls.count("patch"), 0)
+            self.assertEqual(len(scanner.registrations), 3)
+
+            sync_registrations(self.event.rsvps.all(), force=True)
+            self.assertEqual(scanner.calls.count("patch"), 3)
+
+            for registration in scanner.registrations.values():
+                if registration["uuid"] == str(rsvp.person_id):
+                    self.assertEqual(registration["metas"], {"place": "A12"})
+                else:
+                    self.assertEqual(registration["metas"], {})
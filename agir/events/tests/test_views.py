@@ -418,6 +418,7 @@ class RSVPTestCase(TestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, 200)
         self.assertEqual("CO", response.json()["rsvp"])
+        self.simple_event.refresh_participant_counts()
         self.assertEqual(1, self.simple_event.participants)
 
     def test_cannot_rsvp_if_max_participants_reached(self):
@@ -442,6 +443,7 @@ class RSVPTestCase(TestCase):
         self.assertEqual(msgs[0].level, messages.ERROR)
         self.assertIn("complet.", msgs[0].message)
 
+        self.simple_event.refresh_participant_counts()
         self.assertEqual(1, self.simple_event.participants)
 
     @mock.patch("agir.events.actions.rsvps.send_guest_confirmation")
@@ -459,6 +461,7 @@ class RSVPTestCase(TestCase):
             reverse("rsvp_event", kwargs={"pk": self.simple_event.pk}),
             fetch_redirect_response=False,
         )
+        self.simple_event.refresh_participant_counts()
         self.assertEqual(2, self.simple_event.participants)
 
         msgs = list(messages.get_messages(response.wsgi_request))
@@ -480,6 +483,7 @@ class RSVPTestCase(TestCase):
         self.assertRedirects(
             response, reverse("view_event", kwargs={"pk": self.simple_event.pk})
         )
+        self.simple_event.refresh_participant_counts()
         self.assertEqual(1, self.simple_event.participants)
 
         msgs = list(messages.get_messages(response.wsgi_request))
@@ -500,6 +504,7 @@ class RSVPTestCase(TestCase):
         self.assertRedirects(
             response, reverse("view_event", kwargs={"pk": self.simple_event.pk})
         )
+        self.simple_event.refresh_participant_counts()
         self.assertEqual(1, self.simple_event.participants)
 
         msgs = list(messages.get_messages(response.wsgi_request))
@@ -524,6 +529,7 @@ class RSVPTestCase(TestCase):
         self.person.refresh_from_db()
         self.assertIn(self.person, self.form_event.confirmed_attendees)
         self.assertEqual(self.person.meta["custom-field"], "another custom value")
+        self.form_event.refresh_participant_counts()
         self.assertEqual(2, self.form_event.participants)
 
         rsvp_notification.delay.assert_called_once()
@@ -567,6 +573,7 @@ class RSVPTestCase(TestCase):
         msgs = list(messages.get_messages(response.wsgi_request))
         self.assertEqual(msgs[0].level, messages.SUCCESS)
 
+        self.form_event.refresh_participant_counts()
         self.assertEqual(2, self.form_event.participants)
 
         guest_confirmation.delay.assert_called_once()
@@ -590,6 +597,7 @@ class RSVPTestCase(TestCase):
         msgs = list(messages.get_messages(response.wsgi_request))
         self.assertEqual(msgs[0].level, messages.ERROR)
 
+        self.form_event.refresh_participant_counts()
         self.assertEqual(1, self.form_event.participants)
 
     @mock.patch("agir.events.actions.rsvps.send_rsvp_notification")
@@ -782,6 +790,7 @@ class RSVPTestCase(TestCase):
         complete_payment(payment)
         event_notification_listener(payment)
 
+        self.form_paying_event.refresh_participant_counts()
         self.assertEqual(2, self.form_paying_event.participants)
 
         send_guest_confirmation.delay.assert_called_once()
@@ -864,6 +873,7 @@ class RSVPTestCase(TestCase):
         self.person.refresh_from_db()
         self.assertIn(self.person, self.form_event.confirmed_attendees)
         self.assertEqual(self.person.meta["custom-field"], "another custom value")
+        self.form_event.refresh_participant_counts()
         self.assertEqual(2, self.form_event.participants)
 
         rsvp_notification.delay.assert_called_once()
@@ -926,6 +936,7 @@ class RSVPTestCase(TestCase):
         self.person.refresh_from_db()
         self.assertIn(self.person, self.form_event.confirmed_attendees)
         self.assertEqual(self.person.meta["custom-field"], "another custom value")
+        self.form_event.refresh_participant_counts()
         self.assertEqual(2, self.form_event.participants)
 
         rsvp_notification.delay.assert_called_once()
@@ -1,9 +1,9 @@
-import ics
 from django.conf import settings
-from django.http import Http404, HttpResponse
+from django.http import Http404
 from django.utils import timezone
 from django.views.generic import ListView, DetailView
 
+from agir.events.calendars import get_calendar_ids, feed_response
 from agir.events.models import Calendar, Event, EventSubtype
 from agir.front.view_mixins import ObjectOpengraphMixin
 from agir.lib.views import IframableMixin
@@ -30,7 +30,7 @@ class CalendarView(IframableMixin, ObjectOpengraphMixin, ListView):
         return super().get(request, *args, **kwargs)
 
     def get_queryset(self):
-        calendar_ids = self.get_calendar_ids(self.calendar.id)
+        calendar_ids = get_calendar_ids(self.calendar.id)
 
         return (
             Event.objects.upcoming(as_of=timezone.now())
@@ -45,42 +45,13 @@ class CalendarView(IframableMixin, ObjectOpengraphMixin, ListView):
             default_event_image=settings.DEFAULT_EVENT_IMAGE, calendar=self.calendar
         )
 
-    @staticmethod
-    def get_calendar_ids(parent_id):
-        ids = Calendar.objects.raw(
-            """
-        WITH RECURSIVE children AS (
-            SELECT id
-            FROM events_calendar
-            WHERE id = %s
-          UNION ALL
-            SELECT c.id
-            FROM events_calendar AS c
-            JOIN children
-            ON c.parent_id = children.id
-        )
-        SELECT id FROM children;
-        """,
-            [parent_id],
-        )
-
-        return list(ids)
-
 
 class CalendarIcsView(DetailView):
     model = Calendar
 
-    def render_to_response(self, context, **response_kwargs):
-        calendar = ics.Calendar(
-            events=[
-                event.to_ics()
-                for event in self.object.events.filter(
-                    visibility=Event.VISIBILITY_PUBLIC
-                )
-            ]
-        ).serialize()
-
-        return HttpResponse(calendar, content_type="text/calendar")
+    def get(self, request, *args, **kwargs):
+        self.object = self.get_object()
+        return feed_response(request, self.object.events.all())
 
 
 class EventSubtypeIcsView(CalendarIcsView):
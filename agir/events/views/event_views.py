@@ -1,9 +1,4 @@
-import locale
-import os
-import textwrap
-
 import ics
-from PIL import Image, ImageDraw, ImageFont, ImageOps
 from django.contrib import messages
 from django.contrib.auth.views import redirect_to_login
 from django.core.exceptions import PermissionDenied
@@ -45,7 +40,7 @@ from agir.front.view_mixins import (
     ChangeLocationBaseView,
     FilterView,
 )
-from agir.lib.tasks import create_static_map_image_from_coordinates
+from ..display import EventOGImage
 from ..filters import EventFilter
 from ..forms import (
     EventGeocodingForm,
@@ -56,8 +51,6 @@ from ..models import Event, Invitation
 from ..tasks import (
     send_event_report,
 )
-from ...api import settings
-from ...carte.models import StaticMapImage
 
 __all__ = [
     "ManageEventView",
@@ -83,110 +76,9 @@ __all__ = [
 
 class EventOGImageView(DetailView):
     model = Event
-    event = None
-    static_root = os.path.join(
-        settings.BASE_DIR, "front", "static", "front", "og-image"
-    )
-
-    def get_date_string(self):
-        # set locale for displaying day name in french
-        locale.setlocale(locale.LC_ALL, "fr_FR.utf8")
-        format = "%A %d %B À %-H:%M"
-        if self.event.timezone != timezone.get_default_timezone_name():
-            format += "%Z"
-        return self.event.local_start_time.strftime(format).capitalize()
-
-    def get_location_string(self):
-        if self.event.location_city and self.event.location_zip:
-            return f"{self.event.location_city} ({self.event.location_zip})"
-        if self.event.location_city:
-            return self.event.location_city
-        if self.event.location_zip:
-            return self.event.location_zip
-
-        return ""
-
-    def get_illustration(self):
-        if self.event.coordinates is None:
-            return self.get_image_from_file("Frame-193.png")
-
-        static_map_image = StaticMapImage.objects.filter(
-            center__dwithin=(
-                self.event.coordinates,
-                StaticMapImage.UNIQUE_CENTER_MAX_DISTANCE,
-            ),
-        ).first()
-
-        if static_map_image is None:
-            create_static_map_image_from_coordinates.delay(
-                [self.event.coordinates[0], self.event.coordinates[1]]
-            )
-            return self.get_image_from_file("Frame-193.png")
-
-        static_map_image.image.open()
-        map = ImageOps.fit(Image.open(static_map_image.image), (1200, 278))
-
-        # Add marker to static map image
-        icon = self.get_image_from_file("map-marker.png")
-        icon = icon.resize((116, 139), Image.LANCZOS)
-        map.paste(icon, (542, 49), icon)
-
-        return map
-
-    def get_font(self, size, bold=False):
-        filename = (
-            os.path.join(self.static_root, "poppins-bold.ttf")
-            if bold
-            else os.path.join(self.static_root, "Poppins-Medium.ttf")
-        )
-        return ImageFont.truetype(
-            filename,
-            size=size,
-            encoding="utf-8",
-        )
-
-    def get_image_from_file(self, filename):
-        return Image.open(os.path.join(self.static_root, filename))
-
-    def generate_thumbnail(self):
-        image = Image.new("RGB", (1200, 630), "#FFFFFF")
-        draw = ImageDraw.Draw(image)
-
-        # Draw illustration image
-        illustration = self.get_illustration()
-        image.paste(illustration, (0, 0), illustration)
-
-        # Draw event location and date
-        # ex: Paris (75010) - Mercredi 7 Juillet à 19:00
-        draw.text(
-            (108, 315),
-            f"{self.get_location_string()} – {self.get_date_string()}",
-            fill=(63, 38, 130, 0),
-            align="left",
-            font=self.get_font(32, bold=True),
-        )
-
-        # Draw event name
-        lines = textwrap.wrap(
-            self.event.name.capitalize(), width=36, max_lines=2, placeholder="…"
-        )
-        font = self.get_font(45 if len(lines) > 1 else 56)
-        y = 369
-        for line in lines:
-            draw.text((108, y), line, font=font, fill=(0, 0, 0, 0), align="left")
-            y += 63
-
-        # Draw Action Populaire logo
-        image.paste(self.get_image_from_file("bande-ap.png"), (0, 535))
-
-        return image
 
     def get(self, request, *args, **kwargs):
-        self.event = self.get_object()
-        image = self.generate_thumbnail()
-        response = HttpResponse(content_type="image/png")
-        image.save(response, "PNG")
-        return response
+        return EventOGImage(self.get_object()).get_response()
 
 
 class EventSearchView(FilterView):
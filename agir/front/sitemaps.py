@@ -1,55 +1,150 @@
-from django.contrib.sitemaps import Sitemap
+"""Plans du site
+
+Les plans sont découpés en pages de `SITEMAP_PAGE_SIZE` adresses, listées par l'index. Seuls les
+identifiants et les dates de dernière modification sont récupérés, sans instancier les modèles.
+
+Chaque page est conservée en cache sous une clé qui dépend du nombre d'objets de la section et de la
+date de leur dernière modification : une seule requête d'agrégation suffit à vérifier que la page en
+cache est à jour.
+"""
+
+import hashlib
+from functools import wraps
+
+from django.contrib.sitemaps import Sitemap, views as sitemap_views
+from django.core.cache import cache
+from django.db.models import Count, F, Max
+from django.db.models.functions import Greatest
+from django.http import HttpResponse
 from django.urls import reverse
 
 from agir.municipales.models import CommunePage
 from ..events.models import Event
 from ..groups.models import SupportGroup
 
+SITEMAP_PAGE_SIZE = 10000
+SITEMAP_CACHE_TIMEOUT = 24 * 3600
+
+
+class VersionedSitemap(Sitemap):
+    """Plan du site construit à partir de tuples `(*fields, lastmod)`"""
 
-class EventSitemap(Sitemap):
     changefreq = "always"
+    limit = SITEMAP_PAGE_SIZE
+    fields = ("id",)
+
+    def get_queryset(self):
+        raise NotImplementedError()
+
+    def get_lastmod_expression(self):
+        return F("modified")
 
     def items(self):
-        return Event.objects.listed()
+        return (
+            self.get_queryset()
+            .annotate(lastmod=self.get_lastmod_expression())
+            .order_by("id")
+            .values_list(*self.fields, "lastmod")
+        )
 
-    def location(self, obj):
-        return reverse("view_event", args=[obj.id])
+    def lastmod(self, item):
+        return item[-1]
 
-    def lastmod(self, obj):
-        return max(obj.modified, obj.end_time)
+    def get_version(self):
+        """Renvoie une chaîne qui change dès qu'un objet de la section est ajouté, retiré ou modifié"""
+        aggregates = self.get_queryset().aggregate(
+            count=Count("id"), modified=Max("modified")
+        )
+        modified = aggregates["modified"]
+        return f"{aggregates['count']}:{modified.timestamp() if modified else ''}"
 
 
-class SupportGroupSitemap(Sitemap):
-    changefreq = "always"
+class EventSitemap(VersionedSitemap):
+    def get_queryset(self):
+        return Event.objects.listed()
 
-    def items(self):
-        return SupportGroup.objects.active().all()
+    def get_lastmod_expression(self):
+        return Greatest("modified", "end_time")
 
-    def location(self, obj):
-        return reverse("view_group", args=[obj.id])
+    def location(self, item):
+        return reverse("view_event", args=[item[0]])
 
-    def lastmod(self, obj):
-        return obj.modified
 
+class SupportGroupSitemap(VersionedSitemap):
+    def get_queryset(self):
+        return SupportGroup.objects.active()
 
-class CommunesSitemap(Sitemap):
-    changefreq = "always"
+    def location(self, item):
+        return reverse("view_group", args=[item[0]])
 
-    def items(self):
+
+class CommunesSitemap(VersionedSitemap):
+    fields = ("code_departement", "slug")
+
+    def get_queryset(self):
         return CommunePage.objects.filter(published=True)
 
-    def location(self, c):
+    def location(self, item):
         return reverse(
             "view_commune",
-            kwargs={"code_departement": c.code_departement, "slug": c.slug},
+            kwargs={"code_departement": item[0], "slug": item[1]},
         )
 
-    def lastmod(self, c):
-        return c.modified
-
 
 sitemaps = {
     "events": EventSitemap,
     "groups": SupportGroupSitemap,
     "communes": CommunesSitemap,
 }
+
+
+def cached_sitemap_view(view):
+    """Met en cache les réponses d'une vue de plan du site, jusqu'à la modification d'une section"""
+
+    @wraps(view)
+    def wrapper(request, sitemaps, section=None, **kwargs):
+        if section is not None:
+            if section not in sitemaps:
+                return view(request, sitemaps, section=section, **kwargs)
+            kwargs["section"] = section
+            sections = [section]
+        else:
+            sections = list(sitemaps)
+
+        versions = "|".join(sitemaps[s]().get_version() for s in sections)
+        key = "Sitemap:{}:{}:{}:{}".format(
+            view.__name__,
+            section,
+            request.GET.get("p", 1),
+            hashlib.sha1(
+                f"{request.scheme}:{request.get_host()}:{versions}".encode()
+            ).hexdigest(),
+        )
+
+        cached = cache.get(key)
+        if cached is not None:
+            content, content_type, last_modified = cached
+            response = HttpResponse(content, content_type=content_type)
+            response["X-Robots-Tag"] = "noindex, noodp, noarchive"
+            if last_modified is not None:
+                response["Last-Modified"] = last_modified
+            return response
+
+        response = view(request, sitemaps, **kwargs)
+        response.render()
+        cache.set(
+            key,
+            (
+                response.content,
+                response["Content-Type"],
+                response.get("Last-Modified"),
+            ),
+            SITEMAP_CACHE_TIMEOUT,
+        )
+        return response
+
+    return wrapper
+
+
+index = cached_sitemap_view(sitemap_views.index)
+sitemap = cached_sitemap_view(sitemap_views.sitemap)
@@ -1,10 +1,9 @@
 from django.conf import settings
-from django.contrib.sitemaps.views import sitemap, index as sitemap_index
 from django.urls import reverse_lazy, path, re_path, include
 from django.views.generic import RedirectView
 
 from . import views
-from ..front.sitemaps import sitemaps
+from ..front.sitemaps import sitemaps, sitemap, index as sitemap_index
 
 supportgroup_settings_patterns = [
     path(
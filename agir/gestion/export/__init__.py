@@ -1,9 +1,13 @@
 from django.conf import settings
-from django.db.models import Q
+from django.db.models import Prefetch, QuerySet, prefetch_related_objects
 
 from agir.gestion.models import Reglement, Document
 from agir.gestion.typologies import TypeDocument
 from agir.lib.admin.utils import get_admin_link
+from agir.lib.utils import grouper
+
+# nombre de règlements dont les pièces sont chargées ensemble
+TAILLE_LOT_EXPORT = 2000
 
 LIBELLES_MODE = {
     Reglement.Mode.VIREMENT: "VIR",
@@ -43,13 +47,47 @@ def references_pieces(reglement):
 
 
 def autres_pieces(reglement):
-    q = Q(depense=reglement.depense) & ~Q(type=TypeDocument.FACTURE)
+    documents = [
+        d for d in reglement.depense.documents.all() if d.type != TypeDocument.FACTURE
+    ]
     if reglement.depense.projet:
-        q = q | Q(projet=reglement.depense.projet)
-    documents = Document.objects.filter(q).distinct()
+        documents.extend(reglement.depense.projet.documents.all())
+
+    # un même document peut être lié à la fois à la dépense et au projet
+    documents = {d.pk: d for d in documents}.values()
 
     return [lien_document(d) for d in documents]
 
 
 def gestion_admin_link(instance):
     return f"{settings.API_DOMAIN}{get_admin_link(instance)}"
+
+
+def iterer_reglements(reglements, taille_lot=TAILLE_LOT_EXPORT):
+    """Parcourt les règlements par lots, en chargeant les pièces de chaque lot en quelques requêtes
+
+    Les règlements d'un queryset sont lus au fur et à mesure : seul le lot en cours est conservé en
+    mémoire. Les pièces utilisées par `references_pieces`, `autres_pieces` et `lien_document` sont
+    préchargées, ce qui évite toute requête supplémentaire pendant l'export.
+    """
+    if isinstance(reglements, QuerySet):
+        reglements = reglements.select_related(
+            "depense__projet__event", "preuve", "facture"
+        ).iterator(chunk_size=taille_lot)
+
+    for lot in grouper(reglements, taille_lot):
+        lot = list(lot)
+        prefetch_related_objects(
+            lot,
+            "facture__versions",
+            "preuve__versions",
+            Prefetch(
+                "depense__documents",
+                queryset=Document.objects.prefetch_related("versions"),
+            ),
+            Prefetch(
+                "depense__projet__documents",
+                queryset=Document.objects.prefetch_related("versions"),
+            ),
+        )
+        yield lot
@@ -1,8 +1,8 @@
+from itertools import chain
 from operator import neg
 from typing import Iterable
 
 import pandas as pd
-from django.db.models import QuerySet
 from glom import glom, Val, T, M, Coalesce
 
 from agir.gestion.export import (
@@ -10,6 +10,7 @@ from agir.gestion.export import (
     lien_document,
     autres_pieces,
     gestion_admin_link,
+    iterer_reglements,
     references_pieces,
 )
 from agir.gestion.models import Reglement
@@ -77,25 +78,19 @@ def exporter_reglements(
     reglements: Iterable[Reglement] = None,
     colonnes_supplementaires: bool = True,
 ):
-    if isinstance(reglements, QuerySet):
-        reglements = reglements.select_related(
-            "depense__projet__event", "preuve", "facture"
-        )
-
     if colonnes_supplementaires:
         spec = spec_fec
     else:
         spec = {k: v for k, v in spec_fec.items() if not k[0] == "_"}
 
-    df = pd.DataFrame(glom(reglements, [spec]))
+    df = pd.DataFrame(
+        chain.from_iterable(glom(lot, [spec]) for lot in iterer_reglements(reglements))
+    )
 
     if colonnes_supplementaires:
-        max_autres_pieces = df["_AutresPièces"].str.len().max()
-
-        autres_colonnes = []
-
-        for i in range(max_autres_pieces):
-            df[f"_AutrePièce{i+1}"] = df["_AutresPièces"].str.get(i)
-        del df["_AutresPièces"]
+        # une colonne par pièce supplémentaire, construites en une seule opération
+        autres_pieces = pd.DataFrame(df.pop("_AutresPièces").tolist(), index=df.index)
+        autres_pieces.columns = [f"_AutrePièce{i+1}" for i in autres_pieces.columns]
+        df = df.join(autres_pieces)
 
     return df
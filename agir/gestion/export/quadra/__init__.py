@@ -1,13 +1,18 @@
 import datetime
+from itertools import chain
 from operator import neg
 from typing import Iterable, Tuple
 
 import pandas as pd
-from django.db.models import QuerySet
 from django.utils import timezone
 from glom import glom, Val, T, M, Coalesce
 
-from agir.gestion.export import LIBELLES_MODE, lien_document, autres_pieces
+from agir.gestion.export import (
+    LIBELLES_MODE,
+    lien_document,
+    autres_pieces,
+    iterer_reglements,
+)
 from agir.gestion.models import Reglement, Compte
 from agir.gestion.typologies import TypeDepense
 from agir.lib.admin.utils import get_admin_link
@@ -68,9 +73,6 @@ def exporter_reglements(
     spec = spec_fec.copy()
     spec["ValidDate"] = Val(timezone.now().date())
 
-    if isinstance(reglements, QuerySet):
-        reglements = reglements.select_related(
-            "depense__projet__event", "preuve", "facture"
-        )
-
-    return pd.DataFrame(glom(reglements, [spec]))
+    return pd.DataFrame(
+        chain.from_iterable(glom(lot, [spec]) for lot in iterer_reglements(reglements))
+    )
@@ -117,6 +117,10 @@ class Document(ModeleGestionMixin, TimeStampedModel):
 
     @property
     def fichier(self):
+        if "versions" in getattr(self, "_prefetched_objects_cache", {}):
+            # les versions préchargées sont triées par date
+            versions = self.versions.all()
+            return versions[len(versions) - 1].fichier if versions else None
         return getattr(self.versions.last(), "fichier", None)
 
     def attribuer_numero(self, compte, code_dep, changer=False):
@@ -0,0 +1,65 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from agir.gestion.export.fecc import exporter_reglements
+from agir.gestion.models import Compte, Depense, Document, Projet, Reglement
+from agir.gestion.typologies import TypeDepense, TypeDocument, TypeProjet
+
+
+class ExporterReglementsTestCase(TestCase):
+    def setUp(self):
+        self.compte = Compte.objects.create(designation="LFI", nom="Compte")
+        self.projet = Projet.objects.create(
+            titre="Projet",
+            type=TypeProjet.CONFERENCE_PRESSE,
+            origine=Projet.Origin.ADMINISTRATION,
+            etat=Projet.Etat.EN_CONSTITUTION,
+        )
+        self.numero = 0
+
+    def creer_reglements(self, nombre):
+        for _ in range(nombre):
+            depense = Depense.objects.create(
+                titre="Dépense",
+                compte=self.compte,
+                projet=self.projet,
+                type=TypeDepense.values[0],
+                montant=100,
+            )
+            facture = Document.objects.create(type=TypeDocument.FACTURE)
+            devis = Document.objects.create(type=TypeDocument.DEVIS)
+            depense.documents.add(facture, devis)
+            self.numero += 1
+            Reglement.objects.create(
+                depense=depense,
+                numero=self.numero,
+                intitule="Règlement",
+                mode=Reglement.Mode.VIREMENT,
+                montant=100,
+                facture=facture,
+                nom_fournisseur="Fournisseur",
+                location_city_fournisseur="Paris",
+                location_zip_fournisseur="75001",
+            )
+
+    def exporter(self):
+        with CaptureQueriesContext(connection) as queries:
+            df = exporter_reglements(Reglement.objects.order_by("numero"))
+        return df, len(queries)
+
+    def test_nombre_de_requetes_independant_du_nombre_de_reglements(self):
+        projet_document = Document.objects.create(type=TypeDocument.FACTURE)
+        self.projet.documents.add(projet_document)
+
+        self.creer_reglements(2)
+        df, nombre_requetes = self.exporter()
+        self.assertEqual(len(df), 2)
+
+        self.creer_reglements(8)
+        df, autre_nombre_requetes = self.exporter()
+        self.assertEqual(len(df), 10)
+        self.assertEqual(nombre_requetes, autre_nombre_requetes)
+
+        # le devis de la dépense et la facture du projet, mais pas la facture de la dépense
+        self.assertEqual(list(df.columns[-2:]), ["_AutrePièce1", "_AutrePièce2"])
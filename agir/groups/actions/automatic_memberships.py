@@ -1,13 +1,22 @@
+import json
 from collections import OrderedDict
+from functools import partial
 
 from data_france.models import CirconscriptionConsulaire, CirconscriptionLegislative
+from django.db import connection, transaction
 from django.db.models import F, ExpressionWrapper, BooleanField
 from django.db.models import Q
+from django.utils import timezone
 
+from agir.authentication.signals import invalidate_person_session_context
 from agir.groups.models import SupportGroup, Membership
+from agir.groups.statistics import schedule_group_statistics_update
 from agir.lib.data import departements
+from agir.lib.form_fields import CustomJSONEncoder
+from agir.lib.rules import clear_permission_context
+from agir.lib.utils import grouper
+from agir.notifications.actions import create_default_group_memberships_subscriptions
 from agir.people.models import Person
-from agir.people.models import PersonTag
 
 TAG_SUFFIX_FE = "Membre boucle FE {}"
 TAG_SUFFIX_DEPARTEMENT = "Membre boucle départementale {}"
@@ -15,75 +24,208 @@ QUALIFICATION_PREFIX = "BD__"
 FINANCE_QUALIFICATION_LABEL = QUALIFICATION_PREFIX + "finances"
 
 
-def sync_supportgroup_memberships(supportgroup, target_memberships, dry_run=False):
-    current_memberships = set(supportgroup.members.values_list("id", flat=True))
-    missing_memberships = target_memberships.difference(current_memberships)
-    extra_members = current_memberships.difference(target_memberships)
-
-    missing_memberships = [
-        Membership(
-            supportgroup=supportgroup,
-            person_id=p,
-            membership_type=Membership.MEMBERSHIP_TYPE_MANAGER,
+# table temporaire contenant les membres souhaités du groupe en cours de synchronisation
+TARGET_TABLE_REQUEST = """
+DROP TABLE IF EXISTS automatic_membership_target;
+CREATE TEMPORARY TABLE automatic_membership_target (
+    person_id uuid PRIMARY KEY,
+    meta jsonb NOT NULL,
+    has_finance_managing_privilege boolean NOT NULL
+) ON COMMIT DROP;
+INSERT INTO automatic_membership_target (person_id, meta, has_finance_managing_privilege)
+SELECT *
+FROM unnest(%(person_ids)s::uuid[], %(metas)s::jsonb[], %(finances)s::boolean[]);
+"""
+
+DIFF_REQUEST = """
+SELECT
+    (SELECT COUNT(*) FROM groups_membership WHERE supportgroup_id = %(supportgroup_id)s),
+    (
+        SELECT COUNT(*)
+        FROM automatic_membership_target t
+        WHERE NOT EXISTS (
+            SELECT 1 FROM groups_membership m
+            WHERE m.supportgroup_id = %(supportgroup_id)s AND m.person_id = t.person_id
+        )
+    ),
+    (
+        SELECT COUNT(*)
+        FROM groups_membership m
+        WHERE m.supportgroup_id = %(supportgroup_id)s
+        AND NOT EXISTS (
+            SELECT 1 FROM automatic_membership_target t WHERE t.person_id = m.person_id
         )
-        for p in missing_memberships
+    );
+"""
+
+# les abonnements aux notifications font référence aux adhésions, et doivent être supprimés d'abord
+DELETE_REQUEST = """
+DELETE FROM notifications_subscription s
+USING groups_membership m
+WHERE s.membership_id = m.id
+AND m.supportgroup_id = %(supportgroup_id)s
+AND NOT EXISTS (
+    SELECT 1 FROM automatic_membership_target t WHERE t.person_id = m.person_id
+);
+DELETE FROM groups_membership m
+WHERE m.supportgroup_id = %(supportgroup_id)s
+AND NOT EXISTS (
+    SELECT 1 FROM automatic_membership_target t WHERE t.person_id = m.person_id
+)
+RETURNING m.person_id;
+"""
+
+INSERT_REQUEST = """
+INSERT INTO groups_membership (
+    created, modified, person_id, supportgroup_id, membership_type, notifications_enabled,
+    default_subscriptions_enabled, personal_information_sharing_consent, meta,
+    has_finance_managing_privilege
+)
+SELECT %(now)s, %(now)s, t.person_id, %(supportgroup_id)s, %(membership_type)s, TRUE,
+    TRUE, NULL, '{}'::jsonb, TRUE
+FROM automatic_membership_target t
+ON CONFLICT (supportgroup_id, person_id) DO NOTHING
+RETURNING id, person_id;
+"""
+
+# reproduit le signal `membership_person_political_support` pour les adhésions créées
+POLITICAL_SUPPORT_REQUEST = """
+UPDATE people_person
+SET is_political_support = TRUE, modified = %(now)s
+WHERE id = ANY(%(person_ids)s::uuid[]) AND NOT is_political_support;
+"""
+
+BOUCLE_UPDATE_REQUEST = """
+UPDATE groups_membership m
+SET meta = t.meta,
+    has_finance_managing_privilege = t.has_finance_managing_privilege,
+    personal_information_sharing_consent = TRUE
+FROM automatic_membership_target t
+WHERE m.supportgroup_id = %(supportgroup_id)s AND m.person_id = t.person_id
+AND (
+    m.meta <> t.meta
+    OR m.has_finance_managing_privilege <> t.has_finance_managing_privilege
+    OR m.personal_information_sharing_consent IS DISTINCT FROM TRUE
+);
+UPDATE people_person p
+SET newsletters = ARRAY(SELECT DISTINCT unnest(p.newsletters || %(newsletters)s::varchar[]))
+FROM automatic_membership_target t
+WHERE p.id = t.person_id AND NOT p.newsletters @> %(newsletters)s::varchar[];
+"""
+
+SEGMENT_UPDATE_REQUEST = """
+UPDATE groups_membership m
+SET meta = m.meta || jsonb_build_object('from_membership_segment', %(segment_id)s)
+WHERE m.supportgroup_id = %(supportgroup_id)s
+AND m.meta -> 'from_membership_segment' IS DISTINCT FROM to_jsonb(%(segment_id)s);
+"""
+
+SUBSCRIPTIONS_BATCH_SIZE = 500
+
+
+def sync_supportgroup_memberships(
+    supportgroup, target_memberships, metas=None, dry_run=False
+):
+    """Synchronise les adhésions du groupe avec l'ensemble des membres souhaités
+
+    La synchronisation se fait directement en base, à partir d'une table temporaire des membres
+    souhaités, sans charger les adhésions : les signaux ne sont donc pas envoyés, et leurs effets
+    (soutien politique des nouveaux membres, abonnements par défaut, invalidation des caches,
+    statistiques du groupe) sont reproduits par lot.
+
+    La table temporaire reste disponible jusqu'à la fin de la transaction, qui doit être ouverte par
+    l'appelant pour y faire référence dans ses propres requêtes.
+
+    :return: le nombre d'adhésions après synchronisation (avant en cas de `dry_run`), le nombre
+        d'adhésions créées et le nombre d'adhésions supprimées
+    """
+    metas = metas or {}
+    person_ids = list(target_memberships)
+    person_metas = [dict(metas.get(person_id, {})) for person_id in person_ids]
+    finances = [
+        bool(meta.pop("has_finance_managing_privilege", False)) for meta in person_metas
     ]
-    extra_members = Membership.objects.filter(
-        supportgroup=supportgroup, person_id__in=extra_members
-    )
+    params = {"supportgroup_id": supportgroup.pk}
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            TARGET_TABLE_REQUEST,
+            {
+                "person_ids": [str(person_id) for person_id in person_ids],
+                "metas": [
+                    json.dumps(meta, cls=CustomJSONEncoder) for meta in person_metas
+                ],
+                "finances": finances,
+            },
+        )
 
-    if dry_run:
-        return current_memberships, len(missing_memberships), len(extra_members)
+        if dry_run:
+            cursor.execute(DIFF_REQUEST, params)
+            return cursor.fetchone()
+
+        cursor.execute(DELETE_REQUEST, params)
+        deleted = [person_id for person_id, in cursor.fetchall()]
+
+        now = timezone.now()
+        cursor.execute(
+            INSERT_REQUEST,
+            {
+                **params,
+                "now": now,
+                "membership_type": Membership.MEMBERSHIP_TYPE_MANAGER,
+            },
+        )
+        created = cursor.fetchall()
+
+        if created:
+            cursor.execute(
+                POLITICAL_SUPPORT_REQUEST,
+                {
+                    "now": now,
+                    "person_ids": [str(person_id) for _, person_id in created],
+                },
+            )
 
-    _, deleted = extra_members.delete()
-    created = Membership.objects.bulk_create(
-        missing_memberships, ignore_conflicts=True, send_post_save_signal=True
-    )
-    current_memberships = list(
-        Membership.objects.filter(supportgroup=supportgroup).select_related("person")
-    )
+        cursor.execute(
+            "SELECT COUNT(*) FROM groups_membership WHERE supportgroup_id = %(supportgroup_id)s;",
+            params,
+        )
+        count = cursor.fetchone()[0]
 
-    return current_memberships, len(created), deleted.get("groups.Membership", 0)
+    for batch in grouper(created, SUBSCRIPTIONS_BATCH_SIZE):
+        create_default_group_memberships_subscriptions(batch)
 
+    if created or deleted:
+        invalidate_person_session_context(
+            *deleted, *(person_id for _, person_id in created)
+        )
+        clear_permission_context()
+        transaction.on_commit(
+            partial(schedule_group_statistics_update, supportgroup.pk)
+        )
 
-def apply_changes(supportgroup, target_memberships, metas, dry_run=False):
-    updated_memberships, created_count, deleted_count = sync_supportgroup_memberships(
-        supportgroup, target_memberships, dry_run=dry_run
-    )
+    return count, len(created), len(deleted)
 
-    if dry_run:
-        return len(updated_memberships), created_count, deleted_count
 
-    newsletter_subscribers = []
-    for membership in updated_memberships:
-        membership.meta = metas[membership.person_id]
-        membership.has_finance_managing_privilege = membership.meta.pop(
-            "has_finance_managing_privilege", False
+def apply_changes(supportgroup, target_memberships, metas, dry_run=False):
+    with transaction.atomic():
+        result = sync_supportgroup_memberships(
+            supportgroup, target_memberships, metas=metas, dry_run=dry_run
         )
-        # Ensure members personal information is shared within the group
-        membership.personal_information_sharing_consent = True
-        # Ensure members are subscribed to main newsletter choices
-        if not membership.person.subscribed:
-            membership.person.subscribed = True
-            newsletter_subscribers.append(membership.person)
-
-    Membership.objects.bulk_update(
-        updated_memberships,
-        (
-            "has_finance_managing_privilege",
-            "personal_information_sharing_consent",
-            "meta",
-        ),
-    )
 
-    if newsletter_subscribers:
-        Person.objects.bulk_update(newsletter_subscribers, fields=("newsletters",))
+        if not dry_run:
+            # les membres partagent leurs informations au sein du groupe, et sont abonnés aux
+            # principales lettres d'information
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    BOUCLE_UPDATE_REQUEST,
+                    {
+                        "supportgroup_id": supportgroup.pk,
+                        "newsletters": list(Person.MAIN_NEWSLETTER_CHOICES),
+                    },
+                )
 
-    return (
-        len(updated_memberships),
-        created_count,
-        deleted_count,
-    )
+    return result
 
 
 def maj_boucle_par_animation(filter):
@@ -116,17 +258,16 @@ def maj_boucle_par_animation(filter):
 
 
 def maj_boucle_par_tag(tag_suffix):
-    tags = PersonTag.objects.filter(label__endswith=tag_suffix)
+    person_tags = Person.tags.through.objects.filter(
+        persontag__label__endswith=tag_suffix
+    ).values_list("person_id", "persontag_id", "persontag__description")
 
     membres_souhaites = []
     metas = {}
 
-    for tag in tags:
-        membres_tags = list(tag.people.values_list("id", flat=True))
-        membres_souhaites += membres_tags
-        meta = {"tag_id": tag.id, "description": tag.description}
-        for person_id in membres_tags:
-            metas[person_id] = meta
+    for person_id, tag_id, description in person_tags:
+        membres_souhaites.append(person_id)
+        metas[person_id] = {"tag_id": tag_id, "description": description}
 
     return membres_souhaites, metas
 
@@ -277,25 +418,23 @@ def update_memberships_from_segment(supportgroup, dry_run=False):
     target_memberships = set(
         supportgroup.membership_segment.get_people().values_list("id", flat=True)
     )
-    updated_memberships, created_count, deleted_count = sync_supportgroup_memberships(
-        supportgroup, target_memberships, dry_run=dry_run
-    )
-    if dry_run:
-        return len(updated_memberships), created_count, deleted_count
-
-    for membership in updated_memberships:
-        membership.meta["from_membership_segment"] = supportgroup.membership_segment.pk
 
-    Membership.objects.bulk_update(
-        updated_memberships,
-        ("meta",),
-    )
+    with transaction.atomic():
+        result = sync_supportgroup_memberships(
+            supportgroup, target_memberships, dry_run=dry_run
+        )
 
-    return (
-        len(updated_memberships),
-        created_count,
-        deleted_count,
-    )
+        if not dry_run:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    SEGMENT_UPDATE_REQUEST,
+                    {
+                        "supportgroup_id": supportgroup.pk,
+                        "segment_id": supportgroup.membership_segment.pk,
+                    },
+                )
+
+    return result
 
 
 def refresh_supportgroups_with_membership_segment(supportgroups, dry_run=False):
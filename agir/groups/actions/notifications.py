@@ -11,7 +11,7 @@ from agir.groups.tasks import (
     send_joined_notification_email,
     send_alert_capacity_email,
     send_message_notification_email,
-    send_comment_notification_email,
+    schedule_comment_notification_email,
 )
 from agir.msgs.actions import (
     get_comment_recipients,
@@ -119,7 +119,7 @@ def new_comment_restricted_notifications(comment):
         notification_subscriptions__activity_type=Activity.TYPE_NEW_COMMENT_RESTRICTED,
     )
 
-    send_comment_notification_email.delay(comment.pk)
+    schedule_comment_notification_email(comment)
 
     Activity.objects.bulk_create(
         [
@@ -221,7 +221,7 @@ def new_comment_notifications(comment: SupportGroupMessageComment):
         for r in other_recipients
     ]
 
-    send_comment_notification_email.delay(comment.pk)
+    schedule_comment_notification_email(comment)
 
     Activity.objects.bulk_create(
         restricted_activities + other_activities,
@@ -4,6 +4,7 @@ import base64
 import hmac
 import hashlib
 from datetime import date, datetime
+from functools import lru_cache
 
 from django.conf import settings
 from django.utils import timezone
@@ -59,36 +60,49 @@ def generate_msg_part_for_group(group, expiration_date):
     :param expiration_date: the expiration date for the promo code
     :return:
     """
-    date_fragment = generate_date_fragment(expiration_date)
+    return generate_date_fragment(expiration_date) + generate_group_fragment(group.pk)
 
+
+def generate_group_fragment(group_pk):
+    """Generate the 6 characters corresponding to the support group id"""
     # let's hash the group part to make sure it works whatever the uuid generation mode
     # keep only the strictly minimum number of bytes
     keep_bytes = (GROUP_ID_SIZE * 3 // 4) + 1
-    group_bytes = DIGESTMOD(group.pk.bytes).digest()[:keep_bytes]
+    group_bytes = DIGESTMOD(group_pk.bytes).digest()[:keep_bytes]
 
     # let's use the first GROUP_ID_SIZE characters of the base64 encoding
-    group_fragment = BASE64ENC(group_bytes)[:GROUP_ID_SIZE]
+    return BASE64ENC(group_bytes)[:GROUP_ID_SIZE]
 
-    return date_fragment + group_fragment
 
+def sign_code(msg, key=None):
+    if key is None:
+        key = settings.PROMO_CODE_KEY
 
-def sign_code(msg):
     keep_bytes = (SIGNATURE_SIZE * 3 // 4) + 1
-    sig_bytes = hmac.new(
-        key=settings.PROMO_CODE_KEY, msg=msg, digestmod=DIGESTMOD
-    ).digest()[:keep_bytes]
+    sig_bytes = hmac.new(key=key, msg=msg, digestmod=DIGESTMOD).digest()[:keep_bytes]
 
     signature_frag = BASE64ENC(sig_bytes)[:SIGNATURE_SIZE]
 
     return msg + signature_frag
 
 
+@lru_cache(maxsize=8192)
+def _generate_code(group_pk, expiration_date, key):
+    # la clé fait partie des arguments pour que le cache tienne compte d'un éventuel changement
+    msg = generate_date_fragment(expiration_date) + generate_group_fragment(group_pk)
+    return sign_code(msg, key).decode("ascii")
+
+
 def generate_code_for_group(group, expiration_date):
-    msg = generate_msg_part_for_group(group, expiration_date)
-    return sign_code(msg).decode("ascii")
+    """Generate the signed promo code of a group
+
+    Codes only depend on the group, the expiration date and the key: they are kept in memory so
+    that group lists do not sign the same codes again for each request.
+    """
+    return _generate_code(group.pk, expiration_date, settings.PROMO_CODE_KEY)
 
 
-def parse_special_promo_code(code, group):
+def parse_special_promo_code(code):
     if not isinstance(code, dict) or not code.get("expiration", None):
         return None
 
@@ -97,30 +111,40 @@ def parse_special_promo_code(code, group):
     except ValueError:
         return None
 
-    if timezone.now().date() >= expiration_date:
-        return None
-
     return {
-        "code": generate_code_for_group(group, expiration_date),
         "expiration": expiration_date,
         "label": code.get("label", "Offre exceptionnelle"),
     }
 
 
+@lru_cache(maxsize=8)
+def _load_special_promo_codes(codes):
+    try:
+        codes = json.loads(codes)
+    except json.JSONDecodeError:
+        return ()
+
+    return tuple(
+        code for code in map(parse_special_promo_code, codes) if code is not None
+    )
+
+
 def get_special_promo_codes(group):
     codes = settings.SPECIAL_PROMO_CODES
     if not codes:
         return []
-    try:
-        codes = json.loads(codes)
-    except json.JSONDecodeError as e:
-        codes = []
 
-    codes = [parse_special_promo_code(code, group) for code in codes]
-    while None in codes:
-        codes.remove(None)
+    today = timezone.now().date()
 
-    return codes
+    return [
+        {
+            "code": generate_code_for_group(group, code["expiration"]),
+            "expiration": code["expiration"],
+            "label": code["label"],
+        }
+        for code in _load_special_promo_codes(codes)
+        if today < code["expiration"]
+    ]
 
 
 def get_default_promo_codes(group):
@@ -21,7 +21,7 @@ from agir.lib.admin.filters import (
     RegionListFilter,
     CirconscriptionLegislativeFilter,
 )
-from agir.lib.admin.panels import CenterOnFranceMixin
+from agir.lib.admin.panels import CenterOnFranceMixin, LargeChangeListMixin
 from agir.lib.display import display_price
 from agir.lib.utils import front_url
 from . import actions
@@ -33,9 +33,11 @@ from .. import models
 from ..actions.promo_codes import get_promo_codes
 from ..utils.certification import (
     check_certification_criteria,
+    label_certification_criteria,
 )
 from ...donations.allocations import (
     get_account_name_for_group,
+    supportgroup_balance_subquery,
     DONATIONS_ACCOUNT,
     SPENDING_ACCOUNT,
 )
@@ -43,7 +45,9 @@ from ...lib.admin.utils import admin_url
 
 
 @admin.register(models.SupportGroup)
-class SupportGroupAdmin(VersionAdmin, CenterOnFranceMixin, OSMGeoAdmin):
+class SupportGroupAdmin(
+    LargeChangeListMixin, VersionAdmin, CenterOnFranceMixin, OSMGeoAdmin
+):
     history_latest_first = True
     form = SupportGroupAdminForm
     fieldsets = (
@@ -250,7 +254,11 @@ class SupportGroupAdmin(VersionAdmin, CenterOnFranceMixin, OSMGeoAdmin):
     membership_count.admin_order_field = "membership_count"
 
     def allocation(self, obj, show_add_button=False):
-        allocation = obj and obj.get_allocation() or None
+        if obj and hasattr(obj, "allocation"):
+            # solde annoté par get_queryset
+            allocation = obj.allocation
+        else:
+            allocation = obj and obj.get_allocation() or None
         value = display_price(allocation) if allocation else "-"
 
         if show_add_button:
@@ -484,10 +492,7 @@ class SupportGroupAdmin(VersionAdmin, CenterOnFranceMixin, OSMGeoAdmin):
                 'SELECT COUNT(*) FROM "groups_membership" WHERE "supportgroup_id" = "groups_supportgroup"."id"',
                 (),
             ),
-            allocation=RawSQL(
-                'SELECT SUM(amount) FROM "donations_operation" WHERE "group_id" = "groups_supportgroup"."id"',
-                (),
-            ),
+            allocation=supportgroup_balance_subquery(),
         )
 
     def get_search_results(self, request, queryset, search_term):
@@ -613,6 +618,7 @@ class UncertifiableGroupAdmin(SupportGroupAdmin):
         "uncertifiable_warning__date",
         "referents",
         "short_certification_criteria",
+        "certification_checked",
     )
     list_filter = (
         filters.CertificationWarningFilter,
@@ -642,17 +648,25 @@ class UncertifiableGroupAdmin(SupportGroupAdmin):
     def certification__date(self, obj):
         return obj.certification_date and obj.certification_date.strftime("%-d %B %Y")
 
-    @admin.display(description="Avertissement")
+    @admin.display(
+        description="Avertissement", ordering="certification_status__warning_date"
+    )
     def uncertifiable_warning__date(self, obj):
-        warning_date = obj.uncertifiable_warning_date
+        warning_date = obj.certification_status.warning_date
         if not warning_date:
             return "-"
 
-        return obj.uncertifiable_warning_date.strftime("%-d %B %Y")
+        return warning_date.strftime("%-d %B %Y")
+
+    @admin.display(description="Vérifié le", ordering="certification_status__checked")
+    def certification_checked(self, obj):
+        return timezone.localtime(obj.certification_status.checked).strftime(
+            "%-d %B %Y à %H:%M"
+        )
 
     @admin.display(description="Critères")
     def short_certification_criteria(self, obj):
-        criteria = check_certification_criteria(obj, with_labels=True)
+        criteria = label_certification_criteria(obj.certification_status.criteria)
         html = [
             f"""
             <div style="white-space: nowrap;" title={criterion["help"]}>
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class GroupsConfig(AppConfig):
     name = "agir.groups"
     verbose_name = "Groupes d'action"
+
+    def ready(self):
+        # noinspection PyUnresolvedReferences
+        from . import signals
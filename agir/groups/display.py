@@ -1,5 +1,9 @@
+import re
+
 from agir.groups.models import Membership
 from agir.lib.display import genrer
+from agir.lib.geo import get_commune
+from agir.lib.og_images import OGImage
 
 
 def genrer_membership(genre, membership_type):
@@ -22,3 +26,41 @@ def genrer_membership(genre, membership_type):
         raise Exception("The author status is unknown")
 
     return author_status
+
+
+class SupportGroupOGImage(OGImage):
+    kind = "groups"
+    charnieres = {
+        "de ": "à ",
+        "d'": "à ",
+        "du ": "au ",
+        "de la ": "à la ",
+        "des ": "aux ",
+        "de l'": "à l'",
+        "de las ": "à las ",
+        "de los ": "à los ",
+    }
+
+    def get_subtitle(self):
+        # ex: Groupe local à Paris (75010)
+        type = self.object.get_type_display()
+        city = self.object.location_city
+        zip = self.object.location_zip
+
+        if not zip:
+            return type
+
+        commune = get_commune(self.object)
+        if commune:
+            commune = commune.nom_avec_charniere
+
+        if not city and not commune:
+            return f"{type} ({zip})"
+
+        if not commune:
+            return f"{type} à {city} ({zip})"
+
+        for key, value in self.charnieres.items():
+            commune = re.sub("^" + key, value, commune)
+
+        return f"{type} {commune} ({zip})"
@@ -0,0 +1,30 @@
+from django.core.management import BaseCommand
+from tqdm import tqdm
+
+from agir.groups.models import SupportGroup
+from agir.groups.statistics import compute_group_statistics
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcule les statistiques quotidiennes des groupes actifs. À lancer après le "
+        "déploiement, puis chaque nuit pour tenir compte des changements qui ne déclenchent pas "
+        "de recalcul (désactivation d'un compte par exemple)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "groups",
+            metavar="GROUPE",
+            nargs="*",
+            help="Les identifiants des groupes à recalculer (tous les groupes actifs par défaut)",
+        )
+
+    def handle(self, *args, groups, verbosity, **options):
+        supportgroups = SupportGroup.objects.active()
+        if groups:
+            supportgroups = supportgroups.filter(id__in=groups)
+
+        ids = list(supportgroups.values_list("id", flat=True))
+        for supportgroup_id in tqdm(ids, disable=verbosity < 2):
+            compute_group_statistics(supportgroup_id)
@@ -1,12 +1,16 @@
 from datetime import timedelta
 
+from celery import group as task_group
 from django.conf import settings
 from django.contrib.humanize.templatetags.humanize import apnumber
 from django.utils import timezone
 from django.utils.translation import ngettext
 
 from agir.groups import tasks
-from agir.groups.models import SupportGroup
+from agir.groups.utils.certification import (
+    compute_certification_statuses,
+    update_certification_statuses,
+)
 from agir.lib.commands import BaseCommand
 
 
@@ -23,11 +27,15 @@ class Command(BaseCommand):
         - send the list of groups that have received a warning more than one month ago to the admin email
         """
 
-    def warn_uncertifiable_group_referents(self, group):
-        if not self.dry_run:
-            tasks.send_uncertifiable_group_warning.delay(
-                group.id, settings.CERTIFICATION_WARNING_EXPIRATION_IN_DAYS
-            )
+    def warn_uncertifiable_group_referents(self, group_ids):
+        if not self.dry_run and group_ids:
+            # les avertissements sont envoyés à la file de tâches en une seule fois
+            task_group(
+                tasks.send_uncertifiable_group_warning.si(
+                    group_id, settings.CERTIFICATION_WARNING_EXPIRATION_IN_DAYS
+                )
+                for group_id in group_ids
+            ).apply_async()
 
     def send_uncertifiable_group_list(self, group_ids):
         if not self.dry_run:
@@ -35,28 +43,29 @@ class Command(BaseCommand):
                 group_ids, settings.CERTIFICATION_WARNING_EXPIRATION_IN_DAYS
             )
 
-    def check_uncertifiable_groups(self, uncertifiable_groups):
+    def check_uncertifiable_groups(self, statuses):
         warned = []
         uncertifiable = []
+        expiration_limit = timezone.now() - timedelta(
+            days=settings.CERTIFICATION_WARNING_EXPIRATION_IN_DAYS
+        )
 
-        for group in uncertifiable_groups:
-            self.log_current_item(f"{group}")
+        for status in statuses:
             self.tqdm.update(1)
 
             # Warning has not been sent yet
-            if group.uncertifiable_warning_date is None:
-                self.warn_uncertifiable_group_referents(group)
-                warned.append(group.id)
+            if status.warning_date is None:
+                warned.append(status.supportgroup_id)
                 continue
 
             # Warning has been sent less than 31 days ago
-            if timezone.now() <= group.uncertifiable_warning_date + timedelta(
-                days=settings.CERTIFICATION_WARNING_EXPIRATION_IN_DAYS
-            ):
+            if expiration_limit <= status.warning_date:
                 continue
 
             # Warning has expired
-            uncertifiable.append((group.id, group.uncertifiable_warning_date))
+            uncertifiable.append((status.supportgroup_id, status.warning_date))
+
+        self.warn_uncertifiable_group_referents(warned)
 
         if uncertifiable:
             uncertifiable = sorted(uncertifiable, key=lambda i: i[1])
@@ -70,12 +79,15 @@ class Command(BaseCommand):
         *args,
         **kwargs,
     ):
-        uncertifiable_groups = (
-            SupportGroup.objects.prefetch_related("notifications")
-            .uncertifiable()
-            .only("id", "name")
-        )
-        uncertifiable_group_count = len(uncertifiable_groups)
+        # les critères de tous les groupes certifiés sont vérifiés en une seule requête, et le
+        # résultat est conservé pour être consulté dans l'administration
+        if self.dry_run:
+            statuses = compute_certification_statuses()
+        else:
+            statuses = update_certification_statuses()
+
+        uncertifiable_statuses = [s for s in statuses if not s.certifiable]
+        uncertifiable_group_count = len(uncertifiable_statuses)
 
         if uncertifiable_group_count == 0:
             self.error("No uncertifiable group found.")
@@ -91,7 +103,7 @@ class Command(BaseCommand):
             )
         )
 
-        warned, uncertifiable = self.check_uncertifiable_groups(uncertifiable_groups)
+        warned, uncertifiable = self.check_uncertifiable_groups(uncertifiable_statuses)
 
         self.log_current_item("")
         self.tqdm.close()
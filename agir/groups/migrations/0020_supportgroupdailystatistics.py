@@ -0,0 +1,99 @@
+import datetime
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("groups", "0019_supportgroup_membership_segment"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SupportGroupDailyStatistics",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField(editable=False, verbose_name="jour")),
+                (
+                    "events",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="événements publics"
+                    ),
+                ),
+                (
+                    "event_participants",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="participant·es aux événements"
+                    ),
+                ),
+                (
+                    "event_duration",
+                    models.DurationField(
+                        default=datetime.timedelta(0),
+                        verbose_name="durée totale des événements",
+                    ),
+                ),
+                (
+                    "event_subtypes",
+                    models.JSONField(
+                        blank=True,
+                        default=dict,
+                        verbose_name="événements par sous-type",
+                    ),
+                ),
+                (
+                    "event_locations",
+                    models.JSONField(
+                        blank=True, default=dict, verbose_name="événements par adresse"
+                    ),
+                ),
+                (
+                    "members",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="nouveaux membres actifs"
+                    ),
+                ),
+                (
+                    "followers",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="nouveaux abonné·es"
+                    ),
+                ),
+                (
+                    "messages",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="messages et commentaires"
+                    ),
+                ),
+                (
+                    "supportgroup",
+                    models.ForeignKey(
+                        editable=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_statistics",
+                        to="groups.supportgroup",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "statistiques quotidiennes d'un groupe",
+                "verbose_name_plural": "statistiques quotidiennes des groupes",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="supportgroupdailystatistics",
+            constraint=models.UniqueConstraint(
+                fields=("supportgroup", "date"),
+                name="unique_supportgroup_daily_statistics",
+            ),
+        ),
+    ]
@@ -0,0 +1,66 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("groups", "0020_supportgroupdailystatistics"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SupportGroupCertificationStatus",
+            fields=[
+                (
+                    "supportgroup",
+                    models.OneToOneField(
+                        editable=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="certification_status",
+                        serialize=False,
+                        to="groups.supportgroup",
+                    ),
+                ),
+                (
+                    "checked",
+                    models.DateTimeField(
+                        editable=False, verbose_name="date de vérification"
+                    ),
+                ),
+                (
+                    "certifiable",
+                    models.BooleanField(
+                        editable=False, verbose_name="respecte les critères"
+                    ),
+                ),
+                (
+                    "criteria",
+                    models.JSONField(
+                        default=dict,
+                        editable=False,
+                        verbose_name="critères de certification",
+                    ),
+                ),
+                (
+                    "warning_date",
+                    models.DateTimeField(
+                        editable=False,
+                        null=True,
+                        verbose_name="date de l'avertissement de décertification",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "vérification de la certification d'un groupe",
+                "verbose_name_plural": "vérifications de la certification des groupes",
+            },
+        ),
+        migrations.AddIndex(
+            model_name="supportgroupcertificationstatus",
+            index=models.Index(
+                fields=["certifiable", "warning_date"],
+                name="groups_certif_status_idx",
+            ),
+        ),
+    ]
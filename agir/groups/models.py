@@ -41,6 +41,8 @@ __all__ = [
     "Membership",
     "TransferOperation",
     "SupportGroupExternalLink",
+    "SupportGroupDailyStatistics",
+    "SupportGroupCertificationStatus",
 ]
 
 from agir.lib.utils import front_url
@@ -535,11 +537,8 @@ class SupportGroup(
     def get_icon_configuration(self):
         return self.TYPE_PARAMETERS.get(self.type, None)
 
-    def get_meta_image(self):
-        if hasattr(self, "image") and self.image:
-            return urljoin(settings.FRONT_DOMAIN, self.image.url)
-
-        # Use content hash as cache key for the auto-generated meta image
+    def get_og_image_cache_key(self):
+        """Renvoie la clé de l'image Open Graph générée, qui dépend de toutes les informations affichées"""
         content = ":".join(
             (
                 self.name,
@@ -549,11 +548,15 @@ class SupportGroup(
                 self.get_type_display(),
             )
         )
-        content_hash = hashlib.sha1(content.encode("utf-8")).hexdigest()[:8]
+        return hashlib.sha1(content.encode("utf-8")).hexdigest()[:8]
+
+    def get_meta_image(self):
+        if hasattr(self, "image") and self.image:
+            return urljoin(settings.FRONT_DOMAIN, self.image.url)
 
         return front_url(
             "view_og_image_supportgroup",
-            kwargs={"pk": self.pk, "cache_key": content_hash},
+            kwargs={"pk": self.pk, "cache_key": self.get_og_image_cache_key()},
             absolute=True,
         )
 
@@ -815,3 +818,82 @@ class SupportGroupExternalLink(ExternalLinkMixin):
     class Meta:
         verbose_name = "Lien ou réseau social de l’équipe"
         verbose_name_plural = "Liens et réseaux sociaux de l’équipe"
+
+
+class SupportGroupDailyStatistics(models.Model):
+    """Statistiques d'activité d'un groupe pour une journée
+
+    Ces instantanés sont recalculés par `agir.groups.statistics` à chaque modification des
+    adhésions, des événements ou des messages du groupe, et permettent de servir les statistiques
+    d'une période quelconque en une seule requête.
+    """
+
+    supportgroup = models.ForeignKey(
+        SupportGroup,
+        on_delete=models.CASCADE,
+        related_name="daily_statistics",
+        editable=False,
+    )
+    date = models.DateField("jour", editable=False)
+
+    events = models.PositiveIntegerField("événements publics", default=0)
+    event_participants = models.PositiveIntegerField(
+        "participant·es aux événements", default=0
+    )
+    event_duration = models.DurationField(
+        "durée totale des événements", default=timedelta(0)
+    )
+    event_subtypes = models.JSONField(
+        "événements par sous-type", default=dict, blank=True
+    )
+    event_locations = models.JSONField(
+        "événements par adresse", default=dict, blank=True
+    )
+    members = models.PositiveIntegerField("nouveaux membres actifs", default=0)
+    followers = models.PositiveIntegerField("nouveaux abonné·es", default=0)
+    messages = models.PositiveIntegerField("messages et commentaires", default=0)
+
+    class Meta:
+        verbose_name = "statistiques quotidiennes d'un groupe"
+        verbose_name_plural = "statistiques quotidiennes des groupes"
+        constraints = [
+            models.UniqueConstraint(
+                fields=("supportgroup", "date"),
+                name="unique_supportgroup_daily_statistics",
+            )
+        ]
+
+
+class SupportGroupCertificationStatus(models.Model):
+    """Résultat de la dernière vérification des critères de certification d'un groupe certifié
+
+    Ces résultats sont calculés pour tous les groupes certifiés à la fois par
+    `agir.groups.utils.certification.update_certification_statuses`, ce qui permet de les consulter
+    dans l'administration sans recalculer les critères de chaque groupe.
+    """
+
+    supportgroup = models.OneToOneField(
+        SupportGroup,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="certification_status",
+        editable=False,
+    )
+    checked = models.DateTimeField("date de vérification", editable=False)
+    certifiable = models.BooleanField("respecte les critères", editable=False)
+    criteria = models.JSONField(
+        "critères de certification", default=dict, editable=False
+    )
+    warning_date = models.DateTimeField(
+        "date de l'avertissement de décertification", null=True, editable=False
+    )
+
+    class Meta:
+        verbose_name = "vérification de la certification d'un groupe"
+        verbose_name_plural = "vérifications de la certification des groupes"
+        indexes = (
+            models.Index(
+                fields=("certifiable", "warning_date"),
+                name="groups_certif_status_idx",
+            ),
+        )
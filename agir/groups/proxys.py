@@ -30,7 +30,19 @@ class ThematicGroup(SupportGroup):
 
 class UncertifiableGroupManager(models.Manager.from_queryset(SupportGroupQuerySet)):
     def get_queryset(self):
-        return super().get_queryset().uncertifiable()
+        # utilise le résultat de la dernière vérification des critères (voir la commande
+        # `check_uncertifiable_group_status`) plutôt que de les recalculer
+        return (
+            super()
+            .get_queryset()
+            .active()
+            .certified()
+            .filter(
+                type=SupportGroup.TYPE_LOCAL_GROUP,
+                certification_status__certifiable=False,
+            )
+            .select_related("certification_status")
+        )
 
 
 class UncertifiableGroup(SupportGroup):
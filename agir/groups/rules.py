@@ -1,11 +1,51 @@
 import rules
+from django.db.models.signals import post_save, post_delete
 
 from agir.authentication.models import Role
-from agir.lib.rules import is_authenticated_person
+from agir.lib.rules import (
+    is_authenticated_person,
+    cached_for_permissions,
+    clear_permission_context,
+)
 from .models import Membership, SupportGroup
 from ..msgs.models import SupportGroupMessage, SupportGroupMessageComment
 
 
+def get_person_memberships(person_id):
+    """Renvoie les adhésions de la personne indexées par identifiant de groupe
+
+    Les valeurs sont des couples (type d'adhésion, droits de gestion financière). Le résultat est
+    chargé une seule fois par contexte de permission.
+    """
+    return cached_for_permissions(
+        ("memberships", person_id),
+        lambda: {
+            supportgroup_id: (membership_type, has_finance_managing_privilege)
+            for supportgroup_id, membership_type, has_finance_managing_privilege in Membership.objects.filter(
+                person_id=person_id
+            ).values_list(
+                "supportgroup_id", "membership_type", "has_finance_managing_privilege"
+            )
+        },
+    )
+
+
+def get_membership_type(person, supportgroup_id):
+    """Renvoie le type d'adhésion de la personne au groupe, ou 0 si elle n'en est pas membre"""
+    membership = get_person_memberships(person.pk).get(supportgroup_id)
+    return membership[0] if membership else 0
+
+
+post_save.connect(
+    clear_permission_context, sender=Membership, dispatch_uid="permissions_membership"
+)
+post_delete.connect(
+    clear_permission_context,
+    sender=Membership,
+    dispatch_uid="permissions_membership_delete",
+)
+
+
 @rules.predicate
 def is_published_group(_role, supportgroup=None):
     return supportgroup is not None and supportgroup.published
@@ -50,11 +90,8 @@ def is_at_least_manager_for_group(role, obj=None):
 
     return (
         supportgroup is not None
-        and Membership.objects.filter(
-            membership_type__gte=Membership.MEMBERSHIP_TYPE_MANAGER,
-            person=role.person,
-            supportgroup=supportgroup,
-        ).exists()
+        and get_membership_type(role.person, supportgroup.pk)
+        >= Membership.MEMBERSHIP_TYPE_MANAGER
     )
 
 
@@ -74,10 +111,10 @@ def is_at_least_referent_for_group(role, obj=None):
     else:
         return False
 
-    return Membership.objects.filter(
-        membership_type__gte=Membership.MEMBERSHIP_TYPE_REFERENT,
-        person=role.person,
-        supportgroup=supportgroup,
+    return (
+        supportgroup is not None
+        and get_membership_type(role.person, supportgroup.pk)
+        >= Membership.MEMBERSHIP_TYPE_REFERENT
     )
 
 
@@ -98,8 +135,12 @@ def is_finance_manager(role, obj=None):
     else:
         return False
 
+    membership = get_person_memberships(role.person.pk).get(supportgroup.pk)
+
     return (
-        supportgroup.memberships.finance_managers().filter(person__role=role).exists()
+        membership is not None
+        and membership[0] >= Membership.MEMBERSHIP_TYPE_MANAGER
+        and membership[1]
     )
 
 
@@ -137,12 +178,10 @@ def is_own_membership(role, membership=None):
 
 @rules.predicate
 def own_membership_has_higher_rights(role, membership=None):
-    return membership is not None and (
-        Membership.objects.filter(
-            person=role.person,
-            supportgroup=membership.supportgroup,
-            membership_type__gt=membership.membership_type,
-        ).exists()
+    return (
+        membership is not None
+        and get_membership_type(role.person, membership.supportgroup_id)
+        > membership.membership_type
     )
 
 
@@ -156,11 +195,8 @@ def is_group_member(role, obj=None):
         supportgroup_id = obj.supportgroup_id
     else:
         return False
-    return (
-        supportgroup_id is not None
-        and Membership.objects.filter(
-            supportgroup_id=supportgroup_id, person_id=role.person.pk
-        ).exists()
+    return supportgroup_id is not None and supportgroup_id in get_person_memberships(
+        role.person.pk
     )
 
 
@@ -0,0 +1,87 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from agir.events.models import Event, OrganizerConfig, RSVP
+from agir.groups.display import SupportGroupOGImage
+from agir.groups.models import Membership, SupportGroup
+from agir.groups.statistics import schedule_group_statistics_update
+from agir.groups.tasks import generate_supportgroup_og_image
+from agir.lib.og_images import schedule_og_image_generation
+from agir.msgs.models import SupportGroupMessage, SupportGroupMessageComment
+
+
+def schedule_update_on_commit(*supportgroup_ids):
+    transaction.on_commit(partial(schedule_group_statistics_update, *supportgroup_ids))
+
+
+def event_organizer_group_ids(event_id):
+    return OrganizerConfig.objects.filter(
+        event_id=event_id, as_group_id__isnull=False
+    ).values_list("as_group_id", flat=True)
+
+
+@receiver(post_save, sender=Membership, dispatch_uid="statistiques_groupe_adhesion")
+@receiver(
+    post_delete, sender=Membership, dispatch_uid="statistiques_groupe_adhesion_delete"
+)
+def membership_changed(sender, instance, **kwargs):
+    schedule_update_on_commit(instance.supportgroup_id)
+
+
+@receiver(
+    post_save, sender=OrganizerConfig, dispatch_uid="statistiques_groupe_organisation"
+)
+@receiver(
+    post_delete,
+    sender=OrganizerConfig,
+    dispatch_uid="statistiques_groupe_organisation_delete",
+)
+def organizer_config_changed(sender, instance, **kwargs):
+    if instance.as_group_id:
+        schedule_update_on_commit(instance.as_group_id)
+
+
+@receiver(post_save, sender=Event, dispatch_uid="statistiques_groupe_evenement")
+def event_changed(sender, instance, created, **kwargs):
+    # les organisateurs d'un nouvel événement sont enregistrés ensuite, avec OrganizerConfig
+    if not created:
+        schedule_update_on_commit(*event_organizer_group_ids(instance.id))
+
+
+@receiver(post_save, sender=RSVP, dispatch_uid="statistiques_groupe_participation")
+@receiver(
+    post_delete, sender=RSVP, dispatch_uid="statistiques_groupe_participation_delete"
+)
+def rsvp_changed(sender, instance, **kwargs):
+    schedule_update_on_commit(*event_organizer_group_ids(instance.event_id))
+
+
+@receiver(
+    post_save, sender=SupportGroupMessage, dispatch_uid="statistiques_groupe_message"
+)
+def message_changed(sender, instance, **kwargs):
+    schedule_update_on_commit(instance.supportgroup_id)
+
+
+@receiver(
+    post_save,
+    sender=SupportGroupMessageComment,
+    dispatch_uid="statistiques_groupe_commentaire",
+)
+def comment_changed(sender, instance, **kwargs):
+    schedule_update_on_commit(
+        *SupportGroupMessage.objects.filter(pk=instance.message_id).values_list(
+            "supportgroup_id", flat=True
+        )
+    )
+
+
+@receiver(post_save, sender=SupportGroup, dispatch_uid="image_og_groupe")
+def supportgroup_changed(sender, instance, **kwargs):
+    if not instance.image:
+        schedule_og_image_generation(
+            SupportGroupOGImage(instance), generate_supportgroup_og_image
+        )
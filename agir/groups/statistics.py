@@ -0,0 +1,298 @@
+"""Statistiques d'activité des groupes, précalculées par jour
+
+Pour chaque groupe, les événements publics, les nouvelles adhésions et les messages sont agrégés
+par jour dans `SupportGroupDailyStatistics`. Ces instantanés sont recalculés par une tâche Celery
+lorsque les adhésions, les événements, les participations ou les messages du groupe sont modifiés
+(voir `agir.groups.signals`), et les statistiques d'une période sont ensuite calculées à partir
+d'une seule requête sur ces instantanés.
+
+Comme la page de statistiques ne compte que les événements passés, les événements ne sont pris en
+compte qu'à partir du lendemain de leur début.
+"""
+
+import datetime
+from collections import Counter, defaultdict
+
+from dateutil.relativedelta import relativedelta
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q, Value, CharField
+from django.db.models.functions import Concat, TruncDate
+from django.utils import timezone
+from unidecode import unidecode
+
+from agir.events.models import Event, RSVP, OrganizerConfig, EventSubtype
+from agir.groups.models import Membership, SupportGroupDailyStatistics
+from agir.msgs.models import SupportGroupMessage, SupportGroupMessageComment
+
+# délai pendant lequel les modifications d'un même groupe sont regroupées avant le recalcul
+STATISTICS_UPDATE_DELAY = 60
+
+STATISTICS_FIELDS = (
+    "date",
+    "events",
+    "event_participants",
+    "event_duration",
+    "event_subtypes",
+    "event_locations",
+    "members",
+    "followers",
+    "messages",
+)
+
+
+def _scheduled_key(supportgroup_id):
+    return f"GroupStatistics:{supportgroup_id}:scheduled"
+
+
+def schedule_group_statistics_update(*supportgroup_ids):
+    """Programme le recalcul des statistiques des groupes indiqués
+
+    Les demandes successives pour un même groupe sont regroupées en un seul recalcul.
+    """
+    from agir.groups.tasks import update_supportgroup_statistics
+
+    for supportgroup_id in set(supportgroup_ids):
+        if supportgroup_id is None:
+            continue
+        if cache.add(_scheduled_key(supportgroup_id), True, STATISTICS_UPDATE_DELAY):
+            update_supportgroup_statistics.apply_async(
+                (supportgroup_id,), countdown=STATISTICS_UPDATE_DELAY
+            )
+
+
+def compute_group_statistics(supportgroup_id):
+    """Recalcule l'ensemble des statistiques quotidiennes d'un groupe"""
+    cache.delete(_scheduled_key(supportgroup_id))
+    tz = timezone.get_current_timezone()
+    days = defaultdict(
+        lambda: {
+            "events": 0,
+            "event_participants": 0,
+            "event_duration": datetime.timedelta(0),
+            "event_subtypes": Counter(),
+            "event_locations": Counter(),
+            "members": 0,
+            "followers": 0,
+            "messages": 0,
+        }
+    )
+
+    events = (
+        Event.objects.public()
+        .filter(
+            id__in=OrganizerConfig.objects.filter(as_group_id=supportgroup_id).values(
+                "event_id"
+            )
+        )
+        .annotate(
+            rsvp_count=Count("rsvps", filter=Q(rsvps__status=RSVP.Status.CONFIRMED)),
+            address=Concat(
+                "location_name",
+                Value("\n"),
+                "location_address1",
+                Value(", "),
+                "location_zip",
+                Value(" "),
+                "location_city",
+                output_field=CharField(),
+            ),
+        )
+        .values_list("start_time", "end_time", "subtype_id", "address", "rsvp_count")
+    )
+    for start_time, end_time, subtype_id, address, rsvp_count in events:
+        day = days[timezone.localtime(start_time, tz).date()]
+        day["events"] += 1
+        day["event_participants"] += rsvp_count
+        day["event_duration"] += end_time - start_time
+        day["event_subtypes"][str(subtype_id)] += 1
+        day["event_locations"][address] += 1
+
+    memberships = (
+        Membership.objects.active()
+        .filter(supportgroup_id=supportgroup_id)
+        .annotate(date=TruncDate("created", tzinfo=tz))
+        .order_by()
+        .values("date")
+        .annotate(
+            members=Count(
+                "id", filter=Q(membership_type__gte=Membership.MEMBERSHIP_TYPE_MEMBER)
+            ),
+            followers=Count(
+                "id", filter=Q(membership_type__lt=Membership.MEMBERSHIP_TYPE_MEMBER)
+            ),
+        )
+    )
+    for row in memberships:
+        days[row["date"]]["members"] += row["members"]
+        days[row["date"]]["followers"] += row["followers"]
+
+    for messages in (
+        SupportGroupMessage.objects.active().filter(supportgroup_id=supportgroup_id),
+        SupportGroupMessageComment.objects.active().filter(
+            message__supportgroup_id=supportgroup_id
+        ),
+    ):
+        for row in (
+            messages.annotate(date=TruncDate("created", tzinfo=tz))
+            .order_by()
+            .values("date")
+            .annotate(count=Count("id"))
+        ):
+            days[row["date"]]["messages"] += row["count"]
+
+    with transaction.atomic():
+        SupportGroupDailyStatistics.objects.filter(
+            supportgroup_id=supportgroup_id
+        ).delete()
+        SupportGroupDailyStatistics.objects.bulk_create(
+            SupportGroupDailyStatistics(
+                supportgroup_id=supportgroup_id,
+                date=date,
+                **{
+                    **values,
+                    "event_subtypes": dict(values["event_subtypes"]),
+                    "event_locations": dict(values["event_locations"]),
+                },
+            )
+            for date, values in days.items()
+        )
+
+
+def get_period_range(period, today):
+    """Renvoie les bornes (début inclus, fin exclue) de la période, `None` indiquant l'absence de borne"""
+    if period == "month":
+        return today.replace(day=1), None
+    if period == "year":
+        return today.replace(month=1, day=1), None
+    if period == "last_month":
+        end = today.replace(day=1)
+        return end - relativedelta(months=1), end
+    if period == "last_year":
+        end = today.replace(month=1, day=1)
+        return end.replace(year=end.year - 1), end
+    return None, None
+
+
+def get_event_average_by_month(event_count, first_event_date, today, period=None):
+    if event_count == 0:
+        return 0, 0
+
+    if period == "month" or period == "last_month":
+        return event_count, event_count
+
+    if period == "last_year":
+        return event_count, event_count / 12
+
+    month_count = max(
+        (today.year - first_event_date.year) * 12
+        + (today.month - first_event_date.month)
+        + 1,
+        1,
+    )
+
+    if period == "year":
+        month_count = min(month_count, 12)
+
+    return event_count, event_count / month_count
+
+
+def get_top_event_subtypes(subtypes):
+    from agir.events.serializers import DisplayEventSubtypeSerializer
+
+    most_used_event_subtypes = {
+        int(subtype_id): count
+        for subtype_id, count in subtypes.most_common(3)
+        if subtype_id != "None"
+    }
+    event_subtypes = EventSubtype.objects.filter(
+        id__in=list(most_used_event_subtypes.keys())
+    )
+    return sorted(
+        [
+            {
+                **DisplayEventSubtypeSerializer(subtype).data,
+                "events": most_used_event_subtypes[subtype.id],
+            }
+            for subtype in event_subtypes
+        ],
+        key=lambda s: -s["events"],
+    )
+
+
+def get_top_event_locations(locations):
+    normalized_locations = {}
+    for address, events in locations.most_common(10):
+        location = {"address": address, "events": events}
+        normalized_address = unidecode(address).lower().replace("-", " ")
+        location["events"] += normalized_locations.get(normalized_address, {}).get(
+            "events", 0
+        )
+        normalized_locations[normalized_address] = location
+
+    return sorted(normalized_locations.values(), key=lambda l: -l["events"])[:3]
+
+
+def get_group_statistics(supportgroup, period=None):
+    """Renvoie les statistiques du groupe pour la période demandée
+
+    :param supportgroup: le groupe
+    :param period: une des valeurs `ever`, `month`, `year`, `last_month` ou `last_year`
+    """
+    today = timezone.localdate()
+    start, end = get_period_range(period, today)
+
+    snapshots = SupportGroupDailyStatistics.objects.filter(
+        supportgroup_id=supportgroup.id
+    )
+    if start is not None:
+        snapshots = snapshots.filter(date__gte=start)
+    if end is not None:
+        snapshots = snapshots.filter(date__lt=end)
+
+    event_count = event_participants = members = followers = messages = 0
+    event_duration = datetime.timedelta(0)
+    subtypes, locations = Counter(), Counter()
+    first_event_date = None
+
+    for snapshot in snapshots.values(*STATISTICS_FIELDS):
+        members += snapshot["members"]
+        followers += snapshot["followers"]
+        messages += snapshot["messages"]
+
+        # seuls les événements passés sont comptés
+        if snapshot["events"] and snapshot["date"] < today:
+            event_count += snapshot["events"]
+            event_participants += snapshot["event_participants"]
+            event_duration += snapshot["event_duration"]
+            subtypes.update(snapshot["event_subtypes"])
+            locations.update(snapshot["event_locations"])
+            if first_event_date is None or snapshot["date"] < first_event_date:
+                first_event_date = snapshot["date"]
+
+    event_count, event_average_count_by_month = get_event_average_by_month(
+        event_count, first_event_date, today, period
+    )
+
+    data = {
+        "events": {
+            "count": event_count,
+            "averageByMonth": event_average_count_by_month,
+            "averageParticipants": 0,
+            "totalDuration": 0,
+            "averageDuration": 0,
+            "topSubtypes": [],
+            "topLocations": [],
+        },
+        "members": {"active": members, "followers": followers},
+        "messages": {"count": messages},
+    }
+
+    if event_count > 0:
+        data["events"]["averageParticipants"] = event_participants / event_count
+        data["events"]["totalDuration"] = event_duration
+        data["events"]["averageDuration"] = event_duration / event_count
+        data["events"]["topSubtypes"] = get_top_event_subtypes(subtypes)
+        data["events"]["topLocations"] = get_top_event_locations(locations)
+
+    return data
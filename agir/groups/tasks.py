@@ -1,19 +1,26 @@
-from collections import OrderedDict
+from collections import OrderedDict, defaultdict
 
 import ics
 import reversion
+from celery import shared_task
 from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
 from django.db.models import Q
 from django.template.defaultfilters import date as _date
 from django.template.loader import render_to_string
 from django.utils import timezone
-from django.utils.html import format_html
+from django.utils.html import format_html, format_html_join
 from django.utils.translation import gettext_lazy as _
 
 from agir.activity.models import Activity
 from agir.events.models import Event, OrganizerConfig
-from agir.groups.display import genrer_membership
-from agir.groups.models import SupportGroup, Membership
+from agir.groups.display import genrer_membership, SupportGroupOGImage
+from agir.groups.models import (
+    SupportGroup,
+    Membership,
+    SupportGroupCertificationStatus,
+)
 from agir.lib.celery import (
     emailing_task,
     post_save_task,
@@ -22,15 +29,21 @@ from agir.lib.celery import (
 from agir.lib.geo import geocode_element
 from agir.lib.html import sanitize_html
 from agir.lib.mailing import send_mosaico_email, send_template_email
-from agir.lib.utils import clean_subject_email
+from agir.lib.og_images import generate_og_image
+from agir.lib.utils import clean_subject_email, grouper
 from agir.lib.utils import front_url
 from agir.msgs.models import SupportGroupMessage, SupportGroupMessageComment
 from agir.notifications.models import Subscription
 from agir.people.actions.subscription import make_subscription_token
 from agir.people.models import Person
 from .actions.invitation import make_abusive_invitation_report_link
-from .utils.certification import check_certification_criteria
+from .statistics import compute_group_statistics
+from .utils.certification import (
+    check_certification_criteria,
+    certification_criteria_for_queryset,
+)
 from ..msgs.actions import (
+    get_message_email_recipients,
     get_comment_recipients,
     get_comment_participants,
     filter_with_subscription,
@@ -59,6 +72,12 @@ CHANGE_DESCRIPTION = OrderedDict(
     )
 )  # encodes the preferred order when showing the messages
 
+# nombre maximal de destinataires de chaque tâche d'envoi des notifications de message
+NOTIFICATION_EMAIL_CHUNK_SIZE = 500
+
+# délai pendant lequel les commentaires d'un même message sont regroupés dans une seule notification
+COMMENT_NOTIFICATION_DIGEST_DELAY = 5 * 60
+
 GROUP_MEMBERSHIP_LIMIT_NOTIFICATION_STEPS = [
     # 0,  # 30 members (disabled until further notice)
     -4,  # 26 members
@@ -503,47 +522,45 @@ def create_accepted_invitation_member_activity(new_membership_pk):
     )
 
 
-@emailing_task(post_save=True)
-def send_message_notification_email(message_pk):
-    message = SupportGroupMessage.objects.get(pk=message_pk)
-
-    memberships = message.supportgroup.memberships.filter(
-        membership_type__gte=message.required_membership_type
+def get_author_status(author, supportgroup):
+    membership = Membership.objects.filter(
+        person=author, supportgroup=supportgroup
+    ).first()
+    author_status = genrer_membership(
+        author.gender, membership.membership_type if membership is not None else None
     )
-    recipients = Person.objects.filter(
-        id__in=memberships.values_list("person_id", flat=True)
+    return format_html(
+        '{} de <a href="{}">{}</a>',
+        author_status,
+        front_url("view_group", args=[supportgroup.pk]),
+        supportgroup.name,
     )
-    recipients_id = [recipient.id for recipient in recipients]
 
-    recipients = Person.objects.exclude(id=message.author.id).filter(
-        id__in=recipients_id,
-        notification_subscriptions__membership__supportgroup=message.supportgroup,
-        notification_subscriptions__type=Subscription.SUBSCRIPTION_EMAIL,
-        notification_subscriptions__activity_type=Activity.TYPE_NEW_MESSAGE,
-    )
 
-    if len(recipients) == 0:
-        return
+def send_in_chunks(task, recipients, *args):
+    """Répartit l'envoi d'une notification entre plusieurs tâches, exécutées en parallèle"""
+    for chunk in grouper(recipients, NOTIFICATION_EMAIL_CHUNK_SIZE):
+        task.delay(*args, list(chunk))
 
-    # Get membership to display author status
-    membership_type = None
-    membership = Membership.objects.filter(
-        person=message.author, supportgroup=message.supportgroup
+
+@emailing_task(post_save=True)
+def send_message_notification_email(message_pk):
+    message = SupportGroupMessage.objects.get(pk=message_pk)
+    recipients = get_message_email_recipients(message).as_email_recipients()
+    send_in_chunks(send_message_notification_email_chunk, recipients, message_pk)
+
+
+@emailing_task(post_save=True)
+def send_message_notification_email_chunk(message_pk, recipients):
+    message = SupportGroupMessage.objects.select_related("author", "supportgroup").get(
+        pk=message_pk
     )
-    if membership.exists():
-        membership_type = membership.first().membership_type
-    author_status = genrer_membership(message.author.gender, membership_type)
 
     bindings = {
         "MESSAGE_HTML": message.html_content,
         "DISPLAY_NAME": message.author.display_name,
         "MESSAGE_LINK": front_url("user_message_details", kwargs={"pk": message_pk}),
-        "AUTHOR_STATUS": format_html(
-            '{} de <a href="{}">{}</a>',
-            author_status,
-            front_url("view_group", args=[message.supportgroup.pk]),
-            message.supportgroup.name,
-        ),
+        "AUTHOR_STATUS": get_author_status(message.author, message.supportgroup),
     }
 
     if message.subject:
@@ -562,61 +579,131 @@ def send_message_notification_email(message_pk):
     )
 
 
-@emailing_task(post_save=True)
-def send_comment_notification_email(comment_pk):
-    comment = SupportGroupMessageComment.objects.select_related(
-        "message__supportgroup", "author"
-    ).get(pk=comment_pk)
-    message = comment.message
-    supportgroup = message.supportgroup
-    author_membership = Membership.objects.filter(
-        person=comment.author, supportgroup_id=message.supportgroup_id
-    ).first()
-
-    if message.required_membership_type > Membership.MEMBERSHIP_TYPE_FOLLOWER:
+def get_comment_email_recipients(comment):
+    if comment.message.required_membership_type > Membership.MEMBERSHIP_TYPE_FOLLOWER:
         # Private comment: send only to allowed membership and initial author
-        recipients = filter_with_subscription(
-            get_comment_recipients(comment),
-            comment=comment,
-            subscription_type=Subscription.SUBSCRIPTION_EMAIL,
-            activity_type=Activity.TYPE_NEW_COMMENT_RESTRICTED,
-        )
+        recipients = get_comment_recipients(comment)
     else:
         # Public comment: send to all group members who ever commented
-        recipients = filter_with_subscription(
-            get_comment_participants(comment),
-            comment=comment,
-            subscription_type=Subscription.SUBSCRIPTION_EMAIL,
-            activity_type=Activity.TYPE_NEW_COMMENT_RESTRICTED,
+        recipients = get_comment_participants(comment)
+
+    return filter_with_subscription(
+        recipients,
+        comment=comment,
+        subscription_type=Subscription.SUBSCRIPTION_EMAIL,
+        activity_type=Activity.TYPE_NEW_COMMENT_RESTRICTED,
+    ).as_email_recipients()
+
+
+def _comment_notification_key(message_pk, name):
+    return f"CommentNotification:{message_pk}:{name}"
+
+
+def schedule_comment_notification_email(comment):
+    """Programme la notification par email d'un commentaire
+
+    La notification est différée de `COMMENT_NOTIFICATION_DIGEST_DELAY`, et les commentaires publiés
+    sur le même message entre temps sont inclus dans la même notification.
+
+    La programmation n'a lieu qu'après la validation du commentaire : si une notification est déjà
+    programmée, le commentaire sera donc visible lorsqu'elle sera envoyée.
+    """
+    message_pk, comment_pk = comment.message_id, comment.pk
+
+    def schedule():
+        if cache.add(
+            _comment_notification_key(message_pk, "scheduled"),
+            True,
+            COMMENT_NOTIFICATION_DIGEST_DELAY,
+        ):
+            send_comment_notification_email.apply_async(
+                (comment_pk,), countdown=COMMENT_NOTIFICATION_DIGEST_DELAY
+            )
+
+    transaction.on_commit(schedule)
+
+
+@emailing_task(post_save=True)
+def send_comment_notification_email(comment_pk):
+    """Envoie une seule notification pour les commentaires du message publiés depuis celui indiqué
+
+    Chaque destinataire reçoit un seul email contenant tous les commentaires qu'il n'a pas écrits.
+    Les identifiants des commentaires déjà notifiés sont conservés, pour qu'un commentaire ne soit
+    jamais notifié deux fois, ni écarté parce qu'il a été validé après la notification précédente.
+    """
+    comment = SupportGroupMessageComment.objects.get(pk=comment_pk)
+    message_pk = comment.message_id
+
+    # les commentaires validés à partir de maintenant programmeront une nouvelle notification
+    cache.delete(_comment_notification_key(message_pk, "scheduled"))
+
+    notified_key = _comment_notification_key(message_pk, "notified")
+    notified = set(cache.get(notified_key, []))
+    comments = list(
+        SupportGroupMessageComment.objects.active()
+        .filter(message_id=message_pk, created__gte=comment.created)
+        .exclude(pk__in=notified)
+        .select_related("message__supportgroup")
+        .order_by("created")
+    )
+    cache.set(
+        notified_key,
+        list(notified | {c.pk for c in comments}),
+        COMMENT_NOTIFICATION_DIGEST_DELAY * 10,
+    )
+
+    comments_by_recipient = defaultdict(list)
+    for c in comments:
+        for recipient in get_comment_email_recipients(c):
+            comments_by_recipient[recipient].append(c.pk)
+
+    recipients_by_comments = defaultdict(list)
+    for recipient, comment_pks in comments_by_recipient.items():
+        recipients_by_comments[tuple(comment_pks)].append(recipient)
+
+    for comment_pks, recipients in recipients_by_comments.items():
+        send_in_chunks(
+            send_comment_notification_email_chunk, recipients, list(comment_pks)
         )
 
-    if len(recipients) == 0:
+
+@emailing_task(post_save=True)
+def send_comment_notification_email_chunk(comment_pks, recipients):
+    comments = list(
+        SupportGroupMessageComment.objects.filter(pk__in=comment_pks)
+        .select_related("message__supportgroup", "author")
+        .order_by("created")
+    )
+    if not comments:
         return
 
+    last_comment = comments[-1]
+    message = last_comment.message
+    supportgroup = message.supportgroup
+
     # TODO: utiliser les identifiants de message plutôt que le sujet pour permettre le regroupement
     subject = clean_subject_email(
         # on utilise le sujet du *message* initial pour pousser les clients mail à regrouper les différentes
         # notifications liées à un même message.
         message.subject
         if message.subject
-        else f"Nouveau message de {comment.author.display_name}"
+        else f"Nouveau message de {last_comment.author.display_name}"
     )
 
-    author_membership_type = genrer_membership(
-        comment.author.gender,
-        author_membership.membership_type if author_membership is not None else None,
-    )
+    if len(comments) == 1:
+        message_html = last_comment.html_content
+    else:
+        message_html = format_html_join(
+            "",
+            "<p><strong>{}</strong></p>{}",
+            ((c.author.display_name, c.html_content) for c in comments),
+        )
 
     bindings = {
-        "MESSAGE_HTML": comment.html_content,
-        "DISPLAY_NAME": comment.author.display_name,
+        "MESSAGE_HTML": message_html,
+        "DISPLAY_NAME": last_comment.author.display_name,
         "MESSAGE_LINK": front_url("user_message_details", args=(message.pk,)),
-        "AUTHOR_STATUS": format_html(
-            '{} de <a href="{}">{}</a>',
-            author_membership_type,
-            front_url("view_group", args=[supportgroup.pk]),
-            supportgroup.name,
-        ),
+        "AUTHOR_STATUS": get_author_status(last_comment.author, supportgroup),
     }
 
     send_mosaico_email(
@@ -774,7 +861,12 @@ def send_newly_certified_group_notifications(supportgroup_pk):
 def send_uncertifiable_group_warning(supportgroup_pk, expiration_in_days):
     supportgroup = SupportGroup.objects.get(pk=supportgroup_pk)
     recipients = supportgroup.managers
-    certification_criteria = check_certification_criteria(supportgroup)
+    # Les critères sont recalculés en une seule requête plutôt que critère par critère
+    certification_criteria = check_certification_criteria(
+        certification_criteria_for_queryset(
+            SupportGroup.objects.filter(pk=supportgroup_pk)
+        )[0]
+    )
     # Double-check if any criterium is unmatched to avoid false positives
     if all(certification_criteria.values()):
         raise Exception(
@@ -795,6 +887,9 @@ def send_uncertifiable_group_warning(supportgroup_pk, expiration_in_days):
         ],
         send_post_save_signal=True,
     )
+    SupportGroupCertificationStatus.objects.filter(
+        supportgroup_id=supportgroup_pk
+    ).update(warning_date=timezone.now())
     send_template_email(
         template_name="groups/email/uncertifiable_group_warning.html",
         from_email=settings.EMAIL_FROM,
@@ -834,3 +929,15 @@ def send_uncertified_group_notifications(supportgroup_pk):
         bindings={"group": supportgroup},
         recipients=[*recipients, settings.EMAIL_SUPPORT],
     )
+
+
+@shared_task
+def update_supportgroup_statistics(supportgroup_pk):
+    compute_group_statistics(supportgroup_pk)
+
+
+@post_save_task()
+def generate_supportgroup_og_image(supportgroup_pk, cache_key):
+    supportgroup = SupportGroup.objects.get(pk=supportgroup_pk)
+    if not supportgroup.image:
+        generate_og_image(SupportGroupOGImage(supportgroup), cache_key)
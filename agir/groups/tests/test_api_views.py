@@ -1,6 +1,8 @@
 import uuid
 from unittest.mock import patch
 
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 from rest_framework.test import APITestCase
 
@@ -69,6 +71,22 @@ class GroupDetailAPITestCase(APITestCase):
             self.assertEqual(res.status_code, 200)
             self.assertEqual(res.data.get("membershipType"), membership_type)
 
+    def test_membership_lookups_are_not_repeated(self):
+        self.membership.membership_type = Membership.MEMBERSHIP_TYPE_REFERENT
+        self.membership.save()
+        self.client.force_login(self.person.role)
+
+        with CaptureQueriesContext(connection) as context:
+            res = self.client.get(f"/api/groupes/{self.person_group.pk}/")
+        self.assertEqual(res.status_code, 200)
+
+        membership_queries = [
+            q["sql"]
+            for q in context.captured_queries
+            if "groups_membership" in q["sql"]
+        ]
+        self.assertEqual(len(membership_queries), len(set(membership_queries)))
+
 
 class GroupJoinAPITestCase(APITestCase):
     def setUp(self):
@@ -0,0 +1,64 @@
+from django.test import TestCase
+
+from agir.groups.actions.automatic_memberships import (
+    apply_changes,
+    maj_boucle_par_tag,
+)
+from agir.groups.models import SupportGroup, Membership
+from agir.notifications.models import Subscription
+from agir.people.models import Person, PersonTag
+
+
+class ApplyChangesTestCase(TestCase):
+    def setUp(self):
+        self.boucle = SupportGroup.objects.create(
+            name="Boucle", type=SupportGroup.TYPE_BOUCLE_DEPARTEMENTALE
+        )
+        self.people = [
+            Person.objects.create_person(f"{i}@agir.local", is_political_support=False)
+            for i in range(3)
+        ]
+        self.ancien = Person.objects.create_person("ancien@agir.local")
+        Membership.objects.create(supportgroup=self.boucle, person=self.ancien)
+        Membership.objects.create(supportgroup=self.boucle, person=self.people[0])
+
+    def test_synchronise_les_adhesions(self):
+        tag = PersonTag.objects.create(
+            label="Membre boucle départementale 75", description="Tag"
+        )
+        tag.people.add(*self.people)
+        membres, metas = maj_boucle_par_tag("Membre boucle départementale 75")
+        metas[self.people[1].id]["has_finance_managing_privilege"] = True
+
+        self.assertEqual(
+            apply_changes(self.boucle, set(membres), metas, dry_run=True), (2, 2, 1)
+        )
+        self.assertEqual(self.boucle.memberships.count(), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            result = apply_changes(self.boucle, set(membres), metas)
+        self.assertEqual(result, (3, 2, 1))
+
+        memberships = {
+            m.person_id: m for m in self.boucle.memberships.select_related("person")
+        }
+        self.assertCountEqual(memberships, [p.id for p in self.people])
+        for person in self.people:
+            membership = memberships[person.id]
+            self.assertEqual(membership.meta, {"tag_id": tag.id, "description": "Tag"})
+            self.assertTrue(membership.personal_information_sharing_consent)
+            self.assertTrue(membership.person.subscribed)
+            self.assertTrue(membership.person.is_political_support)
+        self.assertTrue(memberships[self.people[1].id].has_finance_managing_privilege)
+        self.assertFalse(memberships[self.people[2].id].has_finance_managing_privilege)
+
+        self.assertEqual(
+            Subscription.objects.filter(
+                membership=memberships[self.people[1].id]
+            ).count(),
+            len(Subscription.DEFAULT_GROUP_EMAIL_TYPES)
+            + len(Subscription.DEFAULT_GROUP_PUSH_TYPES),
+        )
+
+        # une seconde synchronisation ne change rien
+        self.assertEqual(apply_changes(self.boucle, set(membres), metas), (3, 0, 0))
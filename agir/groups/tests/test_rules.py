@@ -3,6 +3,7 @@ from django.test import TestCase
 
 from agir.groups import rules
 from agir.groups.models import SupportGroup, Membership
+from agir.lib.rules import permission_context
 from agir.people.models import Person
 
 
@@ -218,3 +219,23 @@ class SupportGroupPermissionsTestCase(TestCase):
         self.assertFalse(
             self.referent.has_perm("groups.add_referent_to_supportgroup", self.group)
         )
+
+    def test_memberships_are_loaded_once_per_permission_context(self):
+        self.membership2.membership_type = Membership.MEMBERSHIP_TYPE_REFERENT
+        self.membership2.save()
+        role = self.person.role
+
+        with permission_context():
+            with self.assertNumQueries(1):
+                self.assertFalse(rules.is_at_least_manager_for_group(role, self.group1))
+                self.assertTrue(rules.is_at_least_manager_for_group(role, self.group2))
+                self.assertTrue(rules.is_at_least_referent_for_group(role, self.group2))
+                self.assertTrue(rules.is_group_member(role, self.group1))
+                self.assertTrue(
+                    role.has_perm("groups.change_supportgroup", self.group2)
+                )
+
+            # toute modification d'une adhésion vide le contexte
+            self.membership1.membership_type = Membership.MEMBERSHIP_TYPE_MANAGER
+            self.membership1.save()
+            self.assertTrue(rules.is_at_least_manager_for_group(role, self.group1))
@@ -0,0 +1,84 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from agir.events.models import Event, OrganizerConfig, RSVP
+from agir.groups.models import SupportGroup, Membership, SupportGroupDailyStatistics
+from agir.groups.statistics import compute_group_statistics, get_group_statistics
+from agir.msgs.models import SupportGroupMessage
+from agir.people.models import Person
+
+
+class GroupStatisticsTestCase(TestCase):
+    def setUp(self):
+        self.group = SupportGroup.objects.create(name="Groupe")
+        self.referent = Person.objects.create_insoumise(
+            "referent@example.com", create_role=True
+        )
+        self.follower = Person.objects.create_insoumise("abonne@example.com")
+        Membership.objects.create(
+            person=self.referent,
+            supportgroup=self.group,
+            membership_type=Membership.MEMBERSHIP_TYPE_REFERENT,
+        )
+        Membership.objects.create(
+            person=self.follower,
+            supportgroup=self.group,
+            membership_type=Membership.MEMBERSHIP_TYPE_FOLLOWER,
+        )
+        SupportGroupMessage.objects.create(
+            supportgroup=self.group, author=self.referent, text="Bonjour"
+        )
+
+        now = timezone.now()
+        self.event = Event.objects.create(
+            name="Réunion",
+            start_time=now - timedelta(days=2),
+            end_time=now - timedelta(days=2) + timedelta(hours=2),
+        )
+        OrganizerConfig.objects.create(
+            event=self.event, person=self.referent, as_group=self.group
+        )
+        for person in (self.referent, self.follower):
+            RSVP.objects.create(event=self.event, person=person)
+
+        # un événement à venir n'est pas compté
+        Event.objects.create(
+            name="Prochaine réunion",
+            start_time=now + timedelta(days=2),
+            end_time=now + timedelta(days=2, hours=2),
+        ).organizer_configs.create(person=self.referent, as_group=self.group)
+
+    def test_statistics_are_computed_from_daily_snapshots(self):
+        compute_group_statistics(self.group.id)
+        self.assertTrue(
+            SupportGroupDailyStatistics.objects.filter(supportgroup=self.group).exists()
+        )
+
+        statistics = get_group_statistics(self.group, "ever")
+
+        self.assertEqual(statistics["events"]["count"], 1)
+        self.assertEqual(statistics["events"]["averageParticipants"], 2)
+        self.assertEqual(statistics["events"]["totalDuration"], timedelta(hours=2))
+        self.assertEqual(statistics["members"], {"active": 1, "followers": 1})
+        self.assertEqual(statistics["messages"], {"count": 1})
+
+    def test_statistics_can_be_filtered_by_period(self):
+        compute_group_statistics(self.group.id)
+
+        with self.assertNumQueries(1):
+            statistics = get_group_statistics(self.group, "last_year")
+        self.assertEqual(statistics["events"]["count"], 0)
+        self.assertEqual(statistics["members"], {"active": 0, "followers": 0})
+
+    def test_api_view_uses_snapshots(self):
+        compute_group_statistics(self.group.id)
+        self.client.force_login(self.referent.role)
+
+        res = self.client.get(
+            reverse("api_group_statistics", kwargs={"pk": self.group.pk})
+        )
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data["members"], {"active": 1, "followers": 1})
@@ -5,12 +5,14 @@ from django.db.models import Q
 from django.core import mail
 from django.db.models import Q
 from django.shortcuts import reverse as dj_reverse
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 from django.utils import timezone
 
 from agir.lib.tests.mixins import create_group, create_location
 from agir.events.models import Event, OrganizerConfig
 from agir.people.models import Person
+from agir.msgs.models import SupportGroupMessage, SupportGroupMessageComment
 from agir.notifications.models import Subscription
 from ...activity.models import Activity
 from .. import tasks
@@ -198,6 +200,61 @@ class NotificationTasksTestCase(TestCase):
                 "/groupes/{}".format(self.group.pk), text, "group link not in message"
             )
 
+    def test_message_notification_mail(self):
+        message = SupportGroupMessage.objects.create(
+            author=self.creator, supportgroup=self.group, text="Bonjour à tous"
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            tasks.send_message_notification_email(message.pk)
+
+        self.assertCountEqual(
+            [m.recipients()[0] for m in mail.outbox],
+            [self.member1.email, self.member2.email],
+        )
+        self.assertIn("Bonjour à tous", mail.outbox[0].body)
+
+    @override_settings(
+        CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+    )
+    def test_comment_notifications_are_grouped(self):
+        cache.clear()
+        message = SupportGroupMessage.objects.create(
+            author=self.creator, supportgroup=self.group, text="Message"
+        )
+        first_comment = SupportGroupMessageComment.objects.create(
+            author=self.member1, message=message, text="Premier commentaire"
+        )
+        SupportGroupMessageComment.objects.create(
+            author=self.member1, message=message, text="Second commentaire"
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            tasks.send_comment_notification_email(first_comment.pk)
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].recipients(), [self.creator.email])
+        self.assertIn("Premier commentaire", mail.outbox[0].body)
+        self.assertIn("Second commentaire", mail.outbox[0].body)
+
+        # les commentaires déjà notifiés ne le sont pas une seconde fois
+        with self.captureOnCommitCallbacks(execute=True):
+            tasks.send_comment_notification_email(first_comment.pk)
+        self.assertEqual(len(mail.outbox), 1)
+
+        # un commentaire antérieur à la dernière notification, mais qui n'y figurait pas, est notifié
+        late_comment = SupportGroupMessageComment.objects.create(
+            author=self.member1, message=message, text="Commentaire en retard"
+        )
+        SupportGroupMessageComment.objects.filter(pk=late_comment.pk).update(
+            created=first_comment.created
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            tasks.send_comment_notification_email(first_comment.pk)
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertIn("Commentaire en retard", mail.outbox[1].body)
+        self.assertNotIn("Premier commentaire", mail.outbox[1].body)
+
     def test_changed_group_activity(self):
         tasks.send_support_group_changed_notification(
             self.group.pk, ["name", "contact_name", "description"]
@@ -4,8 +4,17 @@ from django.test import TestCase
 from django.utils import timezone
 
 from agir.people.models import Person
-from ..models import SupportGroup, Membership, SupportGroupSubtype
-from ..utils.certification import check_certification_criteria
+from ..models import (
+    SupportGroup,
+    Membership,
+    SupportGroupSubtype,
+    SupportGroupCertificationStatus,
+)
+from ..proxys import UncertifiableGroup
+from ..utils.certification import (
+    check_certification_criteria,
+    update_certification_statuses,
+)
 from ..utils.supportgroup import (
     DAYS_SINCE_GROUP_CREATION_LIMIT,
     DAYS_SINCE_LAST_EVENT_LIMIT,
@@ -244,3 +253,36 @@ class SupportGroupCertificationCriteriaTestCase(TestCase):
         second_group.subtypes.add(local_subtype)
         criteria = check_certification_criteria(local_group)
         self.assertFalse(criteria["exclusivity"])
+
+
+class SupportGroupCertificationStatusTestCase(TestCase):
+    def setUp(self):
+        self.group = SupportGroup.objects.create(
+            name="Certifié",
+            type=SupportGroup.TYPE_LOCAL_GROUP,
+            certification_date=timezone.now(),
+        )
+        self.uncertified_group = SupportGroup.objects.create(
+            name="Non certifié", type=SupportGroup.TYPE_LOCAL_GROUP
+        )
+
+    def test_statuses_are_computed_for_certified_groups(self):
+        statuses = update_certification_statuses()
+
+        self.assertEqual([s.supportgroup_id for s in statuses], [self.group.id])
+        status = SupportGroupCertificationStatus.objects.get(supportgroup=self.group)
+        self.assertFalse(status.certifiable)
+        self.assertEqual(status.criteria, check_certification_criteria(self.group))
+        self.assertIsNone(status.warning_date)
+        self.assertQuerysetEqual(
+            UncertifiableGroup.objects.all(), [self.group.id], transform=lambda g: g.id
+        )
+
+    def test_statuses_of_uncertified_groups_are_removed(self):
+        update_certification_statuses()
+        self.group.certification_date = None
+        self.group.save()
+
+        self.assertEqual(update_certification_statuses(), [])
+        self.assertFalse(SupportGroupCertificationStatus.objects.exists())
+        self.assertFalse(UncertifiableGroup.objects.exists())
@@ -3,7 +3,8 @@ from unittest import mock
 from unittest.mock import patch
 
 from django.core import mail
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 from django.utils import timezone
 from rest_framework import status
 from rest_framework.reverse import reverse
@@ -504,3 +505,32 @@ class GroupAPIUpcomingEventViewTestCase(SupportGroupMixin, TestCase):
         # upcoming events size must be 1
         self.assertEqual(self.manager_group.organized_events.upcoming().count(), 1)
         self.assertEqual(len(response.data), 1)
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class SupportGroupSitemapTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.group = SupportGroup.objects.create(name="Groupe")
+        self.url = reverse(
+            "django.contrib.sitemaps.views.sitemap", kwargs={"section": "groups"}
+        )
+
+    def test_sitemap_is_cached_until_a_group_changes(self):
+        response = self.client.get(self.url)
+        self.assertContains(response, self.group.pk)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertContains(response, self.group.pk)
+
+        other_group = SupportGroup.objects.create(name="Autre groupe")
+        response = self.client.get(self.url)
+        self.assertContains(response, other_group.pk)
+
+        self.group.published = False
+        self.group.save()
+        response = self.client.get(self.url)
+        self.assertNotContains(response, self.group.pk)
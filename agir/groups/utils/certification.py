@@ -1,10 +1,16 @@
 from datetime import timedelta
 
+from django.db import transaction
 from django.db.models import Count
 from django.utils import timezone
 
 from agir.events.models import Event
-from agir.groups.models import Membership, SupportGroup, SupportGroupSubtype
+from agir.groups.models import (
+    Membership,
+    SupportGroup,
+    SupportGroupSubtype,
+    SupportGroupCertificationStatus,
+)
 from agir.lib.geo import FRENCH_COUNTRY_CODES
 
 CERTIFICATION_CRITERIA_LABELS = {
@@ -329,6 +335,10 @@ def check_certification_criteria(group, with_labels=False):
     if not with_labels:
         return {key: val is not False for key, val in criteria.items()}
 
+    return label_certification_criteria(criteria)
+
+
+def label_certification_criteria(criteria):
     return {
         key: {**labels, "value": criteria.get(key)}
         for key, labels in CERTIFICATION_CRITERIA_LABELS.items()
@@ -336,6 +346,72 @@ def check_certification_criteria(group, with_labels=False):
     }
 
 
+def compute_certification_statuses(qs=None):
+    """Vérifie les critères de certification d'un ensemble de groupes
+
+    Les critères de tous les groupes sont calculés par une seule requête, et les dates des derniers
+    avertissements de décertification par une seconde requête.
+
+    :param qs: les groupes à vérifier, par défaut l'ensemble des groupes locaux certifiés actifs
+    :return: la liste des statuts (non enregistrés) des groupes
+    """
+    if qs is None:
+        qs = (
+            SupportGroup.objects.active()
+            .certified()
+            .filter(type=SupportGroup.TYPE_LOCAL_GROUP)
+        )
+
+    supportgroup_ids = list(qs.values_list("id", flat=True))
+    if not supportgroup_ids:
+        return []
+
+    params = get_params()
+    params["supportgroup_ids"] = supportgroup_ids
+    warning_dates = dict(
+        SupportGroup.objects.filter(id__in=supportgroup_ids)
+        .with_certification_warning()
+        .values_list("id", "warning_date")
+    )
+
+    return [
+        SupportGroupCertificationStatus(
+            supportgroup_id=group.id,
+            checked=params["now"],
+            certifiable=group.certifiable,
+            criteria={
+                key: getattr(group, f"cc_{key}")
+                for key in CERTIFICATION_CRITERIA_LABELS
+            },
+            warning_date=warning_dates.get(group.id),
+        )
+        for group in SupportGroup.objects.raw(SQL_QUERY, params=params)
+    ]
+
+
+def update_certification_statuses(qs=None):
+    """Vérifie les critères de certification d'un ensemble de groupes et enregistre le résultat
+
+    Sans argument, tous les groupes locaux certifiés actifs sont vérifiés, et les statuts des
+    groupes qui ne le sont plus sont supprimés.
+
+    :param qs: les groupes à vérifier
+    :return: la liste des statuts enregistrés
+    """
+    statuses = compute_certification_statuses(qs)
+
+    with transaction.atomic():
+        if qs is None:
+            SupportGroupCertificationStatus.objects.all().delete()
+        else:
+            SupportGroupCertificationStatus.objects.filter(
+                supportgroup_id__in=[s.supportgroup_id for s in statuses]
+            ).delete()
+        SupportGroupCertificationStatus.objects.bulk_create(statuses)
+
+    return statuses
+
+
 def check_single_group_and_queryset_criterion_match(qs):
     params = get_params(qs)
     qs = certification_criteria_for_queryset(qs)
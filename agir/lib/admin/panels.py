@@ -19,6 +19,8 @@ from django.utils.translation import gettext_lazy as _
 from django.views import View
 from django.views.generic.base import ContextMixin
 
+from agir.lib.pagination import EstimatedCountPaginator
+
 
 class CenterOnFranceMixin:
     # for some reason it has to be in projected coordinates
@@ -51,6 +53,45 @@ class DisplayContactPhoneMixin:
     display_contact_phone.admin_order_field = "contact_phone"
 
 
+class LargeChangeListMixin:
+    """Mixin pour les listes d'administration des très grandes tables
+
+    - le nombre total de résultats est estimé au-delà d'un seuil, et n'est pas recalculé sans
+      filtre (voir `EstimatedCountPaginator`) ;
+    - les actions marquées `select_across` appliquées sans sélection portent sur l'ensemble des
+      résultats filtrés : elles reçoivent le queryset filtré de la liste, plutôt que la liste
+      de tous les identifiants concernés.
+    """
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    # valeur factice de la sélection : elle n'est pas utilisée lorsque `select_across` est activé
+    SELECT_ACROSS_PLACEHOLDER = "*"
+
+    def is_select_across_request(self, request):
+        if request.method != "POST" or not request.POST.get("action"):
+            return False
+
+        if request.POST.get("select_across") == "1":
+            return True
+
+        if request.POST.getlist(helpers.ACTION_CHECKBOX_NAME):
+            return False
+
+        action = self.get_actions(request).get(request.POST["action"])
+        return action is not None and getattr(action[0], "select_across", False)
+
+    def changelist_view(self, request, extra_context=None):
+        if self.is_select_across_request(request):
+            post = request.POST.copy()
+            post["select_across"] = "1"
+            post.setlist(helpers.ACTION_CHECKBOX_NAME, [self.SELECT_ACROSS_PLACEHOLDER])
+            request.POST = post
+
+        return super().changelist_view(request, extra_context)
+
+
 class AdminViewMixin(ContextMixin, View):
     model_admin = None
 
@@ -190,30 +190,52 @@ anciennes_regions_par_code = {r.id: r for r in anciennes_regions}
 _CORSE_RE = re.compile("[ABab]")
 
 
-def filtre_departements(*codes):
-    return reduce(lambda a, b: a | b, (filtre_departement(code) for code in codes))
+# Index des départements par préfixe de code postal, calculé une seule fois à l'import
+# Les codes postaux d'outre-mer sont identifiés par leurs trois premiers chiffres, ceux de
+# métropole par leurs deux premiers. On retourne toujours par défaut le premier département
+# Corse pour les codes postaux commençant par 20.
+departements_par_prefixe_code_postal: dict[str, Departement] = {
+    **{d.id: d for d in departements if len(d.id) == 2 or d.id.startswith("97")},
+    "20": departements_par_code["2A"],
+}
 
 
-def filtre_departement(code):
+def _code_departement(code):
     if code in departements_par_code:
-        return Q(location_country__in=FRANCE_COUNTRY_CODES) & (
-            Q(
-                location_departement_id="",
-                location_zip__startswith=_CORSE_RE.sub("0", code),
+        return code
+
+    if _normalize_entity_name(code) in departements_par_nom:
+        return departements_par_nom[_normalize_entity_name(code)].id
+
+    raise ValueError("Département inconnu")
+
+
+def filtre_departements(*codes):
+    """Filtre les objets localisés dans l'un des départements indiqués
+
+    Le code département enregistré (`location_departement_id`) est utilisé en priorité, ce qui
+    permet une simple comparaison d'égalité indexée. Le filtrage par préfixe de code postal
+    n'est conservé que pour les objets dont le département n'a pas encore été renseigné.
+    """
+    codes = list(dict.fromkeys(_code_departement(code) for code in codes))
+
+    return Q(location_country__in=FRANCE_COUNTRY_CODES) & (
+        Q(location_departement_id__in=codes)
+        | (
+            Q(location_departement_id="")
+            & reduce(
+                or_,
+                (
+                    Q(location_zip__startswith=prefixe)
+                    for prefixe in dict.fromkeys(_CORSE_RE.sub("0", c) for c in codes)
+                ),
             )
-            | Q(location_departement_id=code)
         )
+    )
 
-    elif _normalize_entity_name(code) in departements_par_nom:
-        return Q(
-            location_country__in=FRANCE_COUNTRY_CODES,
-            location_zip__startswith=_CORSE_RE.sub(
-                "0", departements_par_nom[_normalize_entity_name(code)].id
-            ),
-        )
 
-    else:
-        raise ValueError("Département inconnu")
+def filtre_departement(code):
+    return filtre_departements(code)
 
 
 def filtre_region(code):
@@ -222,20 +244,20 @@ def filtre_region(code):
             raise ValueError(f"Région '{code}' inconnue")
         code = regions_par_nom[_normalize_entity_name(code)].id
 
-    return reduce(or_, (filtre_departement(d.id) for d in departements if d.id == code))
+    return filtre_departements(*(d.id for d in departements if d.code_region == code))
 
 
-def code_postal_vers_code_departement(zipcode: str) -> str:
+def departement_par_code_postal(zipcode: str):
+    """Retourne le département correspondant au code postal, ou `None`"""
     if zipcode.startswith("97"):
-        code = zipcode[:3]
-    # on retourne toujours par défaut le premier département Corse
-    elif zipcode[:2] == "20":
-        code = "2A"
-    else:
-        code = zipcode[:2]
+        return departements_par_prefixe_code_postal.get(zipcode[:3])
+    return departements_par_prefixe_code_postal.get(zipcode[:2])
 
-    if code in departements_par_code:
-        return code
+
+def code_postal_vers_code_departement(zipcode: str) -> str:
+    departement = departement_par_code_postal(zipcode)
+    if departement is not None:
+        return departement.id
     return ""
 
 
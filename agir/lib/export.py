@@ -20,6 +20,22 @@ def dicts_to_csv_lines(iterator, fieldnames):
         buffer.seek(0)
 
 
+def rows_to_csv_lines(iterator, headers=None):
+    buffer = StringIO()
+    w = csv.writer(buffer)
+
+    for row in chain((headers,) if headers is not None else (), iterator):
+        chars = w.writerow(row)
+        buffer.seek(0)
+
+        while chars:
+            content = buffer.read(chars)
+            chars -= len(content)
+            yield content
+
+        buffer.seek(0)
+
+
 def snakecase_to_camelcase(identifier):
     components = identifier.split("_")
     return components[0] + "".join(word.title() for word in components[1:])
@@ -1,19 +1,24 @@
 import dataclasses
 import re
+from contextlib import contextmanager
 from functools import wraps
 from typing import Any, Optional
 
 import gspread
 import pandas as pd
 from django.conf import settings
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from gspread.utils import ValueInputOption, rowcol_to_a1, ValueRenderOption
 
+from agir.api.redis import get_auth_redis_client
 from agir.lib.celery import retriable_task
 
 GOOGLE_SHEET_REGEX = r"^https://docs.google.com/spreadsheets/d/(?P<sid>[A-Za-z0-9_-]{40,})/.*[?#&]gid=(?P<gid>[0-9]+)"
 GOOGLE_SHEET_TEMPLATE = "https://docs.google.com/spreadsheets/d/{sid}/edit#gid={gid}"
 MAX_CHUNK_SIZE = 100_000
+HEADERS_CACHE_TIMEOUT = 600
+SYNC_DELAY = 15
 
 
 class _TemporaryGspreadError(Exception):
@@ -75,21 +80,83 @@ def parse_sheet_link(link: str) -> Optional[GoogleSheetId]:
     return GoogleSheetId(sid, gid)
 
 
+_sheet_client = None
+
+# client utilisé à la place de gspread, par exemple dans les tests
+_override_sheet_client = None
+
+
+def get_sheet_client():
+    """Renvoie un client gspread authentifié
+
+    Le client est partagé au sein du processus afin d'éviter de refaire l'authentification
+    du compte de service à chaque opération sur une feuille.
+    """
+    global _sheet_client
+
+    if _override_sheet_client is not None:
+        return _override_sheet_client
+
+    if _sheet_client is None:
+        _sheet_client = gspread.service_account(settings.GCE_KEY_FILE)
+
+    return _sheet_client
+
+
+@contextmanager
+def using_sheet_client(client):
+    """Remplace le client gspread par le client indiqué le temps du bloc
+
+    Le client doit implémenter la partie de l'API de gspread utilisée par ce module.
+    """
+    global _override_sheet_client
+    previous_client = _override_sheet_client
+    _override_sheet_client = client
+
+    try:
+        yield client
+    finally:
+        _override_sheet_client = previous_client
+
+
 def open_sheet(sheet: GoogleSheetId):
-    gc = gspread.service_account(settings.GCE_KEY_FILE)
-    spreadsheet = gc.open_by_key(sheet.sid)
+    spreadsheet = get_sheet_client().open_by_key(sheet.sid)
     sheet = spreadsheet.get_worksheet_by_id(sheet.gid)
 
     return sheet
 
 
+def _headers_cache_key(sheet_id: GoogleSheetId):
+    return f"GoogleSheet:{sheet_id.sid}:{sheet_id.gid}:headers"
+
+
+def get_sheet_headers(sheet_id: GoogleSheetId, sheet=None):
+    """Renvoie la ligne d'en-têtes de la feuille, en utilisant le cache si possible"""
+    headers = cache.get(_headers_cache_key(sheet_id))
+
+    if headers is None:
+        if sheet is None:
+            sheet = open_sheet(sheet_id)
+        headers = sheet.row_values(1)
+        set_sheet_headers(sheet_id, headers)
+
+    return headers
+
+
+def set_sheet_headers(sheet_id: GoogleSheetId, headers):
+    cache.set(
+        _headers_cache_key(sheet_id), [str(h) for h in headers], HEADERS_CACHE_TIMEOUT
+    )
+
+
 def clear_sheet(sheet_id: GoogleSheetId):
     sheet = open_sheet(sheet_id)
+    cache.delete(_headers_cache_key(sheet_id))
     return sheet.clear()
 
 
 def check_sheet_permissions(sheet: GoogleSheetId):
-    gc = gspread.service_account(settings.GCE_KEY_FILE)
+    gc = get_sheet_client()
 
     try:
         spreadsheet = gc.open_by_key(sheet.sid)
@@ -146,6 +213,8 @@ def copy_array_to_sheet(sheet_id: GoogleSheetId, values):
         )
         results.append(result)
 
+    set_sheet_headers(sheet_id, values[0])
+
     return results
 
 
@@ -156,67 +225,103 @@ def copy_records_to_sheet(sheet_id: GoogleSheetId, records):
 
 
 def add_row_to_sheet(sheet_id: GoogleSheetId, values: dict[str, Any], id_column=None):
-    if id_column is not None:
-        assert id_column in values
-    sheet = open_sheet(sheet_id)
+    return add_rows_to_sheet(sheet_id, [values], id_column=id_column)
+
+
+def add_rows_to_sheet(
+    sheet_id: GoogleSheetId, rows: list[dict[str, Any]], id_column=None
+):
+    """Ajoute plusieurs lignes à la feuille en un nombre constant d'appels à l'API
 
-    sheet_headers = sheet.row_values(1)
+    Les colonnes manquantes sont ajoutées à la fin de la feuille. Si `id_column` est indiqué, les lignes
+    dont l'identifiant se trouve déjà dans la feuille sont mises à jour plutôt qu'ajoutées.
 
-    headers_map = {i: h for i, h in enumerate(sheet_headers) if h in values}
+    :param sheet_id: la feuille à modifier
+    :param rows: les lignes à ajouter, sous la forme de dictionnaires associant en-têtes et valeurs
+    :param id_column: l'en-tête de la colonne identifiant chaque ligne
+    """
+    if not rows:
+        return
+
+    if id_column is not None:
+        assert all(id_column in values for values in rows)
+
+    sheet = open_sheet(sheet_id)
+    sheet_headers = get_sheet_headers(sheet_id, sheet)
 
     # itérer les clés pour préserver l'ordre des nouvelles colonnes
-    missing_columns = [h for h in values.keys() if h not in sheet_headers]
+    missing_columns = list(
+        dict.fromkeys(h for values in rows for h in values if h not in sheet_headers)
+    )
+    headers = [*sheet_headers, *missing_columns]
 
     if missing_columns:
-        if sheet.col_count < len(sheet_headers) + len(missing_columns):
-            sheet.resize(
-                rows=sheet.row_count, cols=len(sheet_headers) + len(missing_columns)
-            )
+        if sheet.col_count < len(headers):
+            sheet.resize(rows=sheet.row_count, cols=len(headers))
 
         first_new_col = len(sheet_headers) + 1
-        last_new_col = len(sheet_headers) + len(missing_columns)
-
-        headers_map.update(
-            {
-                i: h
-                for h, i in zip(
-                    missing_columns,
-                    range(first_new_col - 1, last_new_col),
-                )
-            }
-        )
+        last_new_col = len(headers)
 
         header_range = (
             f"{rowcol_to_a1(1, first_new_col)}:{rowcol_to_a1(1, last_new_col)}"
         )
         sheet.update(header_range, [missing_columns])
+        set_sheet_headers(sheet_id, headers)
 
     # la valeur par défaut est une chaîne vide plutôt que None car sinon gspread
     # n'écrase pas une potentielle valeur existante.
-    insert = [
-        values[headers_map[i]] if i in headers_map else ""
-        for i in range(len(sheet_headers) + len(missing_columns))
-    ]
+    inserts = [[values.get(h, "") for h in headers] for values in rows]
 
     if id_column is not None:
-        id_pos = next(i for i, c in headers_map.items() if c == id_column)
+        id_pos = headers.index(id_column)
         id_values = sheet.col_values(
             id_pos + 1, value_render_option=ValueRenderOption.unformatted
         )[1:]
+        # les identifiants sont comparés sous forme de texte, la feuille pouvant les avoir convertis
+        existing_rows = {str(v): i + 2 for i, v in enumerate(id_values)}
+
+        updates = []
+        new_inserts = []
+        for values, insert in zip(rows, inserts):
+            if str(values[id_column]) in existing_rows:
+                existing_row = existing_rows[str(values[id_column])]
+                first_cell = rowcol_to_a1(existing_row, 1)
+                last_cell = rowcol_to_a1(existing_row, len(insert))
+                updates.append(
+                    {"range": f"{first_cell}:{last_cell}", "values": [insert]}
+                )
+            else:
+                new_inserts.append(insert)
 
-        try:
-            existing_row = id_values.index(values[id_column]) + 2
-        except ValueError:
-            pass
-        else:
-            first_cell = rowcol_to_a1(existing_row, 1)
-            last_cell = rowcol_to_a1(existing_row, len(insert))
-            sheet.update(f"{first_cell}:{last_cell}", [insert])
-            return
-
-    sheet.append_row(
-        insert,
-        value_input_option=ValueInputOption.raw,
-        insert_data_option="INSERT_ROWS",
-        table_range="A1",
-    )
+        if updates:
+            sheet.batch_update(updates, value_input_option=ValueInputOption.raw)
+        inserts = new_inserts
+
+    if inserts:
+        sheet.append_rows(
+            inserts,
+            value_input_option=ValueInputOption.raw,
+            insert_data_option="INSERT_ROWS",
+            table_range="A1",
+        )
+
+
+def schedule_sheet_sync(task, *args, key, delay=SYNC_DELAY):
+    """Programme l'exécution de `task` en regroupant les demandes rapprochées
+
+    Tant qu'une exécution est programmée pour la clé `key`, les demandes suivantes sont ignorées :
+    la tâche doit donc traiter toutes les modifications en attente, et appeler `release_sheet_sync`
+    avant de commencer son traitement pour que les modifications suivantes soient prises en compte.
+
+    :param task: la tâche celery à exécuter
+    :param key: la clé identifiant la synchronisation
+    :param delay: le délai, en secondes, pendant lequel les demandes sont regroupées
+    """
+    if get_auth_redis_client().set(
+        f"GoogleSheetSync:{key}:scheduled", 1, nx=True, ex=delay * 10
+    ):
+        task.apply_async(args, countdown=delay)
+
+
+def release_sheet_sync(key):
+    get_auth_redis_client().delete(f"GoogleSheetSync:{key}:scheduled")
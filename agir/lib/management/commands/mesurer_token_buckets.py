@@ -0,0 +1,84 @@
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management import BaseCommand
+
+from agir.lib.token_bucket import TokenBucket, has_tokens
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure le nombre de vérifications de limites de débit par seconde sur le serveur Redis "
+        "configuré, en comparant des vérifications successives de deux buckets, une vérification "
+        "groupée, et une vérification groupée avec pré-filtrage local. À lancer sur un Redis local."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-t",
+            "--threads",
+            type=int,
+            default=8,
+            help="Le nombre de threads effectuant des vérifications en parallèle.",
+        )
+        parser.add_argument(
+            "-d",
+            "--duration",
+            type=float,
+            default=5,
+            help="La durée de chaque mesure, en secondes.",
+        )
+        parser.add_argument(
+            "-i",
+            "--identifiers",
+            type=int,
+            default=100,
+            help="Le nombre d'identifiants distincts vérifiés.",
+        )
+
+    def measure(self, check, threads, duration, identifiers):
+        def worker(n):
+            count = 0
+            end = time.monotonic() + duration
+            while time.monotonic() < end:
+                check(f"{n}:{count % identifiers}")
+                count += 1
+            return count
+
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            return sum(executor.map(worker, range(threads))) / duration
+
+    def handle(self, *args, threads, duration, identifiers, **options):
+        # des noms uniques pour ne pas être gêné par les clés d'une mesure précédente
+        prefix = f"Benchmark:{uuid.uuid4().hex[:8]}"
+
+        def buckets(name, local_precheck=False):
+            return (
+                TokenBucket(f"{prefix}:{name}:email", 5, 600, local_precheck),
+                TokenBucket(f"{prefix}:{name}:ip", 5, 120, local_precheck),
+            )
+
+        sequential_email, sequential_ip = buckets("sequential")
+        grouped_email, grouped_ip = buckets("grouped")
+        local_email, local_ip = buckets("local", local_precheck=True)
+
+        measures = [
+            (
+                "deux appels successifs",
+                lambda id: sequential_email.has_tokens(id)
+                and sequential_ip.has_tokens(id),
+            ),
+            (
+                "un appel groupé",
+                lambda id: has_tokens((grouped_email, id), (grouped_ip, id)),
+            ),
+            (
+                "un appel groupé avec pré-filtrage local",
+                lambda id: has_tokens((local_email, id), (local_ip, id)),
+            ),
+        ]
+
+        for label, check in measures:
+            rate = self.measure(check, threads, duration, identifiers)
+            self.stdout.write(f"{label} : {rate:.0f} vérifications par seconde")
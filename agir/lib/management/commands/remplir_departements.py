@@ -0,0 +1,63 @@
+from django.apps import apps
+from django.core.management import BaseCommand
+from django.db import transaction
+
+from agir.lib.data import departements_par_prefixe_code_postal, FRANCE_COUNTRY_CODES
+from agir.lib.models import LocationMixin
+
+# Les codes postaux corses commencent tous par 20, que la commune soit en Corse-du-Sud ou en
+# Haute-Corse : le département ne peut pas être déduit du code postal seul.
+PREFIXES_AMBIGUS = {"20"}
+
+
+class Command(BaseCommand):
+    help = (
+        "Renseigne le code département des objets localisés pour lesquels il est manquant, "
+        "à partir de leur code postal. Les codes postaux corses, qui ne permettent pas de "
+        "distinguer les deux départements, sont ignorés."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-n",
+            "--dry-run",
+            action="store_true",
+            dest="dry_run",
+            default=False,
+            help="Compte les objets concernés sans les modifier.",
+        )
+
+    def handle(self, *args, dry_run, **options):
+        models = [
+            model
+            for model in apps.get_models()
+            if issubclass(model, LocationMixin) and not model._meta.proxy
+        ]
+
+        for model in models:
+            qs = model._base_manager.filter(
+                location_departement_id="",
+                location_country__in=FRANCE_COUNTRY_CODES,
+            )
+            total = 0
+
+            # une requête par préfixe de code postal, plutôt qu'un traitement ligne par ligne
+            with transaction.atomic():
+                for (
+                    prefixe,
+                    departement,
+                ) in departements_par_prefixe_code_postal.items():
+                    if prefixe in PREFIXES_AMBIGUS:
+                        continue
+
+                    prefix_qs = qs.filter(
+                        location_zip__regex=rf"^{prefixe}[0-9]{{{5 - len(prefixe)}}}$"
+                    )
+                    if dry_run:
+                        total += prefix_qs.count()
+                    else:
+                        total += prefix_qs.update(
+                            location_departement_id=departement.id
+                        )
+
+            self.stdout.write(f"{model._meta.label} : {total} objet(s)")
@@ -0,0 +1,16 @@
+from agir.lib.rules import permission_context
+
+
+class PermissionContextMiddleware:
+    """Active un contexte de permission pour chaque requête
+
+    Les prédicats de permission évalués pendant la requête partagent ainsi les mêmes données
+    (voir `agir.lib.rules.PermissionContext`).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with permission_context():
+            return self.get_response(request)
@@ -144,17 +144,14 @@ class SimpleLocationMixin(models.Model):
             return data.departements_par_code[code_departement].nom
 
     def get_region(self, ancienne=False):
-        if self.location_country in FRANCE_COUNTRY_CODES and RE_FRENCH_ZIPCODE.match(
-            self.location_zip
-        ):
-            code_departement = code_postal_vers_code_departement(self.location_zip)
+        code_departement = self.get_departement()
 
-            if code_departement:
-                departement = departements_par_code[code_departement]
+        if code_departement:
+            departement = departements_par_code[code_departement]
 
-                if ancienne:
-                    return departement.nom_ancienne_region
-                return departement.nom_region
+            if ancienne:
+                return departement.nom_ancienne_region
+            return departement.nom_region
 
         return ""
 
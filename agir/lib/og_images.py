@@ -0,0 +1,213 @@
+"""Images Open Graph des pages d'événements et de groupes
+
+Les images sont rendues une seule fois par version de l'objet : leur clé dépend de toutes les
+informations affichées (nom, lieu, date, coordonnées de l'illustration), et le rendu est enregistré
+dans le stockage de fichiers sous cette clé. Les requêtes suivantes sont simplement redirigées vers
+le fichier enregistré, avec des en-têtes de cache longs puisque l'URL change avec le contenu.
+
+Tant que la carte de l'emplacement n'a pas été générée, l'image est rendue avec l'illustration par
+défaut et n'est pas enregistrée, pour être recalculée une fois la carte disponible.
+
+Les polices et les images statiques ne sont chargées qu'une fois par processus.
+"""
+
+import os
+import textwrap
+from functools import lru_cache
+from io import BytesIO
+
+from PIL import Image, ImageDraw, ImageFont, ImageOps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseRedirect
+from django.utils.cache import patch_cache_control
+
+from agir.carte.models import StaticMapImage
+from agir.lib.tasks import create_static_map_image_from_coordinates
+
+OG_IMAGE_STATIC_ROOT = os.path.join(
+    settings.BASE_DIR, "front", "static", "front", "og-image"
+)
+OG_IMAGE_STORAGE_ROOT = "og-images"
+
+OG_IMAGE_MAX_AGE = 365 * 24 * 3600
+# l'image provisoire (sans carte) doit être remplacée rapidement
+OG_IMAGE_TEMPORARY_MAX_AGE = 10 * 60
+
+# délai pendant lequel la génération d'une même version n'est pas reprogrammée
+OG_IMAGE_SCHEDULE_TIMEOUT = 24 * 3600
+
+DEFAULT_ILLUSTRATION = "Frame-193.png"
+
+
+@lru_cache(maxsize=None)
+def get_font(size, bold=False):
+    filename = "poppins-bold.ttf" if bold else "Poppins-Medium.ttf"
+    return ImageFont.truetype(
+        os.path.join(OG_IMAGE_STATIC_ROOT, filename),
+        size=size,
+        encoding="utf-8",
+    )
+
+
+@lru_cache(maxsize=None)
+def get_image_from_file(filename):
+    """Renvoie une image statique, partagée entre les rendus : elle ne doit pas être modifiée"""
+    image = Image.open(os.path.join(OG_IMAGE_STATIC_ROOT, filename))
+    image.load()
+    return image
+
+
+@lru_cache(maxsize=None)
+def get_map_marker():
+    return get_image_from_file("map-marker.png").resize((116, 139), Image.LANCZOS)
+
+
+def get_illustration(coordinates):
+    """Renvoie l'illustration correspondant aux coordonnées, et si celle-ci est définitive"""
+    if coordinates is None:
+        return get_image_from_file(DEFAULT_ILLUSTRATION), True
+
+    static_map_image = StaticMapImage.objects.filter(
+        center__dwithin=(coordinates, StaticMapImage.UNIQUE_CENTER_MAX_DISTANCE),
+    ).first()
+
+    if static_map_image is None:
+        create_static_map_image_from_coordinates.delay([coordinates[0], coordinates[1]])
+        return get_image_from_file(DEFAULT_ILLUSTRATION), False
+
+    static_map_image.image.open()
+    map = ImageOps.fit(Image.open(static_map_image.image), (1200, 278))
+
+    # Add marker to static map image
+    icon = get_map_marker()
+    map.paste(icon, (542, 49), icon)
+
+    return map, True
+
+
+def render_og_image(illustration, subtitle, title):
+    image = Image.new("RGB", (1200, 630), "#FFFFFF")
+    draw = ImageDraw.Draw(image)
+
+    # Draw illustration image
+    image.paste(illustration, (0, 0), illustration)
+
+    # Draw subtitle
+    # ex: Paris (75010) - Mercredi 7 Juillet à 19:00
+    draw.text(
+        (108, 315),
+        subtitle,
+        fill=(63, 38, 130, 0),
+        align="left",
+        font=get_font(32, bold=True),
+    )
+
+    # Draw title
+    lines = textwrap.wrap(title.capitalize(), width=36, max_lines=2, placeholder="…")
+    font = get_font(45 if len(lines) > 1 else 56)
+    y = 369
+    for line in lines:
+        draw.text((108, y), line, font=font, fill=(0, 0, 0, 0), align="left")
+        y += 63
+
+    # Draw Action Populaire logo
+    image.paste(get_image_from_file("bande-ap.png"), (0, 535))
+
+    return image
+
+
+class OGImage:
+    """Image Open Graph d'un objet localisé
+
+    Les sous-classes indiquent le type d'objet (`kind`) et le sous-titre affiché. La clé de l'image
+    est fournie par la méthode `get_og_image_cache_key` de l'objet.
+    """
+
+    kind = None
+
+    def __init__(self, obj):
+        self.object = obj
+
+    def get_subtitle(self):
+        raise NotImplementedError()
+
+    def get_title(self):
+        return self.object.name
+
+    def get_cache_key(self):
+        return self.object.get_og_image_cache_key()
+
+    def get_storage_path(self):
+        return f"{OG_IMAGE_STORAGE_ROOT}/{self.kind}/{self.object.pk}/{self.get_cache_key()}.png"
+
+    def exists(self):
+        return default_storage.exists(self.get_storage_path())
+
+    def render(self):
+        """Rend l'image au format PNG, et indique si celle-ci est définitive"""
+        illustration, final = get_illustration(self.object.coordinates)
+        image = render_og_image(illustration, self.get_subtitle(), self.get_title())
+        content = BytesIO()
+        image.save(content, "PNG")
+        return content.getvalue(), final
+
+    def generate(self):
+        """Rend l'image et l'enregistre si elle est définitive
+
+        :return: le contenu PNG, et si l'image a été enregistrée
+        """
+        content, final = self.render()
+        if final:
+            path = self.get_storage_path()
+            if not default_storage.exists(path):
+                default_storage.save(path, ContentFile(content))
+        return content, final
+
+    def get_response(self):
+        if self.exists():
+            response = HttpResponseRedirect(
+                default_storage.url(self.get_storage_path())
+            )
+            final = True
+        else:
+            content, final = self.generate()
+            response = HttpResponse(content, content_type="image/png")
+
+        patch_cache_control(
+            response,
+            public=True,
+            max_age=OG_IMAGE_MAX_AGE if final else OG_IMAGE_TEMPORARY_MAX_AGE,
+        )
+        return response
+
+
+def schedule_og_image_generation(og_image, task):
+    """Programme la génération de l'image avec la tâche indiquée, une seule fois par version
+
+    La génération n'est programmée qu'après la validation de la transaction en cours, pour que la
+    tâche trouve l'objet dans son état enregistré, et ne soit pas programmée en cas d'annulation.
+    """
+    if not settings.OG_IMAGE_BACKGROUND_GENERATION:
+        return
+
+    def schedule():
+        cache_key = og_image.get_cache_key()
+        if cache.add(
+            f"OGImage:{og_image.kind}:{og_image.object.pk}:{cache_key}",
+            True,
+            OG_IMAGE_SCHEDULE_TIMEOUT,
+        ):
+            task.delay(og_image.object.pk, cache_key)
+
+    transaction.on_commit(schedule)
+
+
+def generate_og_image(og_image, cache_key):
+    """Génère l'image si elle correspond toujours à la version demandée et n'existe pas encore"""
+    if og_image.get_cache_key() != cache_key or og_image.exists():
+        return
+    og_image.generate()
@@ -1,6 +1,9 @@
+import json
 from collections import OrderedDict
 
 from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import QuerySet
 from django.utils.functional import cached_property
 from django.utils.translation import gettext_lazy as _
 from rest_framework.pagination import PageNumberPagination
@@ -14,6 +17,75 @@ class CachedCountPaginator(Paginator):
         return self.object_list.values("pk").count()
 
 
+def estimate_count(queryset):
+    """Estime le nombre de lignes d'un queryset à partir des statistiques de PostgreSQL
+
+    Pour une table non filtrée, on utilise `pg_class.reltuples`, et sinon l'estimation du
+    planificateur obtenue avec `EXPLAIN`. Renvoie `None` si aucune estimation n'est disponible.
+    """
+    connection = connections[queryset.db]
+
+    with connection.cursor() as cursor:
+        if not queryset.query.where and not queryset.query.distinct:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+            # reltuples vaut -1 (ou 0) pour une table jamais analysée
+            if row is not None and row[0] > 0:
+                return row[0]
+
+        sql, params = queryset.values("pk").query.sql_with_params()
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    try:
+        return int(plan[0]["Plan"]["Plan Rows"])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginateur adapté aux très grandes tables
+
+    - au-delà de `exact_count_threshold` lignes estimées, le nombre total est une estimation de
+      PostgreSQL plutôt que le résultat d'un `COUNT(*)` ;
+    - une page est obtenue en sélectionnant d'abord les seules clés primaires avec le décalage
+      demandé, puis les lignes complètes correspondantes, ce qui évite de parcourir et de
+      construire les lignes complètes de toutes les pages précédentes.
+    """
+
+    exact_count_threshold = 10000
+
+    @cached_property
+    def count(self):
+        if not isinstance(self.object_list, QuerySet):
+            return super().count
+
+        estimate = estimate_count(self.object_list)
+        if estimate is not None and estimate >= self.exact_count_threshold:
+            return estimate
+
+        return self.object_list.values("pk").count()
+
+    def page(self, number):
+        if not isinstance(self.object_list, QuerySet):
+            return super().page(number)
+
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        top = bottom + self.per_page
+        if number == self.num_pages:
+            top += self.orphans
+
+        pks = list(self.object_list.values_list("pk", flat=True)[bottom:top])
+        return self._get_page(self.object_list.filter(pk__in=pks), number, self)
+
+
 class APIPageNumberPagination(PageNumberPagination):
     page_size = 20
     page_size_query_param = "page_size"
@@ -1,5 +1,59 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
 import rules
 
+_permission_context = ContextVar("permission_context", default=None)
+
+
+class PermissionContext:
+    """Cache des données utilisées par les prédicats de permission
+
+    Un même prédicat est souvent évalué plusieurs fois au cours d'une requête (vérifications
+    globales puis par objet, champs de sérialiseurs calculés objet par objet...). Les données
+    nécessaires (adhésions de la personne, organisateurs d'un événement...) sont chargées une
+    seule fois et conservées tant que le contexte est actif.
+    """
+
+    def __init__(self):
+        self._data = {}
+
+    def get(self, key, loader):
+        if key not in self._data:
+            self._data[key] = loader()
+        return self._data[key]
+
+    def clear(self):
+        self._data.clear()
+
+
+@contextmanager
+def permission_context():
+    """Active un contexte de permission pour la durée du bloc"""
+    token = _permission_context.set(PermissionContext())
+    try:
+        yield _permission_context.get()
+    finally:
+        _permission_context.reset(token)
+
+
+def cached_for_permissions(key, loader):
+    """Renvoie le résultat de `loader`, mis en cache dans le contexte de permission actif
+
+    En l'absence de contexte actif (tâches, commandes, shell), `loader` est appelé à chaque fois.
+    """
+    context = _permission_context.get()
+    if context is None:
+        return loader()
+    return context.get(key, loader)
+
+
+def clear_permission_context(**kwargs):
+    """Vide le contexte de permission actif, à connecter aux signaux des modèles concernés"""
+    context = _permission_context.get()
+    if context is not None:
+        context.clear()
+
 
 @rules.predicate
 def is_authenticated_person(role):
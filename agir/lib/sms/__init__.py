@@ -1,22 +1,34 @@
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 from django.conf import settings
 from phonenumbers import number_type, PhoneNumberType
 
-from agir.lib.sms import ovh, sfr
+from agir.api.redis import get_auth_redis_client
+from agir.lib.sms import ovh, sfr, fake
 from agir.lib.sms.common import (
     compute_sms_length_information,
     SMSSendException,
     to_phone_number,
     SMSException,
 )
+from agir.lib.token_bucket import TokenBucket
 from agir.lib.utils import grouper
 
 logger = logging.getLogger(__name__)
 
-SMS_PROVIDERS = {"OVH": ovh, "SFR": sfr}
+SMS_PROVIDERS = {"OVH": ovh, "SFR": sfr, "FAKE": fake}
 SMS_PROVIDER = SMS_PROVIDERS.get(settings.SMS_PROVIDER)
 
+BulkSMSBucket = TokenBucket(
+    "BulkSMS",
+    max(1, round(settings.SMS_BULK_BATCHES_PER_SECOND)),
+    1 / settings.SMS_BULK_BATCHES_PER_SECOND,
+)
+"""Bucket utilisé pour limiter le débit des envois groupés (un jeton par lot)"""
+
 
 def _send_sms_as_email(message, recipient, **params):
     """
@@ -85,20 +97,148 @@ def send_sms(message, phone_number, force=False, at=None, sender=None):
         raise e
 
 
-def send_bulk_sms(message, phone_numbers, at=None, sender=None):
+def _e164(phone_number):
+    return getattr(phone_number, "as_e164", str(phone_number))
+
+
+class BulkSMSStatus:
+    """État d'avancement d'un envoi groupé, numéro par numéro
+
+    L'état est conservé dans Redis, ce qui permet de reprendre un envoi interrompu sans renvoyer
+    le SMS aux numéros déjà traités, même si la liste des numéros a changé entre temps.
+    """
+
+    EXPIRY = 7 * 24 * 3600
+
+    def __init__(self, name):
+        self.key = f"BulkSMS:{name}:numbers"
+
+    def get_done_numbers(self):
+        """Renvoie un dictionnaire associant chaque numéro traité au succès de l'envoi"""
+        return {
+            number.decode() if isinstance(number, bytes) else number: result
+            in (b"1", "1")
+            for number, result in get_auth_redis_client().hgetall(self.key).items()
+        }
+
+    def mark_done(self, sent, invalid):
+        mapping = {
+            **{_e164(n): 0 for n in invalid},
+            **{_e164(n): 1 for n in sent},
+        }
+        if mapping:
+            get_auth_redis_client().pipeline().hset(self.key, mapping=mapping).expire(
+                self.key, self.EXPIRY
+            ).execute()
+
+    def reset(self):
+        get_auth_redis_client().delete(self.key)
+
+
+def _wait_for_token(bucket, id):
+    while not bucket.has_tokens(id):
+        time.sleep(bucket.interval)
+
+
+def _send_batch(message, recipients, at, sender):
+    """Envoie un lot, et renvoie les numéros du lot, les numéros valides et invalides, et les numéros
+    pour lesquels l'envoi a échoué
+
+    En cas d'erreur du fournisseur, seuls les envois qu'il a confirmés sont considérés comme traités :
+    les autres numéros sont renvoyés comme en échec, pour pouvoir être contactés à nouveau.
+    """
+    try:
+        valid, invalid = SMS_PROVIDER.send_sms(
+            message, recipients, at=at, sender=sender
+        )
+    except SMSSendException as e:
+        logger.exception(str(e))
+        valid, invalid = set(e.sent), set()
+
+    done = {_e164(n) for n in valid} | {_e164(n) for n in invalid}
+    failed = [r for r in recipients if _e164(r) not in done]
+
+    return recipients, valid, invalid, failed
+
+
+def send_bulk_sms(
+    message,
+    phone_numbers,
+    at=None,
+    sender=None,
+    concurrency=1,
+    bucket=None,
+    status_name=None,
+    on_batch_done=None,
+):
+    """Envoie un même SMS à une liste de numéros
+
+    Les numéros sont dédoublonnés et découpés en lots de la taille acceptée par le fournisseur, qui sont
+    envoyés en parallèle.
+
+    :param concurrency: le nombre de lots envoyés simultanément
+    :param bucket: un `TokenBucket` limitant le nombre de lots envoyés (un jeton par lot)
+    :param status_name: si indiqué, l'état de chaque numéro est enregistré sous ce nom, et les numéros
+        déjà traités lors d'un précédent appel avec le même nom ne sont pas de nouveau contactés
+    :param on_batch_done: fonction appelée avec le nombre de numéros traités à la fin de chaque lot
+    :raises SMSSendException: si l'envoi a échoué pour certains numéros, qui ne sont pas enregistrés
+        comme traités et seront donc contactés lors d'une reprise
+    :return: le couple (numéros auxquels le SMS a été envoyé, numéros invalides)
+    """
+    recipients = list(dict.fromkeys(to_phone_number(n) for n in phone_numbers))
+
     sent = set()
     not_sent = set()
+    failed = set()
 
-    for numbers in grouper(phone_numbers, SMS_PROVIDER.BULK_GROUP_SIZE):
-        recipients = [to_phone_number(number) for number in numbers]
-        try:
-            valid, invalid = SMS_PROVIDER.send_sms(
-                message, recipients, at=at, sender=sender
-            )
+    status = BulkSMSStatus(status_name) if status_name else None
+    done_numbers = status.get_done_numbers() if status else {}
+
+    if done_numbers:
+        already_done = [r for r in recipients if _e164(r) in done_numbers]
+        sent.update(r for r in already_done if done_numbers[_e164(r)])
+        not_sent.update(r for r in already_done if not done_numbers[_e164(r)])
+        recipients = [r for r in recipients if _e164(r) not in done_numbers]
+        if already_done and on_batch_done is not None:
+            on_batch_done(len(already_done))
+
+    lock = threading.Lock()
+
+    def batch_done(future):
+        # les erreurs sont remontées par l'appel à `result()` dans la boucle principale
+        if future.exception() is not None:
+            return
+
+        batch, valid, invalid, batch_failed = future.result()
+        with lock:
             sent.update(valid)
             not_sent.update(invalid)
-        except SMSSendException as e:
-            logger.exception(str(e))
-            not_sent.update(recipients)
+            failed.update(batch_failed)
+        if status is not None:
+            status.mark_done(valid, invalid)
+        if on_batch_done is not None:
+            on_batch_done(len(batch))
+
+    futures = []
+    with ThreadPoolExecutor(max_workers=max(concurrency, 1)) as executor:
+        for batch in grouper(recipients, SMS_PROVIDER.BULK_GROUP_SIZE):
+            if bucket is not None:
+                _wait_for_token(bucket, status_name or "default")
+
+            # l'état du lot est enregistré dès la fin de son envoi, pour pouvoir reprendre
+            # correctement en cas d'interruption
+            future = executor.submit(_send_batch, message, list(batch), at, sender)
+            future.add_done_callback(batch_done)
+            futures.append(future)
+
+    for future in futures:
+        future.result()
+
+    if failed:
+        raise SMSSendException(
+            f"L'envoi a échoué pour {len(failed)} numéro(s).",
+            sent=sent,
+            invalid=not_sent,
+        )
 
     return sent, not_sent
@@ -0,0 +1,32 @@
+import threading
+import time
+
+from django.conf import settings
+
+BULK_GROUP_SIZE = 100
+
+# liste des SMS "envoyés", sous la forme de triplets (message, destinataires, expéditeur)
+outbox = []
+_outbox_lock = threading.Lock()
+
+
+def send_sms(message, recipients, *, at=None, sender=None, **_):
+    """Fournisseur factice, qui conserve les messages en mémoire au lieu de les envoyer
+
+    Une latence peut être simulée avec le paramètre `SMS_FAKE_LATENCY` pour réaliser des tests
+    de charge de l'envoi groupé sans solliciter de fournisseur réel.
+    """
+    if settings.SMS_FAKE_LATENCY:
+        time.sleep(settings.SMS_FAKE_LATENCY)
+
+    recipients = [recipient.as_e164 for recipient in recipients]
+
+    with _outbox_lock:
+        outbox.append((message, recipients, sender))
+
+    return recipients, []
+
+
+def clear_outbox():
+    with _outbox_lock:
+        outbox.clear()
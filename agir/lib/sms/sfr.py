@@ -1,6 +1,7 @@
 import csv
 import datetime
 import json
+import logging
 from enum import Enum
 
 import requests
@@ -11,6 +12,8 @@ from agir.lib.sms.common import SMSSendException, SMSException
 # API DOC : https://assistance.utilisateur-relationclient.sfrbusiness.fr/dmc/
 #         :https://www.dmc.sfr-sh.fr/ApiWorkshop/doc/DMCv1_SFD064-API-Declenchement_a_distance.pdf
 
+logger = logging.getLogger(__name__)
+
 BULK_GROUP_SIZE = 100
 
 
@@ -40,10 +43,12 @@ class DmcBufferWS:
             "servicePassword": settings.SFR_PASSWORD,
             "spaceId": settings.SFR_SPACE_ID,
         }
+        # une session par client permet de réutiliser la connexion pour tous les SMS d'un lot
+        self.session = requests.Session()
 
     def _make_request(self, endpoint, data):
         data.update(self.authentication)
-        response = requests.get(
+        response = self.session.get(
             f"{self.BASE_URL}/{endpoint}",
             params=data,
         )
@@ -108,7 +113,12 @@ def send_sms(message, recipients, *, sender=None, template=None, **_):
     not_sent = set()
 
     for recipient in recipients:
-        ok = api_client.send_sms(message, recipient)
+        try:
+            ok = api_client.send_sms(message, recipient)
+        except SMSSendException as e:
+            # un échec pour un destinataire ne doit pas empêcher l'envoi aux autres destinataires du lot
+            logger.exception(str(e))
+            ok = False
         sent.add(recipient.as_e164) if ok else not_sent.add(recipient.as_e164)
 
     return sent, not_sent
@@ -0,0 +1,119 @@
+from gspread.utils import a1_range_to_grid_range
+
+from agir.lib.google_sheet import using_sheet_client
+
+
+class FakeWorksheet:
+    """Feuille en mémoire implémentant le sous-ensemble de l'API de gspread utilisé par `agir.lib.google_sheet`"""
+
+    def __init__(self, id, rows=None):
+        self.id = id
+        self.rows = [list(r) for r in (rows or [])]
+        self.row_count = max(len(self.rows), 1000)
+        self.col_count = max((len(r) for r in self.rows), default=26)
+        self.calls = []
+
+    def _set_cell(self, row, col, value):
+        while len(self.rows) <= row:
+            self.rows.append([])
+        line = self.rows[row]
+        while len(line) <= col:
+            line.append("")
+        line[col] = value
+
+    def _write(self, range_name, values):
+        grid = a1_range_to_grid_range(range_name)
+        for i, row in enumerate(values):
+            for j, value in enumerate(row):
+                self._set_cell(
+                    grid["startRowIndex"] + i, grid["startColumnIndex"] + j, value
+                )
+
+    def row_values(self, row, **kwargs):
+        self.calls.append("row_values")
+        values = self.rows[row - 1] if row <= len(self.rows) else []
+        while values and values[-1] == "":
+            values = values[:-1]
+        return list(values)
+
+    def col_values(self, col, **kwargs):
+        self.calls.append("col_values")
+        values = [r[col - 1] if col <= len(r) else "" for r in self.rows]
+        while values and values[-1] == "":
+            values.pop()
+        return values
+
+    def get_all_values(self):
+        return [list(r) for r in self.rows]
+
+    def resize(self, rows=None, cols=None):
+        self.calls.append("resize")
+        if rows is not None:
+            self.row_count = rows
+            del self.rows[rows:]
+        if cols is not None:
+            self.col_count = cols
+            self.rows = [r[:cols] for r in self.rows]
+
+    def update(self, range_name, values, **kwargs):
+        self.calls.append("update")
+        self._write(range_name, values)
+
+    def batch_update(self, data, **kwargs):
+        self.calls.append("batch_update")
+        for d in data:
+            self._write(d["range"], d["values"])
+
+    def append_rows(self, values, **kwargs):
+        self.calls.append("append_rows")
+        while self.rows and not any(v != "" for v in self.rows[-1]):
+            self.rows.pop()
+        self.rows.extend(list(r) for r in values)
+        self.row_count = max(self.row_count, len(self.rows))
+
+    def append_row(self, values, **kwargs):
+        self.append_rows([values], **kwargs)
+
+    def clear(self):
+        self.calls.append("clear")
+        self.rows = []
+
+
+class FakeSpreadsheet:
+    def __init__(self, id):
+        self.id = id
+        self.worksheets = {}
+
+    def get_worksheet_by_id(self, gid):
+        if gid not in self.worksheets:
+            self.worksheets[gid] = FakeWorksheet(gid)
+        return self.worksheets[gid]
+
+    def list_permissions(self):
+        return []
+
+
+class FakeSheetClient:
+    """Client remplaçant gspread dans les tests
+
+    Les feuilles sont créées à la volée lors de leur première ouverture.
+    """
+
+    def __init__(self):
+        self.spreadsheets = {}
+
+    def open_by_key(self, key):
+        if key not in self.spreadsheets:
+            self.spreadsheets[key] = FakeSpreadsheet(key)
+        return self.spreadsheets[key]
+
+    def worksheet(self, sheet_id):
+        return self.open_by_key(sheet_id.sid).get_worksheet_by_id(sheet_id.gid)
+
+
+def using_fake_sheet_client(client=None):
+    """Remplace le client gspread par un client local le temps du bloc
+
+    :param client: le client à utiliser, par défaut une nouvelle instance de `FakeSheetClient`
+    """
+    return using_sheet_client(client if client is not None else FakeSheetClient())
@@ -0,0 +1,72 @@
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from agir.lib.google_sheet import (
+    GoogleSheetId,
+    add_rows_to_sheet,
+    add_row_to_sheet,
+    copy_array_to_sheet,
+)
+from agir.lib.tests.fake_google_sheet import using_fake_sheet_client
+
+SHEET_ID = GoogleSheetId(sid="a" * 44, gid=0)
+
+
+class AddRowsToSheetTestCase(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_add_rows_in_a_single_append(self):
+        with using_fake_sheet_client() as client:
+            sheet = client.worksheet(SHEET_ID)
+            sheet.rows = [["id", "nom"], [1, "Arthur"]]
+
+            add_rows_to_sheet(
+                SHEET_ID, [{"id": 2, "nom": "Berthe"}, {"id": 3, "nom": "Camille"}]
+            )
+
+            self.assertEqual(
+                sheet.get_all_values(),
+                [["id", "nom"], [1, "Arthur"], [2, "Berthe"], [3, "Camille"]],
+            )
+            self.assertEqual(sheet.calls.count("append_rows"), 1)
+
+    def test_add_missing_columns(self):
+        with using_fake_sheet_client() as client:
+            sheet = client.worksheet(SHEET_ID)
+            sheet.rows = [["id", "nom"], [1, "Arthur"]]
+
+            add_rows_to_sheet(
+                SHEET_ID,
+                [{"id": 2, "email": "b@example.com"}, {"id": 3, "ville": "Paris"}],
+            )
+
+            self.assertEqual(
+                sheet.get_all_values(),
+                [
+                    ["id", "nom", "email", "ville"],
+                    [1, "Arthur"],
+                    [2, "", "b@example.com", ""],
+                    [3, "", "", "Paris"],
+                ],
+            )
+
+    def test_update_existing_rows_with_id_column(self):
+        with using_fake_sheet_client() as client:
+            sheet = client.worksheet(SHEET_ID)
+            copy_array_to_sheet(SHEET_ID, [["id", "statut"], ["R1", "en attente"]])
+
+            add_rows_to_sheet(
+                SHEET_ID,
+                [
+                    {"id": "R1", "statut": "confirmé"},
+                    {"id": "R2", "statut": "confirmé"},
+                ],
+                id_column="id",
+            )
+            add_row_to_sheet(SHEET_ID, {"id": "R2", "statut": "annulé"}, "id")
+
+            self.assertEqual(
+                sheet.get_all_values(),
+                [["id", "statut"], ["R1", "confirmé"], ["R2", "annulé"]],
+            )
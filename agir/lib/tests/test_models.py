@@ -1,9 +1,12 @@
 import uuid
 from datetime import datetime
+from io import StringIO
 
+from django.core.management import call_command
 from django.test import TestCase
 from django.db import IntegrityError
 
+from agir.lib import data
 from . import models
 
 
@@ -97,3 +100,49 @@ class LocationMixinTestCase(TestCase):
         self.assertEqual(instance.departement, "Saint-Pierre-et-Miquelon")
         self.assertEqual(instance.region, "")
         self.assertEqual(instance.ancienne_region, "")
+
+    def test_persisted_departement_takes_precedence(self):
+        instance = models.LocationModel.objects.create(
+            location_zip="20000", location_country="FR", location_departement_id="2B"
+        )
+        self.assertEqual(instance.departement, "Haute-Corse")
+        self.assertEqual(instance.region, "Corse")
+
+    def test_filtre_departements_and_region(self):
+        nord = models.LocationModel.objects.create(
+            location_zip="59000", location_country="FR"
+        )
+        persisted = models.LocationModel.objects.create(
+            location_zip="75001", location_country="FR", location_departement_id="62"
+        )
+        paris = models.LocationModel.objects.create(
+            location_zip="75001", location_country="FR"
+        )
+
+        self.assertCountEqual(
+            models.LocationModel.objects.filter(data.filtre_departements("59", "62")),
+            [nord, persisted],
+        )
+        self.assertCountEqual(
+            models.LocationModel.objects.filter(data.filtre_departement("Paris")),
+            [paris],
+        )
+        self.assertCountEqual(
+            models.LocationModel.objects.filter(data.filtre_region("32")),
+            [nord, persisted],
+        )
+
+    def test_remplir_departements_ignore_les_codes_postaux_corses(self):
+        nord = models.LocationModel.objects.create(
+            location_zip="59000", location_country="FR"
+        )
+        bastia = models.LocationModel.objects.create(
+            location_zip="20200", location_country="FR"
+        )
+
+        call_command("remplir_departements", stdout=StringIO())
+
+        nord.refresh_from_db()
+        bastia.refresh_from_db()
+        self.assertEqual(nord.location_departement_id, "59")
+        self.assertEqual(bastia.location_departement_id, "")
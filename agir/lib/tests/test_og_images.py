@@ -0,0 +1,64 @@
+import tempfile
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from agir.events.display import EventOGImage
+from agir.events.models import Event
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class OGImageTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        now = timezone.now()
+        self.event = Event.objects.create(
+            name="Événement",
+            start_time=now + timezone.timedelta(days=1),
+            end_time=now + timezone.timedelta(days=1, hours=1),
+            location_city="Paris",
+            location_zip="75010",
+        )
+        self.url = f"/evenements/{self.event.pk}/og-image/{self.event.get_og_image_cache_key()}/"
+
+    def test_image_is_rendered_once_then_redirected_to(self):
+        res = self.client.get(self.url)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res["Content-Type"], "image/png")
+        self.assertIn("max-age=31536000", res["Cache-Control"])
+        self.assertTrue(EventOGImage(self.event).exists())
+
+        res = self.client.get(self.url)
+        self.assertEqual(res.status_code, 302)
+        self.assertTrue(
+            res["Location"].endswith(EventOGImage(self.event).get_storage_path())
+        )
+
+    def test_new_image_when_event_changes(self):
+        path = EventOGImage(self.event).get_storage_path()
+        self.event.name = "Nouveau nom"
+        self.assertNotEqual(EventOGImage(self.event).get_storage_path(), path)
+
+    @override_settings(OG_IMAGE_BACKGROUND_GENERATION=True)
+    @patch("agir.events.signals.generate_event_og_image")
+    def test_generation_is_scheduled_once_after_commit(self, generate_event_og_image):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.event.save()
+            generate_event_og_image.delay.assert_not_called()
+        generate_event_og_image.delay.assert_called_once_with(
+            self.event.pk, self.event.get_og_image_cache_key()
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.event.save()
+        generate_event_og_image.delay.assert_called_once()
@@ -1,7 +1,11 @@
+from unittest import mock
+
 from django.test import TestCase
 from math import ceil
 
+import agir.lib.sms.fake
 import agir.lib.sms.ovh
+from agir.api.redis import using_separate_redis_server
 from agir.lib.sms.common import (
     compute_sms_length_information,
     MESSAGE_LENGTH,
@@ -73,3 +77,97 @@ class SMSSendingTestCase(TestCase):
 
         self.assertEqual(sent, {"+33678956454", "+33678451252"})
         self.assertEqual(invalid, {"+33754986598"})
+
+
+@using_separate_redis_server
+class BulkSMSSendingTestCase(TestCase):
+    numbers = [f"+336{i:08d}" for i in range(25)]
+
+    def setUp(self) -> None:
+        from agir.lib import sms
+
+        self.original_provider = sms.SMS_PROVIDER
+        sms.SMS_PROVIDER = agir.lib.sms.fake
+        agir.lib.sms.fake.clear_outbox()
+
+    def tearDown(self) -> None:
+        from agir.lib import sms
+
+        sms.SMS_PROVIDER = self.original_provider
+
+    def test_send_batches_concurrently(self):
+        with self.settings(SMS_FAKE_LATENCY=0.01):
+            sent, invalid = send_bulk_sms(
+                "mon message", self.numbers + self.numbers[:5], concurrency=4
+            )
+
+        self.assertEqual(sent, set(self.numbers))
+        self.assertEqual(invalid, set())
+        self.assertEqual(
+            sorted(
+                n for _, recipients, _ in agir.lib.sms.fake.outbox for n in recipients
+            ),
+            self.numbers,
+        )
+
+    def test_resume_does_not_send_batches_twice(self):
+        with mock.patch.object(agir.lib.sms.fake, "BULK_GROUP_SIZE", 10):
+            send_bulk_sms("mon message", self.numbers[:20], status_name="envoi")
+            self.assertEqual(len(agir.lib.sms.fake.outbox), 2)
+
+            sent, invalid = send_bulk_sms(
+                "mon message", self.numbers, status_name="envoi"
+            )
+
+        self.assertEqual(sent, set(self.numbers))
+        self.assertEqual(len(agir.lib.sms.fake.outbox), 3)
+        self.assertEqual(agir.lib.sms.fake.outbox[-1][1], self.numbers[20:])
+
+    def test_resume_does_not_depend_on_numbers_order(self):
+        with mock.patch.object(agir.lib.sms.fake, "BULK_GROUP_SIZE", 10):
+            send_bulk_sms("mon message", self.numbers[5:15], status_name="envoi")
+            self.assertEqual(len(agir.lib.sms.fake.outbox), 1)
+
+            sent, invalid = send_bulk_sms(
+                "mon message", list(reversed(self.numbers)), status_name="envoi"
+            )
+
+        self.assertEqual(sent, set(self.numbers))
+        self.assertCountEqual(
+            [
+                n
+                for _, recipients, _ in agir.lib.sms.fake.outbox[1:]
+                for n in recipients
+            ],
+            self.numbers[:5] + self.numbers[15:],
+        )
+
+    def test_worker_exceptions_are_raised(self):
+        with mock.patch.object(
+            agir.lib.sms.fake, "send_sms", side_effect=ValueError("erreur")
+        ):
+            with self.assertRaises(ValueError):
+                send_bulk_sms("mon message", self.numbers, status_name="envoi")
+
+    def test_resume_sends_again_batches_that_failed(self):
+        def failing_send_sms(message, recipients, **kwargs):
+            raise SMSSendException("L'API a rencontré une erreur", invalid=recipients)
+
+        with mock.patch.object(agir.lib.sms.fake, "BULK_GROUP_SIZE", 10):
+            with mock.patch.object(
+                agir.lib.sms.fake, "send_sms", side_effect=failing_send_sms
+            ):
+                with self.assertRaises(SMSSendException) as cm:
+                    send_bulk_sms("mon message", self.numbers, status_name="envoi")
+            self.assertEqual(cm.exception.sent, frozenset())
+
+            sent, invalid = send_bulk_sms(
+                "mon message", self.numbers, status_name="envoi"
+            )
+
+        self.assertEqual(sent, set(self.numbers))
+        self.assertEqual(invalid, set())
+        self.assertCountEqual(
+            [n for _, recipients, _ in agir.lib.sms.fake.outbox for n in recipients],
+            self.numbers,
+        )
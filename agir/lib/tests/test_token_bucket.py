@@ -0,0 +1,58 @@
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from agir.api.redis import using_separate_redis_server
+from agir.lib import token_bucket
+from agir.lib.token_bucket import TokenBucket, has_tokens
+
+
+@using_separate_redis_server
+class TokenBucketTestCase(SimpleTestCase):
+    def setUp(self):
+        self.addCleanup(token_bucket._exhausted_until.clear)
+        patcher = patch("agir.lib.token_bucket.get_current_timestamp")
+        self.timestamp = patcher.start()
+        self.timestamp.return_value = 1000
+        self.addCleanup(patcher.stop)
+
+        self.first = TokenBucket("First", 2, 60)
+        self.second = TokenBucket("Second", 1, 60)
+
+    def test_buckets_are_refilled(self):
+        self.assertTrue(self.first.has_tokens("a"))
+        self.assertTrue(self.first.has_tokens("a"))
+        self.assertFalse(self.first.has_tokens("a"))
+        self.assertTrue(self.first.has_tokens("b"))
+
+        self.timestamp.return_value = 1060
+        self.assertTrue(self.first.has_tokens("a"))
+        self.assertFalse(self.first.has_tokens("a"))
+
+    def test_tokens_are_only_taken_if_all_buckets_have_enough(self):
+        self.assertTrue(has_tokens((self.first, "a"), (self.second, "a")))
+        self.assertFalse(has_tokens((self.first, "a"), (self.second, "a")))
+
+        # le premier bucket n'a pas été décrémenté lors du refus
+        self.assertTrue(self.first.has_tokens("a"))
+        self.assertFalse(self.first.has_tokens("a"))
+
+    def test_local_precheck_avoids_redis(self):
+        bucket = TokenBucket("Local", 1, 60, local_precheck=True)
+        self.assertTrue(bucket.has_tokens("a"))
+        self.assertFalse(bucket.has_tokens("a"))
+
+        with patch("agir.lib.token_bucket.token_bucket_script") as script:
+            self.assertFalse(bucket.has_tokens("a"))
+            script.assert_not_called()
+
+        self.timestamp.return_value = 1060
+        self.assertTrue(bucket.has_tokens("a"))
+
+    def test_reset_clears_local_precheck(self):
+        bucket = TokenBucket("Local", 1, 60, local_precheck=True)
+        bucket.has_tokens("a")
+        self.assertFalse(bucket.has_tokens("a"))
+
+        bucket.reset("a")
+        self.assertTrue(bucket.has_tokens("a"))
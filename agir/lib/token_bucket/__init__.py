@@ -4,7 +4,7 @@ from django.utils import timezone
 
 from agir.api.redis import get_auth_redis_client as get_redis_client
 
-__all__ = ["TokenBucket"]
+__all__ = ["TokenBucket", "has_tokens"]
 
 
 def get_current_timestamp():
@@ -14,17 +14,29 @@ def get_current_timestamp():
     return timezone.now().timestamp()
 
 
+# entities known to be out of tokens in this process: (bucket name, id) -> timestamp (in seconds)
+# from which the bucket will have enough tokens again
+_exhausted_until = {}
+_EXHAUSTED_MAX_SIZE = 10000
+
+
 class TokenBucket:
-    def __init__(self, name: str, max: int, interval: int):
+    def __init__(self, name: str, max: int, interval: int, local_precheck=False):
         """Instancies a Token bucket value
 
         :param name: a unique name for the token bucket, used to name the redis keys
         :param max: the maximum (and initial) value of the token bucket
         :param interval: the interval (in seconds) by which the bucket is refilled by one unit
+        :param local_precheck: whether to remember in-process the entities known to be out of tokens,
+            so that they are rejected without querying redis until their bucket is refilled
         """
         self.name = name
         self.max = max
         self.interval = interval
+        self.local_precheck = local_precheck
+
+    def key_prefix(self, id):
+        return f"TokenBucket:{self.name}:{str(id)}:"
 
     def has_tokens(self, id, amount=1):
         """Check if the specific `id` has at least `amount` tokens, and decrease the bucket if it is the case
@@ -33,37 +45,72 @@ class TokenBucket:
         :param amount: an integer or float value
         :return: whether the entity has the necessary tokens
         """
-
-        key_prefix = f"TokenBucket:{self.name}:{str(id)}:"
-
-        res = token_bucket_script(
-            key=key_prefix,
-            max=self.max,
-            interval=self.interval,
-            now=get_current_timestamp(),
-            amount=amount,
-            client=get_redis_client(),
-        )
-
-        return bool(res)
+        return has_tokens((self, id, amount))
 
     def reset(self, id):
-        key_prefix = f"TokenBucket:{self.name}:{str(id)}:"
+        key_prefix = self.key_prefix(id)
+        _exhausted_until.pop((self.name, str(id)), None)
         get_redis_client().pipeline().delete(f"{key_prefix}v").delete(
             f"{key_prefix}t"
         ).execute()
 
 
+def has_tokens(*checks):
+    """Check several token buckets at once, and decrease them only if all of them have enough tokens
+
+    All the buckets are evaluated atomically, in a single call to redis.
+
+    :param checks: tuples `(bucket, id)` or `(bucket, id, amount)`
+    :return: whether all the entities have the necessary tokens
+    """
+    checks = [
+        (bucket, id, *rest) if rest else (bucket, id, 1) for bucket, id, *rest in checks
+    ]
+    now = get_current_timestamp()
+
+    for bucket, id, _ in checks:
+        if (
+            bucket.local_precheck
+            and _exhausted_until.get((bucket.name, str(id)), 0) > now
+        ):
+            return False
+
+    keys = []
+    args = [now]
+    for bucket, id, amount in checks:
+        key_prefix = bucket.key_prefix(id)
+        keys.extend([f"{key_prefix}v", f"{key_prefix}t"])
+        args.extend([bucket.max, bucket.interval, amount])
+
+    waits = token_bucket_script(keys=keys, args=args, client=get_redis_client())
+
+    for (bucket, id, _), wait in zip(checks, waits):
+        if bucket.local_precheck and wait:
+            if len(_exhausted_until) >= _EXHAUSTED_MAX_SIZE:
+                _prune_exhausted(now)
+            _exhausted_until[(bucket.name, str(id))] = now + int(wait) / 1000
+
+    return not any(int(wait) for wait in waits)
+
+
+def _prune_exhausted(now):
+    for key, until in list(_exhausted_until.items()):
+        if until <= now:
+            _exhausted_until.pop(key, None)
+
+    # every entry is still valid: forgetting some of them only means querying redis for them
+    if len(_exhausted_until) >= _EXHAUSTED_MAX_SIZE:
+        _exhausted_until.clear()
+
+
 _token_bucket_script = None
 
 
-def token_bucket_script(key, max, interval, now, amount, client):
+def token_bucket_script(keys, args, client):
     global _token_bucket_script
 
     if _token_bucket_script is None:
         with open_text("agir.lib.token_bucket", "token_bucket.lua") as fd:
             _token_bucket_script = client.register_script(fd.read())
 
-    return _token_bucket_script(
-        keys=[f"{key}v", f"{key}t"], args=[max, interval, now, amount], client=client
-    )
+    return _token_bucket_script(keys=keys, args=args, client=client)
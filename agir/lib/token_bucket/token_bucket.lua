@@ -1,37 +1,62 @@
--- value_key timestamp_key max_value interval now amount
+-- now, then for each bucket: max_value interval amount
+-- keys: for each bucket: value_key timestamp_key
 --
 -- interval and now must be in seconds
+--
+-- Tokens are only taken if every bucket has enough of them. Returns, for each bucket, 0 if it had
+-- enough tokens, or else the time to wait (in milliseconds) before it has enough of them.
+
+local now = tonumber(ARGV[1])
+local bucket_count = #KEYS / 2
+
+local values = {}
+local waits = {}
+local allowed = true
 
-local value_key = KEYS[1]
-local timestamp_key = KEYS[2]
-local max_value = tonumber(ARGV[1])
-local interval = tonumber(ARGV[2])
-local now = tonumber(ARGV[3])
-local amount = tonumber(ARGV[4])
-
-local current_value
-local expiry_time
-local previous_value = redis.call('GET', value_key)
-local last_update = redis.call('GET', timestamp_key)
-
-if (previous_value == false) or (last_update == false) then
-    -- if we found no record, we set current_value to initial_value
-    -- and last_update to now
-    current_value = max_value
-else
-    current_value = previous_value + (now - last_update) / interval
-
-    if current_value > max_value then
+for i = 1, bucket_count do
+    local value_key = KEYS[2 * i - 1]
+    local timestamp_key = KEYS[2 * i]
+    local max_value = tonumber(ARGV[3 * i - 1])
+    local interval = tonumber(ARGV[3 * i])
+    local amount = tonumber(ARGV[3 * i + 1])
+
+    local current_value
+    local previous_value = redis.call('GET', value_key)
+    local last_update = redis.call('GET', timestamp_key)
+
+    if (previous_value == false) or (last_update == false) then
+        -- if we found no record, we set current_value to initial_value
+        -- and last_update to now
         current_value = max_value
+    else
+        current_value = previous_value + (now - last_update) / interval
+
+        if current_value > max_value then
+            current_value = max_value
+        end
+    end
+
+    values[i] = current_value
+
+    if amount > current_value then
+        allowed = false
+        waits[i] = math.ceil((amount - current_value) * interval * 1000)
+    else
+        waits[i] = 0
     end
 end
 
-if amount > current_value then
-    return false
-else
-    current_value = current_value - amount
-    expiry_time = math.ceil((max_value - current_value) * interval)
-    redis.call('SET', value_key, current_value, 'EX', expiry_time)
-    redis.call('SET', timestamp_key, now, 'EX', expiry_time)
-    return true
+if allowed then
+    for i = 1, bucket_count do
+        local max_value = tonumber(ARGV[3 * i - 1])
+        local interval = tonumber(ARGV[3 * i])
+        local amount = tonumber(ARGV[3 * i + 1])
+        local current_value = values[i] - amount
+        local expiry_time = math.max(math.ceil((max_value - current_value) * interval), 1)
+
+        redis.call('SET', KEYS[2 * i - 1], current_value, 'EX', expiry_time)
+        redis.call('SET', KEYS[2 * i], now, 'EX', expiry_time)
+    end
 end
+
+return waits
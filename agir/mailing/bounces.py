@@ -0,0 +1,127 @@
+"""Traitement des rejets d'emails signalés par les fournisseurs d'envoi
+
+Les webhooks des fournisseurs se contentent de transmettre les notifications à une tâche Celery,
+qui les enregistre par lots : les événements déjà reçus sont ignorés, puis toutes les adresses
+rejetées définitivement sont marquées en une seule requête.
+"""
+
+import hashlib
+import json
+from typing import NamedTuple
+
+from django.db import transaction
+from django.db.models.functions import Upper
+from django.utils import timezone
+
+from agir.authentication.session_context import invalidate_session_context
+from agir.mailing.models import EmailBounce
+from agir.people.models import PersonEmail
+
+SENDGRID_BOUNCE_EVENTS = ("bounce", "dropped")
+
+
+class Bounce(NamedTuple):
+    event_id: str
+    address: str
+    bounce_type: str
+    permanent: bool
+
+
+def _payload_id(payload):
+    return hashlib.sha1(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+def parse_ses_notification(notification):
+    """Renvoie les rejets contenus dans une notification SNS d'Amazon SES"""
+    if notification.get("Type") != "Notification":
+        return []
+
+    message = json.loads(notification["Message"])
+    if message.get("notificationType") != "Bounce":
+        return []
+
+    bounce = message["bounce"]
+    event_id = (
+        bounce.get("feedbackId")
+        or notification.get("MessageId")
+        or _payload_id(message)
+    )
+    addresses = [r["emailAddress"] for r in bounce.get("bouncedRecipients", [])] or [
+        message["mail"]["destination"][0]
+    ]
+
+    return [
+        Bounce(
+            event_id=f"{event_id}:{address}",
+            address=address,
+            bounce_type=bounce["bounceType"],
+            permanent=bounce["bounceType"] == "Permanent",
+        )
+        for address in addresses
+    ]
+
+
+def parse_sendgrid_events(events):
+    """Renvoie les rejets contenus dans une liste d'événements Sendgrid"""
+    return [
+        Bounce(
+            event_id=event.get("sg_event_id") or _payload_id(event),
+            address=event["email"],
+            bounce_type=event["event"],
+            permanent=True,
+        )
+        for event in events
+        if event.get("event") in SENDGRID_BOUNCE_EVENTS
+    ]
+
+
+PARSERS = {
+    EmailBounce.PROVIDER_SES: parse_ses_notification,
+    EmailBounce.PROVIDER_SENDGRID: parse_sendgrid_events,
+}
+
+
+def record_bounces(provider, bounces):
+    """Enregistre les rejets qui n'ont pas encore été reçus et marque les adresses concernées
+
+    :return: le nombre d'adresses nouvellement marquées comme rejetées
+    """
+    bounces = {bounce.event_id: bounce for bounce in bounces}
+    if not bounces:
+        return 0
+
+    with transaction.atomic():
+        known = set(
+            EmailBounce.objects.filter(
+                provider=provider, event_id__in=bounces
+            ).values_list("event_id", flat=True)
+        )
+        new_bounces = [b for event_id, b in bounces.items() if event_id not in known]
+
+        EmailBounce.objects.bulk_create(
+            [
+                EmailBounce(provider=provider, **bounce._asdict())
+                for bounce in new_bounces
+            ],
+            ignore_conflicts=True,
+        )
+
+        addresses = {b.address.upper() for b in new_bounces if b.permanent}
+        if not addresses:
+            return 0
+
+        # la recherche se fait comme dans `PersonEmail.objects.get_by_natural_key`, sans tenir
+        # compte de la casse, ce qui permet d'utiliser l'index sur upper(address)
+        emails = dict(
+            PersonEmail.objects.annotate(upper_address=Upper("address"))
+            .filter(upper_address__in=addresses, _bounced=False)
+            .values_list("id", "person_id")
+        )
+        PersonEmail.objects.filter(id__in=emails).update(
+            _bounced=True, bounced_date=timezone.now()
+        )
+
+    # la mise à jour groupée ne déclenche pas les signaux qui invalident le contexte de session
+    invalidate_session_context(*set(emails.values()))
+
+    return len(emails)
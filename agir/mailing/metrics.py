@@ -2,3 +2,14 @@ from prometheus_client import Counter
 
 ses_bounced_metric = Counter("ses_bounced_metric", "")
 sendgrid_bounced_metric = Counter("sendgrid_bounced_metric", "")
+
+bounce_webhook_requests = Counter(
+    "agir_mailing_bounce_webhook_requests",
+    "Requêtes reçues sur les webhooks de rejet",
+    ["provider"],
+)
+bounce_webhook_events = Counter(
+    "agir_mailing_bounce_webhook_events",
+    "Rejets reçus sur les webhooks, par type de rejet",
+    ["provider", "bounce_type"],
+)
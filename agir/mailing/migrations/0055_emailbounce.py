@@ -0,0 +1,75 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("mailing", "0054_alter_segment_newsletters"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EmailBounce",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Date de réception"
+                    ),
+                ),
+                (
+                    "provider",
+                    models.CharField(
+                        choices=[("ses", "Amazon SES"), ("sendgrid", "Sendgrid")],
+                        max_length=10,
+                        verbose_name="Fournisseur",
+                    ),
+                ),
+                (
+                    "event_id",
+                    models.CharField(
+                        max_length=255, verbose_name="Identifiant chez le fournisseur"
+                    ),
+                ),
+                (
+                    "address",
+                    models.EmailField(max_length=254, verbose_name="Adresse email"),
+                ),
+                (
+                    "bounce_type",
+                    models.CharField(
+                        blank=True, max_length=50, verbose_name="Type de rejet"
+                    ),
+                ),
+                (
+                    "permanent",
+                    models.BooleanField(
+                        help_text="Seuls les rejets définitifs marquent l'adresse comme rejetée",
+                        verbose_name="Rejet définitif",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Rejet d'email",
+                "verbose_name_plural": "Rejets d'email",
+            },
+        ),
+        migrations.AddIndex(
+            model_name="emailbounce",
+            index=models.Index(fields=["address"], name="mailing_bounce_address_idx"),
+        ),
+        migrations.AddConstraint(
+            model_name="emailbounce",
+            constraint=models.UniqueConstraint(
+                fields=("provider", "event_id"), name="unique_bounce_event"
+            ),
+        ),
+    ]
@@ -20,7 +20,7 @@ from agir.people.models import (
     PersonQualification,
 )
 
-__all__ = ["Segment"]
+__all__ = ["Segment", "EmailBounce"]
 
 
 DATE_HELP_TEXT = (
@@ -803,3 +803,43 @@ class Segment(BaseSegment, models.Model):
 
     def __str__(self):
         return self.name
+
+
+class EmailBounce(models.Model):
+    """Rejet d'email signalé par un fournisseur d'envoi
+
+    Les rejets sont identifiés par l'identifiant de l'événement chez le fournisseur, pour que les
+    notifications renvoyées par celui-ci ne soient enregistrées qu'une seule fois.
+    """
+
+    PROVIDER_SES = "ses"
+    PROVIDER_SENDGRID = "sendgrid"
+    PROVIDER_CHOICES = (
+        (PROVIDER_SES, "Amazon SES"),
+        (PROVIDER_SENDGRID, "Sendgrid"),
+    )
+
+    created = models.DateTimeField("Date de réception", auto_now_add=True)
+    provider = models.CharField("Fournisseur", max_length=10, choices=PROVIDER_CHOICES)
+    event_id = models.CharField("Identifiant chez le fournisseur", max_length=255)
+    address = models.EmailField("Adresse email")
+    bounce_type = models.CharField("Type de rejet", max_length=50, blank=True)
+    permanent = models.BooleanField(
+        "Rejet définitif",
+        help_text="Seuls les rejets définitifs marquent l'adresse comme rejetée",
+    )
+
+    class Meta:
+        verbose_name = "Rejet d'email"
+        verbose_name_plural = "Rejets d'email"
+        constraints = (
+            models.UniqueConstraint(
+                fields=("provider", "event_id"), name="unique_bounce_event"
+            ),
+        )
+        indexes = (
+            models.Index(fields=("address",), name="mailing_bounce_address_idx"),
+        )
+
+    def __str__(self):
+        return f"{self.address} ({self.get_provider_display()})"
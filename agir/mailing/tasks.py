@@ -0,0 +1,8 @@
+from celery import shared_task
+
+from agir.mailing.bounces import PARSERS, record_bounces
+
+
+@shared_task
+def record_bounce_notification(provider, payload):
+    record_bounces(provider, PARSERS[provider](payload))
@@ -343,6 +343,35 @@ def get_user_messages(person, start=0, stop=20):
     return messages
 
 
+def get_message_email_recipients(message: SupportGroupMessage):
+    """Récupère la liste des personnes à notifier par email d'un nouveau message
+
+    Les conditions d'appartenance au groupe et d'abonnement aux notifications sont vérifiées dans
+    une même requête, sans charger les membres du groupe.
+    """
+    return (
+        Person.objects.filter(
+            Exists(
+                Membership.objects.filter(
+                    person_id=OuterRef("id"),
+                    supportgroup_id=message.supportgroup_id,
+                    membership_type__gte=message.required_membership_type,
+                )
+            ),
+            Exists(
+                Subscription.objects.filter(
+                    person_id=OuterRef("id"),
+                    membership__supportgroup_id=message.supportgroup_id,
+                    type=Subscription.SUBSCRIPTION_EMAIL,
+                    activity_type=Activity.TYPE_NEW_MESSAGE,
+                )
+            ),
+        )
+        # on ne veut pas envoyer de notification à l'auteur du message !
+        .exclude(id=message.author_id)
+    )
+
+
 def get_comment_recipients(comment: SupportGroupMessageComment):
     """Récupềre la liste des personnes destinataires d'un commentaire
 
@@ -70,6 +70,33 @@ def create_default_person_push_subscriptions(person):
     Subscription.objects.bulk_create(subscriptions)
 
 
+def create_default_group_memberships_subscriptions(memberships):
+    """Crée en une seule requête les abonnements par défaut de plusieurs adhésions
+
+    :param memberships: des couples `(membership_id, person_id)`
+    """
+    Subscription.objects.bulk_create(
+        [
+            Subscription(
+                person_id=person_id,
+                membership_id=membership_id,
+                type=subscription_type,
+                activity_type=activity_type,
+            )
+            for membership_id, person_id in memberships
+            for subscription_type, activity_types in (
+                (Subscription.SUBSCRIPTION_PUSH, Subscription.DEFAULT_GROUP_PUSH_TYPES),
+                (
+                    Subscription.SUBSCRIPTION_EMAIL,
+                    Subscription.DEFAULT_GROUP_EMAIL_TYPES,
+                ),
+            )
+            for activity_type in activity_types
+        ],
+        ignore_conflicts=True,
+    )
+
+
 def create_default_group_membership_subscriptions(person, membership):
     if not membership.id:
         membership = Membership.objects.get(
@@ -0,0 +1,168 @@
+"""Compteurs de montants alimentés par des paiements
+
+Chaque compteur est identifié par un nom. Sa valeur est conservée dans Redis, mais la source de
+vérité est le journal `PaymentCounterEntry`, qui enregistre les paiements déjà comptabilisés. Ce
+journal rend l'ajout ou le retrait d'un paiement idempotent : un paiement ne peut être compté
+qu'une seule fois, même si la notification de paiement est reçue plusieurs fois.
+
+Si la clé Redis disparaît, la valeur est recalculée depuis le journal lors de la lecture suivante,
+et la commande `reconcilier_compteurs` permet de corriger périodiquement une éventuelle dérive
+(incrément perdu entre la base et Redis par exemple).
+
+Les pages de progression étant très sollicitées lors des directs, chaque processus conserve la
+valeur lue pendant quelques secondes pour ne pas interroger Redis à chaque requête.
+"""
+
+import time
+
+from django.db import transaction
+from django.db.models import Sum
+
+from agir.api.redis import get_auth_redis_client
+from agir.payments.models import Payment, PaymentCounterEntry
+
+__all__ = ["Counter"]
+
+COUNTER_LOCAL_CACHE_TTL = 2
+
+# n'incrémente la clé que si elle existe déjà : une clé absente sera recalculée depuis le journal
+# à la lecture suivante, ce qui évite de la recréer avec un montant partiel
+_INCR_IF_EXISTS = """
+if redis.call("EXISTS", KEYS[1]) == 1 then
+    return redis.call("INCRBY", KEYS[1], ARGV[1])
+end
+return nil
+"""
+
+_local_cache = {}
+
+
+class Counter:
+    def __init__(self, name: str):
+        """Instancie un compteur
+
+        :param name: le nom unique du compteur, utilisé dans le journal et pour la clé Redis
+        """
+        self.name = name
+
+    @property
+    def redis_key(self):
+        return f"Counter:{self.name}:amount"
+
+    def _incr(self, amount):
+        client = get_auth_redis_client()
+        client.eval(_INCR_IF_EXISTS, 1, self.redis_key, amount)
+        _local_cache.pop(self.name, None)
+
+    def add_payment(self, payment: Payment, amount=None):
+        """Comptabilise un paiement, s'il ne l'a pas déjà été
+
+        :param payment: le paiement à comptabiliser
+        :param amount: le montant à compter, par défaut le prix du paiement
+        :return: si le paiement a effectivement été ajouté au compteur
+        """
+        if amount is None:
+            amount = payment.price
+
+        with transaction.atomic():
+            _, created = PaymentCounterEntry.objects.get_or_create(
+                counter=self.name, payment=payment, defaults={"amount": amount}
+            )
+            if created:
+                transaction.on_commit(lambda: self._incr(amount))
+
+        return created
+
+    def remove_payment(self, payment: Payment):
+        """Retire un paiement du compteur, s'il y avait été ajouté
+
+        :param payment: le paiement à retirer
+        :return: si le paiement a effectivement été retiré du compteur
+        """
+        with transaction.atomic():
+            entry = (
+                PaymentCounterEntry.objects.select_for_update()
+                .filter(counter=self.name, payment=payment)
+                .first()
+            )
+            if entry is None:
+                return False
+
+            entry.delete()
+            transaction.on_commit(lambda: self._incr(-entry.amount))
+
+        return True
+
+    def compute(self):
+        """Calcule la valeur du compteur à partir du journal"""
+        return (
+            PaymentCounterEntry.objects.filter(counter=self.name).aggregate(
+                total=Sum("amount")
+            )["total"]
+            or 0
+        )
+
+    def get_value(self):
+        """Renvoie la valeur du compteur
+
+        La valeur est lue dans le cache local du processus, puis dans Redis, et n'est recalculée
+        depuis le journal que si la clé Redis est absente.
+        """
+        now = time.monotonic()
+        cached = _local_cache.get(self.name)
+        if cached is not None and cached[0] > now:
+            return cached[1]
+
+        client = get_auth_redis_client()
+        raw_value = client.get(self.redis_key)
+
+        try:
+            value = int(raw_value)
+        except (ValueError, TypeError):
+            value = self.compute()
+            # si un autre processus a recalculé la valeur entre temps, on garde la sienne
+            if not client.set(self.redis_key, value, nx=True):
+                value = int(client.get(self.redis_key) or value)
+
+        _local_cache[self.name] = (now + COUNTER_LOCAL_CACHE_TTL, value)
+        return value
+
+    def reconcile(self):
+        """Corrige la valeur conservée dans Redis à partir du journal
+
+        :return: le couple (ancienne valeur, nouvelle valeur)
+        """
+        client = get_auth_redis_client()
+        value = self.compute()
+        previous = client.getset(self.redis_key, value)
+        _local_cache.pop(self.name, None)
+
+        try:
+            previous = int(previous)
+        except (ValueError, TypeError):
+            previous = None
+
+        return previous, value
+
+    def rebuild(self, payments):
+        """Reconstruit le journal du compteur à partir d'une liste de paiements
+
+        :param payments: un queryset des paiements qui doivent être comptabilisés
+        :return: la nouvelle valeur du compteur
+        """
+        with transaction.atomic():
+            PaymentCounterEntry.objects.filter(counter=self.name).delete()
+            PaymentCounterEntry.objects.bulk_create(
+                PaymentCounterEntry(counter=self.name, payment_id=id, amount=price)
+                for id, price in payments.values_list("id", "price").iterator()
+            )
+
+        return self.reconcile()[1]
+
+    @classmethod
+    def all_names(cls):
+        return (
+            PaymentCounterEntry.objects.values_list("counter", flat=True)
+            .order_by("counter")
+            .distinct()
+        )
@@ -0,0 +1,35 @@
+from django.core.management import BaseCommand
+
+from agir.lib.display import display_price
+from agir.payments.counters import Counter
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcule la valeur des compteurs de montants à partir du journal des paiements "
+        "comptabilisés, et corrige les valeurs conservées dans Redis. Destinée à être lancée "
+        "périodiquement."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "counters",
+            metavar="COMPTEUR",
+            nargs="*",
+            help="Les compteurs à réconcilier (tous par défaut)",
+        )
+
+    def handle(self, *args, counters, verbosity, **options):
+        names = counters or Counter.all_names()
+
+        for name in names:
+            previous, value = Counter(name).reconcile()
+
+            if previous is not None and previous != value:
+                self.stdout.write(
+                    self.style.WARNING(
+                        f"{name} : {display_price(previous)} corrigé en {display_price(value)}"
+                    )
+                )
+            elif verbosity > 1:
+                self.stdout.write(f"{name} : {display_price(value)}")
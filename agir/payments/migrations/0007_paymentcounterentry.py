@@ -0,0 +1,51 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("payments", "0006_alter_subscription_meta"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PaymentCounterEntry",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("counter", models.CharField(max_length=100, verbose_name="compteur")),
+                ("amount", models.IntegerField(verbose_name="montant")),
+                (
+                    "created",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="date d'ajout"
+                    ),
+                ),
+                (
+                    "payment",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="counter_entries",
+                        to="payments.payment",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Paiement comptabilisé",
+                "verbose_name_plural": "Paiements comptabilisés",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="paymentcounterentry",
+            constraint=models.UniqueConstraint(
+                fields=("counter", "payment"), name="unique_counter_payment"
+            ),
+        ),
+    ]
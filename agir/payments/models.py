@@ -21,7 +21,7 @@ from agir.payments.model_fields import AmountField
 from .payment_modes import PAYMENT_MODES
 from .types import PAYMENT_TYPES
 
-__all__ = ["Payment", "Subscription"]
+__all__ = ["Payment", "Subscription", "PaymentCounterEntry"]
 
 from ..checks import AbstractCheckPaymentMode
 
@@ -388,3 +388,26 @@ class Subscription(ExportModelOperationsMixin("subscription"), TimeStampedModel)
     class Meta:
         verbose_name = "Paiement récurrent"
         verbose_name_plural = "Paiements récurrents"
+
+
+class PaymentCounterEntry(models.Model):
+    """Paiement comptabilisé dans un compteur de montant
+
+    Voir `agir.payments.counters`.
+    """
+
+    counter = models.CharField("compteur", max_length=100)
+    payment = models.ForeignKey(
+        "Payment", on_delete=models.CASCADE, related_name="counter_entries"
+    )
+    amount = models.IntegerField("montant")
+    created = models.DateTimeField("date d'ajout", auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Paiement comptabilisé"
+        verbose_name_plural = "Paiements comptabilisés"
+        constraints = [
+            models.UniqueConstraint(
+                fields=("counter", "payment"), name="unique_counter_payment"
+            )
+        ]
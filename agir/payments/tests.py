@@ -1,3 +1,67 @@
 from django.test import TestCase
 
-# Create your tests here.
+from agir.api.redis import using_separate_redis_server
+from agir.payments import counters
+from agir.payments.counters import Counter
+from agir.payments.models import Payment
+
+
+@using_separate_redis_server
+class CounterTestCase(TestCase):
+    def setUp(self):
+        counters._local_cache.clear()
+        self.counter = Counter("test")
+        self.payments = [
+            Payment.objects.create(
+                price=price,
+                type="don_test",
+                mode="check_donations",
+                status=Payment.STATUS_COMPLETED,
+            )
+            for price in (1000, 2500)
+        ]
+
+    def add(self, payment):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.counter.add_payment(payment)
+
+    def remove(self, payment):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.counter.remove_payment(payment)
+
+    def test_payment_is_counted_only_once(self):
+        self.assertEqual(self.counter.get_value(), 0)
+        counters._local_cache.clear()
+
+        self.assertTrue(self.add(self.payments[0]))
+        self.assertFalse(self.add(self.payments[0]))
+        self.assertTrue(self.add(self.payments[1]))
+        self.assertEqual(self.counter.get_value(), 3500)
+
+        self.assertTrue(self.remove(self.payments[0]))
+        self.assertFalse(self.remove(self.payments[0]))
+        self.assertEqual(self.counter.get_value(), 2500)
+
+    def test_value_is_recomputed_when_redis_key_is_lost(self):
+        for payment in self.payments:
+            self.add(payment)
+
+        counters.get_auth_redis_client().delete(self.counter.redis_key)
+        counters._local_cache.clear()
+
+        self.assertEqual(self.counter.get_value(), 3500)
+
+    def test_reconcile_fixes_drift(self):
+        self.add(self.payments[0])
+        self.counter.get_value()
+        counters.get_auth_redis_client().incrby(self.counter.redis_key, 42)
+
+        self.assertEqual(self.counter.reconcile(), (1042, 1000))
+        self.assertEqual(self.counter.get_value(), 1000)
+
+    def test_value_is_cached_locally(self):
+        self.add(self.payments[0])
+        self.counter.get_value()
+        counters.get_auth_redis_client().incrby(self.counter.redis_key, 42)
+
+        self.assertEqual(self.counter.get_value(), 1000)
@@ -1,9 +1,15 @@
+import hashlib
+import pickle
 import statistics
 from datetime import timedelta
+from urllib.parse import urlencode
 
+from django.db.models import Count, Func, Value
+from django.db.models.functions import Concat, Substr
 from django.utils import timezone
 from push_notifications.models import GCMDevice
 
+from agir.api.redis import get_auth_redis_client
 from agir.groups.models import Membership, SupportGroup
 from agir.lib.data import code_postal_vers_code_departement, departements_par_code
 from agir.payments.models import Payment
@@ -11,10 +17,19 @@ from agir.people.models import Person
 from agir.presidentielle2022.apps import Presidentielle2022Config
 
 
-def get_statistics_for_queryset(original_queryset):
-    person_pks = original_queryset.values_list("pk", flat=True)
+STATISTICS_PROGRESS_STEP = 5000
+
+
+def get_statistics_for_queryset(original_queryset, progress=None):
+    """Calcule les statistiques affichées dans l'administration pour un ensemble de personnes
+
+    :param original_queryset: les personnes concernées
+    :param progress: fonction optionnelle appelée régulièrement avec le nombre de personnes
+        traitées et le nombre total de personnes
+    """
+    person_pks = original_queryset.values("pk")
     stats = {
-        "total": len(person_pks),
+        "total": original_queryset.count(),
         "is_political_support": 0,
         "contacts": 0,
         "known_phone_numbers": 0,
@@ -42,7 +57,10 @@ def get_statistics_for_queryset(original_queryset):
     unknown_genders = 0
     user_ids = []
 
-    for person in queryset:
+    for i, person in enumerate(queryset.iterator(chunk_size=2000)):
+        if progress is not None and i % STATISTICS_PROGRESS_STEP == 0:
+            progress(i, stats["total"])
+
         if person.is_political_support:
             stats["is_political_support"] += 1
         if person.date_of_birth:
@@ -81,9 +99,12 @@ def get_statistics_for_queryset(original_queryset):
             if person.location_zip not in stats["zip_codes"]:
                 stats["zip_codes"][person.location_zip] = 0
             stats["zip_codes"][person.location_zip] += 1
-            code_departement = code_postal_vers_code_departement(person.location_zip)
-            if code_departement:
-                departement = departements_par_code[code_departement]
+            code_departement = (
+                person.location_departement_id
+                or code_postal_vers_code_departement(person.location_zip)
+            )
+            departement = departements_par_code.get(code_departement)
+            if departement:
                 departement = f"{departement.id} - {departement.nom}"
                 if departement not in stats["departements"]:
                     stats["departements"][departement] = 0
@@ -163,3 +184,145 @@ def get_statistics_for_queryset(original_queryset):
     )
 
     return stats
+
+
+def get_nsp_subscriptions_chart_data(queryset):
+    return list(
+        queryset.exclude(meta__subscriptions__NSP__date__isnull=True)
+        .annotate(
+            subscription_datetime=Func(
+                "meta",
+                Value("subscriptions"),
+                Value("NSP"),
+                Value("date"),
+                function="jsonb_extract_path_text",
+            )
+        )
+        .annotate(
+            subscription_date=Concat(
+                Substr("subscription_datetime", 1, 10), Value("T00:00:00Z")
+            )
+        )
+        .values("subscription_date")
+        .annotate(y=Count("id"))
+        .order_by("subscription_date")
+    )
+
+
+# crée le calcul et fixe sa durée de vie en une seule opération atomique
+_CREATE_JOB = """
+if redis.call("HSETNX", KEYS[1], "status", ARGV[1]) == 0 then
+    return 0
+end
+redis.call("HSET", KEYS[1], "query", ARGV[2])
+redis.call("EXPIRE", KEYS[1], ARGV[3])
+return 1
+"""
+
+
+class PersonStatisticsJob:
+    """Calcul en tâche de fond des statistiques d'un ensemble de personnes
+
+    La requête correspondant aux filtres choisis est conservée dans Redis (sous forme sérialisée,
+    comme le permet Django pour `QuerySet.query`), ainsi que l'avancement et le résultat du
+    calcul. L'identifiant d'un calcul est calculé à partir des filtres choisis (les paramètres de la
+    liste des personnes, triés), et non de la requête sérialisée, qui n'est pas stable d'un
+    processus à l'autre : afficher à nouveau les statistiques pour les mêmes filtres permet de
+    suivre le calcul en cours ou d'en récupérer le résultat.
+
+    La durée de vie de la clé est prolongée à chaque mise à jour de l'avancement, pour qu'elle
+    n'expire pas pendant un calcul long.
+    """
+
+    EXPIRY = 15 * 60
+
+    STATUS_PENDING = "pending"
+    STATUS_RUNNING = "running"
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+
+    def __init__(self, job_id):
+        self.id = job_id
+        self.key = f"PersonStatistics:{job_id}"
+
+    @classmethod
+    def for_filters(cls, filters):
+        """Renvoie le calcul correspondant aux filtres indiqués
+
+        :param filters: les paramètres de la liste des personnes, sous forme de couples (nom, valeur)
+        """
+        spec = urlencode(sorted(filters))
+        return cls(hashlib.sha1(spec.encode()).hexdigest())
+
+    @classmethod
+    def start(cls, queryset, filters):
+        """Renvoie le calcul correspondant aux filtres, en le créant si nécessaire
+
+        :param queryset: le queryset des personnes, conservé pour le calcul
+        :param filters: les paramètres de la liste des personnes, sous forme de couples (nom, valeur)
+        :return: un couple (calcul, booléen indiquant si le calcul vient d'être créé)
+        """
+        job = cls.for_filters(filters)
+        query = pickle.dumps(queryset.query)
+
+        created = get_auth_redis_client().eval(
+            _CREATE_JOB, 1, job.key, cls.STATUS_PENDING, query, cls.EXPIRY
+        )
+
+        return job, bool(created)
+
+    def get_queryset(self):
+        queryset = Person.objects.all()
+        queryset.query = pickle.loads(get_auth_redis_client().hget(self.key, "query"))
+        return queryset
+
+    def get_state(self):
+        state = get_auth_redis_client().hgetall(self.key)
+        if not state:
+            return None
+
+        return {
+            "status": state[b"status"].decode(),
+            "done": int(state.get(b"done", 0)),
+            "total": int(state.get(b"total", 0)),
+            "result": pickle.loads(state[b"result"]) if b"result" in state else None,
+        }
+
+    def _update(self, mapping):
+        get_auth_redis_client().pipeline().hset(self.key, mapping=mapping).expire(
+            self.key, self.EXPIRY
+        ).execute()
+
+    def set_progress(self, done, total):
+        self._update({"status": self.STATUS_RUNNING, "done": done, "total": total})
+
+    def set_result(self, result):
+        self._update(
+            {
+                "status": self.STATUS_DONE,
+                "done": result["statistics"]["total"],
+                "total": result["statistics"]["total"],
+                "result": pickle.dumps(result),
+            }
+        )
+
+    def set_failed(self):
+        self._update({"status": self.STATUS_FAILED})
+
+    def delete(self):
+        get_auth_redis_client().delete(self.key)
+
+    def run(self):
+        try:
+            queryset = self.get_queryset()
+            self.set_result(
+                {
+                    "statistics": get_statistics_for_queryset(
+                        queryset, progress=self.set_progress
+                    ),
+                    "chart_data": get_nsp_subscriptions_chart_data(queryset),
+                }
+            )
+        except Exception:
+            self.set_failed()
+            raise
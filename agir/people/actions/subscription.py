@@ -1,17 +1,24 @@
+import json
+import logging
+import uuid
 from dataclasses import dataclass
 from datetime import timedelta
 from typing import Optional
 
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import transaction
 from django.utils import timezone
 
+from agir.api.redis import get_auth_redis_client
 from agir.authentication.tokens import subscription_confirmation_token_generator
 from agir.elus.models import types_elus, StatutMandat, MandatMunicipal
 from agir.groups.models import Membership
 from agir.lib.http import add_query_params_to_url
 from agir.people.models import Person, PersonTag
 
+logger = logging.getLogger(__name__)
+
 
 def make_subscription_token(email, **kwargs):
     return subscription_confirmation_token_generator.make_token(email=email, **kwargs)
@@ -143,11 +150,19 @@ SUBSCRIPTION_SUCCESS_REDIRECT = {
 }
 
 
-def save_subscription_information(person, type, data, new=False):
-    person_fields = set(f.name for f in Person._meta.get_fields())
+PERSON_FIELD_NAMES = frozenset(f.name for f in Person._meta.get_fields())
+
+SUBSCRIPTION_QUEUE_KEY = "SubscriptionQueue"
+# délai pendant lequel les inscriptions sont accumulées avant d'être enregistrées ensemble
+SUBSCRIPTION_QUEUE_DELAY = 5
+SUBSCRIPTION_QUEUE_BATCH_SIZE = 200
+# les inscriptions en attente qui n'ont pas pu être enregistrées sont conservées dans cette liste
+SUBSCRIPTION_QUEUE_FAILED_KEY = f"{SUBSCRIPTION_QUEUE_KEY}:failed"
+
 
+def save_subscription_information(person, type, data, new=False):
     # mise à jour des différents champs
-    for f in person_fields.intersection(data):
+    for f in PERSON_FIELD_NAMES.intersection(data):
         # Si la personne n'est pas nouvelle on ne remplace que les champs vides
         setattr(person, f, data[f] if new else getattr(person, f) or data[f])
 
@@ -160,18 +175,19 @@ def save_subscription_information(person, type, data, new=False):
     if type not in subscriptions:
         subscriptions[type] = {"date": timezone.now().isoformat()}
         if referrer_id := data.get("referrer", data.get("referer")):
-            try:
-                referrer = Person.objects.get(referrer_id=referrer_id)
-            except Person.DoesNotExist:
-                pass
-            else:
-                subscriptions[type]["referrer"] = str(referrer.pk)
+            referrer_pk = (
+                Person.objects.filter(referrer_id=referrer_id)
+                .values_list("pk", flat=True)
+                .first()
+            )
+            if referrer_pk is not None:
+                subscriptions[type]["referrer"] = str(referrer_pk)
 
                 # l'import se fait ici pour éviter les imports circulaires
                 from ..tasks import notify_referrer
 
                 notify_referrer.delay(
-                    referrer_id=str(referrer.id),
+                    referrer_id=str(referrer_pk),
                     referred_id=str(person.id),
                     referral_type=type,
                 )
@@ -204,6 +220,144 @@ def save_subscription_information(person, type, data, new=False):
         person.save()
 
 
+def enqueue_subscription_information(person_id, type, data):
+    """Met en file d'attente l'enregistrement des informations d'inscription d'une personne existante
+
+    Les inscriptions en attente sont enregistrées par lots par `save_queued_subscription_information`.
+    """
+    client = get_auth_redis_client()
+    client.rpush(
+        SUBSCRIPTION_QUEUE_KEY,
+        json.dumps(
+            {"person_id": str(person_id), "type": type, "data": data},
+            cls=DjangoJSONEncoder,
+        ),
+    )
+    schedule_queued_subscriptions(client)
+
+
+def schedule_queued_subscriptions(client):
+    if client.set(
+        f"{SUBSCRIPTION_QUEUE_KEY}:scheduled",
+        1,
+        nx=True,
+        ex=SUBSCRIPTION_QUEUE_DELAY * 10,
+    ):
+        # l'import se fait ici pour éviter les imports circulaires
+        from ..tasks import save_queued_subscriptions
+
+        save_queued_subscriptions.apply_async(countdown=SUBSCRIPTION_QUEUE_DELAY)
+
+
+def _merge_subscriptions(entries):
+    """Regroupe les inscriptions d'une même adresse email pour un même type d'inscription
+
+    Les informations les plus récentes l'emportent, à l'exception des métadonnées, qui sont fusionnées.
+    """
+    merged = {}
+    for entry in entries:
+        key = (entry["data"]["email"].lower(), entry["type"])
+        if key in merged:
+            previous = merged[key]
+            entry["data"] = {
+                **previous["data"],
+                **entry["data"],
+                "metadata": {
+                    **(previous["data"].get("metadata") or {}),
+                    **(entry["data"].get("metadata") or {}),
+                },
+            }
+        merged[key] = entry
+    return merged.values()
+
+
+def save_queued_subscription_information():
+    """Enregistre par lots les inscriptions en attente
+
+    Les inscriptions ne sont retirées de la file qu'une fois enregistrées : elles peuvent donc être
+    traitées deux fois en cas d'interruption, ce que permet `save_subscription_information`, qui ne
+    remplace que les champs vides. Celles dont l'enregistrement échoue sont déplacées dans la liste
+    `SUBSCRIPTION_QUEUE_FAILED_KEY`, pour ne pas bloquer le traitement des suivantes.
+    """
+    client = get_auth_redis_client()
+    client.delete(f"{SUBSCRIPTION_QUEUE_KEY}:scheduled")
+
+    # un seul traitement à la fois, pour qu'une même inscription ne soit pas retirée deux fois
+    lock = client.lock(
+        f"{SUBSCRIPTION_QUEUE_KEY}:lock", timeout=600, blocking_timeout=0
+    )
+    if not lock.acquire():
+        schedule_queued_subscriptions(client)
+        return
+
+    try:
+        _save_queued_subscription_information(client)
+    finally:
+        lock.release()
+
+
+def _parse_queued_subscriptions(client, items):
+    entries = []
+    for item in items:
+        try:
+            entry = json.loads(item)
+            entry["person_id"] = uuid.UUID(entry["person_id"])
+            # les champs utilisés pour regrouper les inscriptions doivent être présents
+            if not isinstance(entry["type"], str) or not isinstance(
+                entry["data"]["email"], str
+            ):
+                raise TypeError("Inscription incomplète")
+        except (ValueError, TypeError, KeyError):
+            logger.exception(
+                "Inscription en attente invalide", extra={"subscription": item}
+            )
+            client.rpush(SUBSCRIPTION_QUEUE_FAILED_KEY, item)
+        else:
+            entries.append(entry)
+    return entries
+
+
+def _save_queued_subscription_information(client):
+    while True:
+        items = client.lrange(
+            SUBSCRIPTION_QUEUE_KEY, 0, SUBSCRIPTION_QUEUE_BATCH_SIZE - 1
+        )
+        if not items:
+            return
+
+        entries = _merge_subscriptions(_parse_queued_subscriptions(client, items))
+        try:
+            people = Person.objects.in_bulk([entry["person_id"] for entry in entries])
+        except Exception:
+            # erreur indépendante des inscriptions elles-mêmes : le lot est conservé et le
+            # traitement sera relancé plus tard
+            schedule_queued_subscriptions(client)
+            raise
+
+        for entry in entries:
+            person = people.get(entry["person_id"])
+            if person is None:
+                continue
+
+            try:
+                with transaction.atomic():
+                    save_subscription_information(person, entry["type"], entry["data"])
+            except Exception:
+                logger.exception(
+                    "Erreur lors de l'enregistrement d'une inscription en attente",
+                    extra={"subscription": entry},
+                )
+                client.rpush(
+                    SUBSCRIPTION_QUEUE_FAILED_KEY,
+                    json.dumps(
+                        {**entry, "person_id": str(entry["person_id"])},
+                        cls=DjangoJSONEncoder,
+                    ),
+                )
+
+        client.ltrim(SUBSCRIPTION_QUEUE_KEY, len(items), -1)
+
+
 def subscription_success_redirect_url(type, id, data):
     params = {"agir_id": str(id)}
     url = SUBSCRIPTION_SUCCESS_REDIRECT[type]
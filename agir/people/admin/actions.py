@@ -8,6 +8,7 @@ from django.http import HttpResponseRedirect
 from django.template.response import TemplateResponse
 
 from agir.lib.admin.form_fields import AutocompleteSelectModel
+from agir.lib.utils import grouper
 from agir.people.actions.export import liaisons_to_csv_response, people_to_csv_response
 from agir.people.actions.subscription import DATE_2022_LIAISON_META_PROPERTY
 from agir.people.models import PersonTag, Person
@@ -77,7 +78,7 @@ class AddPersonTagForm(forms.Form):
                 admin_site=model_admin.admin_site,
                 choices=self.fields["tag"].choices,
             ),
-            people.first()._meta.get_field("tags").remote_field,
+            Person._meta.get_field("tags").remote_field,
             admin_site=model_admin.admin_site,
             can_add_related=request.user.has_perm("people.add_persontag"),
             can_change_related=request.user.has_perm("people.change_persontag"),
@@ -85,7 +86,17 @@ class AddPersonTagForm(forms.Form):
 
     def save(self):
         tag = self.cleaned_data["tag"]
-        tag.people.add(*self.people)
+        through = Person.tags.through
+
+        # les personnes sont ajoutées par lots, sans charger l'ensemble des personnes concernées
+        for batch in grouper(
+            self.people.order_by().values_list("pk", flat=True).iterator(), 5000
+        ):
+            through.objects.bulk_create(
+                [through(person_id=pk, persontag_id=tag.pk) for pk in batch],
+                ignore_conflicts=True,
+            )
+
         return tag
 
 
@@ -134,6 +145,7 @@ def bulk_add_tag(modeladmin, request, queryset):
         "has_change_permission": modeladmin.has_change_permission(request),
         "has_view_permission": modeladmin.has_view_permission(request),
         "media": modeladmin.media + admin_form.media,
+        "select_across": request.POST.get("select_across") == "1",
     }
     context.update(modeladmin.admin_site.each_context(request))
 
@@ -12,8 +12,7 @@ from django.contrib.admin.views.main import ERROR_FLAG
 from django.contrib.gis.admin import OSMGeoAdmin
 from django.core.exceptions import PermissionDenied
 from django.core.serializers.json import DjangoJSONEncoder
-from django.db.models import Count, Max, Func, Value
-from django.db.models.functions import Concat, Substr
+from django.db.models import Count, Max
 from django.http import HttpResponseRedirect, Http404
 from django.shortcuts import get_object_or_404
 from django.template.response import TemplateResponse, SimpleTemplateResponse
@@ -30,11 +29,15 @@ from agir.lib.admin.filters import (
     RegionListFilter,
     CirconscriptionLegislativeFilter,
 )
-from agir.lib.admin.panels import CenterOnFranceMixin, DisplayContactPhoneMixin
+from agir.lib.admin.panels import (
+    CenterOnFranceMixin,
+    DisplayContactPhoneMixin,
+    LargeChangeListMixin,
+)
 from agir.lib.admin.utils import display_link
 from agir.lib.utils import generate_token_params, front_url
 from agir.notifications.models import Subscription
-from agir.people.actions.stats import get_statistics_for_queryset
+from agir.people.actions.stats import PersonStatisticsJob
 from agir.people.admin import filters
 from agir.people.admin.actions import (
     export_people_to_csv,
@@ -63,6 +66,7 @@ from agir.people.models import (
 )
 from agir.people.person_forms.display import default_person_form_display
 from agir.people.person_forms.models import PersonForm, PersonFormSubmission
+from agir.people.tasks import calculer_statistiques_personnes
 
 __all__ = [
     "PersonAdmin",
@@ -77,7 +81,9 @@ __all__ = [
 
 
 @admin.register(Person)
-class PersonAdmin(DisplayContactPhoneMixin, CenterOnFranceMixin, OSMGeoAdmin):
+class PersonAdmin(
+    LargeChangeListMixin, DisplayContactPhoneMixin, CenterOnFranceMixin, OSMGeoAdmin
+):
     list_display = (
         "__str__",
         "display_contact_phone",
@@ -495,27 +501,29 @@ class PersonAdmin(DisplayContactPhoneMixin, CenterOnFranceMixin, OSMGeoAdmin):
             return HttpResponseRedirect(request.path + "?" + ERROR_FLAG + "=1")
 
         queryset = cl.get_queryset(request)
-        statistics = get_statistics_for_queryset(queryset)
-        chart_data = (
-            queryset.exclude(meta__subscriptions__NSP__date__isnull=True)
-            .annotate(
-                subscription_datetime=Func(
-                    "meta",
-                    Value("subscriptions"),
-                    Value("NSP"),
-                    Value("date"),
-                    function="jsonb_extract_path_text",
-                )
-            )
-            .annotate(
-                subscription_date=Concat(
-                    Substr("subscription_datetime", 1, 10), Value("T00:00:00Z")
-                )
-            )
-            .values("subscription_date")
-            .annotate(y=Count("id"))
-            .order_by("subscription_date")
+        job, created = PersonStatisticsJob.start(
+            queryset,
+            [
+                (key, value)
+                for key, values in request.GET.lists()
+                if key != ERROR_FLAG
+                for value in values
+            ],
         )
+        if created:
+            calculer_statistiques_personnes.delay(job.id)
+
+        state = job.get_state() or {"status": PersonStatisticsJob.STATUS_PENDING}
+        result = state.get("result") or {}
+
+        if state["status"] == PersonStatisticsJob.STATUS_FAILED:
+            # le calcul sera relancé au prochain affichage de la page
+            job.delete()
+            messages.add_message(
+                request=request,
+                level=messages.ERROR,
+                message="Le calcul des statistiques a échoué. Rechargez la page pour le relancer.",
+            )
 
         context = {
             **self.admin_site.each_context(request),
@@ -524,9 +532,12 @@ class PersonAdmin(DisplayContactPhoneMixin, CenterOnFranceMixin, OSMGeoAdmin):
             "cl": cl,
             "media": self.media,
             "preserved_filters": self.get_preserved_filters(request),
-            "chart_data": json.dumps(list(chart_data), cls=DjangoJSONEncoder),
+            "chart_data": json.dumps(
+                result.get("chart_data", []), cls=DjangoJSONEncoder
+            ),
             "changelist_link": f'{reverse("admin:people_person_changelist")}?{request.GET.urlencode()}',
-            "statistics": statistics,
+            "statistics": result.get("statistics"),
+            "job": state,
         }
 
         return TemplateResponse(
@@ -580,38 +591,6 @@ class PersonAdmin(DisplayContactPhoneMixin, CenterOnFranceMixin, OSMGeoAdmin):
             f'{reverse("admin:people_person_statistics")}?{request.GET.urlencode()}'
         )
 
-        if (
-            hasattr(request, "POST")
-            and request.POST.get("action", None)
-            and not request.POST.getlist(admin.helpers.ACTION_CHECKBOX_NAME)
-        ):
-            # If no item is selected and action select_across is set to True
-            # allow applying the action to all items that match the current view
-            # filters (optionally limiting the number of items to a maximum value)
-            select_across = False
-            try:
-                action = self.get_actions(request)[request.POST["action"]][0]
-                select_across = action.select_across
-            except (KeyError, AttributeError):
-                pass
-
-            if select_across:
-                items = (
-                    self.get_changelist_instance(request)
-                    .get_queryset(request)
-                    .values_list("id", flat=True)
-                )
-
-                if hasattr(action, "max_items"):
-                    items[: action.max_items]
-
-                post = request.POST.copy()
-                post.setlist(
-                    admin.helpers.ACTION_CHECKBOX_NAME,
-                    items,
-                )
-                request.POST = post
-
         return super().changelist_view(request, extra_context)
 
     def save_form(self, request, form, change):
@@ -863,7 +842,7 @@ class PersonFormAdmin(FormSubmissionViewsMixin, admin.ModelAdmin):
 
 
 @admin.register(PersonFormSubmission)
-class PersonFormSubmissionAdmin(admin.ModelAdmin):
+class PersonFormSubmissionAdmin(LargeChangeListMixin, admin.ModelAdmin):
     autocomplete_fields = ("person",)
     search_fields = ("person__search", "form__title")
     list_display = ("created", "form_link", "person_link")
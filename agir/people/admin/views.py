@@ -1,12 +1,17 @@
-import csv
 from uuid import uuid4
 
 import gspread
 from django.conf import settings
 from django.contrib import messages
 from django.core.exceptions import PermissionDenied
+from django.core.paginator import Paginator
 from django.db import transaction
-from django.http import HttpResponse, HttpResponseRedirect, Http404, QueryDict
+from django.http import (
+    HttpResponseRedirect,
+    Http404,
+    QueryDict,
+    StreamingHttpResponse,
+)
 from django.shortcuts import get_object_or_404
 from django.template.response import TemplateResponse
 from django.urls import reverse
@@ -15,6 +20,7 @@ from django.views.generic.detail import SingleObjectMixin
 
 from agir.lib.admin.panels import AdminViewMixin
 from agir.lib.admin.utils import admin_url
+from agir.lib.export import rows_to_csv_lines
 from agir.people.actions.management import merge_persons
 from agir.people.admin.forms import (
     AddPersonEmailForm,
@@ -30,18 +36,33 @@ from agir.people.tasks import copier_toutes_reponses_vers_feuille_externe
 
 class FormSubmissionViewsMixin:
     person_form_display = default_person_form_display
+    results_per_page = 500
 
     def get_submission_queryset(self, form):
         return form.submissions.all().select_related("person")
 
-    def generate_result_table(self, form, html=True, fieldsets_titles=True):
-        submissions = self.get_submission_queryset(form)
+    def generate_result_page(self, form, page_number, html=True, fieldsets_titles=True):
+        """Formate uniquement les réponses de la page demandée
 
-        headers, submissions = self.person_form_display.get_formatted_submissions(
-            submissions, html=html, fieldsets_titles=fieldsets_titles
+        Les en-têtes sont calculés sur l'ensemble des réponses pour rester identiques d'une page à l'autre.
+        """
+        submissions = self.get_submission_queryset(form)
+        paginator = Paginator(
+            submissions.order_by("-pk").values_list("pk", flat=True),
+            self.results_per_page,
+        )
+        page = paginator.get_page(page_number)
+
+        headers, rows = self.person_form_display.iter_formatted_submissions(
+            submissions.filter(pk__in=list(page.object_list)).order_by("-pk"),
+            html=html,
+            fieldsets_titles=fieldsets_titles,
+            additional_fields=self.person_form_display.get_additional_fields(
+                form, submissions
+            ),
         )
 
-        return {"form": form, "headers": headers, "submissions": submissions}
+        return {"form": form, "headers": headers, "submissions": rows, "page": page}
 
     def view_results(self, request, pk, title=None, download_url=None):
         if not self.has_change_permission(request) or not request.user.has_perm(
@@ -50,7 +71,7 @@ class FormSubmissionViewsMixin:
             raise PermissionDenied
 
         form = PersonForm.objects.get(id=pk)
-        table = self.generate_result_table(form)
+        table = self.generate_result_page(form, request.GET.get("page"))
         if download_url is None:
             download_url = admin_url(
                 "admin:people_personform_download_results", args=(form.pk,)
@@ -63,6 +84,7 @@ class FormSubmissionViewsMixin:
             "form": table["form"],
             "headers": table["headers"],
             "submissions": table["submissions"],
+            "page": table["page"],
             "download_url": download_url,
         }
 
@@ -74,18 +96,19 @@ class FormSubmissionViewsMixin:
 
         form = get_object_or_404(PersonForm, id=pk)
         filename = filename or form.slug
-        table = self.generate_result_table(form, html=False, fieldsets_titles=False)
+        headers, rows = self.person_form_display.iter_formatted_submissions(
+            self.get_submission_queryset(form).order_by("created"),
+            html=False,
+            fieldsets_titles=False,
+        )
 
-        response = HttpResponse(content_type="text/csv")
+        response = StreamingHttpResponse(
+            rows_to_csv_lines(rows, headers=headers), content_type="text/csv"
+        )
         response["Content-Disposition"] = 'attachment; filename="{0}.csv"'.format(
             filename
         )
 
-        writer = csv.writer(response)
-        writer.writerow(table["headers"])
-        for submission in table["submissions"]:
-            writer.writerow(submission)
-
         return response
 
     def create_result_url(self, request, pk, clear=False):
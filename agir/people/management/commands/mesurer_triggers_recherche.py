@@ -0,0 +1,96 @@
+import time
+import uuid
+from importlib import import_module
+from itertools import cycle, islice
+
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from agir.people.models import Person, PersonEmail
+
+search_triggers = import_module(
+    "agir.people.migrations.0035_search_triggers_par_requete"
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure la durée d'un import groupé d'adresses email (création, modification puis "
+        "suppression), avec les déclencheurs de recherche ligne à ligne puis par requête. "
+        "Toutes les modifications sont annulées à la fin de chaque mesure, mais les tables des "
+        "personnes et des adresses sont verrouillées pendant la mesure : à lancer sur une base locale."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-n",
+            "--emails",
+            type=int,
+            default=10000,
+            help="Le nombre d'adresses email importées.",
+        )
+        parser.add_argument(
+            "-p",
+            "--people",
+            type=int,
+            default=1000,
+            help="Le nombre de personnes entre lesquelles les adresses sont réparties.",
+        )
+
+    def measure(self, person_ids, emails):
+        prefix = uuid.uuid4().hex[:8]
+        durations = []
+
+        start = time.perf_counter()
+        PersonEmail.objects.bulk_create(
+            [
+                PersonEmail(person_id=person_id, address=f"{prefix}-{i}@agir.test")
+                for i, person_id in enumerate(islice(cycle(person_ids), emails))
+            ]
+        )
+        durations.append(time.perf_counter() - start)
+
+        imported = PersonEmail.objects.filter(address__startswith=f"{prefix}-")
+
+        start = time.perf_counter()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "UPDATE people_personemail SET address = 'modifie-' || address WHERE id = ANY(%s)",
+                [list(imported.values_list("id", flat=True))],
+            )
+        durations.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        PersonEmail.objects.filter(address__startswith=f"modifie-{prefix}-").delete()
+        durations.append(time.perf_counter() - start)
+
+        return durations
+
+    def handle(self, *args, emails, people, **options):
+        person_ids = list(Person.objects.values_list("id", flat=True)[:people])
+        if not person_ids:
+            raise CommandError("La base ne contient aucune personne.")
+
+        measures = [
+            (
+                "déclencheurs ligne à ligne",
+                search_triggers.REMOVE_STATEMENT_LEVEL_SEARCH_TRIGGERS
+                + search_triggers.CREATE_ROW_LEVEL_SEARCH_TRIGGERS,
+            ),
+            ("déclencheurs par requête", None),
+        ]
+
+        for label, setup in measures:
+            with transaction.atomic():
+                if setup:
+                    with connection.cursor() as cursor:
+                        cursor.execute(setup)
+
+                creation, update, deletion = self.measure(person_ids, emails)
+                # annule les adresses importées, ainsi que le remplacement des déclencheurs
+                transaction.set_rollback(True)
+
+            self.stdout.write(
+                f"{label} : {emails / creation:.0f} créations, {emails / update:.0f} modifications "
+                f"et {emails / deletion:.0f} suppressions par seconde"
+            )
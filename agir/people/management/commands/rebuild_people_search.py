@@ -0,0 +1,68 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+REBUILD_BATCH_REQUEST = """
+WITH batch AS (
+  SELECT id FROM people_person
+  WHERE %(last_id)s::uuid IS NULL OR id > %(last_id)s::uuid
+  ORDER BY id
+  LIMIT %(batch_size)s
+)
+UPDATE people_person p
+SET search = get_people_tsvector(p.id, p.first_name, p.last_name, p.location_zip)
+FROM batch
+WHERE p.id = batch.id
+RETURNING p.id;
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcule le vecteur de recherche de toutes les personnes, par lots validés séparément "
+        "pour ne pas verrouiller la table"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-b",
+            "--batch-size",
+            type=int,
+            dest="batch_size",
+            default=5000,
+            help="Nombre de personnes mises à jour à chaque requête",
+        )
+        parser.add_argument(
+            "-p",
+            "--pause",
+            type=float,
+            dest="pause",
+            default=0.0,
+            help="Pause entre deux lots, en secondes",
+        )
+
+    def handle(self, *args, batch_size, pause, **options):
+        last_id = None
+        total = 0
+
+        while True:
+            # chaque lot fait l'objet de sa propre transaction : les verrous sont relâchés entre deux lots
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    REBUILD_BATCH_REQUEST,
+                    {"last_id": last_id, "batch_size": batch_size},
+                )
+                ids = [id for id, in cursor.fetchall()]
+
+            if not ids:
+                break
+
+            last_id = str(max(ids))
+            total += len(ids)
+            self.stdout.write(f"{total} personnes mises à jour...")
+
+            if pause:
+                time.sleep(pause)
+
+        self.stdout.write(self.style.SUCCESS(f"{total} personnes mises à jour."))
@@ -2,6 +2,7 @@ import secrets
 from argparse import FileType
 from pathlib import Path
 
+from django.conf import settings
 from django.contrib.gis.db.models.functions import Distance as DistanceFunction
 from django.core.management.base import BaseCommand, CommandError
 from phonenumber_field.phonenumber import PhoneNumber
@@ -17,7 +18,12 @@ from agir.lib.management_utils import (
     region_argument,
     segment_argument,
 )
-from agir.lib.sms import compute_sms_length_information, send_bulk_sms, SMSSendException
+from agir.lib.sms import (
+    compute_sms_length_information,
+    send_bulk_sms,
+    SMSSendException,
+    BulkSMSBucket,
+)
 from agir.people.models import Person
 
 
@@ -59,6 +65,12 @@ class Command(BaseCommand):
         parser.add_argument("-T", "--exclude-telegram", action="store_true")
         parser.add_argument("-s", "--sentfile", type=FileType(mode="r"))
         parser.add_argument("-E", "--export-file", type=FileType(mode="w"))
+        parser.add_argument(
+            "-r",
+            "--resume",
+            metavar="TOKEN",
+            help="Reprendre l'envoi interrompu identifié par TOKEN (mêmes destinataires et même message)",
+        )
 
     def can_send(self, phone):
         return (
@@ -91,6 +103,7 @@ class Command(BaseCommand):
         at,
         exclude_telegram,
         export_file,
+        resume,
         **options,
     ):
         if (
@@ -139,9 +152,11 @@ class Command(BaseCommand):
             res = list(
                 drop_duplicate_numbers(
                     (
-                        (p.contact_phone, p.distance)
-                        for p in ps.iterator()
-                        if self.can_send(p.contact_phone)
+                        (contact_phone, distance)
+                        for contact_phone, distance in ps.values_list(
+                            "contact_phone", "distance"
+                        ).iterator()
+                        if self.can_send(contact_phone)
                     ),
                     number,
                 )
@@ -163,7 +178,12 @@ class Command(BaseCommand):
                 ps = ps.exclude(meta__has_telegram=True)
 
             numbers = set(
-                p.contact_phone for p in ps.iterator() if self.can_send(p.contact_phone)
+                contact_phone
+                for contact_phone in ps.order_by()
+                .values_list("contact_phone", flat=True)
+                .distinct()
+                .iterator()
+                if self.can_send(contact_phone)
             )
 
         self.stdout.write(f"Nombre de numéros : {len(numbers)}")
@@ -211,12 +231,24 @@ class Command(BaseCommand):
         if answer == "ANNULER":
             return
 
-        token = secrets.token_urlsafe(4)
+        token = resume or secrets.token_urlsafe(4)
         sent_filename = Path(f"sent.{token}")
         invalid_filename = Path(f"invalid.{token}")
+        self.stdout.write(
+            f"Envoi {token} : en cas d'interruption, relancez la commande avec l'option --resume {token}"
+        )
 
         try:
-            sent, invalid = send_bulk_sms(message, tqdm(numbers), at=at)
+            with tqdm(total=len(numbers)) as progress:
+                sent, invalid = send_bulk_sms(
+                    message,
+                    numbers,
+                    at=at,
+                    concurrency=settings.SMS_BULK_CONCURRENCY,
+                    bucket=BulkSMSBucket,
+                    status_name=token,
+                    on_batch_done=progress.update,
+                )
         except SMSSendException as e:
             self.stderr.write("Erreur lors de l'envoi des SMS.")
             self.stderr.write(
@@ -233,6 +265,9 @@ class Command(BaseCommand):
                 raise
 
             self.stderr.write(f"Fichiers {sent_filename} et {invalid_filename} écrits.")
+            self.stderr.write(
+                f"Relancez la commande avec l'option --resume {token} pour contacter les numéros restants."
+            )
             return 1
 
         self.stdout.write(f"{len(sent)} SMS envoyés")
@@ -0,0 +1,142 @@
+from django.db import migrations
+
+REMOVE_ROW_LEVEL_SEARCH_TRIGGERS = """
+DROP TRIGGER IF EXISTS update_search_field_when_email_modified ON people_personemail;
+DROP FUNCTION IF EXISTS process_update_email();
+DROP FUNCTION IF EXISTS update_people_search_field_from_id(people_person.id%TYPE);
+DROP TRIGGER IF EXISTS update_person_search_field_when_modified ON people_person;
+"""
+
+CREATE_STATEMENT_LEVEL_SEARCH_TRIGGERS = """
+CREATE FUNCTION update_people_search_field_from_ids(person_ids people_person.id%TYPE[]) RETURNS VOID AS $$
+BEGIN
+  --
+  -- Update search vector for all the persons identified by person_ids, in a single statement
+  --
+  UPDATE people_person SET search = get_people_tsvector(id, first_name, last_name, location_zip)
+  WHERE id = ANY(person_ids);
+END
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION process_update_emails() RETURNS TRIGGER AS $$
+BEGIN
+  --
+  -- Statement-level trigger function to update the search vector of all the persons whose
+  -- emails have been created, updated or deleted by the statement
+  --
+  IF (tg_op = 'INSERT') THEN
+    PERFORM update_people_search_field_from_ids(
+      ARRAY(SELECT DISTINCT person_id FROM new_emails)
+    );
+  ELSIF (tg_op = 'DELETE') THEN
+    PERFORM update_people_search_field_from_ids(
+      ARRAY(SELECT DISTINCT person_id FROM old_emails)
+    );
+  ELSIF (tg_op = 'UPDATE') THEN
+    -- when an email is moved to another person, both persons are updated
+    PERFORM update_people_search_field_from_ids(ARRAY(
+      SELECT n.person_id
+      FROM new_emails n JOIN old_emails o ON o.id = n.id
+      WHERE o.address <> n.address OR o.person_id <> n.person_id
+      UNION
+      SELECT o.person_id
+      FROM new_emails n JOIN old_emails o ON o.id = n.id
+      WHERE o.person_id <> n.person_id
+    ));
+  END IF;
+  RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER update_person_search_field_when_created
+BEFORE INSERT ON people_person
+  FOR EACH ROW EXECUTE PROCEDURE process_update_person();
+
+CREATE TRIGGER update_person_search_field_when_modified
+BEFORE UPDATE OF first_name, last_name, location_zip ON people_person
+  FOR EACH ROW
+  WHEN (
+    OLD.first_name IS DISTINCT FROM NEW.first_name
+    OR OLD.last_name IS DISTINCT FROM NEW.last_name
+    OR OLD.location_zip IS DISTINCT FROM NEW.location_zip
+  )
+  EXECUTE PROCEDURE process_update_person();
+
+CREATE TRIGGER update_search_field_when_email_created
+AFTER INSERT ON people_personemail
+  REFERENCING NEW TABLE AS new_emails
+  FOR EACH STATEMENT EXECUTE PROCEDURE process_update_emails();
+
+CREATE TRIGGER update_search_field_when_email_modified
+AFTER UPDATE ON people_personemail
+  REFERENCING OLD TABLE AS old_emails NEW TABLE AS new_emails
+  FOR EACH STATEMENT EXECUTE PROCEDURE process_update_emails();
+
+CREATE TRIGGER update_search_field_when_email_deleted
+AFTER DELETE ON people_personemail
+  REFERENCING OLD TABLE AS old_emails
+  FOR EACH STATEMENT EXECUTE PROCEDURE process_update_emails();
+"""
+
+REMOVE_STATEMENT_LEVEL_SEARCH_TRIGGERS = """
+DROP TRIGGER IF EXISTS update_search_field_when_email_created ON people_personemail;
+DROP TRIGGER IF EXISTS update_search_field_when_email_modified ON people_personemail;
+DROP TRIGGER IF EXISTS update_search_field_when_email_deleted ON people_personemail;
+DROP FUNCTION IF EXISTS process_update_emails();
+DROP FUNCTION IF EXISTS update_people_search_field_from_ids(people_person.id%TYPE[]);
+DROP TRIGGER IF EXISTS update_person_search_field_when_created ON people_person;
+DROP TRIGGER IF EXISTS update_person_search_field_when_modified ON people_person;
+"""
+
+CREATE_ROW_LEVEL_SEARCH_TRIGGERS = """
+CREATE FUNCTION update_people_search_field_from_id(person_id people_person.id%TYPE) RETURNS VOID AS $$
+BEGIN
+  --
+  -- Update search vector for the person identified by person_id
+  --
+  UPDATE people_person SET search = get_people_tsvector(id, first_name, last_name, location_zip) WHERE id = person_id;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION process_update_email() RETURNS TRIGGER AS $$
+BEGIN
+  --
+  -- Trigger function to update the corresponding person's search vector
+  -- when an email is created, updated or deleted
+  --
+  IF (tg_op = 'INSERT') THEN
+    PERFORM update_people_search_field_from_id(NEW.person_id);
+  ELSIF (tg_op = 'DELETE') THEN
+    PERFORM update_people_search_field_from_id(OLD.person_id);
+  ELSIF (tg_op = 'UPDATE' AND (OLD.address <> NEW.address OR OLD.person_id <> NEW.person_id)) THEN
+    PERFORM update_people_search_field_from_id(NEW.person_id);
+  END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER update_person_search_field_when_modified
+BEFORE INSERT OR UPDATE ON people_person
+  FOR EACH ROW EXECUTE PROCEDURE process_update_person();
+
+CREATE TRIGGER update_search_field_when_email_modified
+AFTER INSERT OR UPDATE OR DELETE ON people_personemail
+  FOR EACH ROW EXECUTE PROCEDURE process_update_email();
+"""
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("people", "0034_alter_document_type"),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=REMOVE_ROW_LEVEL_SEARCH_TRIGGERS,
+            reverse_sql=CREATE_ROW_LEVEL_SEARCH_TRIGGERS,
+        ),
+        migrations.RunSQL(
+            sql=CREATE_STATEMENT_LEVEL_SEARCH_TRIGGERS,
+            reverse_sql=REMOVE_STATEMENT_LEVEL_SEARCH_TRIGGERS,
+        ),
+    ]
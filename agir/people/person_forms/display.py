@@ -2,12 +2,13 @@
 from functools import reduce
 from itertools import chain
 from operator import or_
+from uuid import UUID
 
 import iso8601
 from data_france.models import Commune
 from django.conf import settings
 from django.core.exceptions import ValidationError
-from django.db.models import Subquery, OuterRef, QuerySet
+from django.db.models import Subquery, OuterRef, QuerySet, Func, F, Q
 from django.urls import reverse
 from django.utils.formats import localize
 from django.utils.html import format_html
@@ -18,6 +19,7 @@ from phonenumber_field.phonenumber import PhoneNumber
 from phonenumbers import NumberParseException
 
 from agir.lib.html import textify
+from agir.lib.utils import grouper
 from agir.people.models import Person, PersonForm, PersonEmail, PersonTag
 from agir.people.person_forms.fields import (
     PREDEFINED_CHOICES,
@@ -97,6 +99,34 @@ class PersonFormDisplay:
         except StopIteration:
             return value
 
+    def _get_choice_label_getter(self, field_descriptor, html=False):
+        """Renvoie une fonction équivalente à `_get_choice_label` pour un champ donné
+
+        Les libellés des choix sont calculés une seule fois, ce qui évite de reconstruire et parcourir
+        la liste des choix pour chaque valeur lorsqu'on formate toute une colonne.
+        """
+        choices = field_descriptor["choices"]
+        if isinstance(choices, str) and callable(PREDEFINED_CHOICES.get(choices)):
+            return lambda value: self._get_choice_label(field_descriptor, value, html)
+
+        if isinstance(choices, str):
+            choices = PREDEFINED_CHOICES.get(choices)
+
+        labels = {}
+        for choice in choices:
+            id, label = (
+                (choice, choice) if isinstance(choice, str) else (choice[0], choice[1])
+            )
+            labels.setdefault(id, label)
+
+        def get_label(value):
+            try:
+                return labels.get(value, value)
+            except TypeError:
+                return value
+
+        return get_label
+
     def _get_formatted_value(self, field, value, html=True, na_placeholder=None):
         """Récupère la valeur du champ pour les humains
 
@@ -182,6 +212,107 @@ class PersonFormDisplay:
 
         return value
 
+    def _get_formatted_column(self, field, values, html=True):
+        """Formate d'un seul coup toutes les valeurs d'un même champ
+
+        Le résultat est identique à un appel à `_get_formatted_value` pour chacune des valeurs, mais les
+        libellés de choix ne sont calculés qu'une fois et les objets référencés (personnes, étiquettes,
+        communes) sont récupérés en une seule requête.
+
+        :param field: le descripteur du champ
+        :param values: la liste des valeurs prises par ce champ
+        :param html: s'il faut inclure du HTML ou non
+        :return: la liste des valeurs formatées, dans le même ordre
+        """
+        field_type = field.get("type")
+        na_placeholder = self.NA_HTML_PLACEHOLDER if html else self.NA_TEXT_PLACEHOLDER
+        present_values = [v for v in values if v is not None]
+
+        if field_type in ["choice", "autocomplete_choice"] and "choices" in field:
+            get_label = self._get_choice_label_getter(field, html)
+            formatter = get_label
+        elif field_type == "multiple_choice" and "choices" in field:
+            get_label = self._get_choice_label_getter(field, html)
+
+            def formatter(value):
+                if isinstance(value, list):
+                    return " // ".join(get_label(v) for v in value)
+                return value
+
+        elif field_type == "person":
+            ids = set()
+            for value in present_values:
+                try:
+                    ids.add(UUID(str(value)))
+                except ValueError:
+                    pass
+            people = {
+                str(p.id): str(p)
+                for p in Person.objects.filter(id__in=ids).select_related(
+                    "public_email"
+                )
+            }
+
+            def formatter(value):
+                try:
+                    return people.get(str(UUID(str(value))), value)
+                except ValueError:
+                    return value
+
+        elif field_type == "person_tag":
+            ids = {
+                tag_id
+                for value in present_values
+                for tag_id in (value if isinstance(value, list) else [value])
+            }
+            tags = {str(t.id): str(t) for t in PersonTag.objects.filter(id__in=ids)}
+
+            def formatter(value):
+                if not isinstance(value, list):
+                    value = [value]
+                return [tags.get(str(tag_id), "None") for tag_id in value]
+
+        elif field_type == "commune":
+            pks = {v for v in present_values if isinstance(v, int)}
+            codes = {
+                tuple(v.split("-"))
+                for v in present_values
+                if isinstance(v, str) and v.count("-") == 1
+            }
+            communes = {}
+            if pks or codes:
+                for c in Commune.objects.filter(
+                    reduce(
+                        or_,
+                        (Q(type=type, code=code) for type, code in codes),
+                        Q(pk__in=pks),
+                    )
+                ):
+                    communes[c.pk] = c.nom
+                    communes[f"{c.type}-{c.code}"] = c.nom
+
+            def formatter(value):
+                return communes.get(value, value)
+
+            return [na_placeholder if v is None else formatter(v) for v in values]
+        else:
+            return [
+                self._get_formatted_value(field, v, html, na_placeholder)
+                for v in values
+            ]
+
+        results = []
+        for value in values:
+            if value is None:
+                results.append(na_placeholder)
+                continue
+            value = formatter(value)
+            if isinstance(value, list):
+                value = ", ".join(value)
+            results.append(value)
+
+        return results
+
     def _get_admin_fields(self, submissions, html=True):
         id_fields = [s.pk for s in submissions]
 
@@ -320,25 +451,16 @@ class PersonFormDisplay:
 
         return field_information
 
-    def get_formatted_submissions(
+    def _get_headers(
         self,
-        submissions_or_form,
+        form,
+        additional_fields,
         html=True,
         include_admin_fields=True,
         resolve_labels=True,
-        resolve_values=True,
         fieldsets_titles=False,
         unique_labels=False,
-        as_dicts=False,
     ):
-        if not submissions_or_form:
-            return [], []
-
-        form, submissions = self._get_form_and_submissions(submissions_or_form)
-
-        if len(submissions) == 0:
-            return [], []
-
         fields_dict = form.fields_dict
 
         simple_labels = self.get_form_field_labels(
@@ -366,54 +488,111 @@ class PersonFormDisplay:
         else:
             labels = simple_labels
 
-        full_data = [sub.data for sub in submissions]
-        if resolve_values:
-            full_values = [
-                {
-                    id: (
-                        self._get_formatted_value(fields_dict[id], value, html)
-                        if id in fields_dict
-                        else value
-                    )
-                    for id, value in d.items()
-                }
-                for d in full_data
-            ]
-        else:
-            full_values = full_data
-
-        declared_fields = set(fields_dict)
-        additional_fields = sorted(
-            reduce(or_, (set(d) for d in full_data)).difference(declared_fields)
-        )
-
         headers = [
             labels.get(field_id, field_id) for field_id in fields_dict
         ] + additional_fields
 
-        ordered_values = [
-            [
-                v.get(
-                    i,
-                    (
-                        self.NA_HTML_PLACEHOLDER
-                        if html and resolve_values
-                        else self.NA_TEXT_PLACEHOLDER if resolve_values else ""
-                    ),
-                )
-                for i in chain(fields_dict, additional_fields)
-            ]
-            for v in full_values
-        ]
+        if include_admin_fields:
+            headers = self.get_admin_fields_label(form, html=html) + headers
+
+        return headers
+
+    def _get_rows(
+        self,
+        form,
+        submissions,
+        additional_fields,
+        html=True,
+        include_admin_fields=True,
+        resolve_values=True,
+    ):
+        """Construit les lignes de valeurs colonne par colonne
+
+        :param form: le formulaire
+        :param submissions: une liste de réponses au formulaire
+        :param additional_fields: les champs présents dans les réponses mais absents du formulaire
+        """
+        fields_dict = form.fields_dict
+        full_data = [sub.data for sub in submissions]
+        missing_placeholder = (
+            self.NA_HTML_PLACEHOLDER
+            if html and resolve_values
+            else self.NA_TEXT_PLACEHOLDER if resolve_values else ""
+        )
+
+        columns = []
+        for id in chain(fields_dict, additional_fields):
+            column = [d.get(id) for d in full_data]
+            if resolve_values and id in fields_dict:
+                column = self._get_formatted_column(fields_dict[id], column, html)
+            columns.append(
+                [
+                    v if id in d else missing_placeholder
+                    for v, d in zip(column, full_data)
+                ]
+            )
+
+        if columns:
+            ordered_values = [list(row) for row in zip(*columns)]
+        else:
+            ordered_values = [[] for _ in full_data]
 
         if include_admin_fields:
             admin_values = self._get_admin_fields(submissions, html)
-            headers = self.get_admin_fields_label(form, html=html) + headers
             ordered_values = [
                 admin_values + values
                 for admin_values, values in zip(admin_values, ordered_values)
             ]
 
+        return ordered_values
+
+    def get_formatted_submissions(
+        self,
+        submissions_or_form,
+        html=True,
+        include_admin_fields=True,
+        resolve_labels=True,
+        resolve_values=True,
+        fieldsets_titles=False,
+        unique_labels=False,
+        as_dicts=False,
+    ):
+        # évite d'évaluer un queryset complet uniquement pour vérifier qu'il n'est pas vide
+        if not isinstance(submissions_or_form, QuerySet) and not submissions_or_form:
+            return [], []
+
+        try:
+            form, submissions = self._get_form_and_submissions(submissions_or_form)
+        except PersonForm.DoesNotExist:
+            return [], []
+
+        submissions = list(submissions)
+
+        if len(submissions) == 0:
+            return [], []
+
+        additional_fields = sorted(
+            set().union(*(s.data for s in submissions)).difference(form.fields_dict)
+        )
+
+        headers = self._get_headers(
+            form,
+            additional_fields,
+            html=html,
+            include_admin_fields=include_admin_fields,
+            resolve_labels=resolve_labels,
+            fieldsets_titles=fieldsets_titles,
+            unique_labels=unique_labels,
+        )
+        ordered_values = self._get_rows(
+            form,
+            submissions,
+            additional_fields,
+            html=html,
+            include_admin_fields=include_admin_fields,
+            resolve_values=resolve_values,
+        )
+
         if as_dicts:
             return [
                 {headers[i]: val for i, val in enumerate(item)}
@@ -422,6 +601,77 @@ class PersonFormDisplay:
 
         return headers, ordered_values
 
+    def get_additional_fields(self, form, submissions):
+        """Renvoie les champs présents dans les réponses mais pas dans la définition du formulaire
+
+        Les clés sont récupérées directement en SQL, sans charger les réponses.
+        """
+        return sorted(
+            set(
+                submissions.order_by()
+                .annotate(_key=Func(F("data"), function="jsonb_object_keys"))
+                .values_list("_key", flat=True)
+                .distinct()
+            ).difference(form.fields_dict)
+        )
+
+    def iter_formatted_submissions(
+        self,
+        submissions_or_form,
+        html=True,
+        include_admin_fields=True,
+        resolve_labels=True,
+        resolve_values=True,
+        fieldsets_titles=False,
+        unique_labels=False,
+        additional_fields=None,
+        chunk_size=2000,
+    ):
+        """Équivalent de `get_formatted_submissions` qui produit les lignes au fur et à mesure
+
+        Les réponses sont récupérées et formatées par lots de `chunk_size`, ce qui permet d'exporter
+        des formulaires avec un très grand nombre de réponses sans tout charger en mémoire.
+
+        :param additional_fields: les champs supplémentaires à inclure ; par défaut, tous ceux
+            présents dans au moins une des réponses, déterminés par une requête SQL
+        :return: un couple (en-têtes, générateur de lignes)
+        """
+        if not isinstance(submissions_or_form, QuerySet) and not submissions_or_form:
+            return [], iter([])
+
+        try:
+            form, submissions = self._get_form_and_submissions(submissions_or_form)
+        except PersonForm.DoesNotExist:
+            return [], iter([])
+
+        if additional_fields is None:
+            additional_fields = self.get_additional_fields(form, submissions)
+
+        headers = self._get_headers(
+            form,
+            additional_fields,
+            html=html,
+            include_admin_fields=include_admin_fields,
+            resolve_labels=resolve_labels,
+            fieldsets_titles=fieldsets_titles,
+            unique_labels=unique_labels,
+        )
+
+        def rows():
+            for chunk in grouper(
+                submissions.iterator(chunk_size=chunk_size), chunk_size
+            ):
+                yield from self._get_rows(
+                    form,
+                    list(chunk),
+                    additional_fields,
+                    html=html,
+                    include_admin_fields=include_admin_fields,
+                    resolve_values=resolve_values,
+                )
+
+        return headers, rows()
+
     def get_formatted_submission(
         self, submission, include_admin_fields=False, html=True
     ):
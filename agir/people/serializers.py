@@ -20,7 +20,7 @@ from .actions.subscription import (
     SUBSCRIPTION_TYPE_LFI,
     SUBSCRIPTION_TYPE_CHOICES,
     subscription_success_redirect_url,
-    save_subscription_information,
+    enqueue_subscription_information,
     SUBSCRIPTION_EMAIL_SENT_REDIRECT,
     save_contact_information,
 )
@@ -175,24 +175,27 @@ class SubscriptionRequestSerializer(serializers.Serializer):
 
         send_confirmation_email.delay(**self.validated_data)
 
-        try:
-            person = Person.objects.get_by_natural_key(email)
-        except Person.DoesNotExist:
+        person_id = (
+            Person.objects.filter(emails__address__iexact=email)
+            .values_list("id", flat=True)
+            .first()
+        )
+        if person_id is None:
             self.result_data = {
                 "status": "new",
                 "url": SUBSCRIPTION_EMAIL_SENT_REDIRECT[type],
             }
         else:
-            save_subscription_information(person, type, self.validated_data)
+            # les informations sont enregistrées par lots, pour répondre sans attendre
+            enqueue_subscription_information(person_id, type, self.validated_data)
 
             self.result_data = {
                 "status": "known",
-                "id": str(person.id),
+                "id": str(person_id),
                 "url": subscription_success_redirect_url(
-                    type, person.id, self.validated_data
+                    type, person_id, self.validated_data
                 ),
             }
-            return person
 
 
 class NewslettersField(serializers.DictField):
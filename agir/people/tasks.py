@@ -8,6 +8,7 @@ from django.utils.safestring import mark_safe
 from django.utils.translation import gettext as _
 
 from agir.activity.models import Activity
+from agir.api.redis import get_auth_redis_client
 from agir.authentication.tokens import (
     subscription_confirmation_token_generator,
     add_email_confirmation_token_generator,
@@ -19,15 +20,21 @@ from agir.lib.google_sheet import (
     copy_array_to_sheet,
     parse_sheet_link,
     gspread_task,
-    add_row_to_sheet,
+    add_rows_to_sheet,
+    grouper,
+    open_sheet,
+    schedule_sheet_sync,
+    release_sheet_sync,
 )
 from agir.lib.mailing import send_mosaico_email, send_template_email
 from agir.lib.sms import send_sms
 from agir.lib.utils import front_url
+from .actions.stats import PersonStatisticsJob
 from .actions.subscription import (
     SUBSCRIPTIONS_EMAILS,
     SUBSCRIPTION_TYPE_LFI,
     SUBSCRIPTION_TYPE_NSP,
+    save_queued_subscription_information,
 )
 from .models import Person, PersonFormSubmission, PersonEmail, PersonValidationSMS
 from .person_forms.display import default_person_form_display, PersonFormDisplay
@@ -297,6 +304,16 @@ def notify_referrer(referrer_id, referred_id, referral_type):
     )
 
 
+@shared_task
+def save_queued_subscriptions():
+    save_queued_subscription_information()
+
+
+@shared_task
+def calculer_statistiques_personnes(job_id):
+    PersonStatisticsJob(job_id).run()
+
+
 @post_save_task()
 def notify_contact(person_pk, is_new=False):
     person = Person.objects.with_prefetched_email().get(pk=person_pk)
@@ -320,6 +337,42 @@ def notify_contact(person_pk, is_new=False):
     )
 
 
+SHEET_SYNC_BATCH_SIZE = 1000
+
+
+def _cle_synchronisation_formulaire(form_id):
+    return f"PersonForm:{form_id}"
+
+
+def _cle_derniere_reponse_copiee(form, sheet_id):
+    return f"GoogleSheetSync:PersonForm:{form.id}:{sheet_id.sid}:{sheet_id.gid}:last_id"
+
+
+def _derniere_reponse_copiee(form, sheet_id):
+    """Renvoie l'id de la dernière réponse copiée dans la feuille externe
+
+    Si cette information n'est pas disponible, elle est retrouvée à partir de la colonne des identifiants
+    de la feuille elle-même.
+    """
+    raw_value = get_auth_redis_client().get(
+        _cle_derniere_reponse_copiee(form, sheet_id)
+    )
+
+    try:
+        return int(raw_value)
+    except (ValueError, TypeError):
+        pass
+
+    ids = open_sheet(sheet_id).col_values(1)[1:]
+    return max((int(i) for i in ids if str(i).isdigit()), default=0)
+
+
+def _enregistrer_derniere_reponse_copiee(form, sheet_id, submission_id):
+    get_auth_redis_client().set(
+        _cle_derniere_reponse_copiee(form, sheet_id), submission_id
+    )
+
+
 @gspread_task
 def copier_toutes_reponses_vers_feuille_externe(person_form_id):
     try:
@@ -351,30 +404,115 @@ def copier_toutes_reponses_vers_feuille_externe(person_form_id):
 
     copy_array_to_sheet(sheet_id, [headers, *values])
 
+    if values:
+        _enregistrer_derniere_reponse_copiee(
+            form, sheet_id, max(int(row[0]) for row in values)
+        )
+
+
+def _cle_reponses_a_copier(form_id):
+    return f"GoogleSheetSync:PersonForm:{form_id}:pending"
+
+
+def planifier_copie_reponses_vers_feuille_externe(
+    person_form_id, person_form_submission_id=None
+):
+    """Programme la copie des nouvelles réponses d'un formulaire vers sa feuille externe
+
+    Les réponses reçues en rafale sont regroupées en un seul ajout à la feuille. Une réponse
+    indiquée explicitement est recopiée même si elle a déjà été exportée, ce qui permet de
+    reporter la modification d'une réponse existante.
+    """
+    if person_form_submission_id is not None:
+        get_auth_redis_client().sadd(
+            _cle_reponses_a_copier(person_form_id), person_form_submission_id
+        )
+
+    schedule_sheet_sync(
+        copier_nouvelles_reponses_vers_feuille_externe,
+        person_form_id,
+        key=_cle_synchronisation_formulaire(person_form_id),
+    )
+
 
 @gspread_task
 def copier_reponse_vers_feuille_externe(person_form_submission_id):
     try:
-        submission = PersonFormSubmission.objects.select_related("form", "person").get(
+        submission = PersonFormSubmission.objects.only("form_id").get(
             id=person_form_submission_id
         )
     except PersonFormSubmission.DoesNotExist:
         return
 
-    sheet_id = parse_sheet_link(submission.form.lien_feuille_externe)
+    planifier_copie_reponses_vers_feuille_externe(
+        submission.form_id, person_form_submission_id
+    )
 
-    if not sheet_id:
-        logger.warning(
-            f"URL de la Google sheet incorrecte pour le formulaire d'id {submission.form.id}"
-        )
-        return
 
-    display = PersonFormDisplay()
+def _copier_reponses(sheet_id, submissions, display):
     rows = display.get_formatted_submissions(
-        submission,
+        submissions.order_by("id"),
         html=False,
         unique_labels=True,
         as_dicts=True,
     )
+    # les réponses déjà présentes dans la feuille sont mises à jour : une tâche relancée après
+    # un échec partiel ne produit pas de doublons
+    add_rows_to_sheet(sheet_id, rows, id_column=PersonFormDisplay.admin_fields_label[0])
+
+
+@gspread_task
+def copier_nouvelles_reponses_vers_feuille_externe(person_form_id):
+    release_sheet_sync(_cle_synchronisation_formulaire(person_form_id))
+
+    try:
+        form = PersonForm.objects.get(id=person_form_id)
+    except PersonForm.DoesNotExist:
+        return
+
+    sheet_id = parse_sheet_link(form.lien_feuille_externe)
+
+    if not sheet_id:
+        logger.warning(
+            f"URL de la Google sheet incorrecte pour le formulaire d'id {form.id}"
+        )
+        return
+
+    display = PersonFormDisplay()
+
+    # les réponses signalées sont mises de côté : celles signalées pendant la copie le seront
+    # lors de l'exécution suivante, et celles d'une exécution en échec sont conservées
+    redis = get_auth_redis_client()
+    pending_key = _cle_reponses_a_copier(form.id)
+    processing_key = f"{pending_key}:processing"
+    with redis.pipeline() as pipe:
+        pipe.sunionstore(processing_key, [processing_key, pending_key])
+        pipe.delete(pending_key)
+        pipe.smembers(processing_key)
+        pending_ids = sorted(int(i) for i in pipe.execute()[-1])
+
+    for batch in grouper(pending_ids, SHEET_SYNC_BATCH_SIZE):
+        _copier_reponses(sheet_id, form.submissions.filter(id__in=batch), display)
+    redis.delete(processing_key)
+
+    last_id = _derniere_reponse_copiee(form, sheet_id)
+
+    while True:
+        submission_ids = list(
+            form.submissions.filter(id__gt=last_id)
+            .exclude(id__in=pending_ids)
+            .order_by("id")
+            .values_list("id", flat=True)[:SHEET_SYNC_BATCH_SIZE]
+        )
+
+        if not submission_ids:
+            return
+
+        _copier_reponses(
+            sheet_id,
+            PersonFormSubmission.objects.filter(id__in=submission_ids),
+            display,
+        )
 
-    add_row_to_sheet(sheet_id, rows[0])
+        last_id = submission_ids[-1]
+        _enregistrer_derniere_reponse_copiee(form, sheet_id, last_id)
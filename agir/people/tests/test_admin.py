@@ -6,6 +6,8 @@ from django.http import StreamingHttpResponse
 from django.test import TestCase
 from django.urls import reverse
 
+from agir.api.redis import using_separate_redis_server, get_auth_redis_client
+from agir.people.actions.stats import PersonStatisticsJob
 from agir.people.models import Person, PersonTag, PersonForm, PersonFormSubmission
 
 
@@ -220,6 +222,45 @@ class PeopleAdminTestCase(TestCase):
             list(items.values_list("id", flat=True)),
         )
 
+    @using_separate_redis_server
+    @patch("agir.people.admin.panels.calculer_statistiques_personnes")
+    def test_statistics_are_computed_in_background(self, calculer_statistiques):
+        self.client.force_login(
+            self.admin.role, backend="agir.people.backend.PersonBackend"
+        )
+        url = reverse("admin:people_person_statistics")
+
+        res = self.client.get(url)
+        self.assertContains(res, "Calcul des statistiques en cours")
+        calculer_statistiques.delay.assert_called_once()
+
+        PersonStatisticsJob(calculer_statistiques.delay.call_args[0][0]).run()
+
+        res = self.client.get(url)
+        self.assertContains(res, 'id="myChart"')
+        calculer_statistiques.delay.assert_called_once()
+
+    @using_separate_redis_server
+    def test_statistics_job_expiry_is_refreshed_while_running(self):
+        job, created = PersonStatisticsJob.start(
+            Person.objects.all(), [("q", "test"), ("is_staff", "1")]
+        )
+        self.assertTrue(created)
+        self.assertEqual(job.get_state()["status"], PersonStatisticsJob.STATUS_PENDING)
+
+        client = get_auth_redis_client()
+        self.assertGreater(client.ttl(job.key), 0)
+
+        client.expire(job.key, 10)
+        job.set_progress(1, 2)
+        self.assertGreater(client.ttl(job.key), 10)
+
+        same_job, created = PersonStatisticsJob.start(
+            Person.objects.all(), [("is_staff", "1"), ("q", "test")]
+        )
+        self.assertEqual(same_job.id, job.id)
+        self.assertFalse(created)
+
     def test_cannot_access_crp_field_without_specific_permission(self):
         unauthorized = Person.objects.create_insoumise(
             "crp_unauthorized@agir.local",
@@ -90,13 +90,13 @@ class SignupAPITestCase(APITestCase):
         self.client.logout()
         data = {"email": "valid@ema.il", "location_zip": "75019"}
         res = self.client.post("/api/inscription/", data=data)
-        self.assertEqual(res.status_code, 201)
+        self.assertEqual(res.status_code, 202)
 
     def test_no_error_is_returned_for_existing_email(self):
         self.client.logout()
         data = {"email": self.existing_person.email, "location_zip": "75019"}
         res = self.client.post("/api/inscription/", data=data)
-        self.assertEqual(res.status_code, 201)
+        self.assertEqual(res.status_code, 202)
 
 
 class CreateContactAPITestCase(APITestCase):
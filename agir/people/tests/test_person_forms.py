@@ -594,6 +594,87 @@ class SubmissionFormatTestCase(TestCase):
         )
 
 
+class SubmissionsColumnFormatTestCase(TestCase):
+    def setUp(self):
+        self.person = Person.objects.create_insoumise("person@corp.com")
+        self.tag = PersonTag.objects.create(label="Étiquette")
+        self.form = PersonForm.objects.create(
+            title="Formulaire",
+            slug="formulaire",
+            custom_fields=[
+                {
+                    "title": "Une partie",
+                    "fields": [
+                        {
+                            "id": "choix",
+                            "type": "choice",
+                            "label": "Choix",
+                            "choices": [["a", "Premier"], ["b", "Second"]],
+                        },
+                        {
+                            "id": "choix_multiples",
+                            "type": "multiple_choice",
+                            "label": "Choix multiples",
+                            "choices": [["a", "Premier"], ["b", "Second"]],
+                        },
+                        {"id": "personne", "type": "person", "label": "Personne"},
+                        {"id": "tag", "type": "person_tag", "label": "Tag"},
+                    ],
+                }
+            ],
+        )
+
+        for data in [
+            {
+                "choix": "a",
+                "choix_multiples": ["a", "b"],
+                "personne": str(self.person.id),
+                "tag": [self.tag.id],
+            },
+            {"choix": "inconnu", "choix_multiples": None, "personne": "pas un id"},
+            {"choix": "b", "autre": "valeur"},
+        ]:
+            PersonFormSubmission.objects.create(
+                form=self.form, person=self.person, data=data
+            )
+
+    def test_column_formatting_is_identical_to_cell_formatting(self):
+        for html in [True, False]:
+            headers, rows = default_person_form_display.get_formatted_submissions(
+                self.form, html=html, include_admin_fields=False
+            )
+            self.assertEqual(
+                headers, ["Choix", "Choix multiples", "Personne", "Tag", "autre"]
+            )
+
+            fields = self.form.fields_dict
+            for submission, row in zip(self.form.submissions.order_by("created"), rows):
+                for i, field_id in enumerate(fields):
+                    if field_id in submission.data:
+                        self.assertEqual(
+                            row[i],
+                            default_person_form_display._get_formatted_value(
+                                fields[field_id], submission.data[field_id], html
+                            ),
+                        )
+
+        self.assertEqual(rows[0][:2], ["Premier", "Premier // Second"])
+        self.assertEqual(rows[1][:3], ["inconnu", "N/A", "pas un id"])
+
+    def test_iter_formatted_submissions(self):
+        headers, rows = default_person_form_display.get_formatted_submissions(
+            self.form, html=False
+        )
+        iter_headers, iter_rows = (
+            default_person_form_display.iter_formatted_submissions(
+                self.form, html=False, chunk_size=2
+            )
+        )
+
+        self.assertEqual(iter_headers, headers)
+        self.assertEqual(list(iter_rows), rows)
+
+
 class FieldsTestCase(TestCase):
     def setUp(self) -> None:
         self.person = Person.objects.create_insoumise(
@@ -0,0 +1,66 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from agir.people.models import Person, PersonEmail
+
+
+class PersonSearchTriggersTestCase(TestCase):
+    def setUp(self):
+        self.person = Person.objects.create_person(
+            email="premier@agir.test", first_name="Foo", location_zip="75001"
+        )
+
+    def get_search(self):
+        self.person.refresh_from_db(fields=["search"])
+        return self.person.search
+
+    def test_search_is_updated_on_bulk_email_creation_and_deletion(self):
+        other = Person.objects.create_person(email="autre@agir.test")
+        PersonEmail.objects.bulk_create(
+            [
+                PersonEmail(person=self.person, address="second@agir.test"),
+                PersonEmail(person=other, address="troisieme@agir.test"),
+            ]
+        )
+        self.assertIn("second@agir.test", self.get_search())
+
+        PersonEmail.objects.filter(address="second@agir.test").delete()
+        self.assertNotIn("second@agir.test", self.get_search())
+
+    def test_search_is_updated_for_both_persons_when_email_is_moved(self):
+        other = Person.objects.create_person(email="autre@agir.test")
+        PersonEmail.objects.filter(address="autre@agir.test").update(person=self.person)
+
+        self.assertIn("autre@agir.test", self.get_search())
+        other.refresh_from_db(fields=["search"])
+        self.assertNotIn("autre@agir.test", other.search)
+
+    def test_search_is_only_recomputed_when_indexed_fields_change(self):
+        Person.objects.filter(pk=self.person.pk).update(search=None)
+
+        Person.objects.filter(pk=self.person.pk).update(newsletters=["LFI"])
+        self.assertIsNone(self.get_search())
+
+        Person.objects.filter(pk=self.person.pk).update(first_name="Bar")
+        self.assertIn("bar", self.get_search())
+
+    def test_rebuild_command(self):
+        Person.objects.update(search=None)
+        call_command("rebuild_people_search", batch_size=1, stdout=StringIO())
+        self.assertIn("premier@agir.test", self.get_search())
+
+    def test_benchmark_command_rolls_back_its_changes(self):
+        out = StringIO()
+        call_command("mesurer_triggers_recherche", emails=10, stdout=out)
+
+        self.assertIn("déclencheurs ligne à ligne", out.getvalue())
+        self.assertIn("déclencheurs par requête", out.getvalue())
+        self.assertEqual(PersonEmail.objects.count(), 1)
+
+        # les déclencheurs par requête sont toujours en place
+        PersonEmail.objects.bulk_create(
+            [PersonEmail(person=self.person, address="second@agir.test")]
+        )
+        self.assertIn("second@agir.test", self.get_search())
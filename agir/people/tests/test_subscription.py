@@ -12,9 +12,17 @@ from rest_framework import status
 from rest_framework.reverse import reverse
 from rest_framework.test import APITestCase
 
+from agir.api.redis import using_separate_redis_server, get_auth_redis_client
 from agir.clients.models import Client
 from agir.lib.http import add_query_params_to_url
 from agir.lib.utils import generate_token_params
+from agir.people.actions.subscription import (
+    enqueue_subscription_information,
+    save_queued_subscription_information,
+    save_subscription_information,
+    SUBSCRIPTION_QUEUE_KEY,
+    SUBSCRIPTION_QUEUE_FAILED_KEY,
+)
 from agir.people.models import Person, generate_referrer_id
 from agir.people.tasks import send_confirmation_email
 
@@ -43,6 +51,7 @@ class WordpressClientMixin:
         self.client.force_login(self.wordpress_client.role)
 
 
+@using_separate_redis_server
 class APISubscriptionTestCase(WordpressClientMixin, APITestCase):
     @mock.patch("agir.people.serializers.send_confirmation_email")
     def test_can_subscribe_with_new_api(self, send_confirmation_email):
@@ -59,7 +68,7 @@ class APISubscriptionTestCase(WordpressClientMixin, APITestCase):
         response = self.client.post(
             reverse("api_people_subscription"), data=data, format="json"
         )
-        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
 
         send_confirmation_email.delay.assert_called_once()
         self.assertEqual(
@@ -101,10 +110,11 @@ class APISubscriptionTestCase(WordpressClientMixin, APITestCase):
             "type": "NSP",
             "metadata": {"universite": "Université Paris"},
         }
-        response = self.client.post(
-            reverse("api_people_subscription"), data=data, format="json"
-        )
-        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse("api_people_subscription"), data=data, format="json"
+            )
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
 
         send_confirmation_email.assert_not_called()
 
@@ -114,6 +124,60 @@ class APISubscriptionTestCase(WordpressClientMixin, APITestCase):
         self.assertEqual(person.last_name, "Polo")
         self.assertEqual(person.location_zip, "75001")
 
+    def test_queued_subscriptions_are_merged_by_email(self):
+        person = Person.objects.create_insoumise(
+            email="file@boite.pays", first_name="Marc", location_zip="75001"
+        )
+        data = {"email": "File@Boite.pays", "type": "NSP", "last_name": "Polo"}
+
+        enqueue_subscription_information(
+            person.id, "NSP", {**data, "metadata": {"universite": "Paris"}}
+        )
+        enqueue_subscription_information(
+            person.id, "NSP", {**data, "metadata": {"ville": "Lyon"}}
+        )
+        save_queued_subscription_information()
+
+        person.refresh_from_db()
+        self.assertTrue(person.is_political_support)
+        self.assertEqual(person.last_name, "Polo")
+        self.assertEqual(
+            person.meta["subscriptions"]["NSP"]["metadata"],
+            {"universite": "Paris", "ville": "Lyon"},
+        )
+
+    def test_invalid_queued_subscriptions_do_not_block_the_queue(self):
+        valid = Person.objects.create_insoumise(email="valide@boite.pays")
+        failing = Person.objects.create_insoumise(email="erreur@boite.pays")
+        client = get_auth_redis_client()
+
+        client.rpush(SUBSCRIPTION_QUEUE_KEY, "pas du json")
+        enqueue_subscription_information(
+            failing.id, "NSP", {"email": "erreur@boite.pays", "type": "NSP"}
+        )
+        enqueue_subscription_information(
+            valid.id, "NSP", {"email": "valide@boite.pays", "type": "NSP"}
+        )
+
+        def save(person, type, data):
+            if person == failing:
+                raise ValueError("erreur")
+            save_subscription_information(person, type, data)
+
+        with patch(
+            "agir.people.actions.subscription.save_subscription_information",
+            side_effect=save,
+        ):
+            save_queued_subscription_information()
+
+        valid.refresh_from_db()
+        self.assertTrue(valid.is_political_support)
+        self.assertEqual(client.llen(SUBSCRIPTION_QUEUE_KEY), 0)
+        self.assertEqual(client.llen(SUBSCRIPTION_QUEUE_FAILED_KEY), 2)
+        self.assertEqual(
+            client.lindex(SUBSCRIPTION_QUEUE_FAILED_KEY, 0), b"pas du json"
+        )
+
 
 class SubscriptionConfirmationTestCase(TestCase):
     def setUp(self):
@@ -1,8 +1,13 @@
 from django.core import mail
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 
+from agir.api.redis import get_auth_redis_client, using_separate_redis_server
+from agir.lib.google_sheet import GoogleSheetId
+from agir.lib.tests.fake_google_sheet import using_fake_sheet_client
 from agir.people import tasks
-from agir.people.models import Person
+from agir.people.models import Person, PersonFormSubmission
+from agir.people.person_forms.models import PersonForm
 
 
 class PeopleTasksTestCase(TestCase):
@@ -39,3 +44,51 @@ class PeopleTasksTestCase(TestCase):
         tasks.send_welcome_mail(person.pk, "LFI")
 
         self.assertEqual(len(mail.outbox), 1)
+
+
+@using_separate_redis_server
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class CopierReponsesVersFeuilleExterneTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.sheet_id = GoogleSheetId(sid="a" * 44, gid=0)
+        self.form = PersonForm.objects.create(
+            title="Formulaire",
+            slug="formulaire",
+            main_question="Question",
+            lien_feuille_externe=self.sheet_id.url,
+            custom_fields=[
+                {"title": "Détails", "fields": [{"id": "ville", "type": "short_text"}]}
+            ],
+        )
+        self.person = Person.objects.create_insoumise("me@me.org")
+        self.submission = PersonFormSubmission.objects.create(
+            form=self.form, person=self.person, data={"ville": "Paris"}
+        )
+
+    def test_copie_sans_doublon_et_report_des_modifications(self):
+        with using_fake_sheet_client() as client:
+            sheet = client.worksheet(self.sheet_id)
+
+            tasks.copier_nouvelles_reponses_vers_feuille_externe(self.form.id)
+            # une tâche relancée ne duplique pas les lignes
+            get_auth_redis_client().delete(
+                f"GoogleSheetSync:PersonForm:{self.form.id}:"
+                f"{self.sheet_id.sid}:{self.sheet_id.gid}:last_id"
+            )
+            tasks.copier_nouvelles_reponses_vers_feuille_externe(self.form.id)
+            self.assertEqual(len(sheet.get_all_values()), 2)
+
+            self.submission.data = {"ville": "Lyon"}
+            self.submission.save()
+            tasks.planifier_copie_reponses_vers_feuille_externe(
+                self.form.id, self.submission.id
+            )
+            tasks.copier_nouvelles_reponses_vers_feuille_externe(self.form.id)
+
+            rows = sheet.get_all_values()
+            self.assertEqual(len(rows), 2)
+            self.assertIn("Lyon", rows[1])
+            self.assertNotIn("Paris", rows[1])
@@ -43,7 +43,8 @@ class SubscriptionAPIView(GenericAPIView):
         serializer.is_valid(raise_exception=True)
         serializer.save()
 
-        return Response(serializer.result_data, status=status.HTTP_201_CREATED)
+        # les informations des personnes existantes sont enregistrées de façon asynchrone
+        return Response(serializer.result_data, status=status.HTTP_202_ACCEPTED)
 
 
 class SignupAPIView(SubscriptionAPIView):
@@ -1,4 +1,3 @@
-import csv
 from urllib.parse import urljoin
 
 from django.conf import settings
@@ -7,7 +6,11 @@ from django.contrib.auth.views import redirect_to_login
 from django.core.exceptions import PermissionDenied
 from django.core.files import File
 from django.http import Http404
-from django.http.response import HttpResponseRedirect, HttpResponse
+from django.http.response import (
+    HttpResponseRedirect,
+    HttpResponse,
+    StreamingHttpResponse,
+)
 from django.shortcuts import get_object_or_404, redirect
 from django.templatetags.static import static
 from django.urls import reverse
@@ -19,6 +22,7 @@ from django.views.generic.list import ListView
 
 from agir.events.models import Event
 from agir.front.view_mixins import ObjectOpengraphMixin
+from agir.lib.export import rows_to_csv_lines
 from agir.mailing.actions import create_campaign_from_submission
 from agir.people import tasks
 from agir.people.models import PersonForm, PersonFormSubmission
@@ -126,7 +130,10 @@ class BasePeopleFormView(UpdateView, ObjectOpengraphMixin):
         if self.person_form_instance.send_answers_to:
             tasks.send_person_form_notification.delay(form.submission.pk)
         if self.person_form_instance.lien_feuille_externe:
-            tasks.copier_reponse_vers_feuille_externe.delay(form.submission.pk)
+            # la réponse est indiquée explicitement pour reporter aussi les modifications
+            tasks.planifier_copie_reponses_vers_feuille_externe(
+                self.person_form_instance.pk, form.submission.pk
+            )
 
         if self.person_form_instance.campaign_template:
             data = {}
@@ -289,7 +296,7 @@ class PeopleFormSubmissionsPrivateView(DetailView):
     def get_csv(self, request):
         self.object = form = self.get_object()
 
-        headers, submissions = default_person_form_display.get_formatted_submissions(
+        headers, submissions = default_person_form_display.iter_formatted_submissions(
             form,
             html=False,
             include_admin_fields=self.object.config.get("link_private_fields", False),
@@ -297,13 +304,11 @@ class PeopleFormSubmissionsPrivateView(DetailView):
             resolve_values=bool(request.GET.get("resolve_values")),
         )
 
-        response = HttpResponse(content_type="text/csv")
+        response = StreamingHttpResponse(
+            rows_to_csv_lines(submissions, headers=headers), content_type="text/csv"
+        )
         response["Content-Disposition"] = (
             f'attachment; filename="{self.object.slug}.csv"'
         )
 
-        writer = csv.writer(response)
-        writer.writerow(headers)
-        writer.writerows(submissions)
-
         return response
@@ -1,5 +1,6 @@
 import datetime
 
+from django.core.cache import cache
 from django.db.models import Count, Q
 from nuntius.models import Campaign, CampaignSentStatusType
 from tqdm import tqdm
@@ -91,6 +92,7 @@ def create_statistics_from_date(
         progress.update(1)
 
     progress.clear()
+    invalidate_statistics_reports()
 
 
 def update_statistics_from_date(
@@ -139,3 +141,73 @@ def update_statistics_from_date(
         progress.update(1)
 
     progress.clear()
+    invalidate_statistics_reports()
+
+
+STATISTICS_REPORT_MODELS = {
+    "absolues": AbsoluteStatistics,
+    "materiel": MaterielStatistics,
+    "communes": CommuneStatistics,
+}
+STATISTICS_REPORT_CACHE_TIMEOUT = 24 * 3600
+STATISTICS_REPORT_VERSION_KEY = "statistics:reports:version"
+
+
+def invalidate_statistics_reports():
+    """Invalide tous les rapports en cache, à appeler après toute modification des relevés"""
+    try:
+        cache.incr(STATISTICS_REPORT_VERSION_KEY)
+    except ValueError:
+        cache.set(STATISTICS_REPORT_VERSION_KEY, 1, None)
+
+
+def _population_range_label(population_range):
+    if population_range == "total":
+        return "total"
+    if len(population_range) == 2:
+        return f"{population_range[0]}-{population_range[1]}"
+    return f"{population_range[0]}+"
+
+
+def _compute_statistics_report(kind, start, end, by_commune):
+    model = STATISTICS_REPORT_MODELS[kind]
+
+    if by_commune:
+        return {
+            "period": (start, end),
+            "communes": CommuneStatistics.objects.deltas_by_commune(start, end),
+        }
+
+    aggregates = model.objects.aggregate_for_period(start, end)
+
+    if model is CommuneStatistics:
+        # les tranches de population sont des tuples, qui ne peuvent pas être des clés JSON
+        aggregates = {
+            key: (
+                {_population_range_label(k): v for k, v in value.items()}
+                if isinstance(value, dict)
+                else value
+            )
+            for key, value in aggregates.items()
+        }
+
+    return aggregates
+
+
+def get_statistics_report(kind, start=None, end=None, by_commune=False):
+    """Renvoie l'évolution des statistiques sur une période, en utilisant le cache si possible
+
+    :param kind: le type de statistiques, parmi les clés de `STATISTICS_REPORT_MODELS`
+    :param start: la date de début de la période (incluse)
+    :param end: la date de fin de la période (incluse)
+    :param by_commune: pour les statistiques par commune, s'il faut détailler l'évolution commune par commune
+    """
+    version = cache.get(STATISTICS_REPORT_VERSION_KEY, 0)
+    key = f"statistics:reports:{version}:{kind}:{start}:{end}:{by_commune}"
+
+    report = cache.get(key)
+    if report is None:
+        report = _compute_statistics_report(kind, start, end, by_commune)
+        cache.set(key, report, STATISTICS_REPORT_CACHE_TIMEOUT)
+
+    return report
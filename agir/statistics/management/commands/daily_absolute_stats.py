@@ -3,6 +3,7 @@ import datetime
 from django.db import IntegrityError
 
 from agir.lib.commands import BaseCommand
+from agir.statistics.actions import invalidate_statistics_reports
 from agir.statistics.models import (
     AbsoluteStatistics,
     MaterielStatistics,
@@ -123,3 +124,5 @@ class Command(BaseCommand):
             self.update_or_create(date)
         else:
             self.create(date)
+
+        invalidate_statistics_reports()
@@ -1,7 +1,8 @@
 import datetime
 
 from django.db import models, IntegrityError
-from django.db.models import Sum
+from django.db.models import Sum, Min, Max, Count, Q, F, Window
+from django.db.models.functions import FirstValue
 from nuntius.models import CampaignSentEvent
 
 from agir.events.models import Event
@@ -15,10 +16,39 @@ from agir.statistics.utils import (
     get_commune_statistics,
     get_default_date,
     POPULATION_RANGES,
-    get_commune_count_by_population_range,
 )
 
 
+def first_and_last_values(qs, fields, partition_by=None):
+    """Annote chaque ligne avec les valeurs des champs pour le premier et le dernier relevé
+
+    Les annotations `first_<champ>` et `last_<champ>` sont calculées par des fonctions de fenêtrage,
+    éventuellement partitionnées, ce qui permet d'obtenir les deux relevés extrêmes d'une période
+    en une seule requête.
+    """
+    window_kwargs = {}
+    if partition_by is not None:
+        window_kwargs["partition_by"] = [F(partition_by)]
+
+    annotations = {}
+    for field in ["date", *fields]:
+        annotations[f"first_{field}"] = Window(
+            FirstValue(field), order_by=F("date").asc(), **window_kwargs
+        )
+        annotations[f"last_{field}"] = Window(
+            FirstValue(field), order_by=F("date").desc(), **window_kwargs
+        )
+
+    return qs.order_by().annotate(**annotations)
+
+
+def get_last_week_bounds():
+    """Renvoie les dates du lundi et du dimanche de la semaine précédente"""
+    today = datetime.date.today()
+    last_monday = today - datetime.timedelta(days=today.weekday(), weeks=1)
+    return last_monday, last_monday + datetime.timedelta(days=6)
+
+
 class StatisticsQuerysetMixin(models.QuerySet):
     def create(self, date=None, **kwargs):
         values = self.get_data(date)
@@ -33,17 +63,15 @@ class StatisticsQuerysetMixin(models.QuerySet):
         return super().update_or_create(date=date, defaults=defaults, **kwargs)
 
     def aggregate_for_last_week(self):
-        today = datetime.date.today()
-        last_monday = today - datetime.timedelta(days=today.weekday(), weeks=1)
-        last_sunday = last_monday + datetime.timedelta(days=6)
-        return self.aggregate_for_period(last_monday, last_sunday)
+        return self.aggregate_for_period(*get_last_week_bounds())
 
     def aggregate_for_last_week_progress(self):
         last_week = self.aggregate_for_last_week()
-        last_monday, last_sunday = last_week["period"]
-        previous_monday = last_monday - datetime.timedelta(weeks=1)
-        previous_sunday = last_sunday - datetime.timedelta(weeks=1)
-        previous_week = self.aggregate_for_period(previous_monday, previous_sunday)
+        last_monday, last_sunday = get_last_week_bounds()
+        previous_week = self.aggregate_for_period(
+            last_monday - datetime.timedelta(weeks=1),
+            last_sunday - datetime.timedelta(weeks=1),
+        )
         aggregates = {"period": last_week["period"]}
 
         for key in self.model.AGGREGATABLE_FIELDS:
@@ -69,7 +97,7 @@ class AbsoluteStatisticsQueryset(StatisticsQuerysetMixin):
         return get_absolute_statistics(date, as_kwargs=True)
 
     def aggregate_for_period(self, start=None, end=None):
-        qs = self.order_by("-date")
+        qs = self
 
         if start:
             qs = qs.filter(date__gte=start)
@@ -77,13 +105,25 @@ class AbsoluteStatisticsQueryset(StatisticsQuerysetMixin):
         if end:
             qs = qs.filter(date__lte=end)
 
-        first = qs.last()
-        last = qs.first()
+        fields = self.model.AGGREGATABLE_FIELDS
+        values = (
+            first_and_last_values(qs, fields)
+            .values(
+                "first_date",
+                "last_date",
+                *(f"first_{key}" for key in fields),
+                *(f"last_{key}" for key in fields),
+            )
+            .first()
+        )
 
-        aggregates = {"period": (first.date, last.date)}
+        if values is None:
+            return {"period": (None, None), **{key: 0 for key in fields}}
 
-        for key in self.model.AGGREGATABLE_FIELDS:
-            aggregates[key] = getattr(last, key) - getattr(first, key)
+        aggregates = {"period": (values["first_date"], values["last_date"])}
+
+        for key in fields:
+            aggregates[key] = values[f"last_{key}"] - values[f"first_{key}"]
 
         return aggregates
 
@@ -189,13 +229,14 @@ class MaterielStatiticsQueryset(StatisticsQuerysetMixin):
         if end:
             qs = qs.filter(date__lte=end)
 
-        first = qs.last()
-        last = qs.first()
-
         aggregates = qs.aggregate(
-            **{field: Sum(field) for field in self.model.AGGREGATABLE_FIELDS}
+            _first_date=Min("date"),
+            _last_date=Max("date"),
+            **{field: Sum(field) for field in self.model.AGGREGATABLE_FIELDS},
+        )
+        aggregates["period"] = aggregates.pop("_first_date"), aggregates.pop(
+            "_last_date"
         )
-        aggregates["period"] = first.date, last.date
 
         return aggregates
 
@@ -343,35 +384,72 @@ class CommuneStatiticsQueryset(models.QuerySet):
 
         self.update_all_for_date(date=date, defaults=updates)
 
+    @staticmethod
+    def _population_range_conditions():
+        return {
+            "total": Q(),
+            **{
+                population_range: (
+                    Q(population__range=population_range)
+                    if len(population_range) == 2
+                    else Q(population__gte=population_range[0])
+                )
+                for population_range in POPULATION_RANGES
+            },
+        }
+
+    def _population_range_counts(self, dates):
+        """Compte, pour chaque date, les communes avec une valeur non nulle par tranche de population
+
+        Toutes les valeurs sont calculées en une seule requête, par agrégation conditionnelle.
+        """
+        qs = self.filter(date__in=dates).exclude(population__isnull=True)
+        ranges = self._population_range_conditions()
+
+        aggregations = {}
+        for i, date in enumerate(dates):
+            for key in self.model.AGGREGATABLE_FIELDS:
+                for j, condition in enumerate(ranges.values()):
+                    aggregations[f"c_{i}_{key}_{j}"] = Count(
+                        "id", filter=Q(date=date) & Q(**{f"{key}__gt": 0}) & condition
+                    )
+
+        values = qs.aggregate(**aggregations)
+
+        return [
+            {
+                key: {
+                    subkey: values[f"c_{i}_{key}_{j}"]
+                    for j, subkey in enumerate(ranges)
+                }
+                for key in self.model.AGGREGATABLE_FIELDS
+            }
+            for i, _ in enumerate(dates)
+        ]
+
     def aggregate_for_date(self, date=None):
         if date is None:
             date = get_default_date()
 
-        qs = self.filter(date=date).exclude(population__isnull=True)
-
-        aggregate = {}
-        for key in self.model.AGGREGATABLE_FIELDS:
-            base_qs = qs.all().filter(**{f"{key}__gt": 0})
-            aggregate[key] = get_commune_count_by_population_range(base_qs)
-
-        return aggregate
+        return self._population_range_counts([date])[0]
 
     def aggregate_for_last_week(self):
-        today = datetime.date.today()
-        last_monday = today - datetime.timedelta(days=today.weekday(), weeks=1)
-        last_sunday = last_monday + datetime.timedelta(days=6)
-        return self.aggregate_for_period(last_monday, last_sunday)
+        return self.aggregate_for_period(*get_last_week_bounds())
 
     def aggregate_for_last_week_progress(self):
         last_week = self.aggregate_for_last_week()
-        last_monday, last_sunday = last_week["period"]
-        previous_monday = last_monday - datetime.timedelta(weeks=1)
-        previous_sunday = last_sunday - datetime.timedelta(weeks=1)
-        previous_week = self.aggregate_for_period(previous_monday, previous_sunday)
+        last_monday, last_sunday = get_last_week_bounds()
+        previous_week = self.aggregate_for_period(
+            last_monday - datetime.timedelta(weeks=1),
+            last_sunday - datetime.timedelta(weeks=1),
+        )
         aggregates = {"period": last_week["period"]}
 
         for key in self.model.AGGREGATABLE_FIELDS:
-            aggregates[key] = last_week[key] - previous_week[key]
+            aggregates[key] = {
+                subkey: last_week[key][subkey] - previous_week[key][subkey]
+                for subkey in last_week[key]
+            }
 
         return aggregates
 
@@ -396,12 +474,19 @@ class CommuneStatiticsQueryset(models.QuerySet):
         if end:
             qs = qs.filter(date__lte=end)
 
-        first = qs.last()
-        last = qs.first()
-        aggregates = {"period": (first.date, last.date)}
+        period = qs.aggregate(first_date=Min("date"), last_date=Max("date"))
+        first_date, last_date = period["first_date"], period["last_date"]
+        aggregates = {"period": (first_date, last_date)}
+
+        if first_date is None:
+            ranges = self._population_range_conditions()
+            for key in self.model.AGGREGATABLE_FIELDS:
+                aggregates[key] = {subkey: 0 for subkey in ranges}
+            return aggregates
 
-        start_aggregate = self.aggregate_for_date(first.date)
-        end_aggregate = self.aggregate_for_date(date=last.date)
+        start_aggregate, end_aggregate = self._population_range_counts(
+            [first_date, last_date]
+        )
 
         for key in self.model.AGGREGATABLE_FIELDS:
             aggregates[key] = {
@@ -411,6 +496,52 @@ class CommuneStatiticsQueryset(models.QuerySet):
 
         return aggregates
 
+    def deltas_by_commune(self, start=None, end=None):
+        """Calcule pour chaque commune l'évolution de chaque valeur sur la période
+
+        Le calcul est fait en une seule requête grâce à des fonctions de fenêtrage partitionnées
+        par commune.
+
+        :return: une liste de dictionnaires avec les clés `commune_id`, `population`,
+            `first_date`, `last_date` et les champs de `AGGREGATABLE_FIELDS`
+        """
+        qs = self
+
+        if start:
+            qs = qs.filter(date__gte=start)
+
+        if end:
+            qs = qs.filter(date__lte=end)
+
+        fields = self.model.AGGREGATABLE_FIELDS
+
+        rows = (
+            first_and_last_values(
+                qs, [*fields, "population"], partition_by="commune_id"
+            )
+            .values(
+                "commune_id",
+                "first_date",
+                "last_date",
+                "last_population",
+                *(f"first_{key}" for key in fields),
+                *(f"last_{key}" for key in fields),
+            )
+            .order_by("commune_id")
+            .distinct("commune_id")
+        )
+
+        return [
+            {
+                "commune_id": row["commune_id"],
+                "population": row["last_population"],
+                "first_date": row["first_date"],
+                "last_date": row["last_date"],
+                **{key: row[f"last_{key}"] - row[f"first_{key}"] for key in fields},
+            }
+            for row in rows
+        ]
+
 
 class CommuneStatistics(TimeStampedModel):
     AGGREGATABLE_FIELDS = [
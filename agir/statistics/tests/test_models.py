@@ -0,0 +1,151 @@
+import datetime
+
+from data_france.models import Commune, Departement, Region
+from data_france.utils import TypeNom
+from django.test import TestCase
+
+from agir.statistics.models import AbsoluteStatistics, CommuneStatistics
+
+D1 = datetime.date(2022, 1, 1)
+D2 = datetime.date(2022, 1, 2)
+D3 = datetime.date(2022, 1, 3)
+
+
+class AbsoluteStatisticsAggregateTestCase(TestCase):
+    def setUp(self):
+        AbsoluteStatistics.objects.bulk_create(
+            [
+                AbsoluteStatistics(date=D1, event_count=1, liaison_count=5),
+                AbsoluteStatistics(date=D2, event_count=4, liaison_count=5),
+                AbsoluteStatistics(date=D3, event_count=10, liaison_count=2),
+            ]
+        )
+
+    def test_aggregate_for_period(self):
+        aggregates = AbsoluteStatistics.objects.aggregate_for_period()
+        self.assertEqual(aggregates["period"], (D1, D3))
+        self.assertEqual(aggregates["event_count"], 9)
+        self.assertEqual(aggregates["liaison_count"], -3)
+
+        aggregates = AbsoluteStatistics.objects.aggregate_for_period(start=D2, end=D2)
+        self.assertEqual(aggregates["period"], (D2, D2))
+        self.assertEqual(aggregates["event_count"], 0)
+
+    def test_aggregate_for_empty_period(self):
+        aggregates = AbsoluteStatistics.objects.aggregate_for_period(
+            start=datetime.date(2021, 1, 1), end=datetime.date(2021, 12, 31)
+        )
+        self.assertEqual(aggregates["period"], (None, None))
+        self.assertEqual(aggregates["event_count"], 0)
+
+        progress = AbsoluteStatistics.objects.aggregate_for_last_week_progress()
+        self.assertEqual(progress["event_count"], 0)
+
+
+class CommuneStatisticsAggregateTestCase(TestCase):
+    def setUp(self):
+        region = Region.objects.create(
+            code="01", nom="Région", type_nom=TypeNom.ARTICLE_LA, chef_lieu_id=1
+        )
+        departement = Departement.objects.create(
+            code="01",
+            nom="Département",
+            type_nom=TypeNom.ARTICLE_LE,
+            chef_lieu_id=1,
+            region=region,
+        )
+        self.petite, self.grande = (
+            Commune.objects.create(
+                id=i,
+                code=f"0000{i}",
+                type=Commune.TYPE_COMMUNE,
+                nom=nom,
+                type_nom=TypeNom.ARTICLE_LA,
+                departement=departement,
+            )
+            for i, nom in ((1, "Petite"), (2, "Grande"))
+        )
+
+        CommuneStatistics.objects.bulk_create(
+            [
+                CommuneStatistics(
+                    date=D1, commune=self.petite, population=500, people_count=0
+                ),
+                CommuneStatistics(
+                    date=D1,
+                    commune=self.grande,
+                    population=12000,
+                    people_count=2,
+                    event_count=1,
+                ),
+                CommuneStatistics(
+                    date=D2, commune=self.petite, population=500, people_count=3
+                ),
+                CommuneStatistics(
+                    date=D2,
+                    commune=self.grande,
+                    population=12000,
+                    people_count=5,
+                    event_count=1,
+                ),
+            ]
+        )
+
+    def test_aggregate_for_date(self):
+        aggregate = CommuneStatistics.objects.aggregate_for_date(D2)
+        self.assertEqual(aggregate["people_count"]["total"], 2)
+        self.assertEqual(aggregate["people_count"][(0, 999)], 1)
+        self.assertEqual(aggregate["people_count"][(10000, 14999)], 1)
+        self.assertEqual(aggregate["event_count"]["total"], 1)
+        self.assertEqual(aggregate["local_supportgroup_count"]["total"], 0)
+
+    def test_aggregate_for_period(self):
+        aggregates = CommuneStatistics.objects.aggregate_for_period(D1, D2)
+        self.assertEqual(aggregates["period"], (D1, D2))
+        self.assertEqual(aggregates["people_count"]["total"], 1)
+        self.assertEqual(aggregates["people_count"][(0, 999)], 1)
+        self.assertEqual(aggregates["people_count"][(10000, 14999)], 0)
+        self.assertEqual(aggregates["event_count"]["total"], 0)
+
+    def test_aggregate_for_empty_period_has_same_shape(self):
+        aggregates = CommuneStatistics.objects.aggregate_for_period(D3, D3)
+        non_empty = CommuneStatistics.objects.aggregate_for_period(D1, D2)
+
+        self.assertEqual(aggregates["period"], (None, None))
+        for key in CommuneStatistics.AGGREGATABLE_FIELDS:
+            self.assertEqual(set(aggregates[key]), set(non_empty[key]))
+            self.assertEqual(set(aggregates[key].values()), {0})
+
+        progress = CommuneStatistics.objects.aggregate_for_last_week_progress()
+        self.assertEqual(progress["people_count"]["total"], 0)
+
+    def test_deltas_by_commune(self):
+        deltas = CommuneStatistics.objects.deltas_by_commune(D1, D2)
+        self.assertEqual(
+            deltas,
+            [
+                {
+                    "commune_id": self.petite.id,
+                    "population": 500,
+                    "first_date": D1,
+                    "last_date": D2,
+                    "local_supportgroup_count": 0,
+                    "local_certified_supportgroup_count": 0,
+                    "event_count": 0,
+                    "people_count": 3,
+                },
+                {
+                    "commune_id": self.grande.id,
+                    "population": 12000,
+                    "first_date": D1,
+                    "last_date": D2,
+                    "local_supportgroup_count": 0,
+                    "local_certified_supportgroup_count": 0,
+                    "event_count": 0,
+                    "people_count": 3,
+                },
+            ],
+        )
+
+        deltas = CommuneStatistics.objects.deltas_by_commune(start=D2)
+        self.assertEqual([d["people_count"] for d in deltas], [0, 0])
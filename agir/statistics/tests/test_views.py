@@ -0,0 +1,67 @@
+import datetime
+
+from django.core.cache import cache
+from django.test import override_settings
+from rest_framework.reverse import reverse
+from rest_framework.test import APITestCase
+
+from agir.people.models import Person
+from agir.statistics.models import AbsoluteStatistics
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class StatisticsReportAPIViewTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = Person.objects.create_superperson("admin@agir.local", None)
+        self.person = Person.objects.create_person(
+            "person@agir.local", create_role=True
+        )
+        AbsoluteStatistics.objects.bulk_create(
+            [
+                AbsoluteStatistics(date=datetime.date(2022, 1, 1), event_count=1),
+                AbsoluteStatistics(date=datetime.date(2022, 1, 2), event_count=4),
+            ]
+        )
+        self.url = reverse("api_statistics_report", kwargs={"kind": "absolues"})
+
+    def test_cannot_get_report_without_permission(self):
+        res = self.client.get(self.url)
+        self.assertIn(res.status_code, (401, 403))
+
+        self.client.force_login(self.person.role)
+        res = self.client.get(self.url)
+        self.assertEqual(res.status_code, 403)
+
+    def test_get_report(self):
+        self.client.force_login(self.admin.role)
+
+        res = self.client.get(self.url, {"debut": "2022-01-01", "fin": "2022-01-31"})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data["event_count"], 3)
+        self.assertEqual(
+            res.data["period"], (datetime.date(2022, 1, 1), datetime.date(2022, 1, 2))
+        )
+
+    def test_report_is_cached(self):
+        self.client.force_login(self.admin.role)
+        self.client.get(self.url)
+
+        AbsoluteStatistics.objects.filter(date=datetime.date(2022, 1, 2)).update(
+            event_count=10
+        )
+        res = self.client.get(self.url)
+        self.assertEqual(res.data["event_count"], 3)
+
+    def test_unknown_kind_and_invalid_date(self):
+        self.client.force_login(self.admin.role)
+
+        res = self.client.get(
+            reverse("api_statistics_report", kwargs={"kind": "inconnu"})
+        )
+        self.assertEqual(res.status_code, 404)
+
+        res = self.client.get(self.url, {"debut": "01/01/2022"})
+        self.assertEqual(res.status_code, 400)
@@ -0,0 +1,11 @@
+from django.urls import path
+
+from . import views
+
+urlpatterns = [
+    path(
+        "api/statistiques/<str:kind>/",
+        views.StatisticsReportAPIView.as_view(),
+        name="api_statistics_report",
+    ),
+]
@@ -0,0 +1,49 @@
+import datetime
+
+from django.http import Http404
+from rest_framework.exceptions import ValidationError, PermissionDenied
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from agir.lib.rest_framework_permissions import IsActionPopulaireClientPermission
+from agir.statistics.actions import get_statistics_report, STATISTICS_REPORT_MODELS
+
+
+class StatisticsReportAPIView(APIView):
+    """Évolution des statistiques sur une période, pour les tableaux de bord
+
+    Paramètres : `debut` et `fin` (au format AAAA-MM-JJ), et pour les statistiques par commune,
+    `par_commune` pour obtenir l'évolution commune par commune.
+    """
+
+    permission_classes = (IsActionPopulaireClientPermission,)
+
+    def parse_date(self, param):
+        value = self.request.query_params.get(param)
+        if not value:
+            return None
+        try:
+            return datetime.date.fromisoformat(value)
+        except ValueError:
+            raise ValidationError(
+                {param: "Date invalide (format attendu : AAAA-MM-JJ)"}
+            )
+
+    def get(self, request, kind):
+        if kind not in STATISTICS_REPORT_MODELS:
+            raise Http404()
+
+        opts = STATISTICS_REPORT_MODELS[kind]._meta
+        if not request.user.has_perm(f"{opts.app_label}.view_{opts.model_name}"):
+            raise PermissionDenied()
+
+        by_commune = kind == "communes" and "par_commune" in request.query_params
+
+        return Response(
+            get_statistics_report(
+                kind,
+                start=self.parse_date("debut"),
+                end=self.parse_date("fin"),
+                by_commune=by_commune,
+            )
+        )
@@ -1,7 +1,7 @@
-import json
 import base64
 from rest_framework.test import APITestCase
 from django.utils import timezone
+from agir.mailing.models import EmailBounce
 from agir.people.models import Person, PersonEmail
 
 
@@ -27,13 +27,14 @@ class WebhookTestCase(APITestCase):
                 }"""
 
     def test_sendgrid_bounce(self):
-        response = self.client.post(
-            "/webhooks/sendgrid_bounce",
-            self.sendgrid_payload,
-            format="json",
-            HTTP_AUTHORIZATION="Basic "
-            + (base64.b64encode(b"fi:prout").decode("utf-8")),
-        )
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                "/webhooks/sendgrid_bounce",
+                self.sendgrid_payload,
+                format="json",
+                HTTP_AUTHORIZATION="Basic "
+                + (base64.b64encode(b"fi:prout").decode("utf-8")),
+            )
         self.assertEqual(response.status_code, 202)
         self.person.refresh_from_db()
         self.assertEqual(
@@ -57,13 +58,14 @@ class WebhookTestCase(APITestCase):
         self.assertEqual(response.status_code, 401)
 
     def test_amazon_bounce(self):
-        response = self.client.post(
-            "/webhooks/ses_bounce",
-            self.ses_payload,
-            content_type="text/plain; charset=UTF-8",
-            HTTP_AUTHORIZATION="Basic "
-            + (base64.b64encode(b"fi:prout").decode("utf-8")),
-        )
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                "/webhooks/ses_bounce",
+                self.ses_payload,
+                content_type="text/plain; charset=UTF-8",
+                HTTP_AUTHORIZATION="Basic "
+                + (base64.b64encode(b"fi:prout").decode("utf-8")),
+            )
         self.assertEqual(response.status_code, 202)
         self.person.refresh_from_db()
         self.assertEqual(
@@ -85,14 +87,36 @@ class WebhookTestCase(APITestCase):
         self.assertEqual(response.status_code, 401)
 
     def test_bounce_secondary_email(self):
-        response = self.client.post(
-            "/webhooks/sendgrid_bounce",
-            self.sendgrid_payload2,
-            format="json",
-            HTTP_AUTHORIZATION="Basic "
-            + (base64.b64encode(b"fi:prout").decode("utf-8")),
-        )
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                "/webhooks/sendgrid_bounce",
+                self.sendgrid_payload2,
+                format="json",
+                HTTP_AUTHORIZATION="Basic "
+                + (base64.b64encode(b"fi:prout").decode("utf-8")),
+            )
         self.assertEqual(response.status_code, 202)
         self.person.refresh_from_db()
         self.assertFalse(PersonEmail.objects.get(address="primary@bounce.com").bounced)
         self.assertTrue(PersonEmail.objects.get(address="secondary@bounce.com").bounced)
+
+    def test_sendgrid_bounce_is_recorded_once(self):
+        payload = [
+            {"email": "primary@bounce.com", "event": "bounce", "sg_event_id": "abc"},
+            {"email": "primary@bounce.com", "event": "delivered", "sg_event_id": "def"},
+        ]
+        for _ in range(2):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(
+                    "/webhooks/sendgrid_bounce",
+                    payload,
+                    format="json",
+                    HTTP_AUTHORIZATION="Basic "
+                    + (base64.b64encode(b"fi:prout").decode("utf-8")),
+                )
+            self.assertEqual(response.status_code, 202)
+
+        bounce = EmailBounce.objects.get()
+        self.assertEqual(bounce.event_id, "abc")
+        self.assertEqual(bounce.address, "primary@bounce.com")
+        self.assertTrue(PersonEmail.objects.get(address="primary@bounce.com").bounced)
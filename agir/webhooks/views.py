@@ -1,4 +1,3 @@
-import json
 import logging
 
 import requests
@@ -10,8 +9,15 @@ from rest_framework.permissions import BasePermission
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from agir.people.models import PersonEmail
-from agir.mailing.metrics import ses_bounced_metric, sendgrid_bounced_metric
+from agir.mailing.bounces import PARSERS
+from agir.mailing.metrics import (
+    ses_bounced_metric,
+    sendgrid_bounced_metric,
+    bounce_webhook_requests,
+    bounce_webhook_events,
+)
+from agir.mailing.models import EmailBounce
+from agir.mailing.tasks import record_bounce_notification
 
 logger = logging.getLogger(__name__)
 
@@ -33,18 +39,24 @@ class IsBasicAuthenticated(BasePermission):
 
 
 class BounceView(APIView):
+    """Transmet les notifications de rejet à une tâche Celery, qui les enregistre par lots
+
+    La réponse est renvoyée immédiatement, pour que le fournisseur ne réessaie pas d'envoyer les
+    notifications volumineuses.
+    """
+
     permission_classes = (IsBasicAuthenticated,)
     authentication_classes = (SendgridSesWebhookAuthentication,)
+    provider = None
 
-    def handle_bounce(self, recipient_email):
-        try:
-            person_email = PersonEmail.objects.get_by_natural_key(recipient_email)
-        except PersonEmail.DoesNotExist:
-            pass
-        else:
-            person_email.bounced = True
-            person_email.save()
-            return
+    def handle_bounces(self, payload):
+        bounce_webhook_requests.labels(self.provider).inc()
+        bounces = PARSERS[self.provider](payload)
+        if bounces:
+            for bounce in bounces:
+                bounce_webhook_events.labels(self.provider, bounce.bounce_type).inc()
+            record_bounce_notification.delay(self.provider, payload)
+        return bounces
 
 
 class WrongContentTypeJSONParser(JSONParser):
@@ -53,35 +65,24 @@ class WrongContentTypeJSONParser(JSONParser):
 
 class SesBounceView(BounceView):
     parser_classes = (WrongContentTypeJSONParser,)
+    provider = EmailBounce.PROVIDER_SES
 
     def post(self, request):
         response = Response({"status": "Accepted"}, 202)
         if request.data["Type"] == "SubscriptionConfirmation":
             requests.get(request.data["SubscribeURL"])
             return response
-        if request.data["Type"] != "Notification":
-            return response
-
-        message = json.loads(request.data["Message"])
-        if message["notificationType"] != "Bounce":
-            return response
 
-        ses_bounced_metric.inc()
-        logger.info(f"Amazon Bounce: {json.dumps(message)}")
-
-        if message["bounce"]["bounceType"] != "Permanent":
-            return response
-
-        self.handle_bounce(message["mail"]["destination"][0])
+        if self.handle_bounces(request.data):
+            ses_bounced_metric.inc()
+            logger.info(f"Amazon Bounce: {request.data['Message']}")
 
         return response
 
 
 class SendgridBounceView(BounceView):
+    provider = EmailBounce.PROVIDER_SENDGRID
+
     def post(self, request):
-        for webhook in request.data:
-            if webhook["event"] != "bounce" and webhook["event"] != "dropped":
-                continue
-            sendgrid_bounced_metric.inc()
-            self.handle_bounce(webhook["email"])
+        sendgrid_bounced_metric.inc(len(self.handle_bounces(request.data)))
         return Response({"status": "Accepted"}, 202)